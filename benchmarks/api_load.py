@@ -0,0 +1,209 @@
+"""
+Load test of the local HTTP API (utils/api.py).
+
+Sends requests over concurrent keep-alive connections for a fixed duration per scenario and reports
+the requests and items (trips) per second and the latency percentiles. Scenarios:
+
+    state     GET /state
+    trip      GET /trips/{id} of a random trip
+    import    POST /trips with a batch of new OTM trip messages
+    assign    POST /assignments with a batch of (re-)assignments of trips to vehicles
+
+Without --url, the API is started in this process on a model of the business park locations
+(locations.json) with --vehicles vehicles and --trips draft trips; --ticker also runs the
+SimulationTicker, so requests compete with the simulation for the model lock. With --url, an
+already running API (e.g., the page's 'Local HTTP API' toggle) is tested; it needs vehicles.
+
+Usage:
+    python benchmarks/api_load.py
+    python benchmarks/api_load.py --connections 50 --batch 100 --duration 10 --ticker
+    python benchmarks/api_load.py --url http://127.0.0.1:8502 --scenarios state trip
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import sys
+import time
+
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))  # The other benchmarks, e.g. otm_ingestion
+
+from otm_ingestion import create_message
+from utils.api import APIServer, ModelAPI
+from utils.classes import Location, Vehicle
+from utils.entities import create_locations
+from utils.ticker import SimulationTicker
+
+BASE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+SCENARIOS = ['state', 'trip', 'import', 'assign']
+
+
+class Connection:
+    """
+    A minimal HTTP/1.1 keep-alive client connection (responses must have a Content-Length).
+    """
+
+    def __init__(self, host: str, port: int) -> None:
+        self.host = host
+        self.port = port
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    async def request(self, method: str, path: str, body: bytes = b'') -> Tuple[int, bytes]:
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        head = (f"{method} {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n")
+        self.writer.write(head.encode('ascii') + body)
+        status_line = await self.reader.readline()
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            if name.lower() == 'content-length':
+                length = int(value)
+        return int(status_line.split()[1]), await self.reader.readexactly(length)
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+
+
+class Workload:
+    """
+    The requests of the scenarios, built from the trips and vehicles of the model under test.
+    """
+
+    def __init__(self, trip_ids: List[str], vehicle_ids: List[str], batch: int, locations: List[Location]) -> None:
+        self.trip_ids = trip_ids
+        self.vehicle_ids = vehicle_ids
+        self.batch = batch
+        self.locations = locations
+        self.rng = random.Random(0)
+        self.message_ids = itertools.count(10_000_000)
+        self.assign_offset = itertools.count(0, batch)
+
+    def next_request(self, scenario: str) -> Tuple[str, str, bytes, int]:
+        """
+        Return the (method, path, body, number of items) of the next request of a scenario.
+        """
+        if scenario == 'state':
+            return 'GET', '/state', b'', 1
+        if scenario == 'trip':
+            return 'GET', f"/trips/{self.rng.choice(self.trip_ids)}", b'', 1
+        if scenario == 'import':
+            messages = [create_message(next(self.message_ids), self.rng.sample(self.locations, 3)) for _ in range(self.batch)]
+            return 'POST', '/trips', json.dumps(messages).encode('utf-8'), self.batch
+        offset = next(self.assign_offset)
+        assignments = [{"trip": self.trip_ids[(offset + i) % len(self.trip_ids)],
+                        "vehicle": self.vehicle_ids[(offset + i) % len(self.vehicle_ids)]} for i in range(self.batch)]
+        return 'POST', '/assignments', json.dumps(assignments).encode('utf-8'), self.batch
+
+
+async def run_scenario(host: str, port: int, workload: Workload, scenario: str, connections: int, duration: float) -> Dict[str, float]:
+    """
+    Send the requests of a scenario over concurrent connections for 'duration' seconds.
+    """
+    latencies: List[float] = []
+    counts = {'items': 0, 'errors': 0}
+    deadline = time.perf_counter() + duration
+
+    async def worker() -> None:
+        connection = Connection(host, port)
+        try:
+            while time.perf_counter() < deadline:
+                method, path, body, items = workload.next_request(scenario)
+                start = time.perf_counter()
+                status, _ = await connection.request(method, path, body)
+                latencies.append(time.perf_counter() - start)
+                if status >= 400:
+                    counts['errors'] += 1
+                else:
+                    counts['items'] += items
+        finally:
+            connection.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(connections)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    percentile = lambda p: latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000
+    return {'requests': len(latencies), 'rps': len(latencies) / elapsed, 'items/s': counts['items'] / elapsed,
+            'p50': percentile(0.50), 'p99': percentile(0.99), 'max': latencies[-1] * 1000, 'errors': counts['errors']}
+
+
+async def setup(host: str, port: int, trips: int, locations: List[Location]) -> Tuple[List[str], List[str]]:
+    """
+    Import the draft trips of the 'trip' and 'assign' scenarios and return the trip and vehicle ids.
+    """
+    connection = Connection(host, port)
+    rng = random.Random(1)
+    trip_ids: List[str] = []
+    for first in range(0, trips, 1000):
+        messages = [create_message(i, rng.sample(locations, 3)) for i in range(first, min(trips, first + 1000))]
+        _, body = await connection.request('POST', '/trips', json.dumps(messages).encode('utf-8'))
+        trip_ids.extend(json.loads(body)['created'].values())
+    _, body = await connection.request('GET', '/vehicles')
+    connection.close()
+    return trip_ids, [vehicle['id'] for vehicle in json.loads(body)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='the API to test (default: start one in this process)')
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=SCENARIOS, help='the scenarios to run (default: all)')
+    parser.add_argument('--connections', type=int, default=20, help='concurrent keep-alive connections (default: 20)')
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds per scenario (default: 5)')
+    parser.add_argument('--batch', type=int, default=50, help='trips per import and assignment request (default: 50)')
+    parser.add_argument('--trips', type=int, default=2000, help='draft trips imported before the scenarios (default: 2000)')
+    parser.add_argument('--vehicles', type=int, default=20, help='vehicles of the in-process model (default: 20)')
+    parser.add_argument('--port', type=int, default=8765, help='port of the in-process API (default: 8765)')
+    parser.add_argument('--ticker', action='store_true', help='run the SimulationTicker next to the in-process API')
+    args = parser.parse_args()
+
+    create_locations(os.path.join(BASE_DIR, 'locations.json'))
+    locations = Location.get_all_locations()
+    server, ticker = None, None
+    if args.url is None:
+        host, port = '127.0.0.1', args.port
+        for v in range(args.vehicles):
+            Vehicle(name=f"AV{v}", vehicle_type='terminal_tractor', position=list(locations[0].georeference))
+        ticker = SimulationTicker(interval=1.0)
+        if args.ticker:
+            ticker.start()
+        server = APIServer(ModelAPI(ticker.lock).app, host=host, port=port)
+        server.start()
+    else:
+        url = urlparse(args.url)
+        host, port = url.hostname, url.port or 80
+
+    try:
+        trip_ids, vehicle_ids = asyncio.run(setup(host, port, args.trips, locations))
+        if not vehicle_ids and 'assign' in args.scenarios:
+            parser.error("The API has no vehicles to assign trips to")
+        workload = Workload(trip_ids, vehicle_ids, args.batch, locations)
+        print(f"API at {host}:{port}: {len(trip_ids)} trips imported, {len(vehicle_ids)} vehicles, "
+              f"{args.connections} connections, batches of {args.batch}")
+        print(f"{'scenario':<10}{'requests':>10}{'req/s':>10}{'items/s':>10}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}{'errors':>8}")
+        for scenario in args.scenarios:
+            result = asyncio.run(run_scenario(host, port, workload, scenario, args.connections, args.duration))
+            print(f"{scenario:<10}{result['requests']:>10}{result['rps']:>10.0f}{result['items/s']:>10.0f}"
+                  f"{result['p50']:>9.1f}{result['p99']:>9.1f}{result['max']:>9.1f}{result['errors']:>8}")
+    finally:
+        if server is not None:
+            server.stop()
+        if ticker is not None and args.ticker:
+            ticker.stop()
+
+
+if __name__ == '__main__':
+    main()
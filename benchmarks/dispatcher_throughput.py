@@ -0,0 +1,100 @@
+"""
+Benchmark the throughput of the automatic dispatcher.
+
+Creates a fleet and a backlog of draft trips on synthetic locations (no street network
+needed) and measures dispatch decisions per second for a growing fleet:
+
+- linear scan: pick the earliest available vehicle by scanning all V vehicles, O(V) per decision
+- heap plan: Dispatcher.plan(), O(log V) per decision
+- heap dispatch: Dispatcher.dispatch(), including the write-through via Vehicle.assign_to_trip
+
+Usage:
+    python benchmarks/dispatcher_throughput.py
+    python benchmarks/dispatcher_throughput.py --trips 20000 --fleets 10 100 1000 5000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from utils import clock
+from utils.classes import Action, Location, Route, Trip, Vehicle
+from utils.dispatcher import Dispatcher
+from utils.entities import create_action
+
+
+def create_scenario(num_trips: int, num_vehicles: int, seed: int = 0) -> None:
+    """
+    Create 'num_vehicles' vehicles and 'num_trips' draft trips of two move actions each.
+    """
+    for cls in [Trip, Action, Route]:
+        cls.delete_all_instances()
+    Vehicle._instances = []
+    Vehicle._total_instances = 0
+
+    rng = random.Random(seed)
+    locations = [Location([52.31 + rng.random() * 0.02, 6.62 + rng.random() * 0.05], name=f"L{i}") for i in range(50)]
+    for i in range(num_vehicles):
+        Vehicle(name=f"terminal_tractor {i}", vehicle_type="terminal_tractor", average_speed=15 / 3.6)
+    for i in range(num_trips):
+        trip = Trip(name=f"Trip {i}")
+        stops = rng.sample(locations, 3)
+        for sequence_nr, (origin, destination) in enumerate(zip(stops[:-1], stops[1:])):
+            route = Route([origin.georeference, destination.georeference],
+                          length=rng.randint(200, 2000),
+                          coordinates=[tuple(origin.georeference), tuple(destination.georeference)])
+            create_action(origin, destination, sequence_nr=sequence_nr, route=route, trip=trip)
+
+
+def plan_linear_scan(trips, vehicles):
+    """
+    Reference dispatcher: scan all vehicles for the earliest free time at every decision.
+    """
+    free_at = [vehicle.get_available_time() for vehicle in vehicles]
+    decisions = []
+    for trip in sorted(trips, key=lambda trip: trip.creation_date):
+        i = min(range(len(vehicles)), key=free_at.__getitem__)
+        decisions.append((trip, vehicles[i], free_at[i]))
+        free_at[i] += timedelta(seconds=vehicles[i].get_timing_plan(trip).total_duration)
+    return decisions
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--trips', type=int, default=10000, help='number of draft trips to plan (default: 10000)')
+    parser.add_argument('--dispatch-trips', type=int, default=1000, help='number of trips for the write-through run (default: 1000)')
+    parser.add_argument('--fleets', type=int, nargs='+', default=[10, 100, 1000], help='fleet sizes (default: 10 100 1000)')
+    args = parser.parse_args()
+
+    clock.set_clock(clock.VirtualClock(datetime(2024, 1, 1, 8)))
+    dispatcher = Dispatcher()
+
+    print(f"{'vehicles':>10}{'linear scan':>16}{'heap plan':>16}{'heap dispatch':>16}   (decisions/s)")
+    for num_vehicles in args.fleets:
+        create_scenario(args.trips, num_vehicles)
+        trips, vehicles = Trip.get_by_status('draft'), Vehicle.get_all_vehicles()
+        linear, linear_s = timed(plan_linear_scan, trips, vehicles)
+        heap, heap_s = timed(dispatcher.plan, trips, vehicles)
+        assert [(t.id, v.id) for t, v, _ in linear] == [(t.id, v.id) for t, v, _ in heap]
+
+        create_scenario(args.dispatch_trips, num_vehicles)
+        dispatched, dispatch_s = timed(dispatcher.dispatch)
+        assert len(dispatched) == args.dispatch_trips and not Trip.get_by_status('draft')
+
+        print(f"{num_vehicles:>10}{len(linear) / linear_s:>16,.0f}{len(heap) / heap_s:>16,.0f}{len(dispatched) / dispatch_s:>16,.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+Benchmark the overhead of the lifecycle event stream.
+
+Measures the cost of Action.update_instance_parameter without subscribers (compared with the same
+update without the change hook), with an EventStream subscribed, and the throughput of an EventWriter
+appending the events to an NDJSON file.
+
+Usage:
+    python benchmarks/event_stream.py
+    python benchmarks/event_stream.py --updates 1000000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import types
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from utils import clock
+from utils.classes import Action, Location, Route, Trip
+from utils.event_stream import EventStream, EventWriter
+
+
+def update_without_hook(self: Action, parameter: str, value: object) -> None:
+    """
+    Action.update_instance_parameter as it was before the change hook, as a baseline.
+    """
+    setattr(self, parameter, value)
+    self.last_modified = clock.now()
+
+
+def measure(update, updates: int) -> float:
+    """
+    Return the time per update in nanoseconds; updates alternate the lifecycle so every update is a change.
+    """
+    values = ['actual', 'completed']
+    start = time.perf_counter()
+    for i in range(updates):
+        update('lifecycle', values[i & 1])
+    return (time.perf_counter() - start) / updates * 1e9
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--updates', type=int, default=500000, help='number of updates per measurement (default: 500000)')
+    args = parser.parse_args()
+
+    origin, destination = Location([52.32, 6.63], name='A'), Location([52.321, 6.64], name='B')
+    route = Route([[52.32, 6.63], [52.321, 6.64]], length=500, coordinates=[(52.32, 6.63), (52.321, 6.64)])
+    action = Action(_from=origin, _to=destination, route=route, trip=Trip(name='Trip 0'))
+
+    baseline = min(measure(types.MethodType(update_without_hook, action), args.updates) for _ in range(3))
+    unsubscribed = min(measure(action.update_instance_parameter, args.updates) for _ in range(3))
+    print(f"update without hook:             {baseline:8.0f} ns")
+    print(f"update, no subscribers:          {unsubscribed:8.0f} ns ({unsubscribed - baseline:+.0f} ns)")
+
+    stream = EventStream(maxsize=args.updates)
+    subscribed = measure(action.update_instance_parameter, args.updates)
+    print(f"update, EventStream subscribed:  {subscribed:8.0f} ns ({subscribed - baseline:+.0f} ns)")
+
+    with tempfile.TemporaryDirectory() as directory:
+        writer = EventWriter(stream, path=os.path.join(directory, 'events.ndjson'), batch_size=5000)
+        start = time.perf_counter()
+        written = writer.flush()
+        seconds = time.perf_counter() - start
+        size = os.path.getsize(writer.path)
+    stream.close()
+    print(f"writer: {written:,} events in {seconds:.2f} s ({written / seconds:,.0f} events/s, {size / seconds / 1e6:.1f} MB/s)")
+
+
+if __name__ == '__main__':
+    main()
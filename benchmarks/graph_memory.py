@@ -0,0 +1,92 @@
+"""
+Benchmark the memory held by the street network for a number of concurrent sessions.
+
+Compares the old situation, where every Streamlit session downloads and keeps its own
+graph in st.session_state, with one StreetNetwork shared by all sessions (st.cache_resource).
+
+Usage:
+    python benchmarks/graph_memory.py                      # synthetic grid network
+    python benchmarks/graph_memory.py --place "XL Businesspark Twente"
+    python benchmarks/graph_memory.py --sessions 20 --nodes 4000
+"""
+
+import argparse
+import copy
+import math
+import os
+import sys
+import time
+import tracemalloc
+
+import networkx as nx
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from utils.osmnx import StreetNetwork, get_graph_from_place
+
+
+def create_grid_graph(num_nodes: int) -> nx.MultiDiGraph:
+    """
+    Create a grid-shaped street network of roughly 'num_nodes' nodes around the business park.
+    """
+    side = max(2, int(math.sqrt(num_nodes)))
+    G = nx.MultiDiGraph(crs='epsg:4326')
+    for i in range(side):
+        for j in range(side):
+            G.add_node(i * side + j, y=52.31 + i * 0.0005, x=6.62 + j * 0.0008)
+    for i in range(side):
+        for j in range(side):
+            node = i * side + j
+            for neighbor in ([node + 1] if j < side - 1 else []) + ([node + side] if i < side - 1 else []):
+                for u, v in ((node, neighbor), (neighbor, node)):
+                    G.add_edge(u, v, length=55.0, speed_kph=30.0, travel_time=6.6, highway='service')
+    return G
+
+
+def measure(build) -> tuple:
+    """
+    Return the (result, allocated MiB, seconds) of calling build().
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build()
+    seconds = time.perf_counter() - start
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, allocated / 2**20, seconds
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, default=20, help='number of concurrent sessions (default: 20)')
+    parser.add_argument('--place', type=str, default=None, help='download this place from OSM instead of a synthetic grid')
+    parser.add_argument('--nodes', type=int, default=4000, help='approximate size of the synthetic grid (default: 4000)')
+    args = parser.parse_args()
+
+    if args.place:
+        source = get_graph_from_place(args.place, network_type='all')
+    else:
+        source = create_grid_graph(args.nodes)
+    print(f"Graph: {source.number_of_nodes()} nodes, {source.number_of_edges()} edges; {args.sessions} sessions")
+
+    # Before: every session holds its own graph (a deep copy stands in for a separate download)
+    sessions, per_session_mib, per_session_s = measure(
+        lambda: [{'graph': copy.deepcopy(source)} for _ in range(args.sessions)]
+    )
+    del sessions
+
+    # After: one shared, frozen network with its node index and CSR arrays; sessions hold a reference
+    def build_shared():
+        network = StreetNetwork(copy.deepcopy(source))
+        network.get_csr('travel_time')
+        return [{'network': network} for _ in range(args.sessions)]
+    sessions, shared_mib, shared_s = measure(build_shared)
+
+    print(f"{'':<28}{'memory (MiB)':>14}{'build (s)':>12}")
+    print(f"{'per-session graphs':<28}{per_session_mib:>14.1f}{per_session_s:>12.2f}")
+    print(f"{'shared StreetNetwork':<28}{shared_mib:>14.1f}{shared_s:>12.2f}")
+    print(f"Reduction: {per_session_mib / shared_mib:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
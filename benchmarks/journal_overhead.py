@@ -0,0 +1,180 @@
+"""
+Benchmark the overhead of journaling the model (utils/journal.py) and check that replaying it is deterministic.
+
+Builds --vehicles vehicles on the business park locations (locations.json), each assigned --trips trips
+of two legs with straight routes, and saves a snapshot. Then runs --ticks simulation steps of the
+SimulationTicker (starting trips, moving vehicles and updating statistics; --step seconds of model time
+each) from that snapshot, alternately without a journal and with a Journal recording every change and
+group-committing it every --interval seconds, --repeat times each. Reports the median time per step
+without and with the journal (the medians are less affected by the noise of the statistics updates
+than the means), the overhead of the journal, and the records, commits and bytes written. Finally recovers the model from the snapshot
+and the journal, and checks that the trips, actions and vehicles equal those at the end of the run.
+
+With --replan, the ticker also runs a RollingHorizonPlanner (utils/replanner.py) every --replan seconds of
+model time, so the journal also records the changes of re-planning (moving trips whose vehicle or order
+changed, updating planned ends). The local search of the planner is time-bounded, so runs without and with the
+journal may differ; the recovered model must still match the journaled run.
+
+Usage:
+    python benchmarks/journal_overhead.py
+    python benchmarks/journal_overhead.py --vehicles 1000 --ticks 50 --interval 0.05
+    python benchmarks/journal_overhead.py --vehicles 100 --trips 5 --replan 60
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from datetime import datetime
+from typing import Optional
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from utils import clock
+from utils.classes import Action, Location, Route, Trip, Vehicle
+from utils.entities import create_action, create_actor, create_locations, create_trip
+from utils.journal import Journal, recover
+from utils.osmnx import haversine
+from utils.replanner import RollingHorizonPlanner
+from utils.snapshot import restore_snapshot, save_snapshot
+from utils.ticker import SimulationTicker
+from utils.vrp import VRPSolver
+
+BASE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def create_model(args: argparse.Namespace) -> None:
+    """
+    Create the vehicles and their trips, all assigned so they start at the first step.
+    """
+    rng = random.Random(0)
+    clock.set_clock(clock.SteppedClock(args.step, start=datetime(2024, 2, 5, 8)))
+    locations = [location for location, _ in create_locations(os.path.join(BASE_DIR, 'locations.json'))]
+    actor = create_actor(locations[0], name='Business park')
+
+    def create_route(origin: Location, destination: Location) -> Route:
+        coordinates = [tuple(point) for point in np.linspace(origin.georeference, destination.georeference, 30)]
+        return Route(georeference=coordinates, name=f"{origin.name} to {destination.name}", actors=actor,
+                     length=rng.uniform(300, 1500), nodes=list(range(30)), coordinates=coordinates)
+
+    for v in range(args.vehicles):
+        vehicle = Vehicle(name=f"AV{v}", vehicle_type='terminal_tractor', position=list(locations[v % len(locations)].georeference))
+        for _ in range(args.trips):
+            a, b, c = rng.sample(locations, 3)
+            trip = create_trip(actor)
+            create_action(a, b, sequence_nr=0, route=create_route(a, b), trip=trip)
+            create_action(b, c, sequence_nr=1, route=create_route(b, c), trip=trip)
+            vehicle.assign_to_trip(trip)
+
+
+def create_replanner(args: argparse.Namespace) -> Optional[RollingHorizonPlanner]:
+    """
+    Create a planner re-planning every --replan seconds, with travel times along straight lines (None without --replan).
+    """
+    if args.replan is None:
+        return None
+    locations = Location.get_all_locations()
+    speed = 15 / 3.6  # m/s
+    distances = np.array([[haversine(a.georeference, b.georeference) for b in locations] for a in locations])
+    return RollingHorizonPlanner(VRPSolver(distances / speed, locations, speed, time_budget=0.2), interval=args.replan)
+
+
+def get_fingerprint() -> tuple:
+    """
+    Summarize the trips, actions and vehicles, to compare the model after running and after recovering.
+    """
+    return (
+        [(t.id, t.status, t.progress, t.vehicle.id if t.vehicle else None, t.last_modified) for t in Trip._instances],
+        [(a.id, a.lifecycle, a.progress, a.start_time, a.end_time) for a in Action._instances],
+        [(v.id, v.status, v.position, v.current_trip.id if v.current_trip else None, v.current_action, v.entries,
+          v.exits, v.last_modified, v.schedule.to_dict('records')) for v in Vehicle._instances],
+        clock.now(),
+    )
+
+
+def run(ticker: SimulationTicker, ticks: int) -> list:
+    """
+    Run simulation steps; returns the time of each step in seconds.
+    """
+    times = []
+    for _ in range(ticks):
+        start = time.perf_counter()
+        ticker.step()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--vehicles', type=int, default=500, help='number of vehicles (default: 500)')
+    parser.add_argument('--trips', type=int, default=2, help='trips per vehicle (default: 2)')
+    parser.add_argument('--ticks', type=int, default=20, help='simulation steps per run (default: 20)')
+    parser.add_argument('--step', type=float, default=10.0, help='model time per step in seconds (default: 10)')
+    parser.add_argument('--interval', type=float, default=0.1, help='seconds between two group commits (default: 0.1)')
+    parser.add_argument('--repeat', type=int, default=2, help='runs without and with journal (default: 2)')
+    parser.add_argument('--replan', type=float, default=None, help='re-plan every this many seconds of model time (default: no re-planning)')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    snapshot_path, journal_path = os.path.join(directory, 'model.snapshot'), os.path.join(directory, 'journal.bin')
+    create_model(args)
+    journal = Journal(journal_path, interval=args.interval)
+    journal.close()  # Records the journaled runs only
+    save_snapshot(snapshot_path, journal=journal)
+    print(f"{len(Vehicle._instances)} vehicles, {len(Trip._instances)} trips, {args.ticks} steps of {args.step:g} s per run")
+
+    ticker = SimulationTicker()
+    ticker.replanner = create_replanner(args)
+    run(ticker, 3)  # Warm up
+    plain, journaled = [], []
+    for repeat in range(args.repeat):
+        restore_snapshot(snapshot_path)
+        ticker.replanner = create_replanner(args)  # Re-planning starts again with the model
+        plain.extend(run(ticker, args.ticks))
+        expected = get_fingerprint()
+
+        # Only the last journaled run is kept, so it can be recovered
+        journal = Journal(journal_path, interval=args.interval) if repeat else journal
+        restore_snapshot(snapshot_path)
+        ticker.replanner = create_replanner(args)
+        journal.open()
+        journal.start()
+        journaled.extend(run(ticker, args.ticks))
+        journal.close()
+        start = time.perf_counter()
+        journal.stop()
+        final_commit = time.perf_counter() - start
+        recorded = get_fingerprint()
+        if repeat < args.repeat - 1:
+            os.remove(journal_path)
+
+    start = time.perf_counter()
+    result = recover(snapshot_path, journal_path)
+    replay = time.perf_counter() - start
+    size = os.path.getsize(journal_path)
+    os.remove(snapshot_path)
+    os.remove(journal_path)
+
+    median_plain, median_journaled = statistics.median(plain), statistics.median(journaled)
+    print(f"{'step without journal':<24}{median_plain * 1000:>9.1f} ms (mean {statistics.mean(plain) * 1000:.1f} ms)")
+    print(f"{'step with journal':<24}{median_journaled * 1000:>9.1f} ms (mean {statistics.mean(journaled) * 1000:.1f} ms)")
+    print(f"{'overhead':<24}{(median_journaled / median_plain - 1) * 100:>+9.1f} %")
+    if ticker.replanner is not None:
+        print(f"re-planner: {ticker.replanner.replans} replans, last {ticker.replanner.last_latency * 1000:.0f} ms")
+    print(f"journal: {journal.committed:,} records ({journal.committed / args.ticks:,.0f} per step) in {journal.commits} commits "
+          f"({journal.committed / max(1, journal.commits):,.0f} records per fsync), {size / 1e6:.1f} MB, "
+          f"{journal.failed} failed ({journal.failed_commits} failed commits); final commit {final_commit * 1000:.0f} ms")
+    print(f"recovered {result['replayed']:,} records onto the snapshot in {replay:.2f} s")
+    print(f"Runs without and with journal {'match' if recorded == expected else 'DIFFER'}"
+          f"{' (the re-planner is time-bounded)' if args.replan is not None else ''}; "
+          f"recovered model {'matches' if get_fingerprint() == recorded else 'DIFFERS FROM'} the journaled run")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""
+Benchmark the HMM map-matching of GPS traces (utils/mapmatching.py).
+
+Builds a grid street network around the business park (two-way streets), drives --vehicles vehicles
+along shortest paths between random corners, samples noisy GPS positions every --spacing meters, and
+matches the traces offline (match_trace) and online (OnlineMapMatcher, one sample at a time). Reports
+the samples per second, the latency per online update and the accuracy: the share of samples matched
+onto the driven route and the median error of the distance driven along the route.
+
+Usage:
+    python benchmarks/map_matching.py
+    python benchmarks/map_matching.py --grid 80 --vehicles 50 --noise 15
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import networkx as nx
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from utils.mapmatching import EdgeIndex, OnlineMapMatcher, get_route_distance, match_trace
+from utils.osmnx import StreetNetwork, get_interpolated_position, haversine
+
+
+def create_grid(size: int) -> nx.MultiDiGraph:
+    """
+    Create a size x size grid of two-way streets of about 100 meters.
+    """
+    G = nx.MultiDiGraph(crs='epsg:4326')
+    latitudes, longitudes = 52.30 + np.arange(size) * 0.0009, 6.60 + np.arange(size) * 0.00147
+    for i, lat in enumerate(latitudes):
+        for j, lng in enumerate(longitudes):
+            G.add_node(i * size + j, y=float(lat), x=float(lng))
+    for i in range(size):
+        for j in range(size):
+            node = i * size + j
+            for neighbor in ([node + 1] if j < size - 1 else []) + ([node + size] if i < size - 1 else []):
+                length = haversine((G.nodes[node]['y'], G.nodes[node]['x']), (G.nodes[neighbor]['y'], G.nodes[neighbor]['x']))
+                G.add_edge(node, neighbor, length=length)
+                G.add_edge(neighbor, node, length=length)
+    return G
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--grid', type=int, default=40, help='streets per side of the grid (default: 40)')
+    parser.add_argument('--vehicles', type=int, default=20, help='number of traces (default: 20)')
+    parser.add_argument('--spacing', type=float, default=15.0, help='meters driven between two samples (default: 15)')
+    parser.add_argument('--noise', type=float, default=8.0, help='standard deviation of the GPS noise in meters (default: 8)')
+    parser.add_argument('--window', type=int, default=10, help='window of the online matcher (default: 10)')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    G = create_grid(args.grid)
+    network = StreetNetwork(G)
+    start = time.perf_counter()
+    index = EdgeIndex(network)
+    print(f"Grid of {G.number_of_nodes()} nodes and {G.number_of_edges()} edges; "
+          f"index of {len(index.segment_edges)} segments built in {time.perf_counter() - start:.2f} s")
+
+    traces = []
+    corners = network.node_coordinates
+    for _ in range(args.vehicles):
+        origin, destination = corners[rng.choice(len(corners), 2, replace=False)]
+        nodes = network.get_shortest_path(tuple(origin), tuple(destination), weight='length')
+        length = network.get_route_length(nodes)
+        coordinates = [(G.nodes[node]['y'], G.nodes[node]['x']) for node in nodes]
+        progress = np.linspace(0, 100, max(2, int(length / args.spacing)))
+        truth = [get_interpolated_position(coordinates, p) for p in progress]
+        noise = rng.normal(0, args.noise, size=(len(truth), 2)) / [111320, 111320 * np.cos(np.radians(52.3))]
+        traces.append((nodes, progress / 100 * length, [tuple(p) for p in np.array(truth) + noise]))
+    samples = sum(len(points) for _, _, points in traces)
+
+    def accuracy(results: list) -> tuple:
+        on_route, errors = 0, []
+        for (nodes, driven, _), matches in zip(traces, results):
+            for expected, match in zip(driven, matches):
+                distance = get_route_distance(network, nodes, match) if match is not None else None
+                if distance is not None:
+                    on_route += 1
+                    errors.append(abs(distance - expected))
+        return on_route / samples, float(np.median(errors))
+
+    print(f"{samples} samples, GPS noise {args.noise:g} m, one sample every {args.spacing:g} m")
+    print(f"{'mode':<9}{'samples/s':>11}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}{'on route':>10}{'error m':>9}")
+
+    start = time.perf_counter()
+    results = [match_trace(index, points, sigma=args.noise) for _, _, points in traces]
+    elapsed = time.perf_counter() - start
+    on_route, error = accuracy(results)
+    print(f"{'offline':<9}{samples / elapsed:>11.0f}{'':>9}{'':>9}{'':>9}{on_route:>10.1%}{error:>9.1f}")
+
+    latencies, results = [], []
+    start = time.perf_counter()
+    for _, _, points in traces:
+        matcher = OnlineMapMatcher(index, sigma=args.noise, window=args.window)
+        for point in points:
+            update = time.perf_counter()
+            matcher.update(*point)
+            latencies.append(time.perf_counter() - update)
+        matcher.flush()
+        results.append(list(matcher.finalized))
+    elapsed = time.perf_counter() - start
+    latencies = np.array(latencies) * 1000
+    on_route, error = accuracy(results)
+    print(f"{'online':<9}{samples / elapsed:>11.0f}{np.percentile(latencies, 50):>9.2f}{np.percentile(latencies, 99):>9.2f}"
+          f"{latencies.max():>9.2f}{on_route:>10.1%}{error:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
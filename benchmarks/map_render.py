@@ -0,0 +1,111 @@
+"""
+Benchmark preparing the live map for st_folium on every refresh of the page (create_map()).
+
+Builds the static location markers of the business park (locations.json), --vehicles vehicles and
+--routes route polylines, and measures the server-side time per refresh until st_folium hands the
+map to the browser, for:
+
+- rebuild: a new map, Fullscreen plugin and feature groups with all static markers on every refresh,
+  rendered by st_folium (render=True, as before the base map was cached)
+- cached: a copy of the base map of osm.create_static_map(), built once, with render=False
+
+st_folium renders the map it gets in both cases; render=True renders the whole figure before that.
+The Streamlit component itself is replaced by a function returning its arguments, so what is sent to
+the browser can be compared. The browser only rebuilds the map when its script changes (it should not
+change between refreshes) and otherwise replaces the feature groups: with the cached map, these no
+longer hold the static markers.
+
+Usage:
+    python benchmarks/map_render.py
+    python benchmarks/map_render.py --vehicles 200 --routes 50 --refreshes 20
+"""
+
+import argparse
+import copy
+import os
+import re
+import sys
+import time
+
+import folium
+import streamlit_folium
+
+from folium.plugins import Fullscreen
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from utils.classes import Vehicle
+from utils.entities import create_locations
+from utils.osm import create_static_map, create_vehicle_layer, get_vehicle_features
+
+BASE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+CENTER = [52.3225, 6.6335]
+
+
+def get_feature_groups(routes: list) -> list:
+    """
+    Create the dynamic feature groups of a refresh (vehicles, destinations, routes).
+    """
+    fg_vehicles = folium.FeatureGroup(name="Vehicles")
+    fg_vehicles.add_child(create_vehicle_layer(get_vehicle_features(Vehicle.get_all_vehicles())))
+    fg_routes = folium.FeatureGroup(name='Routes')
+    for coordinates in routes:
+        fg_routes.add_child(folium.PolyLine(coordinates))
+    return [fg_vehicles, folium.FeatureGroup(name="UserMarkers"), fg_routes]
+
+
+def rebuild(markers: list, routes: list) -> dict:
+    """
+    Build the whole map and let st_folium render the figure, as create_map() did on every refresh.
+    """
+    m = folium.Map(location=CENTER, zoom_start=15, width=1600)
+    Fullscreen().add_to(m)
+    fg_microhubs = folium.FeatureGroup(name="Microhubs")
+    for marker in markers:
+        fg_microhubs.add_child(copy.deepcopy(marker))  # Copies, so repeated renders do not change the markers
+    fg_vehicles, fg_user, fg_routes = get_feature_groups(routes)
+    return streamlit_folium.st_folium(m, zoom=15, key="new", feature_group_to_add=[fg_vehicles, fg_user, fg_microhubs, fg_routes],
+                                      height=400, width=1600)
+
+
+def cached(static_map: folium.Map, routes: list) -> dict:
+    """
+    Pass a copy of the cached base map to st_folium, as create_map() does.
+    """
+    return streamlit_folium.st_folium(copy.deepcopy(static_map), zoom=15, key="new", feature_group_to_add=get_feature_groups(routes),
+                                      height=400, width=1600, render=False)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--vehicles', type=int, default=20, help='number of vehicles (default: 20)')
+    parser.add_argument('--routes', type=int, default=10, help='number of route polylines (default: 10)')
+    parser.add_argument('--refreshes', type=int, default=10, help='refreshes measured per variant (default: 10)')
+    args = parser.parse_args()
+
+    streamlit_folium._component_func = lambda **kwargs: kwargs
+    locations = create_locations(os.path.join(BASE_DIR, 'locations.json'))
+    markers = [marker for _, marker in locations]
+    for v in range(args.vehicles):
+        Vehicle(name=f"AV{v}", vehicle_type='terminal_tractor', position=list(locations[v % len(locations)][0].georeference))
+    routes = [[locations[r % len(locations)][0].georeference, locations[(r + 1) % len(locations)][0].georeference]
+              for r in range(args.routes)]
+
+    begin = time.perf_counter()
+    static_map = create_static_map(CENTER, 15, markers)
+    print(f"{len(markers)} static markers, {args.vehicles} vehicles, {args.routes} routes; "
+          f"base map built in {(time.perf_counter() - begin) * 1000:.0f} ms")
+    for name, refresh in [('rebuild', lambda: rebuild(markers, routes)), ('cached', lambda: cached(static_map, routes))]:
+        first = refresh()
+        begin = time.perf_counter()
+        for _ in range(args.refreshes):
+            result = refresh()
+        elapsed = (time.perf_counter() - begin) / args.refreshes
+        # Variable names end in random ids; the browser compares the script without them
+        same = re.sub(r'_[0-9a-f]{32}', '', first['script']) == re.sub(r'_[0-9a-f]{32}', '', result['script'])
+        print(f"{name:<10}{elapsed * 1000:>8.0f} ms per refresh  script {len(result['script']) / 1000:,.0f} kB, "
+              f"feature groups {len(result['feature_group']) / 1000:,.0f} kB, {'unchanged' if same else 'CHANGED'} between refreshes")
+
+
+if __name__ == '__main__':
+    main()
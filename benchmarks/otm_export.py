@@ -0,0 +1,67 @@
+"""
+Benchmark the throughput of the OTM exporter.
+
+Imports synthetic OTM trip messages between the business park locations (locations.json) as
+straight-line trips, assigns them to vehicles and exports them as an NDJSON stream and as a JSON list,
+with the json module and (if it is installed) orjson, reporting messages and megabytes per second.
+
+Usage:
+    python benchmarks/otm_export.py
+    python benchmarks/otm_export.py --trips 50000 --vehicles 50
+"""
+
+import argparse
+import io
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))  # The other benchmarks, e.g. otm_ingestion
+
+import utils.otm as otm
+from otm_ingestion import create_message
+from utils.classes import Location, Trip, Vehicle
+from utils.entities import create_locations
+from utils.otm import OTMExporter, OTMImporter
+
+BASE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--trips', type=int, default=10000, help='number of trips to export (default: 10000)')
+    parser.add_argument('--vehicles', type=int, default=20, help='number of vehicles the trips are assigned to (default: 20)')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per configuration, the best is reported (default: 3)')
+    args = parser.parse_args()
+
+    create_locations(os.path.join(BASE_DIR, 'locations.json'))
+    locations = Location.get_all_locations()
+    rng = random.Random(0)
+    OTMImporter(batch_size=1000).import_messages(create_message(i, rng.sample(locations, 3)) for i in range(args.trips))
+    vehicles = [Vehicle(name=f"AV{v}", vehicle_type='terminal_tractor', position=list(locations[0].georeference)) for v in range(args.vehicles)]
+    for i, trip in enumerate(Trip.get_all_trips()):
+        trip.vehicle = vehicles[i % len(vehicles)]
+        trip.status = 'requested'
+    print(f"Model: {Trip.get_total_trips()} trips of 2 actions, {len(vehicles)} vehicles, {len(locations)} locations")
+
+    backends = [('json', None)] + ([('orjson', otm.orjson)] if otm.orjson is not None else [])
+    print(f"{'backend':<10}{'format':<8}{'messages/s':>12}{'MB/s':>8}{'MB':>8}")
+    for name, backend in backends:
+        otm.orjson = backend
+        for ndjson in [True, False]:
+            best, size = float('inf'), 0
+            for _ in range(args.repeat):
+                exporter = OTMExporter(batch_size=1000)
+                output = io.BytesIO()
+                start = time.perf_counter()
+                count = exporter.write(output, exporter.iter_trips(), ndjson=ndjson)
+                best = min(best, time.perf_counter() - start)
+                size = output.tell()
+            assert count == args.trips
+            print(f"{name:<10}{'ndjson' if ndjson else 'list':<8}{count / best:>12,.0f}{size / best / 1e6:>8.1f}{size / 1e6:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
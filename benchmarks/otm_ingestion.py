@@ -0,0 +1,95 @@
+"""
+Benchmark the throughput of the bulk OTM trip importer.
+
+Writes an NDJSON feed of synthetic OTM trip messages between the business park locations
+(locations.json) and imports it on a synthetic grid street network, reporting messages per
+second with a cold route cache, a warm route cache and (optionally) several routing processes.
+
+Usage:
+    python benchmarks/otm_ingestion.py
+    python benchmarks/otm_ingestion.py --messages 20000 --batch-size 1000 --workers 1 4
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from graph_memory import create_grid_graph
+from utils.classes import Action, Constraint, Location, Route, Trip
+from utils.entities import create_locations
+from utils.otm import OTMImporter
+from utils.osmnx import StreetNetwork
+
+BASE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def create_message(i: int, stops: list) -> dict:
+    """
+    Create an OTM trip message visiting 'stops' (a list of Locations), with a time window per move.
+    """
+    actions = []
+    for sequence_nr, (origin, destination) in enumerate(zip(stops[:-1], stops[1:])):
+        actions.append({
+            "entity": {
+                "id": f"TRIP{i:06d}-ACTION{sequence_nr}",
+                "lifecycle": "planned",
+                "sequenceNr": sequence_nr,
+                "actionType": "move",
+                "from": {"entity": {"id": origin.name}, "associationType": "inline"},
+                "to": {"entity": {"id": destination.name}, "associationType": "inline"},
+                "constraint": {
+                    "id": f"TW{i:06d}-{sequence_nr}",
+                    "value": {"startTime": "2024-02-04T06:00:00Z", "endTime": "2024-02-04T18:00:00Z", "type": "timeWindowConstraint"},
+                    "enforceability": "preference",
+                },
+            },
+            "associationType": "inline",
+        })
+    return {"id": f"TRIP{i:06d}", "name": f"Trip {i}", "status": "planned", "transportMode": "road", "actions": actions}
+
+
+def reset_model() -> None:
+    for cls in [Trip, Action, Route, Constraint]:
+        cls.delete_all_instances()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=5000, help='number of messages in the feed (default: 5000)')
+    parser.add_argument('--batch-size', type=int, default=500, help='messages registered at once (default: 500)')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1], help='numbers of routing processes to compare (default: 1)')
+    parser.add_argument('--nodes', type=int, default=4000, help='approximate size of the synthetic grid (default: 4000)')
+    args = parser.parse_args()
+
+    create_locations(os.path.join(BASE_DIR, 'locations.json'))
+    locations = Location.get_all_locations()
+    network = StreetNetwork(create_grid_graph(args.nodes))
+
+    rng = random.Random(0)
+    with tempfile.NamedTemporaryFile('w', suffix='.ndjson', delete=False) as feed:
+        for i in range(args.messages):
+            feed.write(json.dumps(create_message(i, rng.sample(locations, 3))) + '\n')
+    print(f"Feed: {args.messages} messages, {len(locations)} locations, network of {len(network.node_ids)} nodes")
+
+    try:
+        print(f"{'run':<34}{'messages/s':>12}{'routed':>9}{'cached':>9}{'errors':>8}")
+        for workers in args.workers:
+            route_cache = {}
+            for label in ['cold route cache', 'warm route cache']:
+                reset_model()
+                importer = OTMImporter(network, route_cache=route_cache, batch_size=args.batch_size, max_workers=workers)
+                report = importer.import_source(feed.name)
+                assert report.trips == args.messages and Trip.get_total_trips() == args.messages
+                print(f"{f'{label}, {workers} process(es)':<34}{report.messages_per_second:>12,.0f}"
+                      f"{report.routes_computed:>9,}{report.route_cache_hits:>9,}{len(report.errors):>8}")
+    finally:
+        os.remove(feed.name)
+
+
+if __name__ == '__main__':
+    main()
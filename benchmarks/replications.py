@@ -0,0 +1,88 @@
+"""
+Benchmark the Monte Carlo replications of a planning scenario over a growing number of worker processes.
+
+Builds a scenario on the business park locations (locations.json): --trips trips of two or three
+random stops, released with exponential gaps of --interarrival seconds on average and executed by
+--vehicles vehicles with varying speeds and (un)load times, on straight-line distances (no street
+network needed). Runs --replications seeded replications (utils/replications.py) for every number of
+workers in --workers and reports the replications per second, the speedup and the parallel efficiency
+compared to the first number of workers, and checks that every run gives the same results (the seeds
+do not depend on the number of workers). Finally prints the KPIs with their confidence intervals.
+
+Every replication steps the model with a SimulationTicker, so its run time is dominated by the
+statistics of every step: a larger --step is faster, at a coarser time resolution.
+
+Usage:
+    python benchmarks/replications.py
+    python benchmarks/replications.py --replications 64 --workers 1 2 4 8 --trips 100
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from utils.entities import read_locations
+from utils.osmnx import haversine
+from utils.replications import run_replications
+
+BASE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def create_scenario(args: argparse.Namespace) -> tuple:
+    """
+    Create the scenario, the straight-line distances between its locations and their georeferences.
+    """
+    rng = random.Random(0)
+    georeferences = {location['Identifier '].strip(): (location['Latitude '], location['Longitude '])
+                     for locations in read_locations(os.path.join(BASE_DIR, 'locations.json')).values() for location in locations}
+    names = list(georeferences)
+    scenario = {
+        'trips': [rng.sample(names, rng.choice([2, 3])) for _ in range(args.trips)],
+        'num_vehicles': args.vehicles,
+        'average_speed': 15 / 3.6,
+        'speed_cv': 0.1,
+        'load_time': 120,
+        'unload_time': 120,
+        'load_time_cv': 0.3,
+        'interarrival_time': args.interarrival,
+        'step': args.step,
+    }
+    distances = {(a, b): haversine(georeferences[a], georeferences[b]) for a in names for b in names if a != b}
+    return scenario, distances, georeferences
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--replications', type=int, default=8, help='number of replications per run (default: 8)')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4], help='numbers of worker processes (default: 1 2 4)')
+    parser.add_argument('--trips', type=int, default=30, help='number of trips of the scenario (default: 30)')
+    parser.add_argument('--vehicles', type=int, default=3, help='number of vehicles (default: 3)')
+    parser.add_argument('--interarrival', type=float, default=120, help='mean seconds between two trip releases (default: 120)')
+    parser.add_argument('--step', type=float, default=30, help='simulation seconds per step of the ticker (default: 30)')
+    args = parser.parse_args()
+
+    scenario, distances, georeferences = create_scenario(args)
+    print(f"{args.replications} replications of {args.trips} trips and {args.vehicles} vehicles "
+          f"({os.cpu_count()} CPUs available)")
+    print(f"{'workers':>8}{'seconds':>10}{'repl/s':>10}{'speedup':>10}{'efficiency':>12}  results")
+    reference = None
+    for workers in args.workers:
+        begin = time.perf_counter()
+        results, summary = run_replications(scenario, args.replications, distances, georeferences=georeferences,
+                                            max_workers=workers)
+        elapsed = time.perf_counter() - begin
+        if reference is None:
+            reference = (workers, elapsed, results)
+        speedup = reference[1] / elapsed
+        same = results.equals(reference[2])
+        print(f"{workers:>8}{elapsed:>10.1f}{args.replications / elapsed:>10.2f}{speedup:>10.2f}"
+              f"{speedup * reference[0] / workers:>12.0%}  {'same' if same else 'DIFFERENT'}")
+    print(summary.to_string(float_format=lambda value: f"{value:,.2f}"))
+
+
+if __name__ == '__main__':
+    main()
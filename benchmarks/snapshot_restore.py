@@ -0,0 +1,140 @@
+"""
+Benchmark saving and restoring snapshots of the model state (utils/snapshot.py).
+
+Builds a day of operations on the business park locations (locations.json): --trips trips of two
+legs with routes of --points coordinates each, assigned round-robin to --vehicles vehicles (so every
+vehicle has a full schedule and every trip a timing plan), of which the first half is completed,
+and a statistics row per vehicle every --stats-interval seconds of the day. Reports the time the
+model lock is held to capture the state, the time to write and read the snapshot file, the time
+to install the state, and the size of the file; then checks the restored model against the original.
+
+Usage:
+    python benchmarks/snapshot_restore.py
+    python benchmarks/snapshot_restore.py --trips 20000 --vehicles 100 --stats-interval 10
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from utils import clock
+from utils.classes import Action, Location, Route, Trip, Vehicle
+from utils.entities import create_action, create_actor, create_locations, create_trip
+from utils.snapshot import capture_state, install_state, read_snapshot, write_snapshot
+
+BASE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def create_model(args: argparse.Namespace) -> None:
+    """
+    Create the locations, vehicles, trips (with routes, schedules and timing plans) and statistics of a day.
+    """
+    rng = random.Random(0)
+    start = datetime(2024, 2, 5)
+    clock.set_clock(clock.VirtualClock(start))
+    locations = [location for location, _ in create_locations(os.path.join(BASE_DIR, 'locations.json'))]
+    actor = create_actor(locations[0], name='Business park')
+    for location in locations:
+        location.actors = actor
+    vehicles = [Vehicle(name=f"AV{v}", vehicle_type='terminal_tractor', position=list(locations[v % len(locations)].georeference))
+                for v in range(args.vehicles)]
+
+    def create_route(origin: Location, destination: Location) -> Route:
+        coordinates = [tuple(point) for point in np.linspace(origin.georeference, destination.georeference, args.points)]
+        return Route(georeference=coordinates, name=f"{origin.name} to {destination.name}", actors=actor,
+                     length=rng.uniform(200, 2000), nodes=list(range(args.points)), coordinates=coordinates)
+
+    for i in range(args.trips):
+        a, b, c = rng.sample(locations, 3)
+        trip = create_trip(actor)
+        create_action(a, b, sequence_nr=0, route=create_route(a, b), trip=trip)
+        create_action(b, c, sequence_nr=1, route=create_route(b, c), trip=trip)
+        vehicles[i % len(vehicles)].assign_to_trip(trip)
+    for trip in Trip._instances[:len(Trip._instances) // 2]:
+        for action in trip.actions:
+            action.update_instance_parameter('lifecycle', 'completed')
+            action.update_instance_parameter('progress', 100)
+        trip.update_instance_parameter('progress', 100)
+        trip.update_instance_parameter('status', 'completed')
+
+    timestamps = [start + timedelta(seconds=s) for s in range(0, 86400, args.stats_interval)]
+    trips = Trip._instances
+    for v, vehicle in enumerate(vehicles):
+        vehicle.statistics = pd.DataFrame({
+            'timestamp': timestamps, 'id': vehicle.id, 'lat': 52.32, 'lng': 6.64,
+            'current_trip': [trips[(v + i // 100 * len(vehicles)) % len(trips)] if i % 3 else None for i in range(len(timestamps))],
+            'current_action': [i % 2 for i in range(len(timestamps))], 'status': 'move', 'battery_level': 100.0,
+            'co2_emission': 0, 'nox_emission': 0, 'noise_pollution': 0, 'weight': 0}).astype(object)
+    clock.get_clock().set(start + timedelta(days=1))
+
+
+def get_fingerprint() -> tuple:
+    """
+    Summarize the model, to compare it before and after restoring.
+    """
+    return (
+        [(t.id, t.status, t.progress, t.vehicle.id if t.vehicle else None, [a.id for a in t.actions],
+          t.timing_plan.total_duration if t.timing_plan else None) for t in Trip._instances],
+        [(a.id, a.lifecycle, a.route.id, a.route.coordinates[-1], a._from.id) for a in Action._instances],
+        [(v.id, v.schedule.to_dict('records'), len(v.statistics), v.statistics['current_trip'].map(lambda t: t.id if t is not None else None).tolist())
+         for v in Vehicle._instances],
+        clock.now(),
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--trips', type=int, default=10000, help='number of trips (default: 10000)')
+    parser.add_argument('--vehicles', type=int, default=50, help='number of vehicles (default: 50)')
+    parser.add_argument('--points', type=int, default=60, help='coordinates per route (default: 60)')
+    parser.add_argument('--stats-interval', type=int, default=60, help='seconds between two statistics rows of a vehicle (default: 60)')
+    parser.add_argument('--compression', type=int, default=1, help='zlib compression level (default: 1)')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    create_model(args)
+    print(f"Model of {len(Trip._instances)} trips, {len(Action._instances)} actions, {len(Route._instances)} routes "
+          f"and {len(Vehicle._instances)} vehicles with {sum(len(v.statistics) for v in Vehicle._instances)} statistics rows "
+          f"built in {time.perf_counter() - start:.1f} s")
+    expected = get_fingerprint()
+
+    path = os.path.join(tempfile.mkdtemp(), 'model.snapshot')
+    timings = {}
+    start = time.perf_counter()
+    state, header = capture_state()
+    timings['capture (lock held)'] = time.perf_counter() - start
+    start = time.perf_counter()
+    size = write_snapshot(path, state, header, args.compression)
+    timings['write'] = time.perf_counter() - start
+    del state
+
+    for cls in (Trip, Action, Route, Vehicle):
+        cls._instances.clear()
+    clock.get_clock().set(datetime(2030, 1, 1))
+    start = time.perf_counter()
+    state, header = read_snapshot(path)
+    timings['read'] = time.perf_counter() - start
+    start = time.perf_counter()
+    install_state(state)
+    timings['install (lock held)'] = time.perf_counter() - start
+    timings['restore (read + install)'] = timings['read'] + timings['install (lock held)']
+    os.remove(path)
+
+    print(f"Snapshot of {size / 1e6:.1f} MB")
+    for step, seconds in timings.items():
+        print(f"{step:<26}{seconds * 1000:>9.0f} ms")
+    print(f"Restored model {'matches' if get_fingerprint() == expected else 'DIFFERS FROM'} the original")
+
+
+if __name__ == '__main__':
+    main()
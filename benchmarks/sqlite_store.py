@@ -0,0 +1,185 @@
+"""
+Benchmark writing the model through to SQLite and querying its history (utils/store.py).
+
+Builds --days days of operations on the business park locations (locations.json), with an actor per
+company (CTT, Bolk, Bleckmann, Timberland): --trips trips of two legs between random locations,
+spread evenly over the period and assigned round-robin to --vehicles vehicles, all but the last day
+completed, and a statistics row per vehicle every --stats-interval seconds. An SQLiteStore records
+the model while it is built; reports the time of the first flush writing all of it (and the rows per
+second), and of a flush after a step of the model (every vehicle moves, a statistics row per vehicle
+and --changed trips start), with the part of each flush that holds the model lock. Then queries all
+trips of Timberland in the last week, from the database and by scanning the trips in memory, and
+checks that both give the same trips.
+
+Usage:
+    python benchmarks/sqlite_store.py
+    python benchmarks/sqlite_store.py --trips 100000 --vehicles 200 --days 30
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from utils import clock
+from utils.classes import Action, Location, Route, Trip, Vehicle
+from utils.entities import create_action, create_actor, create_locations, create_trip
+from utils.store import SQLiteStore
+
+BASE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+COMPANIES = {'CTT': 'CTT', 'BOL': 'Bolk', 'BLK': 'Bleckmann', 'TBL': 'Timberland'}
+
+
+def create_model(args: argparse.Namespace, start: datetime) -> None:
+    """
+    Create the locations, actors, vehicles, trips (completed up to the last day) and statistics of the period.
+    """
+    rng = random.Random(0)
+    locations = [location for location, _ in create_locations(os.path.join(BASE_DIR, 'locations.json'))]
+    actors = {}
+    for location in locations:
+        company = next(name for prefix, name in COMPANIES.items() if prefix in location.name)
+        if company not in actors:
+            actors[company] = create_actor(location, name=company)[0]
+        location.update_instance_parameter('actors', [actors[company]])
+        if location not in actors[company].locations:
+            actors[company].update_instance_parameter('locations', actors[company].locations + [location])
+    vehicles = [Vehicle(name=f"AV{v}", vehicle_type='terminal_tractor', position=list(locations[v % len(locations)].georeference))
+                for v in range(args.vehicles)]
+
+    def create_route(origin: Location, destination: Location) -> Route:
+        coordinates = [tuple(point) for point in np.linspace(origin.georeference, destination.georeference, 10)]
+        return Route(georeference=coordinates, name=f"{origin.name} to {destination.name}", length=rng.uniform(200, 2000),
+                     nodes=list(range(10)), coordinates=coordinates)
+
+    period = timedelta(days=args.days)
+    completed_before = start + period - timedelta(days=1)
+    for i in range(args.trips):
+        now = start + period * i / args.trips
+        clock.get_clock().set(now)
+        a, b, c = rng.sample(locations, 3)
+        trip = create_trip([a.actors[0], c.actors[0]])
+        create_action(a, b, sequence_nr=0, route=create_route(a, b), trip=trip)
+        create_action(b, c, sequence_nr=1, route=create_route(b, c), trip=trip)
+        vehicles[i % len(vehicles)].assign_to_trip(trip)
+        if now < completed_before:
+            for n, action in enumerate(trip.actions):
+                action.update_instance_parameter('start_time', now + timedelta(minutes=5 * n))
+                action.update_instance_parameter('end_time', now + timedelta(minutes=5 * n + 4))
+                action.update_instance_parameter('lifecycle', 'completed')
+                action.update_instance_parameter('progress', 100)
+            trip.update_instance_parameter('progress', 100)
+            trip.update_instance_parameter('status', 'completed')
+
+    timestamps = [start + timedelta(seconds=s) for s in range(0, int(period.total_seconds()), args.stats_interval)]
+    for vehicle in vehicles:
+        vehicle.statistics = pd.DataFrame({
+            'timestamp': timestamps, 'id': vehicle.id, 'lat': 52.32, 'lng': 6.64, 'current_trip': None,
+            'current_action': None, 'status': 'idle', 'battery_level': 100.0, 'co2_emission': 0,
+            'nox_emission': 0, 'noise_pollution': 0, 'weight': 0}).astype(object)
+    clock.get_clock().set(start + period)
+
+
+def step_model(args: argparse.Namespace, rng: random.Random) -> None:
+    """
+    Change the model like a step of the simulation: move every vehicle, add its statistics row and start trips.
+    """
+    now = clock.now() + timedelta(seconds=args.stats_interval)
+    clock.get_clock().set(now)
+    for vehicle in Vehicle._instances:
+        vehicle.update_instance_parameter('position', [vehicle.position[0] + 1e-5, vehicle.position[1]])
+        row = pd.DataFrame([{'timestamp': now, 'id': vehicle.id, 'lat': vehicle.position[0], 'lng': vehicle.position[1],
+                             'current_trip': None, 'current_action': None, 'status': 'move', 'battery_level': 99.0,
+                             'co2_emission': 0, 'nox_emission': 0, 'noise_pollution': 0, 'weight': 0}])
+        vehicle.statistics = pd.concat([vehicle.statistics, row], ignore_index=True)
+    pending = [trip for trip in Trip._instances if trip.status != 'completed']
+    for trip in rng.sample(pending, min(args.changed, len(pending))):
+        trip.actions[0].update_instance_parameter('start_time', now)
+        trip.actions[0].update_instance_parameter('lifecycle', 'in_progress')
+        trip.update_instance_parameter('status', 'in_transit')
+
+
+def scan_trips(actor: str, start: datetime, end: datetime) -> list:
+    """
+    Find the trips of an actor in a period by scanning the trips in memory (as without a store).
+    """
+    trips = []
+    for trip in Trip._instances:
+        if not any(a.name == actor for a in trip.actors):
+            continue
+        time = trip.actions[0].start_time if trip.actions and trip.actions[0].start_time is not None else None
+        if time is None:
+            time = pd.Timestamp(trip.vehicle.get_start_time_trip(trip.id)).to_pydatetime() if trip.vehicle else trip.creation_date
+        if start <= time < end:
+            trips.append(trip.id)
+    return trips
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--trips', type=int, default=20000, help='number of trips (default: 20000)')
+    parser.add_argument('--vehicles', type=int, default=50, help='number of vehicles (default: 50)')
+    parser.add_argument('--days', type=int, default=14, help='days of operations (default: 14)')
+    parser.add_argument('--stats-interval', type=int, default=300, help='seconds between two statistics rows of a vehicle (default: 300)')
+    parser.add_argument('--changed', type=int, default=20, help='trips started in the step of the model (default: 20)')
+    args = parser.parse_args()
+
+    start = datetime(2024, 2, 5)
+    clock.set_clock(clock.VirtualClock(start))
+    path = os.path.join(tempfile.mkdtemp(), 'model.db')
+    store = SQLiteStore(path)
+    store.open()
+    captures = []  # The time the model lock would be held by each flush
+    capture = store._capture
+    def timed_capture():
+        begin = time.perf_counter()
+        result = capture()
+        captures.append(time.perf_counter() - begin)
+        return result
+    store._capture = timed_capture
+    begin = time.perf_counter()
+    create_model(args, start)
+    print(f"Model of {len(Trip._instances)} trips, {len(Action._instances)} actions and {len(Vehicle._instances)} vehicles "
+          f"with {sum(len(v.statistics) for v in Vehicle._instances)} statistics rows built in {time.perf_counter() - begin:.1f} s")
+
+    begin = time.perf_counter()
+    rows = store.flush()
+    elapsed = time.perf_counter() - begin
+    print(f"{'first flush':<20}{elapsed * 1000:>9.0f} ms  {rows:,} rows ({rows / elapsed:,.0f} rows/s), "
+          f"model lock held {captures[-1] * 1000:.0f} ms")
+    step_model(args, random.Random(1))
+    begin = time.perf_counter()
+    rows = store.flush()
+    elapsed = time.perf_counter() - begin
+    print(f"{'flush after a step':<20}{elapsed * 1000:>9.1f} ms  {rows:,} rows, model lock held {captures[-1] * 1000:.1f} ms")
+    store.close()
+    print(f"database of {sum(os.path.getsize(path + suffix) for suffix in ('', '-wal') if os.path.exists(path + suffix)) / 1e6:.1f} MB")
+
+    end = clock.now()
+    week = end - timedelta(days=7)
+    begin = time.perf_counter()
+    trips = store.get_trips(actor='Timberland', start=week, end=end)
+    queried = time.perf_counter() - begin
+    begin = time.perf_counter()
+    scanned = scan_trips('Timberland', week, end)
+    scan = time.perf_counter() - begin
+    print(f"Trips of Timberland last week: {len(trips):,} trips in {queried * 1000:.1f} ms from the store, "
+          f"{len(scanned):,} in {scan * 1000:.0f} ms scanning the model; "
+          f"{'same trips' if sorted(trips['id']) == sorted(scanned) else 'DIFFERENT TRIPS'}")
+    plan = store.query("EXPLAIN QUERY PLAN SELECT t.id FROM trips t WHERE t.id IN (SELECT ta.trip_id FROM trip_actors ta "
+                       "JOIN actors a ON a.id = ta.actor_id WHERE a.name = ? OR a.id = ?) AND t.time >= ? AND t.time < ?",
+                       ['Timberland', 'Timberland', week, end])
+    print("Query plan:\n  " + "\n  ".join(plan['detail']))
+
+
+if __name__ == '__main__':
+    main()
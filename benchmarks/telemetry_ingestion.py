@@ -0,0 +1,122 @@
+"""
+Benchmark the throughput of the telemetry pipeline (utils/telemetry.py).
+
+Sends synthetic GPS, battery and status samples of --vehicles vehicles to the pipeline over TCP
+connections (as fast as possible), UDP datagrams (at --udp-rate samples per second; UDP has no
+backpressure) and a file replay. Reports the samples per second from the first byte sent until all
+samples are applied to the model, and the samples applied, dropped as stale (samples beyond 100 per
+vehicle and update are superseded) and lost (UDP).
+
+Usage:
+    python benchmarks/telemetry_ingestion.py
+    python benchmarks/telemetry_ingestion.py --vehicles 500 --samples 500000 --connections 8
+"""
+
+import argparse
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from utils.classes import Sensor, Vehicle
+from utils.telemetry import TelemetryPipeline
+
+DATAGRAM_LINES = 10
+
+
+def create_samples(count: int, vehicles: int) -> list:
+    """
+    Create 'count' samples, round-robin over the vehicles, one second apart per vehicle.
+    """
+    start = time.time()
+    return [json.dumps({"vehicle": f"AV{i % vehicles}", "time": start + i // vehicles, "lat": 52.32 + (i % 997) * 1e-5,
+                        "lon": 6.64 + (i % 991) * 1e-5, "battery": 100 - (i // vehicles) % 100, "status": "move"}).encode('utf-8')
+            for i in range(count)]
+
+
+def wait_until_done(pipeline: TelemetryPipeline, expected: int, timeout: float = 300.0) -> None:
+    """
+    Wait until 'expected' samples were received (or dropped) and parsed, then apply them.
+    """
+    deadline = time.perf_counter() + timeout
+    while pipeline.stats['received'] < expected and time.perf_counter() < deadline:
+        time.sleep(0.001)
+    pipeline.flush()
+
+
+def run(source: str, samples: list, args: argparse.Namespace) -> None:
+    pipeline = TelemetryPipeline(lock=threading.RLock(), update_rate=args.update_rate, max_age=None)
+    pipeline.start()
+    start = time.perf_counter()
+    if source == 'tcp':
+        port = pipeline.listen_tcp(port=0)
+        chunks = [b'\n'.join(samples[c::args.connections]) + b'\n' for c in range(args.connections)]
+
+        def send(data: bytes) -> None:
+            with socket.create_connection(('127.0.0.1', port)) as connection:
+                connection.sendall(data)
+
+        start = time.perf_counter()
+        senders = [threading.Thread(target=send, args=(chunk,)) for chunk in chunks]
+        for sender in senders:
+            sender.start()
+        for sender in senders:
+            sender.join()
+    elif source == 'udp':
+        port = pipeline.listen_udp(port=0)
+        datagrams = [b'\n'.join(samples[i:i + DATAGRAM_LINES]) for i in range(0, len(samples), DATAGRAM_LINES)]
+        interval = DATAGRAM_LINES / args.udp_rate
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sender:
+            start = time.perf_counter()
+            for i, datagram in enumerate(datagrams):
+                sender.sendto(datagram, ('127.0.0.1', port))
+                delay = start + i * interval - time.perf_counter()
+                if delay > 0.001:
+                    time.sleep(delay)
+        time.sleep(0.5)  # Datagrams lost by the socket are never received
+    else:
+        with tempfile.NamedTemporaryFile('wb', suffix='.ndjson', delete=False) as f:
+            f.write(b'\n'.join(samples))
+        start = time.perf_counter()
+        pipeline.replay(f.name).result()
+        os.remove(f.name)
+
+    wait_until_done(pipeline, len(samples) if source != 'udp' else 0)
+    elapsed = time.perf_counter() - start
+    pipeline.stop()
+    stats = pipeline.stats
+    lost = len(samples) - stats['received'] - stats['dropped']
+    print(f"{source:<8}{stats['received'] / elapsed:>12.0f}{stats['applied']:>10}{stats['stale']:>10}"
+          f"{stats['dropped'] + lost:>10}{stats['updates']:>9}{elapsed:>9.2f}")
+    for vehicle in Vehicle._instances:
+        vehicle.sensors.clear()
+    Sensor.delete_all_instances()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--vehicles', type=int, default=500, help='number of vehicles (default: 500)')
+    parser.add_argument('--samples', type=int, default=200000, help='number of samples per source (default: 200000)')
+    parser.add_argument('--connections', type=int, default=4, help='number of TCP connections (default: 4)')
+    parser.add_argument('--udp-rate', type=float, default=50000, help='samples per second sent over UDP (default: 50000)')
+    parser.add_argument('--update-rate', type=float, default=2.0, help='model updates per second (default: 2)')
+    parser.add_argument('--sources', nargs='+', choices=['tcp', 'udp', 'replay'], default=['tcp', 'udp', 'replay'],
+                        help='the sources to benchmark (default: all)')
+    args = parser.parse_args()
+
+    for v in range(args.vehicles):
+        Vehicle(name=f"AV{v}", vehicle_type='terminal_tractor', position=[52.32, 6.64])
+    samples = create_samples(args.samples, args.vehicles)
+    print(f"{args.samples} samples of {args.vehicles} vehicles, {args.update_rate:g} model updates per second")
+    print(f"{'source':<8}{'samples/s':>12}{'applied':>10}{'stale':>10}{'dropped':>10}{'updates':>9}{'seconds':>9}")
+    for source in args.sources:
+        run(source, samples, args)
+
+
+if __name__ == '__main__':
+    main()
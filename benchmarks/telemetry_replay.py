@@ -0,0 +1,193 @@
+"""
+Replay recorded telemetry traces into the telemetry pipeline (utils/telemetry.py) at N times real speed.
+
+Reads NDJSON trace files (one sample per line, see utils/telemetry.py) or, with --synthetic, creates a
+trace of --vehicles vehicles reporting once per --interval seconds for --duration seconds. The samples
+are merged in order of time and replayed keeping the time between them, scaled by 1 / --speed:
+
+    direct    TelemetryPipeline.replay(path, speed): paced chunks are queued like those of a live source
+    tcp       paced chunks are sent over a TCP connection to the pipeline's listener
+    udp       paced chunks are sent as UDP datagrams (of --datagram lines) to the pipeline's listener
+
+Vehicles named in the trace that do not exist are created. Reports the offered and achieved samples per
+second, how far the replay fell behind its schedule, the queue depth (sampled every 10 ms), the samples
+applied, stale and dropped, and the p50/p90/p99/max latency of each stage of the pipeline:
+
+    queue       a chunk of lines waits in the queue until it is parsed
+    parse       a chunk of lines is parsed and batched per vehicle
+    batch       the oldest sample of an update waits for the update
+    apply       an update is applied to the model (map-matching and the model lock included)
+    end_to_end  the oldest sample of an update, from queueing until applied
+
+Usage:
+    python benchmarks/telemetry_replay.py --synthetic --speed 10
+    python benchmarks/telemetry_replay.py trace.ndjson --speed 50 --via tcp --histogram
+    python benchmarks/telemetry_replay.py --synthetic --vehicles 2000 --duration 600 --speed 100 --via udp
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from utils.classes import Vehicle
+from utils.telemetry import STAGES, TelemetryPipeline, get_sample_times, pace
+
+
+def create_trace(path: str, vehicles: int, duration: float, interval: float) -> None:
+    """
+    Write a synthetic trace: each vehicle drives a straight line and reports every 'interval' seconds.
+    """
+    start = time.time() - duration
+    with open(path, 'w') as f:
+        for step in range(int(duration / interval)):
+            for v in range(vehicles):
+                f.write(json.dumps({"vehicle": f"AV{v}", "time": round(start + step * interval + v * interval / vehicles, 3),
+                                    "lat": 52.30 + (v % 50) * 1e-3 + step * 1e-5, "lon": 6.60 + (v // 50) * 1e-3,
+                                    "battery": round(100 - step * 0.01, 2), "status": "move"}) + '\n')
+
+
+def read_trace(paths: list) -> list:
+    """
+    Read the lines of the trace files, merged in order of their times.
+    """
+    lines = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            lines.extend(line for line in f.read().splitlines() if line.strip())
+    times = get_sample_times(lines)
+    order = sorted(range(len(lines)), key=times.__getitem__)
+    return [lines[i] for i in order]
+
+
+def create_vehicles(lines: list) -> None:
+    """
+    Create the vehicles named in the trace that do not exist yet.
+    """
+    names = {json.loads(line).get('vehicle') for line in lines}
+    known = {vehicle.id for vehicle in Vehicle._instances} | {vehicle.name for vehicle in Vehicle._instances}
+    for name in sorted(str(name) for name in names - known if name is not None):
+        Vehicle(name=name, vehicle_type='terminal_tractor', position=[52.30, 6.60])
+
+
+async def send(lines: list, via: str, port: int, speed: float, datagram: int) -> float:
+    """
+    Send the paced lines to the pipeline's TCP or UDP listener; returns the largest lag behind the schedule.
+    """
+    max_lag = 0.0
+    times = get_sample_times(lines)
+    if via == 'tcp':
+        _, writer = await asyncio.open_connection('127.0.0.1', port)
+        async for lag, chunk in pace(lines, times, speed):
+            max_lag = max(max_lag, lag)
+            writer.write(b'\n'.join(chunk) + b'\n')
+            await writer.drain()
+        writer.close()
+        await writer.wait_closed()
+    else:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sender:
+            async for lag, chunk in pace(lines, times, speed):
+                max_lag = max(max_lag, lag)
+                for i in range(0, len(chunk), datagram):
+                    sender.sendto(b'\n'.join(chunk[i:i + datagram]), ('127.0.0.1', port))
+    return max_lag
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('traces', nargs='*', help='NDJSON trace files')
+    parser.add_argument('--synthetic', action='store_true', help='replay a synthetic trace instead of files')
+    parser.add_argument('--vehicles', type=int, default=500, help='vehicles of the synthetic trace (default: 500)')
+    parser.add_argument('--duration', type=float, default=120.0, help='seconds of the synthetic trace (default: 120)')
+    parser.add_argument('--interval', type=float, default=1.0, help='seconds between the samples of a vehicle (default: 1)')
+    parser.add_argument('--speed', type=float, default=10.0, help='replay speed, 1 is real time (default: 10)')
+    parser.add_argument('--via', choices=['direct', 'tcp', 'udp'], default='direct', help='how samples enter the pipeline (default: direct)')
+    parser.add_argument('--datagram', type=int, default=10, help='lines per UDP datagram (default: 10)')
+    parser.add_argument('--update-rate', type=float, default=2.0, help='model updates per second (default: 2)')
+    parser.add_argument('--histogram', action='store_true', help='print the buckets of the end-to-end latency')
+    args = parser.parse_args()
+    if not args.traces and not args.synthetic:
+        parser.error("Give trace files or --synthetic")
+    if args.speed <= 0:
+        parser.error("--speed must be positive")
+
+    path = None
+    if args.synthetic:
+        with tempfile.NamedTemporaryFile('w', suffix='.ndjson', delete=False) as f:
+            path = f.name
+        create_trace(path, args.vehicles, args.duration, args.interval)
+        args.traces = [path]
+    lines = read_trace(args.traces)
+    create_vehicles(lines)
+    times = get_sample_times(lines)
+    span = (times[-1] - times[0]) / args.speed if len(times) > 1 else 0.0
+    print(f"{len(lines)} samples over {times[-1] - times[0]:.0f} s of {len(Vehicle._instances)} vehicles, "
+          f"replayed at {args.speed:g}x ({span:.1f} s) via {args.via}, {args.update_rate:g} model updates per second")
+
+    # Recorded samples are older than the default max_age
+    pipeline = TelemetryPipeline(lock=threading.RLock(), update_rate=args.update_rate, max_age=None)
+    pipeline.start()
+    depths = []
+    sampling = threading.Event()
+
+    def sample_depth() -> None:
+        while not sampling.wait(0.01):
+            depths.append(pipeline.queue_depth)
+
+    sampler = threading.Thread(target=sample_depth, daemon=True)
+    sampler.start()
+    start = time.perf_counter()
+    max_lag = None
+    if args.via == 'direct':
+        if path is None:
+            with tempfile.NamedTemporaryFile('wb', suffix='.ndjson', delete=False) as f:
+                f.write(b'\n'.join(lines) + b'\n')
+            path = f.name
+        pipeline.replay(path, speed=args.speed).result()
+    else:
+        port = pipeline.listen_tcp(port=0) if args.via == 'tcp' else pipeline.listen_udp(port=0)
+        max_lag = asyncio.run(send(lines, args.via, port, args.speed, args.datagram))
+        deadline = time.perf_counter() + 5.0
+        while pipeline.stats['received'] + pipeline.stats['dropped'] < len(lines) and time.perf_counter() < deadline:
+            time.sleep(0.001)
+    sent = time.perf_counter() - start
+    pipeline.flush()
+    elapsed = time.perf_counter() - start
+    sampling.set()
+    sampler.join()
+    pipeline.stop()
+    if path is not None:
+        os.remove(path)
+
+    stats = pipeline.stats
+    lost = len(lines) - stats['received'] - stats['dropped']
+    offered = len(lines) / span if span else float('inf')
+    depths.sort()
+    depth = lambda p: depths[min(len(depths) - 1, int(p * len(depths)))] if depths else 0
+    print(f"offered {offered:.0f} samples/s, achieved {stats['received'] / elapsed:.0f} samples/s "
+          f"({elapsed:.2f} s, {sent - span:+.2f} s behind schedule"
+          + (f", max lag {max_lag * 1000:.1f} ms" if max_lag is not None else "") + ")")
+    print(f"queue depth p50 {depth(0.50)}, p99 {depth(0.99)}, max {depths[-1] if depths else 0} chunks; "
+          f"applied {stats['applied']}, stale {stats['stale']}, dropped {stats['dropped'] + lost}, "
+          f"invalid {stats['invalid']}, unknown {stats['unknown']}, {stats['updates']} updates")
+    print(f"{'stage':<12}{'count':>9}{'mean ms':>10}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for stage in STAGES:
+        histogram = pipeline.latencies[stage]
+        print(f"{stage:<12}{histogram.count:>9}{histogram.mean() * 1000:>10.3f}{histogram.percentile(50) * 1000:>9.3f}"
+              f"{histogram.percentile(90) * 1000:>9.3f}{histogram.percentile(99) * 1000:>9.3f}{histogram.max * 1000:>9.3f}")
+    if args.histogram:
+        histogram = pipeline.latencies['end_to_end']
+        print(f"{'end_to_end <= ms':>16}{'count':>9}")
+        for bound, count in histogram.get_buckets():
+            print(f"{bound * 1000:>16.3f}{count:>9}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark the batch VRP solver on synthetic trips with time windows.
+
+Creates a fleet and a batch of draft trips between random locations (travel times from
+straight-line distances, no street network needed) and reports, per batch size, the
+objective terms after the construction step (time budget 0) and after local search, next
+to the first-come, first-served heap dispatcher.
+
+Usage:
+    python benchmarks/vrp_solver.py
+    python benchmarks/vrp_solver.py --trips 100 300 500 --vehicles 10 --budget 2
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from utils import clock
+from utils.classes import Action, Location, Route, Trip, Vehicle
+from utils.dispatcher import Dispatcher
+from utils.entities import create_action
+from utils.osmnx import haversine
+from utils.vrp import VRPSolver
+
+SPEED = 15 / 3.6  # m/s
+
+
+def create_scenario(num_trips: int, num_vehicles: int, seed: int = 0):
+    """
+    Create the locations, vehicles and draft trips, and return (locations, travel times, time windows).
+    """
+    for cls in [Trip, Action, Route]:
+        cls.delete_all_instances()
+    Vehicle._instances = []
+    Vehicle._total_instances = 0
+    Location._instances = []
+
+    rng = random.Random(seed)
+    now = clock.now()
+    locations = [Location([52.31 + rng.random() * 0.02, 6.62 + rng.random() * 0.05], name=f"L{i}") for i in range(50)]
+    distances = np.array([[haversine(a.georeference, b.georeference) * 1.3 for b in locations] for a in locations])
+    for i in range(num_vehicles):
+        Vehicle(name=f"terminal_tractor {i}", vehicle_type="terminal_tractor", average_speed=SPEED,
+                position=list(locations[i % len(locations)].georeference))
+
+    time_windows = {}
+    horizon = num_trips / num_vehicles * 600  # about ten minutes of work per trip and vehicle
+    for i in range(num_trips):
+        trip = Trip(name=f"Trip {i}")
+        origin, destination = rng.sample(locations, 2)
+        route = Route([origin.georeference, destination.georeference],
+                      length=round(distances[locations.index(origin), locations.index(destination)]),
+                      coordinates=[tuple(origin.georeference), tuple(destination.georeference)])
+        create_action(origin, destination, sequence_nr=0, route=route, trip=trip)
+        earliest = now + timedelta(seconds=rng.uniform(0, horizon))
+        time_windows[trip.id] = (earliest, earliest + timedelta(seconds=rng.uniform(900, 3600)), False)
+    return locations, distances / SPEED, time_windows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--trips', type=int, nargs='+', default=[100, 300, 500], help='batch sizes (default: 100 300 500)')
+    parser.add_argument('--vehicles', type=int, default=10, help='fleet size (default: 10)')
+    parser.add_argument('--budget', type=float, default=2.0, help='local search time budget in seconds (default: 2)')
+    args = parser.parse_args()
+
+    clock.set_clock(clock.VirtualClock(datetime(2024, 1, 1, 8)))
+
+    print(f"{'trips':>6} {'method':<22}{'makespan (s)':>14}{'empty (s)':>12}{'late (s)':>12}{'solve (s)':>11}{'moves':>9}")
+    for num_trips in args.trips:
+        locations, travel_times, time_windows = create_scenario(num_trips, args.vehicles)
+        trips, vehicles = Trip.get_by_status('draft'), Vehicle.get_all_vehicles()
+
+        # Heap dispatcher (first-come, first-served, ignores time windows), evaluated with the solver's objective
+        fcfs = {vehicle: [] for vehicle in vehicles}
+        for trip, vehicle, _ in Dispatcher().plan(trips, vehicles):
+            fcfs[vehicle].append(trip)
+        rows = [('FCFS heap dispatcher', VRPSolver(travel_times, locations, SPEED, time_budget=0).solve(trips, vehicles, time_windows, initial=fcfs))]
+
+        for label, budget in [('construction', 0.0), (f'+ local search {args.budget:g}s', args.budget)]:
+            solver = VRPSolver(travel_times, locations, SPEED, time_budget=budget)
+            start = time.perf_counter()
+            solution = solver.solve(trips, vehicles, time_windows)
+            rows.append((label, solution, time.perf_counter() - start))
+
+        for row in rows:
+            label, solution = row[0], row[1]
+            seconds = f"{row[2]:>11.2f}" if len(row) > 2 else f"{'':>11}"
+            print(f"{num_trips:>6} {label:<22}{solution.makespan:>14,.0f}{solution.empty_driving:>12,.0f}{solution.lateness:>12,.0f}{seconds}{solution.iterations:>9,}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,18 +1,31 @@
+import copy
+import io
 import streamlit as st
 import numpy as np
 import pandas as pd
-import time
 import folium
 
-from folium.plugins import Fullscreen
+from datetime import datetime, timedelta
 from streamlit_folium import st_folium
 
 from utils.entities import *
 from utils.tables import *
 from utils.classes import Location, Trip, Actor, Route, Action, Vehicle
-from utils.osmnx import get_graph_from_place
+from utils.osmnx import StreetNetwork, get_graph_from_place
 from utils.charts import get_gantt_chart
-from utils.stats import update_statistics
+from utils.clock import ScaledClock, get_clock, set_clock
+from utils.ticker import SimulationTicker
+from utils.dispatcher import Dispatcher
+from utils.api import APIServer, ModelAPI
+from utils.event_stream import EventStream, EventWriter
+from utils.otm import OTMExporter, OTMImporter, read_otm_messages
+from utils.replanner import RollingHorizonPlanner
+from utils.journal import Journal, recover
+from utils.snapshot import SnapshotScheduler, get_latest_snapshot, read_snapshot_header, restore_snapshot
+from utils.store import SQLiteStore
+from utils.telemetry import TelemetryPipeline
+from utils.vrp import VRPSolver, get_travel_time_matrix
+from utils.osm import create_static_map, create_vehicle_layer, get_vehicle_features
 
 # Page configuration
 st.set_page_config(
@@ -30,7 +43,6 @@ session_keys = {
     "destinations": [],
     "sleep_time": 2,
     "auto_refresh": True,
-    "do_refresh": False,
     "static_locations": [],
     "polylines": [],
     "disable_inputs": False,
@@ -44,7 +56,6 @@ session_keys = {
     "routes": [],
     "actions": [],
     "vehicles": [],
-    "vehicle_markers": [],
     "num_terminal_tractors": 1,
     "terminal_tractor_capacity": 1,
     "terminal_tractor_speed": 15.0,
@@ -60,53 +71,267 @@ session_keys = {
     "terminal_tractor_battery_threshold": 0,
     "terminal_tractor_charge_speed": 0,
     "real_time_factor": 1,
+    "tick_interval": 1.0,
+    "auto_dispatch": False,
+    "auto_replan": False,
+    "event_stream": False,
+    "api_server": False,
+    "telemetry": False,
+    "auto_snapshot": False,
+    "journal": False,
+    "snapshot_report": None,
+    "sqlite_store": False,
+    "otm_report": None,
+    "map_data": None,
 }
 
 for key, default in session_keys.items():
     if key not in st.session_state:
         st.session_state[key] = default
 
-# Initialize OSM graph if not available in session
-if "graph" not in st.session_state:
-    st.session_state.graph = get_graph_from_place("XL Businesspark Twente", network_type='all')
+@st.cache_resource
+def get_network() -> StreetNetwork:
+    """Download the OSM graph once per process; all sessions share this read-only network."""
+    return StreetNetwork(get_graph_from_place("XL Businesspark Twente", network_type='all'))
+
+network = get_network()
+
+@st.cache_resource
+def get_ticker() -> SimulationTicker:
+    """Start the background thread that advances the model (one per process, like the model registries)."""
+    ticker = SimulationTicker(interval=st.session_state.tick_interval)
+    ticker.start()
+    return ticker
+
+ticker = get_ticker()
 
 # Create Streamlit tabs
 tab1, tab2 = st.tabs(["Map", "Inputs"])
 
 def on_input_change() -> None:
     """Update number of vehicles when input changes."""
-    st.session_state['vehicles'] = create_vehicles(
-        num_vehicles=st.session_state.num_terminal_tractors,
-        type="terminal_tractor"
-    )
-    st.session_state['vehicle_markers'] = [vehicle.marker for vehicle in st.session_state['vehicles']]
+    with ticker.lock:
+        st.session_state['vehicles'] = create_vehicles(
+            num_vehicles=st.session_state.num_terminal_tractors,
+            type="terminal_tractor"
+        )
 
 def update_real_time_factor() -> None:
-    """Update the actual speed of all vehicles based on the real-time factor."""
-    vehicles = Vehicle.get_all_vehicles()
-    for vehicle in vehicles:
-        vehicle.update_instance_parameter('actual_speed', vehicle.average_speed * st.session_state['real_time_factor'])
+    """Run the simulation clock at the real-time factor (e.g., 10x or 100x faster than real time)."""
+    clock = get_clock()
+    if isinstance(clock, ScaledClock):
+        clock.set_factor(st.session_state['real_time_factor'])
+    else:
+        set_clock(ScaledClock(st.session_state['real_time_factor'], start=clock.now()))
+
+def update_auto_dispatch() -> None:
+    """Let the background ticker assign draft trips to the earliest available vehicle."""
+    with ticker.lock:
+        ticker.dispatcher = Dispatcher() if st.session_state['auto_dispatch'] else None
+
+@st.cache_resource
+def get_travel_times(location_version: int, speed: float) -> tuple:
+    """Travel times (s) between all locations, shared by all sessions until the locations or the speed change."""
+    locations = Location.get_all_locations()
+    return locations, get_travel_time_matrix(network, locations, speed)
+
+def plan_draft_trips() -> None:
+    """Assign and sequence all draft trips with the VRP solver (time windows, makespan and empty driving)."""
+    speed = st.session_state.terminal_tractor_speed / 3.6 #km/h -> m/s
+    locations, travel_times = get_travel_times(Location.get_version(), speed)
+    with ticker.lock:
+        solver = VRPSolver(travel_times, locations, speed, time_budget=0.5)
+        solver.solve(Trip.get_by_status('draft'), Vehicle.get_all_vehicles()).apply()
+
+def update_auto_replan() -> None:
+    """Let the background ticker re-plan the trips that have not started yet when execution deviates from the schedule."""
+    speed = st.session_state.terminal_tractor_speed / 3.6 #km/h -> m/s
+    locations, travel_times = get_travel_times(Location.get_version(), speed)
+    with ticker.lock:
+        if st.session_state['auto_replan']:
+            ticker.replanner = RollingHorizonPlanner(VRPSolver(travel_times, locations, speed, time_budget=0.2))
+        else:
+            ticker.replanner = None
+
+@st.cache_resource
+def get_event_writer() -> EventWriter:
+    """The writer appending trip, action and vehicle lifecycle events to events.ndjson (one per process, like the ticker)."""
+    stream = EventStream()
+    stream.close()  # Subscribed when streaming is switched on
+    return EventWriter(stream, path='events.ndjson')
+
+def update_event_stream() -> None:
+    """Start or stop appending lifecycle events to events.ndjson."""
+    writer = get_event_writer()
+    with ticker.lock:
+        if st.session_state['event_stream']:
+            writer.stream.open()
+            writer.start()
+        else:
+            writer.stream.close()
+    if not st.session_state['event_stream']:
+        writer.stop()
+
+@st.cache_resource
+def get_route_cache() -> dict:
+    """Routes of imported OTM legs, shared by all sessions so every leg is only routed once."""
+    return {}
+
+@st.cache_resource
+def get_api_server() -> APIServer:
+    """The local HTTP API on port 8502, sharing the model, the model lock and the route cache (one per process, like the ticker)."""
+    return APIServer(ModelAPI(ticker.lock, network=network, route_cache=get_route_cache()).app, port=8502)
+
+def update_api_server() -> None:
+    """Start or stop the local HTTP API."""
+    server = get_api_server()
+    if st.session_state['api_server']:
+        server.start()
+    else:
+        server.stop()
+
+@st.cache_resource
+def get_telemetry_pipeline() -> TelemetryPipeline:
+    """The pipeline applying vehicle telemetry, map-matched onto the network, to the model twice per second (one per process, like the ticker)."""
+    return TelemetryPipeline(lock=ticker.lock, update_rate=2, network=network)
+
+def update_telemetry() -> None:
+    """Start or stop ingesting vehicle telemetry from TCP and UDP port 8503."""
+    pipeline = get_telemetry_pipeline()
+    if st.session_state['telemetry']:
+        pipeline.start()
+        pipeline.listen_tcp('127.0.0.1', 8503)
+        pipeline.listen_udp('127.0.0.1', 8503)
+    else:
+        pipeline.stop()
+
+@st.cache_resource
+def get_journal() -> Journal:
+    """The journal of all changes to the model in journal.bin (one per process, like the ticker)."""
+    journal = Journal('journal.bin')
+    journal.close()  # Recording when journaling is switched on
+    return journal
+
+def update_journal() -> None:
+    """Start or stop journaling the changes to the model."""
+    journal = get_journal()
+    with ticker.lock:
+        if st.session_state['journal']:
+            journal.open()
+            journal.start()
+        else:
+            journal.close()
+    if not st.session_state['journal']:
+        journal.stop()
+
+@st.cache_resource
+def get_store() -> SQLiteStore:
+    """The SQLite store of the history of the model in model.db (one per process, like the ticker)."""
+    return SQLiteStore('model.db', lock=ticker.lock)
+
+def update_sqlite_store() -> None:
+    """Start or stop writing the model through to model.db."""
+    store = get_store()
+    if st.session_state['sqlite_store']:
+        with ticker.lock:
+            store.open()
+            store.sync_all()
+        store.start()
+    else:
+        store.close()
+        store.stop()
+
+@st.cache_resource
+def get_snapshot_scheduler() -> SnapshotScheduler:
+    """The scheduler saving the model state to snapshots/ every 5 minutes (one per process, like the ticker)."""
+    return SnapshotScheduler(lock=ticker.lock, directory='snapshots', interval=300, journal=get_journal())
+
+def update_auto_snapshot() -> None:
+    """Start or stop saving snapshots of the model state every 5 minutes."""
+    scheduler = get_snapshot_scheduler()
+    if st.session_state['auto_snapshot']:
+        scheduler.start()
+    else:
+        scheduler.stop(save=False)
+
+def save_snapshot_now() -> None:
+    """Save a snapshot of the model state to snapshots/."""
+    header = get_snapshot_scheduler().save()
+    st.session_state['snapshot_report'] = f"Saved {header['path']} ({header['size'] / 1e6:.1f} MB, model time {header['model_time']})."
+
+def restore_latest_snapshot() -> None:
+    """Replace the model state by the latest snapshot in snapshots/ (and the journal after it) and fetch the entities of the session again."""
+    path = get_latest_snapshot('snapshots')
+    if path is None:
+        st.session_state['snapshot_report'] = "No snapshot in snapshots/ yet."
+        return
+    journal = get_journal()
+    journal.commit()
+    with ticker.lock:
+        if read_snapshot_header(path).get('journal_sequence_nr') is not None:
+            header = recover(path, journal.path, lock=ticker.lock)['snapshot']
+        else:
+            header = restore_snapshot(path, lock=ticker.lock)
+        locations = Location.get_all_locations()
+        st.session_state['locations'] = locations
+        st.session_state['static_locations'] = [location.marker for location in locations]
+        st.session_state['vehicles'] = Vehicle.get_all_vehicles()
+        st.session_state['routes'] = Route.get_all_routes()
+        st.session_state['actions'] = Action.get_all_actions()
+        st.session_state['polylines'] = []
+        st.session_state['destinations'] = []
+        st.session_state['create_trip'] = []
+        ticker.destination_markers = []
+        if st.session_state['sqlite_store']:
+            get_store().sync_all()
+    st.session_state['snapshot_report'] = f"Restored {path} (model time {header['model_time']})."
+
+def import_otm_trips() -> None:
+    """Import the uploaded OTM trip messages as draft trips."""
+    files = st.session_state['otm_files'] or []
+    importer = OTMImporter(network, route_cache=get_route_cache(), lock=ticker.lock)
+    messages = (message for file in files for message in read_otm_messages(file))
+    st.session_state['otm_report'] = importer.import_messages(messages)
+
+def export_otm_trips() -> bytes:
+    """Export all trips as OTM trip messages (NDJSON), generated when the download is requested."""
+    exporter = OTMExporter(lock=ticker.lock)
+    output = io.BytesIO()
+    exporter.write(output, exporter.iter_trips())
+    return output.getvalue()
+
+def update_tick_interval() -> None:
+    """Update the time between two simulation steps of the background ticker."""
+    ticker.set_interval(st.session_state['tick_interval'])
 
 def update_vehicle_properties() -> None:
     """Update vehicle properties from the current session state parameters."""
-    vehicles = Vehicle.get_all_vehicles()
-    for vehicle in vehicles:
-        vehicle.update_instance_parameter('average_speed', st.session_state.terminal_tractor_speed / 3.6) #km/h -> m/s
-        vehicle.update_instance_parameter('actual_speed', vehicle.average_speed * st.session_state['real_time_factor'])
-        vehicle.update_instance_parameter('load_time', st.session_state.terminal_tractor_load_time)
-        vehicle.update_instance_parameter('unload_time', st.session_state.terminal_tractor_unload_time)
-        vehicle.update_instance_parameter('co2_emission', st.session_state.terminal_tractor_co2_emission)
-        vehicle.update_instance_parameter('nox_emission', st.session_state.terminal_tractor_nox_emission)
-        vehicle.update_instance_parameter('noise_pollution', st.session_state.terminal_tractor_noise_pollution)
-        vehicle.update_instance_parameter('land_use', st.session_state.terminal_tractor_land_use)
-        vehicle.update_instance_parameter('battery_capacity', st.session_state.terminal_tractor_battery_capacity)
-        vehicle.update_instance_parameter('energy_consumption_moving', st.session_state.terminal_tractor_energy_consumption_moving)
-        vehicle.update_instance_parameter('energy_consumption_idling', st.session_state.terminal_tractor_energy_consumption_idling)
-        vehicle.update_instance_parameter('battery_threshold', st.session_state.terminal_tractor_battery_threshold)
-        vehicle.update_instance_parameter('charge_speed', st.session_state.terminal_tractor_charge_speed)
+    with ticker.lock:
+        vehicles = Vehicle.get_all_vehicles()
+        for vehicle in vehicles:
+            vehicle.update_instance_parameter('average_speed', st.session_state.terminal_tractor_speed / 3.6) #km/h -> m/s
+            vehicle.update_instance_parameter('actual_speed', vehicle.average_speed)
+            vehicle.update_instance_parameter('load_time', st.session_state.terminal_tractor_load_time)
+            vehicle.update_instance_parameter('unload_time', st.session_state.terminal_tractor_unload_time)
+            vehicle.update_instance_parameter('co2_emission', st.session_state.terminal_tractor_co2_emission)
+            vehicle.update_instance_parameter('nox_emission', st.session_state.terminal_tractor_nox_emission)
+            vehicle.update_instance_parameter('noise_pollution', st.session_state.terminal_tractor_noise_pollution)
+            vehicle.update_instance_parameter('land_use', st.session_state.terminal_tractor_land_use)
+            vehicle.update_instance_parameter('battery_capacity', st.session_state.terminal_tractor_battery_capacity)
+            vehicle.update_instance_parameter('energy_consumption_moving', st.session_state.terminal_tractor_energy_consumption_moving)
+            vehicle.update_instance_parameter('energy_consumption_idling', st.session_state.terminal_tractor_energy_consumption_idling)
+            vehicle.update_instance_parameter('battery_threshold', st.session_state.terminal_tractor_battery_threshold)
+            vehicle.update_instance_parameter('charge_speed', st.session_state.terminal_tractor_charge_speed)
 
 # Sidebar settings
 st.sidebar.markdown("## Inputs")
+auto_refresh = st.sidebar.checkbox('Auto Refresh?', st.session_state.auto_refresh)
+if auto_refresh:
+    number = st.sidebar.number_input('Refresh rate in seconds', value=st.session_state.sleep_time)
+    st.session_state.sleep_time = number
+
+# Only the live components (fragments) are refreshed at this interval, the rest of the page reruns on user interaction
+refresh_interval = st.session_state.sleep_time if auto_refresh else None
 
 def delete_all_trips() -> None:
     """
@@ -115,11 +340,12 @@ def delete_all_trips() -> None:
     Delete all trips and reset relevant session states.
     Resets the instances of Trip, Actor, Action, and Route.
     """
-    for cls in [Trip, Actor, Action, Route]:
-        cls.delete_all_instances()
+    with ticker.lock:
+        for cls in [Trip, Actor, Action, Route]:
+            cls.delete_all_instances()
     st.session_state.disable_inputs = False
     st.session_state.destinations = []
-    st.session_state.clicked_before_reset = st_data['last_object_clicked']
+    st.session_state.clicked_before_reset = st.session_state['map_data']['last_object_clicked']
 
 def add_new_delivery() -> list:
     """
@@ -128,7 +354,8 @@ def add_new_delivery() -> list:
     Returns:
         list: The updated list of static location markers.
     """
-    if st_data['last_object_clicked']:
+    st_data = st.session_state['map_data']
+    if st_data and st_data['last_object_clicked']:
         filtered_list = [
             marker for marker in st.session_state['static_locations']
             if marker.location[0] == st_data['last_object_clicked']['lat'] and 
@@ -147,34 +374,44 @@ def add_new_delivery() -> list:
                     st.session_state['create_trip'].append(location)
     return st.session_state["static_locations"]
 
-def create_map(markers: list, user_markers: list, microhubs: list, routes: list) -> dict:
+def get_static_map() -> folium.Map:
+    """
+    Get the base map with the static layers, rebuilt only when the locations change.
+
+    Returns:
+        folium.Map: The cached base map of this session.
     """
-    Create and display a Folium map with various feature groups.
+    version = (Location.get_version(), len(st.session_state["static_locations"]))
+    cached = st.session_state.get("static_map")
+    if cached is None or cached[0] != version:
+        m = create_static_map(st.session_state["center"], st.session_state["zoom"], st.session_state["static_locations"])
+        st.session_state["static_map"] = (version, m)
+    return st.session_state["static_map"][1]
+
+def create_map(vehicle_features: dict, user_markers: list, routes: list) -> dict:
+    """
+    Display a copy of the cached base map with the dynamic feature groups.
+
+    The static location markers are part of the cached base map (see get_static_map()). st_folium
+    renders the map it gets and adds the dynamic groups to it, so it gets a fresh copy every rerun.
 
     Parameters:
-        markers (list): Vehicle markers.
+        vehicle_features (dict): Vehicle positions as a GeoJSON FeatureCollection.
         user_markers (list): User-added markers.
-        microhubs (list): Markers for microhubs.
         routes (list): Route polylines.
 
     Returns:
         dict: The Folium map data.
     """
-    m = folium.Map(location=st.session_state["center"], zoom_start=st.session_state["zoom"], width=1600)
-    Fullscreen().add_to(m)
+    m = copy.deepcopy(get_static_map())
 
     fg_vehicles = folium.FeatureGroup(name="Vehicles")
-    for marker in markers:
-        fg_vehicles.add_child(marker)
+    fg_vehicles.add_child(create_vehicle_layer(vehicle_features))
 
     fg_user = folium.FeatureGroup(name="UserMarkers")
     for marker in user_markers:
         fg_user.add_child(marker)
 
-    fg_microhubs = folium.FeatureGroup(name="Microhubs")
-    for hub in microhubs:
-        fg_microhubs.add_child(hub)
-
     fg_routes = folium.FeatureGroup(name='Routes')
     for route in routes:
         fg_routes.add_child(route)
@@ -184,11 +421,11 @@ def create_map(markers: list, user_markers: list, microhubs: list, routes: list)
         center=st.session_state["center"],
         zoom=15,
         key="new",
-        feature_group_to_add=[fg_vehicles, fg_user, fg_microhubs, fg_routes],
+        feature_group_to_add=[fg_vehicles, fg_user, fg_routes],
         height=400,
         width=1600,
+        render=False,  # st_folium renders the map itself; rendering the whole figure first would do it twice
     )
-    folium.LayerControl().add_to(m)
     return st_data
 
 def color_change(val: str) -> str:
@@ -224,51 +461,54 @@ def create_new_trip() -> None:
     """
     Create a new trip based on user input and update session state.
     """
+    st_data = st.session_state['map_data']
     if (st.session_state.clicked_before_reset['lat'] != st_data['last_object_clicked']['lat'] and
         st.session_state.clicked_before_reset['lng'] != st_data['last_object_clicked']['lng']):
-        st.session_state.clicked_before_reset = {'lat': 0.0, 'lng': 0.0}
-        actors = [location.actors[0] for location in st.session_state['create_trip']]
-        trip = create_trip(actors)
-        routes = []
-        actions_to_add = []
-        for idx, row in to_create_trip.iterrows():
-            origin = row['from_location']
-            destination = row['to_location']
-            route_actors = [row['from_actor'], row['to_actor']]
-            route = create_route(route_actors, st.session_state.graph, origin=origin, destination=destination)
-            routes.append(route)
-            st.session_state["routes"].append(route)
-            actions_to_add.append({
-                'sequence_nr': len(actions_to_add),
-                'type': 'move',
-                'origin': origin,
-                'destination': destination,
-                'route': route,
-                'trip': trip
-            })
-        if st.session_state["static_locations"]:
-            for ac in actions_to_add:
-                create_action(
-                    ac['origin'],
-                    ac['destination'],
-                    sequence_nr=ac['sequence_nr'],
-                    route=ac['route'],
-                    trip=ac['trip'],
-                    action_type=ac['type']
-                )
-            st.session_state["actions"] = Action.get_all_actions()
-        else:
-            raise Exception("No micro-hub available. Please check st.session_state.microhubs")
-        st.session_state['clicked_before_creating_trip'] = {
-            'lat': st.session_state['create_trip'][-1].georeference[0],
-            'lng': st.session_state['create_trip'][-1].georeference[1]
-        }
-        print(f"Overwriting session state: {st.session_state['clicked_before_creating_trip']}")
-        st.session_state['create_trip'] = []
+        with ticker.lock:
+            st.session_state.clicked_before_reset = {'lat': 0.0, 'lng': 0.0}
+            actors = [location.actors[0] for location in st.session_state['create_trip']]
+            trip = create_trip(actors)
+            routes = []
+            actions_to_add = []
+            for idx, row in to_create_trip.iterrows():
+                origin = row['from_location']
+                destination = row['to_location']
+                route_actors = [row['from_actor'], row['to_actor']]
+                route = create_route(route_actors, network, origin=origin, destination=destination)
+                routes.append(route)
+                st.session_state["routes"].append(route)
+                actions_to_add.append({
+                    'sequence_nr': len(actions_to_add),
+                    'type': 'move',
+                    'origin': origin,
+                    'destination': destination,
+                    'route': route,
+                    'trip': trip
+                })
+            if st.session_state["static_locations"]:
+                for ac in actions_to_add:
+                    create_action(
+                        ac['origin'],
+                        ac['destination'],
+                        sequence_nr=ac['sequence_nr'],
+                        route=ac['route'],
+                        trip=ac['trip'],
+                        action_type=ac['type']
+                    )
+                st.session_state["actions"] = Action.get_all_actions()
+            else:
+                raise Exception("No micro-hub available. Please check st.session_state.microhubs")
+            st.session_state['clicked_before_creating_trip'] = {
+                'lat': st.session_state['create_trip'][-1].georeference[0],
+                'lng': st.session_state['create_trip'][-1].georeference[1]
+            }
+            print(f"Overwriting session state: {st.session_state['clicked_before_creating_trip']}")
+            st.session_state['create_trip'] = []
 
 # Get data for tables
-trips = get_trips()
-vehicles = get_vehicles()
+with ticker.lock:
+    trips = get_trips()
+    vehicles = get_vehicles()
 
 def reset_trip() -> None:
     """Reset the list of locations for the current trip."""
@@ -295,15 +535,153 @@ def get_currently_creating_trip() -> pd.DataFrame:
         trip_list.append(pair)
     return pd.DataFrame(trip_list)
 
-with tab1:
-    st.markdown("# Digital Model - Manual Mode")
-    st.write("Click any Marker on the map to start creating a trip. Please wait until the 'Creating Trips' table is created/updated, before clicking the next Marker.")
-    st_data = create_map(
-        st.session_state["vehicle_markers"],
+@st.fragment(run_every=refresh_interval)
+def live_map() -> None:
+    """
+    Display the map with the latest vehicle positions published by the ticker.
+
+    Runs as a fragment, so only the map is refreshed at the auto refresh rate. When a click on
+    the map adds a location to the trip being created, the full page is rerun to show it.
+    """
+    if ticker.last_error is not None:
+        st.error(f"{ticker.failed_steps} simulation step(s) failed. {ticker.last_error}")
+    snapshot = ticker.snapshot()
+    if snapshot['tick'] > 0:
+        st.session_state['destinations'] = snapshot['destination_markers']
+        vehicle_features = snapshot['vehicle_features']
+    else:
+        vehicle_features = get_vehicle_features(Vehicle.get_all_vehicles())
+    st.session_state['map_data'] = create_map(
+        vehicle_features,
         st.session_state["destinations"],
-        st.session_state["static_locations"],
         st.session_state["polylines"]
     )
+    num_locations = len(st.session_state['create_trip'])
+    add_new_delivery()
+    if len(st.session_state['create_trip']) != num_locations:
+        st.rerun()
+
+@st.fragment(run_every=refresh_interval)
+def live_trip_overview() -> None:
+    """
+    Display all trips with their progress and the actions of the selected trips.
+    """
+    with ticker.lock:
+        trips = get_trips()
+    if trips.empty:
+        return
+    st.markdown("### All Trips")
+    selected_options = st.multiselect(
+        "Filter trips based on status",
+        options=['all','draft','requested','confirmed','in_transit','completed','cancelled','accepted','modified'],
+        default=['all']
+    )
+    st.session_state['disable_inputs'] = True
+    filtered_trips = trips if 'all' in selected_options else trips[trips['status'].isin(selected_options)]
+    styled_and_filtered_trips = filtered_trips.style.applymap(color_change, subset=['status'])
+    trip_list = st.dataframe(
+        styled_and_filtered_trips,
+        key="data",
+        on_select="rerun",
+        selection_mode=["single-row"],
+        column_config={
+            "progress": st.column_config.ProgressColumn(
+                "progress",
+                help="The progress of the trip",
+                min_value=0,
+                max_value=100,
+            ),
+        },
+        use_container_width=True,
+        hide_index=True
+    )
+    selected_rows = trip_list.selection
+    st.session_state['selected_rows'] = selected_rows
+    st.session_state["polylines"] = []
+    for row in st.session_state['selected_rows']['rows']:
+        trip = Trip.get_by_id(filtered_trips.iloc[row]['id'])
+        route = get_route_polyline(trip.actions[0].route)
+        if route not in st.session_state["polylines"]:
+            st.session_state["polylines"].append(route)
+        st.write(f"Details of {trip.name}")
+        actions = get_actions_of_trip(trip)
+        styled_actions = actions.style.applymap(color_change_action, subset=['lifecycle'])
+        st.dataframe(
+            styled_actions,
+            column_config={
+                "progress": st.column_config.ProgressColumn(
+                    "progress",
+                    help="The progress of the action",
+                    min_value=0,
+                    max_value=100,
+                ),
+            },
+            use_container_width=True,
+            hide_index=True,
+        )
+
+@st.fragment(run_every=refresh_interval)
+def live_trip_details() -> None:
+    """
+    Display the actions (and their progress) of the trips selected by name.
+    """
+    st.markdown("## Detailed Trip View")
+    options = [trip.name for trip in Trip.get_all_trips()]
+    selected_trips = st.multiselect("Filter trips based on name", options=options)
+    st.session_state["polylines"] = []
+    selected_actions = pd.DataFrame()
+    for trip_name in selected_trips:
+        trip = Trip.get_by_name(trip_name)
+        df_actions = get_actions_of_trip(trip)
+        selected_actions = pd.concat([selected_actions, df_actions], ignore_index=True)
+        for action in trip.get_actions():
+            if action.action_type == 'move' and get_route_polyline(action.route) not in st.session_state['polylines']:
+                st.session_state["polylines"].append(action.route.polyline)
+    if not selected_actions.empty:
+        styled_actions = selected_actions.style.applymap(color_change_action, subset=['lifecycle'])
+        st.dataframe(
+            styled_actions,
+            column_config=get_trip_details_table_config(),
+            use_container_width=True,
+            hide_index=True,
+        )
+
+@st.fragment(run_every=refresh_interval)
+def live_schedule() -> None:
+    """
+    Display the schedule and the latest vehicle statistics published by the ticker.
+    """
+    if Trip.get_total_trips() == 0:
+        return
+    st.markdown("## Schedule")
+    with ticker.lock:
+        st.write(get_gantt_chart(True))
+    latest_vehicle_stats = ticker.snapshot()['statistics']
+    if not latest_vehicle_stats.empty:
+        st.markdown("## Vehicle Raw Data")
+        columns_to_hide = ['id','energy_consumption','co2_emission','nox_emission','noise_pollution','land_use']
+        latest_vehicle_stats = latest_vehicle_stats.drop(columns=columns_to_hide)
+        latest_vehicle_stats['utilization'] = latest_vehicle_stats['utilization'] * 100
+        st.dataframe(
+            latest_vehicle_stats,
+            column_config=get_vehicle_data_table_config(),
+            hide_index=True
+        )
+        st.markdown("## Vehicle Occupancy")
+        st.bar_chart(
+            latest_vehicle_stats,
+            y=['move','idle','load','unload'],
+            y_label='Vehicle',
+            x='name',
+            x_label='Occupancy',
+            stack='normalize',
+            horizontal=True
+        )
+
+with tab1:
+    st.markdown("# Digital Model - Manual Mode")
+    st.write("Click any Marker on the map to start creating a trip. Please wait until the 'Creating Trips' table is created/updated, before clicking the next Marker.")
+    live_map()
     
     left, right = st.columns(2)
     
@@ -335,16 +713,17 @@ with tab1:
                 if current_company != previous_company:
                     actor = create_actor(location[0], name=current_company)
                     previous_company = current_company
-                location[0].actors = actor
-                actor[0].locations.append(location[0])
-            st.session_state['vehicles'] = create_vehicles(
-                st.session_state.num_terminal_tractors,
-                type="terminal_tractor",
-                average_speed=st.session_state.terminal_tractor_speed / 3.6,
-                load_time=st.session_state.terminal_tractor_load_time,
-                unload_time=st.session_state.terminal_tractor_unload_time
-            )
-            st.session_state['vehicle_markers'] = [vehicle.marker for vehicle in st.session_state['vehicles']]
+                location[0].update_instance_parameter('actors', actor)
+                if location[0] not in actor[0].locations:
+                    actor[0].update_instance_parameter('locations', actor[0].locations + [location[0]])
+            with ticker.lock:
+                st.session_state['vehicles'] = create_vehicles(
+                    st.session_state.num_terminal_tractors,
+                    type="terminal_tractor",
+                    average_speed=st.session_state.terminal_tractor_speed / 3.6,
+                    load_time=st.session_state.terminal_tractor_load_time,
+                    unload_time=st.session_state.terminal_tractor_unload_time
+                )
         
         if st.session_state['create_trip']:
             global to_create_trip
@@ -359,7 +738,7 @@ with tab1:
         if not trips.empty:
             st.markdown("### To Be Planned Trips")
             filtered_df = trips[trips['status'].isin(['draft'])]
-            columns_to_hide = ['polyline', 'marker', 'progress', 'length']
+            columns_to_hide = ['progress', 'length']
             filtered_trips = filtered_df.drop(columns=columns_to_hide)
             edited_df = st.data_editor(
                 filtered_trips,
@@ -375,126 +754,21 @@ with tab1:
                 hide_index=True,
                 use_container_width=True
             )
-            for row, vehicle in st.session_state.trip_edit['edited_rows'].items():
-                success = Vehicle.get_by_vehicle_name(vehicle['vehicle']).assign_to_trip(
-                    Trip.get_by_id(edited_df.iloc[row]['id'])
-                )
+            st.button("Plan all draft trips", on_click=plan_draft_trips, help="Assign and sequence all draft trips, respecting their time windows.")
+            with ticker.lock:
+                for row, vehicle in st.session_state.trip_edit['edited_rows'].items():
+                    success = Vehicle.get_by_vehicle_name(vehicle['vehicle']).assign_to_trip(
+                        Trip.get_by_id(edited_df.iloc[row]['id'])
+                    )
         else:
             st.session_state['disable_inputs'] = False
     
     with right:
-        did_user_click = add_new_delivery()
-        if not trips.empty:
-            st.markdown("### All Trips")
-            selected_options = st.multiselect(
-                "Filter trips based on status",
-                options=['all','draft','requested','confirmed','in_transit','completed','cancelled','accepted','modified'],
-                default=['all']
-            )
-            st.session_state['disable_inputs'] = True
-            filtered_df = trips if 'all' in selected_options else trips[trips['status'].isin(selected_options)]
-            columns_to_hide = ['polyline', 'marker']
-            filtered_trips = filtered_df.drop(columns=columns_to_hide)
-            styled_and_filtered_trips = filtered_trips.style.applymap(color_change, subset=['status'])
-            trip_list = st.dataframe(
-                styled_and_filtered_trips,
-                key="data",
-                on_select="rerun",
-                selection_mode=["single-row"],
-                column_config={
-                    "progress": st.column_config.ProgressColumn(
-                        "progress",
-                        help="The progress of the trip",
-                        min_value=0,
-                        max_value=100,
-                    ),
-                },
-                use_container_width=True,
-                hide_index=True
-            )
-            selected_rows = trip_list.selection
-            st.session_state['selected_rows'] = selected_rows
-            st.session_state["polylines"] = []
-            for row in st.session_state['selected_rows']['rows']:
-                route = trips.iloc[row]['polyline']
-                if route not in st.session_state["polylines"]:
-                    st.session_state["polylines"].append(route)
-                trip = Trip.get_by_id(trips.iloc[row]['id'])
-                st.write(f"Details of {trip.name}")
-                actions = get_actions_of_trip(trip)
-                styled_actions = actions.style.applymap(color_change_action, subset=['lifecycle'])
-                st.dataframe(
-                    styled_actions,
-                    column_config={
-                        "progress": st.column_config.ProgressColumn(
-                            "progress",
-                            help="The progress of the action",
-                            min_value=0,
-                            max_value=100,
-                        ),
-                    },
-                    use_container_width=True,
-                    hide_index=True,
-                )
-    
-    st.markdown("## Detailed Trip View")
-    options = [trip.name for trip in Trip.get_all_trips()]
-    selected_trips = st.multiselect("Filter trips based on name", options=options)
-    st.session_state["polylines"] = []
-    selected_actions = pd.DataFrame()
-    for trip_name in selected_trips:
-        trip = Trip.get_by_name(trip_name)
-        df_actions = get_actions_of_trip(trip)
-        selected_actions = pd.concat([selected_actions, df_actions], ignore_index=True)
-        for action in trip.get_actions():
-            if action.action_type == 'move' and action.route.polyline not in st.session_state['polylines']:
-                st.session_state["polylines"].append(action.route.polyline)
-    if not selected_actions.empty:
-        styled_actions = selected_actions.style.applymap(color_change_action, subset=['lifecycle'])
-        st.dataframe(
-            styled_actions,
-            column_config=get_trip_details_table_config(),
-            use_container_width=True,
-            hide_index=True,
-        )
+        live_trip_overview()
     
-    # Start trips with status "requested"
-    trips_with_status_requested = Trip.get_by_status('requested')
-    start_trips(trips_with_status_requested)
+    live_trip_details()
     
-    # Update vehicle positions
-    trips_with_status_in_transit = Trip.get_by_status('in_transit')
-    st.session_state['vehicle_markers'], st.session_state['destinations'] = update_vehicle_positions(
-        trips_with_status_in_transit,
-        st.session_state['vehicle_markers'],
-        st.session_state['destinations']
-    )
-    
-    # Display Schedule and Vehicle Statistics
-    if not trips.empty:
-        st.markdown("## Schedule")
-        st.write(get_gantt_chart(True))
-        latest_vehicle_stats = update_statistics()
-        if not latest_vehicle_stats.empty:
-            st.markdown("## Vehicle Raw Data")
-            columns_to_hide = ['id','energy_consumption','co2_emission','nox_emission','noise_pollution','land_use']
-            latest_vehicle_stats = latest_vehicle_stats.drop(columns=columns_to_hide)
-            latest_vehicle_stats['utilization'] = latest_vehicle_stats['utilization'] * 100
-            st.dataframe(
-                latest_vehicle_stats,
-                column_config=get_vehicle_data_table_config(),
-                hide_index=True
-            )
-            st.markdown("## Vehicle Occupancy")
-            st.bar_chart(
-                latest_vehicle_stats,
-                y=['move','idle','load','unload'],
-                y_label='Vehicle',
-                x='name',
-                x_label='Occupancy',
-                stack='normalize',
-                horizontal=True
-            )
+    live_schedule()
 
 with tab2:
     col1, col2, col3 = st.columns(3)
@@ -506,8 +780,88 @@ with tab2:
             value=st.session_state.real_time_factor,
             key='real_time_factor',
             on_change=update_real_time_factor,
-            disabled=True
+            help="Run the simulation clock this many times faster than real time."
+        )
+        st.number_input(
+            "Simulation tick interval (s)",
+            min_value=0.1,
+            value=st.session_state.tick_interval,
+            key='tick_interval',
+            on_change=update_tick_interval,
+            help="Time between two simulation steps, independent of the page refresh rate."
+        )
+        st.toggle(
+            "Automatic dispatching",
+            value=st.session_state.auto_dispatch,
+            key='auto_dispatch',
+            on_change=update_auto_dispatch,
+            help="Assign draft trips to the vehicle that becomes available earliest, instead of picking a vehicle in 'To Be Planned Trips'."
+        )
+        st.toggle(
+            "Rolling-horizon re-planning",
+            value=st.session_state.auto_replan,
+            key='auto_replan',
+            on_change=update_auto_replan,
+            help="Every 5 minutes, or when a trip runs more than a minute late, re-optimize the trips planned to start within the next hour."
+        )
+        if ticker.replanner is not None and ticker.replanner.last_unplanned:
+            st.warning(f"The last re-planning could not plan {len(ticker.replanner.last_unplanned)} trip(s) (no vehicle available); "
+                       "they keep their previous vehicle and start.")
+        st.toggle(
+            "Stream lifecycle events",
+            value=st.session_state.event_stream,
+            key='event_stream',
+            on_change=update_event_stream,
+            help="Append every status change of trips and vehicles and lifecycle change of actions to events.ndjson, as OTM-style events."
+        )
+        if st.session_state.event_stream and get_event_writer().last_error is not None:
+            st.warning(f"Event stream: {get_event_writer().failed} event(s) not written. Last error: {get_event_writer().last_error}")
+        st.toggle(
+            "Local HTTP API",
+            value=st.session_state.api_server,
+            key='api_server',
+            on_change=update_api_server,
+            help="Serve http://127.0.0.1:8502 for planning systems: import OTM trips (POST /trips), assign trips (POST /assignments) and query trips, vehicles and the simulation state."
+        )
+        st.toggle(
+            "Ingest vehicle telemetry",
+            value=st.session_state.telemetry,
+            key='telemetry',
+            on_change=update_telemetry,
+            help="Update vehicle positions, battery levels and statuses from NDJSON samples (GPS, battery, status) sent to TCP or UDP port 8503."
         )
+        st.toggle(
+            "Automatic snapshots",
+            value=st.session_state.auto_snapshot,
+            key='auto_snapshot',
+            on_change=update_auto_snapshot,
+            help="Every 5 minutes, save the complete model state (trips, actions, routes, vehicle schedules and statistics) to snapshots/, keeping the latest 5."
+        )
+        if st.session_state.auto_snapshot and get_snapshot_scheduler().last_error is not None:
+            st.warning(f"Snapshots: {get_snapshot_scheduler().failed} snapshot(s) failed. Last error: {get_snapshot_scheduler().last_error}")
+        st.toggle(
+            "Journal model changes",
+            value=st.session_state.journal,
+            key='journal',
+            on_change=update_journal,
+            help="Append every change to trips, actions, vehicles, goods, constraints and sensors to journal.bin, so restoring a snapshot also replays the changes made after it."
+        )
+        if st.session_state.journal and get_journal().last_error is not None:
+            st.warning(f"Journal: {get_journal().failed} record(s) not stored, {get_journal().failed_commits} failed commit(s). "
+                       f"Last error: {get_journal().last_error}")
+        st.toggle(
+            "Store history in SQLite",
+            value=st.session_state.sqlite_store,
+            key='sqlite_store',
+            on_change=update_sqlite_store,
+            help="Write trips, actions, vehicle schedules and statistics through to model.db every second, so the trip history can be queried without keeping it in memory."
+        )
+        if st.session_state.sqlite_store and get_store().last_error is not None:
+            st.warning(f"SQLite store: {get_store().failed_flushes} failed flush(es). Last error: {get_store().last_error}")
+        st.button("Save snapshot", on_click=save_snapshot_now)
+        st.button("Restore latest snapshot", on_click=restore_latest_snapshot, help="Continue from the latest snapshot in snapshots/, e.g. after a restart, without routing again.")
+        if st.session_state.snapshot_report is not None:
+            st.info(st.session_state.snapshot_report)
     with col2:
         st.markdown("## Vehicle")
         use_terminal_tractors = st.toggle("Terminal Tractor", value=True)
@@ -631,12 +985,36 @@ with tab2:
             st.session_state.num_terminal_tractors = 0
     with col3:
         st.markdown("## Trip")
-    auto_refresh = st.sidebar.checkbox('Auto Refresh?', st.session_state.auto_refresh)
-    if auto_refresh:
-        number = st.sidebar.number_input('Refresh rate in seconds', value=st.session_state.sleep_time)
-        st.session_state.sleep_time = number
-    if auto_refresh:
-        st.session_state.do_refresh = False
-        time.sleep(st.session_state.sleep_time)
-        st.session_state.do_refresh = True
-        st.rerun()
+        otm_files = st.file_uploader(
+            "Import OTM trips",
+            type=["json", "ndjson", "jsonl"],
+            accept_multiple_files=True,
+            key='otm_files',
+            help="OTM5 trip messages (JSON files or NDJSON feeds), e.g. from example_otm_messages/generated_trips. Trips are imported as draft trips."
+        )
+        st.button("Import", on_click=import_otm_trips, disabled=not otm_files)
+        report = st.session_state.otm_report
+        if report is not None:
+            st.success(f"Imported {report.trips} of {report.messages} trips ({report.messages_per_second:,.0f} messages/s).")
+            for message_id, error in report.errors:
+                st.warning(f"{message_id}: {error}")
+        st.download_button(
+            "Export OTM trips",
+            data=export_otm_trips,
+            file_name="trips.ndjson",
+            mime="application/x-ndjson",
+            help="All trips with their actions, vehicles and locations as OTM5 trip messages, one per line."
+        )
+        if st.session_state.sqlite_store:
+            st.markdown(":card_file_box: **Trip history**")
+            actors = sorted({actor.name for actor in Actor.get_all_actors()})
+            history_actor = st.selectbox("Actor", ["All actors"] + actors, key='history_actor')
+            today = get_clock().now().date()
+            period = st.date_input("Period", value=(today - timedelta(days=7), today), key='history_period')
+            if len(period) == 2:
+                history = get_store().get_trips(
+                    actor=None if history_actor == "All actors" else history_actor,
+                    start=datetime.combine(period[0], datetime.min.time()),
+                    end=datetime.combine(period[1] + timedelta(days=1), datetime.min.time())
+                )
+                st.dataframe(history[['name', 'status', 'time', 'vehicle', 'origin', 'destination', 'progress']], hide_index=True)
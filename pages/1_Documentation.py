@@ -40,7 +40,19 @@ Models a stakeholder in the system (e.g., Bolk, CTT, Timberland)
 ## Constraint
 
 **Purpose:**  
-Intended to model business rules, operational limits, and other constraints. It is currently not yet implemented, but will eventually handle conditions like vehicle capacity limits, routing restrictions, and time-window restrictions according to OTM5 standard.
+Models business rules and operational limits according to the OTM5 standard. A constraint can be attached to a trip, an action or a location.
+
+**Key Attributes:**
+- **Time Window:**  
+  The earliest start and latest end of the constrained trip, action or visit to a location.
+- **Vehicle Types:**  
+  The vehicle types that may execute the trip.
+- **Capacity:**  
+  The load capacity a vehicle needs.
+- **Enforceability:**  
+  Enforced constraints must be met; preference constraints may be violated at a cost.
+
+The automatic dispatcher and the VRP solver only assign trips to vehicles that meet all enforced constraints.
 
 ---
 
@@ -0,0 +1,33 @@
+import os
+import sys
+
+from datetime import datetime
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from utils import clock, events
+from utils.classes import Action, Actor, Constraint, Goods, Location, Route, Sensor, Trip, Vehicle
+
+START = datetime(2024, 2, 5, 8)
+
+
+@pytest.fixture
+def model():
+    """
+    An empty model on a VirtualClock at START; the instance registries and clock are restored afterwards.
+    """
+    classes = [Action, Actor, Constraint, Goods, Location, Route, Sensor, Trip, Vehicle]
+    saved = [(cls._instances, cls._total_instances) for cls in classes]
+    for cls in classes:
+        cls._instances = []
+        cls._total_instances = 0
+    recorders, subscribers = list(events.recorders), list(events.subscribers)
+    previous = clock.set_clock(clock.VirtualClock(START))
+    yield clock.get_clock()
+    clock.set_clock(previous)
+    events.recorders[:], events.subscribers[:] = recorders, subscribers
+    for cls, (instances, total) in zip(classes, saved):
+        cls._instances = instances
+        cls._total_instances = total
@@ -0,0 +1,62 @@
+import threading
+
+from utils.api import ModelAPI
+from utils.classes import Constraint, Location, Route, Trip, Vehicle
+from utils.entities import create_action
+
+
+def create_planned_trip(model):
+    """
+    A trip planned on AV1 at START, and a second vehicle AV2.
+    """
+    a, b = Location([52.31, 6.62], name='A'), Location([52.32, 6.63], name='B')
+    first = Vehicle(name='AV1', vehicle_type='terminal_tractor', average_speed=5)
+    second = Vehicle(name='AV2', vehicle_type='terminal_tractor', average_speed=5)
+    trip = Trip(name='Trip 0')
+    route = Route([a.georeference, b.georeference], length=1000, coordinates=[tuple(a.georeference), tuple(b.georeference)])
+    create_action(a, b, sequence_nr=0, route=route, trip=trip)
+    first.assign_to_trip(trip, start=model.now())
+    return trip, first, second
+
+
+def test_failed_dispatch_keeps_the_assignment(model):
+    trip, first, _ = create_planned_trip(model)
+    start = first.get_start_time_trip(trip.id)
+    trip.constraint = Constraint(vehicle_types=['truck'])
+    result, = ModelAPI(threading.RLock())._assign([{"trip": trip.id}])
+    assert result["error"] == "No vehicle can execute the trip"
+    assert trip.status == 'requested' and trip.vehicle is first
+    assert first.get_start_time_trip(trip.id) == start and len(first.schedule) == 1
+
+
+def test_redispatch_moves_the_trip(model):
+    trip, first, second = create_planned_trip(model)
+    first.update_instance_parameter('status', 'failed')
+    result, = ModelAPI(threading.RLock())._assign([{"trip": trip.id}])
+    assert result["vehicle"] == second.id
+    assert trip.vehicle is second and first.schedule.empty and len(second.schedule) == 1
+
+
+def test_failed_assignment_restores_the_previous_one(model, monkeypatch):
+    trip, first, second = create_planned_trip(model)
+    start = first.get_start_time_trip(trip.id)
+
+    def assign_to_trip(trip, start=None):
+        trip.vehicle, trip.status = second, 'requested'
+        raise RuntimeError("schedule unavailable")
+
+    monkeypatch.setattr(second, 'assign_to_trip', assign_to_trip)
+    result, = ModelAPI(threading.RLock())._assign([{"trip": trip.id, "vehicle": second.name}])
+    assert "schedule unavailable" in result["error"]
+    assert trip.status == 'requested' and trip.vehicle is first
+    assert first.get_start_time_trip(trip.id) == start and second.schedule.empty
+
+
+def test_renamed_location_is_indexed_again(model):
+    location = Location([52.31, 6.62], name='CTT_01')
+    api = ModelAPI(threading.RLock())
+    api._import([])
+    assert api.importer.locations.by_name == {'CTT_01': location}
+    location.update_instance_parameter('name', 'CTT_02')
+    api._import([])
+    assert api.importer.locations.by_name == {'CTT_02': location}
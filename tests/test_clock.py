@@ -0,0 +1,36 @@
+from datetime import timedelta
+
+import pytest
+
+from utils import clock
+from utils.classes import Location, Route, Vehicle
+from utils.entities import create_action, create_trip
+from utils.ticker import SimulationTicker
+
+
+def test_clock_is_abstract():
+    with pytest.raises(TypeError):
+        clock.Clock()
+
+
+def test_stepped_clock_drives_a_trip(model):
+    start = model.now()
+    clock.set_clock(clock.SteppedClock(10, start))
+    a, b = Location([52.30, 6.60], name='A'), Location([52.31, 6.60], name='B')
+    route = Route([a.georeference, b.georeference], length=100, coordinates=[tuple(a.georeference), tuple(b.georeference)])
+    vehicle = Vehicle(name='AV1', vehicle_type='terminal_tractor', position=list(a.georeference), average_speed=10)
+    trip = create_trip([])
+    action = create_action(a, b, sequence_nr=0, route=route, trip=trip)
+    vehicle.assign_to_trip(trip)
+
+    ticker = SimulationTicker()
+    for _ in range(2):
+        ticker.step()
+    # Started at the first step (after its planned start), driven for 10 s, not completed before the next step
+    assert action.start_time == start + timedelta(seconds=10)
+    assert action.progress == 100 and trip.status == 'in_transit'
+    ticker.step()
+    assert trip.status == 'completed' and vehicle.status == 'idle'
+    assert action.end_time == start + timedelta(seconds=30)
+    assert vehicle.position == [52.31, 6.60]
+    assert list(vehicle.cum_statistics['timestamp'][1:]) == [start + timedelta(seconds=s) for s in (10, 20, 30)]
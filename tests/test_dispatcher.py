@@ -0,0 +1,58 @@
+from datetime import timedelta
+
+from utils.classes import Constraint, Location, Route, Trip, Vehicle
+from utils.dispatcher import Dispatcher
+from utils.entities import create_action
+
+
+def create_trips(model, count: int, constraint=None):
+    """
+    'count' trips of 1000 m (200 s at 5 m/s), created one second apart.
+    """
+    a, b = Location([52.31, 6.62], name='A'), Location([52.32, 6.63], name='B')
+    trips = []
+    for i in range(count):
+        trip = Trip(name=f"Trip {i}", constraint=constraint)
+        route = Route([a.georeference, b.georeference], length=1000, coordinates=[tuple(a.georeference), tuple(b.georeference)])
+        create_action(a, b, sequence_nr=0, route=route, trip=trip)
+        trips.append(trip)
+        model.advance(1)
+    return trips
+
+
+def test_trips_are_dispatched_first_come_first_served(model):
+    vehicles = [Vehicle(name=f"AV{v}", vehicle_type='terminal_tractor', average_speed=5) for v in range(2)]
+    trips = create_trips(model, 3)
+    start = model.now()
+    decisions = Dispatcher().plan(list(reversed(trips)), vehicles)
+    # Oldest trip first; ties between equally free vehicles go to the first vehicle
+    assert [(trip, vehicle) for trip, vehicle, _ in decisions] == [
+        (trips[0], vehicles[0]), (trips[1], vehicles[1]), (trips[2], vehicles[0])]
+    assert [s for _, _, s in decisions] == [start, start, start + timedelta(seconds=200)]
+    # Planning does not change the model
+    assert all(trip.status == 'draft' for trip in trips) and all(vehicle.schedule.empty for vehicle in vehicles)
+
+
+def test_outdated_vehicle_entries_are_skipped(model):
+    tractor = Vehicle(name='AV1', vehicle_type='terminal_tractor', average_speed=5)
+    truck = Vehicle(name='Truck 1', vehicle_type='truck', average_speed=5)
+    constrained, = create_trips(model, 1, Constraint(vehicle_types=['truck']))
+    first, second = create_trips(model, 2)
+    start = model.now()
+    decisions = Dispatcher().dispatch([constrained, first, second], [tractor, truck])
+    # The truck took the constrained trip, so its entry 'free at start' is outdated and the
+    # last trip waits for the tractor instead of starting on the busy truck
+    assert decisions == [
+        (constrained, truck, start), (first, tractor, start), (second, tractor, start + timedelta(seconds=200))]
+    assert truck.get_start_time_trip(constrained.id) == start
+    assert tractor.get_start_time_trip(second.id) == start + timedelta(seconds=200)
+
+
+def test_trips_no_vehicle_can_execute_stay_draft(model):
+    vehicle = Vehicle(name='AV1', vehicle_type='terminal_tractor', average_speed=5)
+    infeasible, = create_trips(model, 1, Constraint(vehicle_types=['truck']))
+    feasible, = create_trips(model, 1)
+    decisions = Dispatcher().dispatch([infeasible, feasible], [vehicle])
+    assert [(trip, vehicle) for trip, vehicle, _ in decisions] == [(feasible, vehicle)]
+    assert infeasible.status == 'draft' and infeasible.vehicle is None
+    assert feasible.status == 'requested' and len(vehicle.schedule) == 1
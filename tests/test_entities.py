@@ -0,0 +1,46 @@
+from utils.classes import Location, Route, Trip
+from utils.entities import TripTable, create_action
+
+
+def create_trip(name: str):
+    """
+    A draft trip of 1000 m between two locations.
+    """
+    a, b = Location([52.31, 6.62], name='A'), Location([52.32, 6.63], name='B')
+    trip = Trip(name=name)
+    route = Route([a.georeference, b.georeference], length=1000, coordinates=[tuple(a.georeference), tuple(b.georeference)])
+    create_action(a, b, sequence_nr=0, route=route, trip=trip)
+    return trip
+
+
+def test_trip_table_only_rebuilds_changed_trips(model, monkeypatch):
+    trips = [create_trip(f"Trip {i}") for i in range(3)]
+    table = TripTable()
+    frame = table.refresh()
+    assert list(frame['name']) == ["Trip 0", "Trip 1", "Trip 2"] and list(frame['status']) == ['draft'] * 3
+    assert table.refresh() is frame
+
+    rebuilt = []
+    get_row = TripTable.get_row
+    monkeypatch.setattr(TripTable, 'get_row', staticmethod(lambda trip: rebuilt.append(trip) or get_row(trip)))
+
+    trips[1].update_instance_parameter('status', 'cancelled')
+    changed = table.refresh()
+    assert rebuilt == [trips[1]]
+    assert list(changed['status']) == ['draft', 'cancelled', 'draft']
+    # Frames handed out earlier are left unchanged
+    assert list(frame['status']) == ['draft'] * 3
+
+    rebuilt.clear()
+    appended = create_trip("Trip 3")
+    assert list(table.refresh()['name']) == ["Trip 0", "Trip 1", "Trip 2", "Trip 3"]
+    assert rebuilt == [appended]
+
+
+def test_trip_table_is_rebuilt_after_a_deletion(model):
+    trips = [create_trip(f"Trip {i}") for i in range(3)]
+    table = TripTable()
+    table.refresh()
+    Trip._instances.remove(trips[0])
+    trips[2].update_instance_parameter('name', "Renamed")
+    assert list(table.refresh()['name']) == ["Trip 1", "Renamed"]
@@ -0,0 +1,44 @@
+import time
+
+from datetime import timedelta
+
+from utils.classes import Trip, Vehicle
+from utils.event_stream import EventStream, EventWriter
+from utils.otm import format_datetime
+
+
+def test_events_describe_the_change_when_it_happened(model):
+    first, second = Vehicle(name='AV1', vehicle_type='terminal_tractor'), Vehicle(name='AV2', vehicle_type='terminal_tractor')
+    trip = Trip(name='Trip 0')
+    stream = EventStream()
+    try:
+        first.assign_to_trip(trip)
+        assigned = model.now()
+        model.advance(60)
+        first.unassign_trip(trip)
+        trip.update_instance_parameter('name', 'Trip 1')
+        second.assign_to_trip(trip)
+    finally:
+        stream.close()
+    events = stream.drain()
+    assert [event['entity'].get('vehicle') for event in events] == [{'id': first.id}, None, {'id': second.id}]
+    assert events[0]['time'] == format_datetime(assigned)
+    assert events[1]['time'] == format_datetime(assigned + timedelta(seconds=60))
+    assert events[0]['entity']['name'] == 'Trip 0' and events[2]['entity']['name'] == 'Trip 1'
+
+
+def test_failed_write_is_counted(model, tmp_path):
+    stream = EventStream()
+    writer = EventWriter(stream, path=str(tmp_path), interval=0.01)  # A directory cannot be appended to
+    writer.start()
+    try:
+        Trip(name='Trip 0').update_instance_parameter('status', 'requested')
+        deadline = time.monotonic() + 5
+        while writer.failed == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert writer.is_running()
+    finally:
+        stream.close()
+        writer.stop()
+    assert writer.failed == 1 and writer.written == 0
+    assert 'IsADirectoryError' in writer.last_error
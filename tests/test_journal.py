@@ -0,0 +1,61 @@
+import time
+
+from utils.classes import Actor, Constraint, Location, Sensor, Vehicle
+from utils.entities import create_actor
+from utils.journal import Journal, recover
+from utils.snapshot import save_snapshot
+
+
+def test_actor_links_are_recovered(model, tmp_path):
+    journal = Journal(str(tmp_path / 'journal.bin'))
+    journal.close()
+    save_snapshot(str(tmp_path / 'model.snapshot'), journal=journal)
+    journal.open()
+    location = Location([52.31, 6.62], name='CTT_01')
+    create_actor(location, name='CTT')
+    journal.close()
+    journal.commit()
+    recover(str(tmp_path / 'model.snapshot'), journal.path)
+    [location], [actor] = Location.get_all_locations(), Actor.get_all_actors()
+    assert location.actors == [actor]
+    assert actor.locations == [location]
+
+
+def test_constraint_edits_and_sensor_readings_are_recovered(model, tmp_path):
+    vehicle = Vehicle(name='AV1', vehicle_type='terminal_tractor')
+    constraint = Constraint(name='Gate')
+    journal = Journal(str(tmp_path / 'journal.bin'))
+    journal.close()
+    save_snapshot(str(tmp_path / 'model.snapshot'), journal=journal)
+    journal.open()
+    sensor = Sensor(name='AV1 GPS', sensor_type='gps', vehicle=vehicle)
+    model.advance(10)
+    sensor.record([52.31, 6.62], model.now())
+    constraint.update_instance_parameter('vehicle_types', ['truck'])
+    journal.close()
+    journal.commit()
+    recover(str(tmp_path / 'model.snapshot'), journal.path)
+    [vehicle], [constraint], [sensor] = Vehicle.get_all_vehicles(), Constraint.get_all_constraints(), Sensor.get_all_sensors()
+    assert vehicle.sensors == [sensor]
+    assert sensor.value == [52.31, 6.62] and sensor.samples == 1 and sensor.is_live()
+    assert constraint.vehicle_types == ['truck']
+
+
+def test_failed_commit_is_counted(model, tmp_path):
+    journal = Journal(str(tmp_path / 'journal.bin'), interval=0.01)
+    path, journal.path = journal.path, str(tmp_path)  # A directory cannot be appended to
+    Location([52.31, 6.62], name='CTT_01')
+    journal.start()
+    try:
+        deadline = time.monotonic() + 5
+        while journal.failed_commits == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert journal.failed_commits >= 1 and journal.failed == 1
+        assert 'Commit failed' in journal.last_error
+        assert journal.is_running()
+        journal.path = path
+        Location([52.32, 6.63], name='CTT_02')
+    finally:
+        journal.close()
+        journal.stop()
+    assert journal.committed == 1
@@ -0,0 +1,27 @@
+from utils.classes import Location, Trip
+from utils.otm import OTMImporter
+
+
+def create_messages(count: int) -> list:
+    """
+    OTM trip messages of one move between two known locations.
+    """
+    return [{'id': f"T{i}", 'actions': [{'entity': {'actionType': 'move', 'from': {'id': 'A'}, 'to': {'id': 'B'}}}]}
+            for i in range(count)]
+
+
+def test_messages_are_imported_once(model):
+    Location([52.31, 6.62], name='A'), Location([52.32, 6.63], name='B')
+    report = OTMImporter().import_messages(create_messages(3))
+    assert report.trips == 3 and report.duplicates == 0
+    report = OTMImporter().import_messages(create_messages(4))  # A new importer, as for every upload in the page
+    assert report.trips == 1 and report.duplicates == 3
+    assert sorted(trip.external_id for trip in Trip.get_all_trips()) == ['T0', 'T1', 'T2', 'T3']
+
+
+def test_deleted_trips_can_be_imported_again(model):
+    Location([52.31, 6.62], name='A'), Location([52.32, 6.63], name='B')
+    importer = OTMImporter()
+    importer.import_messages(create_messages(2))
+    Trip.delete_all_instances()
+    assert importer.import_messages(create_messages(2)).trips == 2
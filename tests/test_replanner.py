@@ -0,0 +1,77 @@
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from utils import events
+from utils.classes import Constraint, Location, Route, Trip, Vehicle
+from utils.entities import create_action
+from utils.replanner import RollingHorizonPlanner
+from utils.vrp import VRPSolver
+
+from conftest import START
+
+
+def create_plan(count: int):
+    """
+    A vehicle with 'count' trips between two locations, planned ten minutes apart from START.
+    """
+    a, b = Location([52.31, 6.62], name='A'), Location([52.32, 6.63], name='B')
+    vehicle = Vehicle(name='AV1', vehicle_type='terminal_tractor', position=list(a.georeference), average_speed=5)
+    for i in range(count):
+        trip = Trip(name=f"Trip {i}")
+        route = Route([a.georeference, b.georeference], length=1000, coordinates=[tuple(a.georeference), tuple(b.georeference)])
+        create_action(a, b, sequence_nr=0, route=route, trip=trip)
+        vehicle.assign_to_trip(trip, start=START + timedelta(minutes=10 * i))
+    solver = VRPSolver(np.array([[0, 200], [200, 0]]), [a, b], speed=5, time_budget=0.1)
+    return vehicle, RollingHorizonPlanner(solver)
+
+
+def test_trips_keep_their_vehicle_without_available_vehicles(model):
+    vehicle, planner = create_plan(3)
+    starts = {trip.id: vehicle.get_start_time_trip(trip.id) for trip in Trip.get_all_trips()}
+    vehicle.status = 'failed'
+    planner.replan()
+    assert [trip.status for trip in Trip.get_all_trips()] == ['requested'] * 3
+    assert all(trip.vehicle is vehicle for trip in Trip.get_all_trips())
+    assert {trip.id: vehicle.get_start_time_trip(trip.id) for trip in Trip.get_all_trips()} == starts
+    assert len(planner.last_unplanned) == 3
+
+
+def test_expected_end_of_running_trip_is_recorded(model):
+    vehicle, planner = create_plan(2)
+    trip = Trip.get_all_trips()[0]
+    trip.actions[0].start_time = START
+    trip.status = 'in_transit'
+    vehicle.current_trip = trip
+    model.advance(60)
+    recorded = []
+    events.recorders.append(lambda target, operation, args: recorded.append((target, operation, args)))
+    planner.replan()
+    end = vehicle.schedule.loc[vehicle.schedule['task_id'] == trip.id, 'end'].iloc[0]
+    assert (vehicle, 'update_planned_end', (trip, end)) in recorded
+    assert pd.Timestamp(end) == pd.Timestamp(planner._get_expected_end(trip))
+
+
+def test_unchanged_plan_keeps_its_assignments(model):
+    vehicle, planner = create_plan(3)
+    starts = {trip.id: vehicle.get_start_time_trip(trip.id) for trip in Trip.get_all_trips()}
+    recorded, published = [], []
+    events.recorders.append(lambda target, operation, args: recorded.append(operation))
+    events.subscribers.append(lambda target, parameter, previous, value: published.append(parameter))
+    planner.replan()
+    assert planner.last_reassigned == 0
+    assert 'unassign_trip' not in recorded and 'assign_to_trip' not in recorded and 'status' not in published
+    assert {trip.id: vehicle.get_start_time_trip(trip.id) for trip in Trip.get_all_trips()} == starts
+
+
+def test_trips_of_a_failed_vehicle_move_if_their_constraints_allow(model):
+    vehicle, planner = create_plan(3)
+    other = Vehicle(name='Truck 1', vehicle_type='truck', average_speed=5)
+    constrained = Trip.get_all_trips()[2]
+    constrained.constraint = Constraint(vehicle_types=['terminal_tractor'])
+    vehicle.status = 'failed'
+    planner.replan()
+    assert [trip.vehicle for trip in Trip.get_all_trips()] == [other, other, vehicle]
+    assert planner.last_unplanned == [constrained] and planner.last_reassigned == 2
+    assert all(trip.status == 'requested' for trip in Trip.get_all_trips())
@@ -0,0 +1,29 @@
+import pandas as pd
+import pytest
+
+from utils import clock
+from utils.classes import Trip, Vehicle
+from utils.replications import KPI_COLUMNS, run_replications, summarize_replications
+
+
+def test_single_leg_trip_is_loaded_and_unloaded(model):
+    vehicle = Vehicle(name='AV1', vehicle_type='terminal_tractor')
+    scenario = {'trips': [['A', 'B']], 'average_speed': 10, 'load_time': 60, 'unload_time': 90, 'step': 10}
+    results, _ = run_replications(scenario, 1, {('A', 'B'): 1000.0}, max_workers=1)
+    # Loading (60 s), driving loaded (100 s) and unloading (90 s); the trip starts two steps after its release
+    # (dispatched at the first, started after its planned start) and every action completes at the step after it ends
+    assert results['makespan'][0] == 20 + 250 + 3 * 10
+    assert results['mean_waiting_time'][0] == 20
+    assert results['full_driving'][0] == pytest.approx(100, abs=10)
+    assert results['empty_driving'][0] == 0
+    assert results['travel_distance'][0] == 1000
+    # The model of the replication is gone again
+    assert Vehicle._instances == [vehicle] and Trip._instances == []
+    assert clock.get_clock() is model
+
+
+def test_confidence_interval_uses_student_t():
+    results = pd.DataFrame({kpi: [0.0, 2.0] for kpi in KPI_COLUMNS})
+    summary = summarize_replications(results, confidence=0.95)
+    # t quantile with 1 degree of freedom (12.706), instead of the normal quantile (1.960)
+    assert summary.loc['makespan', 'ci_high'] == pytest.approx(1 + 12.706, abs=1e-3)
@@ -0,0 +1,64 @@
+import io
+import pickle
+import time
+
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.journal import _RecordUnpickler
+from utils.snapshot import SafeUnpickler, SnapshotScheduler
+
+
+def global_payload(module: str, name: str, argument: str) -> bytes:
+    """
+    A protocol 4 pickle calling the global module.name with one argument.
+    """
+    def string(value: str) -> bytes:
+        data = value.encode()
+        return b'\x8c' + bytes([len(data)]) + data  # SHORT_BINUNICODE
+    return b'\x80\x04' + string(module) + string(name) + b'\x93' + string(argument) + b'\x85R.'
+
+
+@pytest.mark.parametrize('unpickler', [SafeUnpickler, _RecordUnpickler])
+@pytest.mark.parametrize('module, name', [
+    ('numpy._core.numeric', 'builtins.eval'),  # Dotted name in a module numpy pickles with
+    ('pandas.core.frame', 'os.system'),
+    ('builtins', 'eval'),
+    ('os', 'system'),
+])
+def test_crafted_payload_is_rejected(unpickler, module, name):
+    payload = global_payload(module, name, "__import__('os').getpid()")
+    with pytest.raises(pickle.UnpicklingError):
+        unpickler(io.BytesIO(payload)).load()
+
+
+def test_frames_are_unpickled():
+    frame = pd.DataFrame({
+        'timestamp': [datetime(2024, 2, 5, 8), datetime(2024, 2, 5, 9)], 'lat': [52.3, np.nan], 'count': [1, 2],
+        'status': ['idle', None], 'trip': pd.Series([None, 'Trip 1'], dtype=object),
+        'time': pd.to_datetime(['2024-02-05', None]),
+    })
+    state = {'frame': frame, 'array': np.arange(3), 'scalar': np.float64(1.5), 'timestamp': pd.Timestamp('2024-02-05')}
+    restored = SafeUnpickler(io.BytesIO(pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL))).load()
+    pd.testing.assert_frame_equal(restored['frame'], frame)
+    assert restored['array'].tolist() == [0, 1, 2]
+    assert restored['scalar'] == 1.5 and restored['timestamp'] == state['timestamp']
+
+
+def test_failed_snapshot_is_counted(model, tmp_path):
+    blocked = tmp_path / 'snapshots'
+    blocked.write_text('')  # A file where the snapshot directory should be
+    scheduler = SnapshotScheduler(directory=str(blocked), interval=0.01)
+    scheduler.start()
+    try:
+        deadline = time.monotonic() + 5
+        while scheduler.failed == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert scheduler.is_running()
+    finally:
+        scheduler.stop(save=False)
+    assert scheduler.failed >= 1 and scheduler.saved == 0
+    assert 'FileExistsError' in scheduler.last_error
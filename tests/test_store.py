@@ -0,0 +1,63 @@
+import pandas as pd
+
+from utils.classes import Actor, Constraint, Location, Sensor, Trip, Vehicle
+from utils.store import SQLiteStore
+
+from test_replanner import create_plan
+
+
+def get_stored_schedule(store: SQLiteStore) -> dict:
+    return {row.trip_id: (row.start_time, row.end_time) for row in store.get_schedules().itertuples()}
+
+
+def get_schedule(vehicle) -> dict:
+    return {task_id: (pd.Timestamp(start), pd.Timestamp(end))
+            for task_id, start, end in zip(vehicle.schedule['task_id'], vehicle.schedule['start'], vehicle.schedule['end'])}
+
+
+def test_replan_is_stored(model, tmp_path):
+    store = SQLiteStore(str(tmp_path / 'model.db'))
+    vehicle, planner = create_plan(3)
+    store.sync_all()
+    store.open()
+    store.flush()
+    model.advance(300)  # The first trip starts five minutes late, so it ends later than planned
+    trip = Trip.get_all_trips()[0]
+    trip.actions[0].update_instance_parameter('start_time', model.now())
+    trip.update_instance_parameter('status', 'in_transit')
+    vehicle.update_instance_parameter('current_trip', trip)
+    store.flush()
+    model.advance(60)
+    planner.replan()
+    store.close()
+    store.flush()
+    assert get_stored_schedule(store) == get_schedule(vehicle)
+    assert sorted(store.get_trips(status='requested')['id']) == sorted(t.id for t in Trip.get_by_status('requested'))
+
+
+def test_stale_trip_actors_are_deleted(model, tmp_path):
+    store = SQLiteStore(str(tmp_path / 'model.db'))
+    store.open()
+    location = Location([52.31, 6.62], name='CTT_01')
+    first, second = Actor([location], name='CTT'), Actor([location], name='Bolk')
+    trip = Trip(name='Trip 0', actors=[first])
+    store.flush()
+    trip.update_instance_parameter('actors', [second])
+    store.close()
+    store.flush()
+    assert store.get_trips(actor='CTT').empty
+    assert store.get_trips(actor='Bolk')['id'].tolist() == [trip.id]
+
+
+def test_constraints_and_sensors_are_stored(model, tmp_path):
+    store = SQLiteStore(str(tmp_path / 'model.db'))
+    store.open()
+    constraint = Constraint(name='Gate', vehicle_types=['terminal_tractor'])
+    sensor = Sensor(name='AV1 battery', sensor_type='battery', vehicle=Vehicle(name='AV1', vehicle_type='terminal_tractor'))
+    store.flush()
+    constraint.update_instance_parameter('vehicle_types', ['truck', 'van'])
+    sensor.record(87.5, model.now())
+    store.close()
+    store.flush()
+    assert store.query("SELECT vehicle_types FROM constraints")['vehicle_types'].tolist() == ['truck,van']
+    assert store.query("SELECT value, samples FROM sensors").values.tolist() == [['87.5', 1]]
@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from utils import clock
+from utils.classes import Location, Route, Sensor, Vehicle
+from utils.entities import create_action, create_trip
+from utils.telemetry import parse_sample
+from utils.ticker import SimulationTicker
+
+
+def start_trip(model, sensor_type, value):
+    """
+    A vehicle with a sensor that measured 'value' at the start, assigned to a 300 m trip at 10 m/s.
+    """
+    start = model.now()
+    clock.set_clock(clock.SteppedClock(10, start))
+    a, b = Location([52.30, 6.60], name='A'), Location([52.31, 6.60], name='B')
+    route = Route([a.georeference, b.georeference], length=300, coordinates=[tuple(a.georeference), tuple(b.georeference)])
+    vehicle = Vehicle(name='AV1', vehicle_type='terminal_tractor', position=list(a.georeference), average_speed=10)
+    sensor = Sensor(name=f"AV1 {sensor_type}", sensor_type=sensor_type, vehicle=vehicle)
+    sensor.record(value, start)
+    vehicle.update_instance_parameter('position' if sensor_type == 'gps' else sensor_type, value)
+    trip = create_trip([])
+    create_action(a, b, sequence_nr=0, route=route, trip=trip)
+    vehicle.assign_to_trip(trip)
+    return vehicle, trip, sensor, SimulationTicker()
+
+
+def test_live_gps_sensor_wins_over_the_simulation(model):
+    vehicle, trip, sensor, ticker = start_trip(model, 'gps', [52.30, 6.61])
+    for _ in range(2):
+        ticker.step()
+    # A third of the trip is driven, but the measured position is kept while the sensor is live
+    assert trip.actions[0].progress == 33 and vehicle.status == 'move'
+    assert vehicle.position == [52.30, 6.61]
+    # Without new samples, the simulation moves the vehicle again
+    sensor.update_instance_parameter('timestamp', clock.now() - timedelta(seconds=Sensor.LIVE_PERIOD + 1))
+    ticker.step()
+    assert vehicle.position != [52.30, 6.61] and vehicle.position[1] == 6.60
+
+
+def test_live_status_sensor_wins_over_the_simulation(model):
+    vehicle, trip, _, ticker = start_trip(model, 'status', 'failed')
+    for _ in range(5):
+        ticker.step()
+    assert trip.status == 'completed' and vehicle.status == 'failed'
+
+
+def test_unknown_status_is_rejected():
+    line = b'{"vehicle": "AV1", "time": 1700000000, "status": "driving"}'
+    with pytest.raises(ValueError, match="driving"):
+        parse_sample(line, datetime.now())
+    assert parse_sample(line.replace(b'driving', b'charging'), datetime.now())[1][3] == 'charging'
@@ -0,0 +1,19 @@
+import time
+
+from utils.ticker import SimulationTicker
+
+
+def test_failed_step_is_reported(model, monkeypatch):
+    ticker = SimulationTicker(interval=0.01)
+    def fail():
+        raise RuntimeError('broken step')
+    monkeypatch.setattr(ticker, 'step', fail)
+    ticker.start()
+    try:
+        deadline = time.monotonic() + 5
+        while ticker.failed_steps < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        ticker.stop()
+    assert ticker.failed_steps >= 2
+    assert 'broken step' in ticker.last_error
@@ -0,0 +1,36 @@
+from utils.classes import Location, Route, TimingPlan, Trip, Vehicle
+from utils.entities import create_action
+
+
+def create_trip():
+    """
+    A trip that loads at A, drives 1000 m to B and unloads there.
+    """
+    a, b = Location([52.31, 6.62], name='A'), Location([52.32, 6.63], name='B')
+    trip = Trip(name="Trip 0")
+    route = Route([a.georeference, b.georeference], length=1000, coordinates=[tuple(a.georeference), tuple(b.georeference)])
+    create_action(location=a, sequence_nr=0, trip=trip, action_type='load')
+    create_action(a, b, sequence_nr=1, route=route, trip=trip)
+    create_action(location=b, sequence_nr=2, trip=trip, action_type='unload')
+    return trip
+
+
+def test_durations_follow_speed_and_load_times(model):
+    plan = TimingPlan(create_trip(), speed=5, load_time=30, unload_time=60)
+    assert plan.durations == [30, 200, 60] and plan.offsets == [0, 30, 230]
+    assert plan.total_duration == 290
+    assert plan.distance_offsets == [0, 0, 1000, 1000]
+    assert plan.cumulative_distances[0] is None and plan.cumulative_distances[1][0] == 0
+    assert plan.get_trip_progress(145) == 0.5 and plan.get_trip_progress(400) == 1
+    assert plan.get_action_progress(1, 100) == 0.5 and plan.get_action_progress(0, -5) == 0
+    assert plan.get_distance_travelled(1, 0.5) == 500
+    assert plan.is_stale(10, 30, 60) and not plan.is_stale(5, 30, 60)
+
+
+def test_plan_is_refreshed_when_the_vehicle_changes(model):
+    trip = create_trip()
+    vehicle = Vehicle(name='AV1', vehicle_type='terminal_tractor', average_speed=5, load_time=30, unload_time=60)
+    vehicle.assign_to_trip(trip, start=model.now())
+    assert trip.timing_plan.total_duration == 290
+    vehicle.update_instance_parameter('actual_speed', 10)
+    assert trip.timing_plan.durations == [30, 100, 60] and trip.timing_plan.total_duration == 190
@@ -0,0 +1,62 @@
+from datetime import timedelta
+
+import numpy as np
+import pytest
+
+from utils.classes import Constraint, Location, Route, Trip, Vehicle
+from utils.dispatcher import Dispatcher
+from utils.entities import create_action
+from utils.vrp import VRPSolution, VRPSolver
+
+
+def create_trips(count: int, constraint=None):
+    """
+    'count' trips of 1000 m between two locations, and a solver for them.
+    """
+    a, b = Location([52.31, 6.62], name='A'), Location([52.32, 6.63], name='B')
+    trips = []
+    for i in range(count):
+        trip = Trip(name=f"Trip {i}", constraint=constraint)
+        route = Route([a.georeference, b.georeference], length=1000, coordinates=[tuple(a.georeference), tuple(b.georeference)])
+        create_action(a, b, sequence_nr=0, route=route, trip=trip)
+        trips.append(trip)
+    return trips, VRPSolver(np.array([[0, 200], [200, 0]]), [a, b], speed=5, time_budget=0.1)
+
+
+def test_trips_are_planned_in_their_time_windows(model):
+    vehicles = [Vehicle(name=f"AV{v}", vehicle_type='terminal_tractor', average_speed=5) for v in range(2)]
+    trips, solver = create_trips(4)
+    solution = solver.solve(trips, vehicles)
+    assert solution.unplanned == [] and sorted(len(route) for route in solution.routes.values()) == [2, 2]
+    assert solution.apply() == []
+    assert all(trip.status == 'requested' for trip in trips)
+
+
+@pytest.mark.parametrize('constraint', [
+    lambda now: Constraint(vehicle_types=['truck']),
+    lambda now: Constraint(end_time=now + timedelta(seconds=100)),  # The trip takes 200 s
+], ids=['vehicle_type', 'time_window'])
+def test_trips_no_vehicle_can_execute_stay_draft(model, constraint):
+    vehicle = Vehicle(name='AV1', vehicle_type='terminal_tractor', average_speed=5)
+    (infeasible,), solver = create_trips(1, constraint(model.now()))
+    (feasible,), _ = create_trips(1)
+    solution = solver.solve([infeasible, feasible], [vehicle])
+    assert solution.unplanned == [infeasible] and solution.routes[vehicle] == [feasible]
+    assert infeasible.id not in solution.starts
+    assert solution.apply() == [infeasible]
+    assert infeasible.status == 'draft' and infeasible.vehicle is None
+    assert feasible.vehicle is vehicle
+    # The dispatcher leaves it a draft as well
+    assert Dispatcher().plan([infeasible], [vehicle]) == []
+
+
+def test_apply_skips_infeasible_routes(model):
+    tractor = Vehicle(name='AV1', vehicle_type='terminal_tractor', average_speed=5)
+    truck = Vehicle(name='Truck 1', vehicle_type='truck', average_speed=5)
+    (constrained,), _ = create_trips(1, Constraint(vehicle_types=['truck']))
+    (other,), _ = create_trips(1)
+    starts = {constrained.id: model.now(), other.id: model.now()}
+    solution = VRPSolution({tractor: [constrained], truck: [other]}, starts, dict(starts), 0.0, 0.0, 0.0, 0.0, 0)
+    assert not solution.is_feasible(tractor) and solution.is_feasible(truck)
+    assert solution.apply() == [constrained]
+    assert constrained.status == 'draft' and other.vehicle is truck
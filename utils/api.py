@@ -0,0 +1,355 @@
+"""
+Module for a local HTTP API to the model, for planning systems that create and assign trips in bulk.
+
+The API is an ASGI application (Starlette, served by uvicorn; both are installed with Streamlit) that
+runs in a background thread of the Streamlit process, so it shares the model registries with the page
+and the SimulationTicker. Handlers are coroutines: JSON is parsed and encoded on the event loop, and
+work on the model (which holds the model lock) runs in a worker thread, so a slow import or a tick in
+progress never blocks other requests. Endpoints accept single items and batches:
+
+    GET  /state                  Simulation time and the number of trips and vehicles per status.
+    POST /trips                  Import OTM trips: a message, a list of messages or an NDJSON body.
+    GET  /trips                  OTM trip messages; filter with ?status=, page with ?offset= and ?limit=.
+    GET  /trips/{id}             One OTM trip message.
+    POST /assignments            Assign draft trips, or re-assign planned ones: {"trip": id, "vehicle": id
+                                 or name, "start": time} or a list of them; trips without a vehicle are
+                                 dispatched together (see utils.dispatcher).
+    GET  /vehicles               OTM vehicle entities.
+    GET  /vehicles/{id}          One OTM vehicle entity.
+"""
+
+import asyncio
+import threading
+
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+import uvicorn
+
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Route
+
+from utils import clock
+from utils.classes import Location, Trip, Vehicle
+from utils.dispatcher import Dispatcher, reassign
+from utils.otm import LocationIndex, OTMExporter, OTMImporter, dumps, format_datetime, loads, parse_datetime
+
+
+def json_response(data: Any, status_code: int = 200) -> Response:
+    """
+    Return a JSON response, encoded with orjson if it is installed.
+
+    Parameters
+    ----------
+    data : Any
+        The response body.
+    status_code : int, optional
+        The HTTP status code. Default is 200.
+
+    Returns
+    -------
+    starlette.responses.Response
+        The response.
+    """
+    return Response(dumps(data), status_code=status_code, media_type='application/json')
+
+
+def error_response(message: str, status_code: int) -> Response:
+    """
+    Return a JSON error response: {"error": message}.
+    """
+    return json_response({"error": message}, status_code)
+
+
+class ModelAPI:
+    """
+    The request handlers of the API, bound to the shared model.
+
+    Instance Attributes:
+    ----------
+    lock : threading.RLock
+        The model lock (e.g., SimulationTicker.lock).
+    importer : OTMImporter
+        The importer of posted trips; it rejects the OTM ids of trips already in the model as duplicates.
+    dispatcher : Dispatcher
+        The dispatcher for assignment requests without a vehicle.
+    app : starlette.applications.Starlette
+        The ASGI application.
+    """
+
+    def __init__(self,
+                 lock: Any,
+                 network: Any = None,
+                 route_cache: Optional[Dict[Any, Any]] = None,
+                 dispatcher: Optional[Dispatcher] = None) -> None:
+        """
+        Initialize a new ModelAPI.
+
+        Parameters:
+        ----------
+        lock : threading.RLock
+            The model lock (e.g., SimulationTicker.lock).
+        network : StreetNetwork, optional
+            The street network imported trips are routed on. Default is None (straight-line legs).
+        route_cache : dict, optional
+            The route cache shared with other importers (e.g., the page's OTM upload). Default is a new cache.
+        dispatcher : Dispatcher, optional
+            The dispatcher for assignment requests without a vehicle. Default is a new Dispatcher.
+        """
+        self.lock = lock
+        self.importer: OTMImporter = OTMImporter(network, locations=LocationIndex([]), route_cache=route_cache, lock=lock)
+        self.dispatcher: Dispatcher = dispatcher if dispatcher is not None else Dispatcher()
+        self._import_lock: threading.Lock = threading.Lock()
+        self._location_version: Optional[int] = None
+        self.app: Starlette = Starlette(routes=[
+            Route('/state', self.get_state, methods=['GET']),
+            Route('/trips', self.post_trips, methods=['POST']),
+            Route('/trips', self.get_trips, methods=['GET']),
+            Route('/trips/{trip_id}', self.get_trip, methods=['GET']),
+            Route('/assignments', self.post_assignments, methods=['POST']),
+            Route('/vehicles', self.get_vehicles, methods=['GET']),
+            Route('/vehicles/{vehicle_id}', self.get_vehicle, methods=['GET']),
+        ])
+
+    # Model operations, executed in a worker thread
+
+    def _state(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "time": format_datetime(clock.now()),
+                "trips": dict(Counter(trip.status for trip in Trip._instances)),
+                "vehicles": dict(Counter(vehicle.status for vehicle in Vehicle._instances)),
+                "tripVersion": Trip.get_version(),
+            }
+
+    def _import(self, messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+        with self._import_lock:
+            if self._location_version != Location.get_version():
+                # Locations were added or changed (e.g., by the page); index them before resolving OTM location ids
+                with self.lock:
+                    self.importer.locations = LocationIndex()
+                    self._location_version = Location.get_version()
+            report = self.importer.import_messages(messages)
+        return {
+            "created": report.trip_ids,
+            "duplicates": report.duplicates,
+            "skippedActions": report.skipped_actions,
+            "errors": [{"id": message_id, "error": error} for message_id, error in report.errors],
+        }
+
+    def _export_trips(self, status: Optional[str], offset: int, limit: Optional[int]) -> List[Dict[str, Any]]:
+        exporter = OTMExporter()
+        with self.lock:
+            trips = Trip.get_by_status(status) if status is not None else Trip.get_all_trips()
+            trips = trips[offset:offset + limit] if limit is not None else trips[offset:]
+            return [exporter.trip(trip) for trip in trips]
+
+    def _export_trip(self, trip_id: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            trip = Trip.get_by_id(trip_id)
+            return OTMExporter().trip(trip) if trip is not None else None
+
+    def _export_vehicles(self, vehicle_id: Optional[str] = None) -> Any:
+        exporter = OTMExporter()
+        with self.lock:
+            if vehicle_id is None:
+                return [exporter.vehicle(vehicle) for vehicle in Vehicle.get_all_vehicles()]
+            vehicle = Vehicle.get_by_id(vehicle_id)
+            return exporter.vehicle(vehicle) if vehicle is not None else None
+
+    def _assign(self, requests: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        results: List[Dict[str, Any]] = [{"trip": request.get('trip')} for request in requests]
+        with self.lock:
+            trips = {trip.id: trip for trip in Trip._instances}
+            vehicles = {vehicle.id: vehicle for vehicle in Vehicle._instances}
+            vehicles.update({vehicle.name: vehicle for vehicle in Vehicle._instances if vehicle.name not in vehicles})
+            to_dispatch: Dict[str, Trip] = {}
+            for result, request in zip(results, requests):
+                trip = trips.get(request.get('trip'))
+                if trip is None:
+                    result["error"] = f"Unknown trip '{request.get('trip')}'"
+                    continue
+                vehicle = vehicles.get(request.get('vehicle'))
+                if request.get('vehicle') is not None and vehicle is None:
+                    result["error"] = f"Unknown vehicle '{request['vehicle']}'"
+                    continue
+                if trip.status not in ['draft', 'requested']:
+                    result["error"] = f"Trip has status '{trip.status}'; only 'draft' and 'requested' trips can be assigned"
+                    continue
+                try:
+                    start = parse_datetime(request['start']) if request.get('start') else None
+                except ValueError as error:
+                    result["error"] = str(error)
+                    continue
+                if vehicle is None:
+                    to_dispatch[trip.id] = trip
+                    result["_dispatch"] = True
+                    continue
+                try:
+                    reassign(trip, vehicle, start=start)  # A planned trip keeps its vehicle if this fails
+                except Exception as error:
+                    result["error"] = f"Could not assign the trip: {error!r}"
+                    continue
+                result.update(self._get_assignment(trip))
+
+            # Trips without a vehicle are dispatched together; planned trips keep their vehicle if no vehicle can execute them
+            if to_dispatch:
+                dispatched = {trip.id for trip, _, _ in self.dispatcher.dispatch(trips=list(to_dispatch.values()))}
+                for result in results:
+                    if result.pop("_dispatch", False):
+                        if result["trip"] in dispatched:
+                            result.update(self._get_assignment(trips[result["trip"]]))
+                        else:
+                            result["error"] = "No vehicle can execute the trip"
+        return results
+
+    @staticmethod
+    def _get_assignment(trip: Trip) -> Dict[str, Any]:
+        """
+        Return the vehicle, planned start and planned end of an assigned trip.
+        """
+        schedule = trip.vehicle.schedule
+        row = (schedule['task_id'].to_numpy() == trip.id).nonzero()[0][-1]
+        return {"vehicle": trip.vehicle.id,
+                "start": format_datetime(schedule['start'].iat[row].to_pydatetime()),
+                "end": format_datetime(schedule['end'].iat[row].to_pydatetime())}
+
+    # Request handlers
+
+    async def get_state(self, request: Request) -> Response:
+        return json_response(await run_in_threadpool(self._state))
+
+    async def post_trips(self, request: Request) -> Response:
+        body = await request.body()
+        try:
+            if request.headers.get('content-type', '').startswith(('application/x-ndjson', 'application/jsonl')):
+                messages = [loads(line) for line in body.splitlines() if line.strip()]
+            else:
+                data = loads(body)
+                messages = data if isinstance(data, list) else [data]
+        except ValueError as error:
+            return error_response(f"Invalid JSON: {error}", 400)
+        if not all(isinstance(message, dict) for message in messages):
+            return error_response("Expected OTM trip messages (JSON objects)", 400)
+        result = await run_in_threadpool(self._import, messages)
+        return json_response(result, 201 if result["created"] else 422)
+
+    async def get_trips(self, request: Request) -> Response:
+        try:
+            offset = int(request.query_params.get('offset', 0))
+            limit = int(request.query_params['limit']) if 'limit' in request.query_params else None
+        except ValueError:
+            return error_response("'offset' and 'limit' must be integers", 400)
+        status = request.query_params.get('status')
+        if status is not None and status not in Trip.VALID_STATUS:
+            return error_response(f"Invalid status '{status}'", 400)
+        return json_response(await run_in_threadpool(self._export_trips, status, offset, limit))
+
+    async def get_trip(self, request: Request) -> Response:
+        trip = await run_in_threadpool(self._export_trip, request.path_params['trip_id'])
+        return json_response(trip) if trip is not None else error_response("Trip not found", 404)
+
+    async def post_assignments(self, request: Request) -> Response:
+        try:
+            data = loads(await request.body())
+        except ValueError as error:
+            return error_response(f"Invalid JSON: {error}", 400)
+        requests = data if isinstance(data, list) else [data]
+        if not all(isinstance(item, dict) for item in requests):
+            return error_response("Expected assignment requests (JSON objects)", 400)
+        results = await run_in_threadpool(self._assign, requests)
+        return json_response(results if isinstance(data, list) else results[0],
+                             200 if any("error" not in result for result in results) else 422)
+
+    async def get_vehicles(self, request: Request) -> Response:
+        return json_response(await run_in_threadpool(self._export_vehicles))
+
+    async def get_vehicle(self, request: Request) -> Response:
+        vehicle = await run_in_threadpool(self._export_vehicles, request.path_params['vehicle_id'])
+        return json_response(vehicle) if vehicle is not None else error_response("Vehicle not found", 404)
+
+
+class APIServer:
+    """
+    Serves an ASGI application with uvicorn in a background thread.
+
+    Instance Attributes:
+    ----------
+    app : ASGI application
+        The application, e.g. ModelAPI.app.
+    host : str
+        The interface to listen on; the default only accepts local connections.
+    port : int
+        The port to listen on.
+
+    Methods:
+    -------
+    start() -> None
+        Start serving in a background thread (no-op if already running).
+    stop() -> None
+        Stop serving and wait for the thread to finish.
+    """
+
+    def __init__(self, app: Any, host: str = '127.0.0.1', port: int = 8502) -> None:
+        """
+        Initialize a new APIServer.
+
+        Parameters:
+        ----------
+        app : ASGI application
+            The application, e.g. ModelAPI.app.
+        host : str, optional
+            The interface to listen on. Default is '127.0.0.1' (local connections only).
+        port : int, optional
+            The port to listen on. Default is 8502.
+        """
+        self.app = app
+        self.host: str = host
+        self.port: int = port
+        self._server: Optional[uvicorn.Server] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """
+        Start serving in a background thread and wait until the server accepts connections.
+
+        Raises:
+        ------
+        RuntimeError:
+            If the server did not start (e.g., the port is in use).
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        config = uvicorn.Config(self.app, host=self.host, port=self.port, log_level='warning', access_log=False)
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._run, name="APIServer", daemon=True)
+        self._thread.start()
+        while not self._server.started:
+            if not self._thread.is_alive():
+                raise RuntimeError(f"The API server could not start on {self.host}:{self.port}")
+            self._thread.join(0.01)
+
+    def _run(self) -> None:
+        """
+        Run the server on a new event loop in this thread.
+        """
+        asyncio.run(self._server.serve())
+
+    def stop(self) -> None:
+        """
+        Stop serving and wait for the thread to finish.
+        """
+        if self._server is not None:
+            self._server.should_exit = True
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def is_running(self) -> bool:
+        """
+        Return True if the server thread is running.
+        """
+        return self._thread is not None and self._thread.is_alive()
@@ -2,8 +2,10 @@ import uuid
 import pandas as pd
 
 from folium import Marker
-from typing import List, Optional, Any
+from typing import List, Optional, Any, Collection
 from datetime import datetime, timedelta
+from utils import clock, events
+from utils.osmnx import get_cumulative_distances
 
 class Action:
     """
@@ -66,7 +68,7 @@ class Action:
     """
 
     VALID_LIFECYCLES: List[str] = ["requested", "planned", "projected", "actual", "realized"]
-    VALID_ACTION_TYPES: List[str] = ["move"]  # Only "move" is allowed for now
+    VALID_ACTION_TYPES: List[str] = ["move", "load", "unload"]  # Only "move" actions have a route
 
     _instances: List['Action'] = []
     _total_instances: int = 0
@@ -96,7 +98,7 @@ class Action:
         sequence_nr : int, optional
             The sequence number of the action. Default is None.
         action_type : str, optional
-            The type of action. Must be "move". Default is "move".
+            The type of action. Must be "move", "load" or "unload". Default is "move".
         name : str, optional
             The name of the action. Default is "".
         lifecycle : str, optional
@@ -139,9 +141,9 @@ class Action:
         # Core attributes
         self.id: str = str(uuid.uuid4())  # Generate a unique identifier for the action
         self.name: str = name
-        self.creation_date: datetime = datetime.now()
-        self.last_modified: datetime = datetime.now()
-        self.action_type: str = action_type  # Only "move" is currently allowed
+        self.creation_date: datetime = clock.now()
+        self.last_modified: datetime = clock.now()
+        self.action_type: str = action_type  # "move", "load" or "unload"
         self.lifecycle: str = lifecycle
         self.transport_mode: Optional[str] = transport_mode
         self.sequence_nr: Optional[int] = sequence_nr
@@ -162,6 +164,8 @@ class Action:
         # Register the instance
         Action._instances.append(self)
         Action._total_instances += 1
+        if events.recorders:
+            events.record(self, events.CREATE, ())
 
     def update_instance_parameter(self, parameter: str, value: Any) -> None:
         """
@@ -174,8 +178,13 @@ class Action:
         value : any
             The new value for the parameter.
         """
+        previous = getattr(self, parameter, None) if events.subscribers else None
         setattr(self, parameter, value)
-        self.last_modified = datetime.now()
+        self.last_modified = clock.now()
+        if events.subscribers:
+            events.publish(self, parameter, previous, value)
+        if events.recorders:
+            events.record(self, 'update_instance_parameter', (parameter, value))
 
     @classmethod
     def get_by_id(cls, id: str) -> List['Action']:
@@ -227,6 +236,8 @@ class Action:
         """
         cls._instances.clear()
         cls._total_instances = 0
+        if events.recorders:
+            events.record(cls, 'delete_all_instances')
 
 class Actor:
     """
@@ -252,6 +263,11 @@ class Actor:
     last_modified : datetime
         The date and time when the actor was last modified.
 
+    Methods:
+    -------
+    update_instance_parameter(parameter: str, value: any) -> None:
+        Updates a specific parameter of the actor to a new value.
+
     Class Methods:
     -------
     get_by_id(id: str) -> List[Actor]
@@ -284,12 +300,14 @@ class Actor:
         """
         self.id: str = str(uuid.uuid4())  # Generate a unique identifier for the actor
         self.name: str = name
-        self.creation_date: datetime = datetime.now()
-        self.last_modified: datetime = datetime.now()
+        self.creation_date: datetime = clock.now()
+        self.last_modified: datetime = clock.now()
         self.locations: List['Location'] = locations  # List of associated locations
 
         Actor._instances.append(self)  # Add the new instance to the list of instances
         Actor._total_instances += 1  # Increment the total instances counter
+        if events.recorders:
+            events.record(self, events.CREATE, ())
 
     def __repr__(self) -> str:
         """
@@ -302,6 +320,29 @@ class Actor:
         """
         return f"Actor(id='{self.id}', name='{self.name}')"
 
+    def update_instance_parameter(self, parameter: str, value: Any) -> None:
+        """
+        Update a specific parameter of the actor to a new value.
+
+        Parameters:
+        ----------
+        parameter : str
+            The name of the parameter to update.
+        value : any
+            The new value to assign to the parameter.
+
+        Example:
+        -------
+        actor.update_instance_parameter("locations", [location])
+        """
+        previous = getattr(self, parameter, None) if events.subscribers else None
+        setattr(self, parameter, value)
+        self.last_modified = clock.now()
+        if events.subscribers:
+            events.publish(self, parameter, previous, value)
+        if events.recorders:
+            events.record(self, 'update_instance_parameter', (parameter, value))
+
     @classmethod
     def get_by_id(cls, id: str) -> List['Actor']:
         """
@@ -352,12 +393,214 @@ class Actor:
         """
         cls._instances.clear()
         cls._total_instances = 0
+        if events.recorders:
+            events.record(cls, 'delete_all_instances')
 
 class Constraint:
-    '''
-    TODO: Implement Constraint class. See https://otm5.opentripmodel.org/ for details. 
-    '''
-    pass
+    """
+    A class to represent a constraint on a trip, action or location, following OTM5 (https://otm5.opentripmodel.org/).
+
+    A constraint combines up to three restrictions, like an OTM5 'andConstraint':
+    - a time window ('timeWindowConstraint'): the constrained entity starts no earlier than
+      'start_time' and ends no later than 'end_time';
+    - a vehicle type restriction ('vehicleTypeConstraint'): only vehicles of one of 'vehicle_types';
+    - a capacity ('sizeConstraint'): only vehicles with a load capacity of at least 'capacity'.
+    Restrictions that are None do not apply. Enforced constraints must be met; preference constraints
+    may be violated at a cost (see utils/constraints.py for the feasibility checks).
+
+    Attributes:
+    ----------
+    VALID_ENFORCEABILITY : list
+        The valid OTM5 enforceability levels: 'enforced' and 'preference'.
+    _instances : list
+        A class attribute that stores all instances of Constraint.
+    _total_instances : int
+        A class attribute that stores the total number of Constraint instances created.
+
+    Instance Attributes:
+    ----------
+    id : str
+        The unique identifier of the constraint.
+    name : str
+        The name of the constraint.
+    enforceability : str
+        Either 'enforced' (hard constraint) or 'preference' (soft constraint).
+    start_time : datetime, optional
+        The start of the time window.
+    end_time : datetime, optional
+        The end of the time window.
+    vehicle_types : list, optional
+        The vehicle types that are allowed.
+    capacity : float, optional
+        The load capacity a vehicle needs.
+    creation_date : datetime
+        The date and time when the constraint was created.
+    last_modified : datetime
+        The date and time when the constraint was last modified.
+
+    Methods:
+    -------
+    is_enforced() -> bool
+        Returns True if the constraint must be met.
+    update_instance_parameter(parameter: str, value: any) -> None:
+        Updates a specific parameter of the constraint to a new value.
+    get_by_id(id: str) -> Optional[Constraint]:
+        Returns the constraint matched by the given id.
+    get_all_constraints() -> List[Constraint]:
+        Returns a list of all constraints.
+    get_total_constraints() -> int:
+        Returns the total number of constraints created.
+    delete_all_instances() -> None
+        Deletes all constraints.
+
+    Example:
+    -------
+    constraint = Constraint(name="Gate 1 opening hours", start_time=datetime(2024, 1, 1, 8), end_time=datetime(2024, 1, 1, 17))
+    """
+
+    VALID_ENFORCEABILITY: List[str] = ['enforced', 'preference']
+    _instances: List['Constraint'] = []
+    _total_instances: int = 0
+
+    def __init__(self,
+                 name: str = "",
+                 enforceability: str = "enforced",
+                 start_time: Optional[datetime] = None,
+                 end_time: Optional[datetime] = None,
+                 vehicle_types: Optional[List[str]] = None,
+                 capacity: Optional[float] = None) -> None:
+        """
+        Initialize a new Constraint instance.
+
+        Parameters:
+        ----------
+        name : str, optional
+            The name of the constraint. Defaults to an empty string.
+        enforceability : str, optional
+            Either 'enforced' or 'preference'. Defaults to 'enforced'.
+        start_time : datetime, optional
+            The start of the time window. Defaults to None (no earliest start).
+        end_time : datetime, optional
+            The end of the time window. Defaults to None (no latest end).
+        vehicle_types : list, optional
+            The vehicle types that are allowed. Defaults to None (all vehicle types).
+        capacity : float, optional
+            The load capacity a vehicle needs. Defaults to None (no capacity needed).
+
+        Raises:
+        -------
+        ValueError:
+            If the enforceability is not valid.
+            If the time window ends before it starts.
+        """
+        if enforceability not in Constraint.VALID_ENFORCEABILITY:
+            raise ValueError(f"Enforceability '{enforceability}' is not valid. Valid values are: {', '.join(Constraint.VALID_ENFORCEABILITY)}")
+        if start_time is not None and end_time is not None and end_time < start_time:
+            raise ValueError(f"Time window ends ({end_time}) before it starts ({start_time})")
+
+        self.id: str = str(uuid.uuid4())
+        self.name: str = name
+        self.enforceability: str = enforceability
+        self.start_time: Optional[datetime] = start_time
+        self.end_time: Optional[datetime] = end_time
+        self.vehicle_types: Optional[List[str]] = vehicle_types
+        self.capacity: Optional[float] = capacity
+        self.creation_date: datetime = clock.now()
+        self.last_modified: datetime = clock.now()
+
+        Constraint._instances.append(self)
+        Constraint._total_instances += 1
+        if events.recorders:
+            events.record(self, events.CREATE, ())
+
+    def __repr__(self) -> str:
+        """
+        Return an unambiguous string representation of the Constraint instance.
+        """
+        return (f"Constraint(name={self.name}, enforceability={self.enforceability}, start_time={self.start_time}, "
+                f"end_time={self.end_time}, vehicle_types={self.vehicle_types}, capacity={self.capacity})")
+
+    def is_enforced(self) -> bool:
+        """
+        Return True if the constraint must be met ('enforced'), False if it is only a preference.
+        """
+        return self.enforceability == 'enforced'
+
+    def update_instance_parameter(self, parameter: str, value: Any) -> None:
+        """
+        Update a specific parameter of the constraint to a new value.
+
+        Parameters:
+        ----------
+        parameter : str
+            The name of the parameter to update.
+        value : any
+            The new value to assign to the parameter.
+
+        Example:
+        -------
+        constraint.update_instance_parameter("end_time", datetime(2024, 1, 1, 18))
+        """
+        previous = getattr(self, parameter, None) if events.subscribers else None
+        setattr(self, parameter, value)
+        self.last_modified = clock.now()
+        if events.subscribers:
+            events.publish(self, parameter, previous, value)
+        if events.recorders:
+            events.record(self, 'update_instance_parameter', (parameter, value))
+
+    @classmethod
+    def get_by_id(cls, id: str) -> Optional['Constraint']:
+        """
+        Retrieve a constraint by its unique identifier.
+
+        Parameters:
+        ----------
+        id : str
+            The unique identifier (UUID) of the constraint.
+
+        Returns:
+        -------
+        Constraint
+            The constraint with the specified id, or None if not found.
+        """
+        return next((c for c in cls._instances if c.id == id), None)
+
+    @classmethod
+    def get_all_constraints(cls) -> List['Constraint']:
+        """
+        Retrieve all constraints.
+
+        Returns:
+        -------
+        List[Constraint]
+            A list of all constraints.
+        """
+        return cls._instances.copy()
+
+    @classmethod
+    def get_total_constraints(cls) -> int:
+        """
+        Retrieve the total number of constraints created.
+
+        Returns:
+        -------
+        int
+            The total number of constraints.
+        """
+        return cls._total_instances
+
+    @classmethod
+    def delete_all_instances(cls) -> None:
+        """
+        Delete all constraint instances.
+
+        This method clears the list of constraint instances and resets the total instances counter.
+        """
+        cls._instances.clear()
+        cls._total_instances = 0
+        if events.recorders:
+            events.record(cls, 'delete_all_instances')
 
 class Goods:
     """
@@ -546,8 +789,8 @@ class Goods:
         self.id: str = str(uuid.uuid4())
         self.goods_type: str = goods_type
         self.name: str = name
-        self.creation_date: datetime = datetime.now()
-        self.last_modified: datetime = datetime.now()
+        self.creation_date: datetime = clock.now()
+        self.last_modified: datetime = clock.now()
         self.description: Optional[str] = description
         self.remark: Optional[str] = remark
         self.barcode: Optional[str] = barcode
@@ -571,6 +814,8 @@ class Goods:
 
         Goods._instances.append(self)
         Goods._total_instances += 1
+        if events.recorders:
+            events.record(self, events.CREATE, ())
 
     def update_instance_parameter(self, parameter: str, value: Any) -> None:
         """
@@ -587,8 +832,13 @@ class Goods:
         -------
         goods.update_instance_parameter("weight", 200.0)
         """
+        previous = getattr(self, parameter, None) if events.subscribers else None
         setattr(self, parameter, value)
-        self.last_modified = datetime.now()
+        self.last_modified = clock.now()
+        if events.subscribers:
+            events.publish(self, parameter, previous, value)
+        if events.recorders:
+            events.record(self, 'update_instance_parameter', (parameter, value))
 
     @classmethod
     def get_by_id(cls, id: str) -> Optional['Goods']:
@@ -695,6 +945,8 @@ class Location:
         A class attribute that stores all instances of Location.
     _total_instances : int
         A class attribute that stores the total number of Location instances created.
+    _version : int
+        A class attribute that is incremented whenever locations are added, changed or deleted.
 
     Instance Attributes:
     ----------
@@ -719,6 +971,11 @@ class Location:
     last_modified : datetime
         The timestamp when the location was last modified.
 
+    Methods:
+    -------
+    update_instance_parameter(parameter: str, value: any) -> None:
+        Updates a specific parameter of the location to a new value.
+
     Class Methods:
     -------
     get_by_id(id: str) -> Location
@@ -733,6 +990,8 @@ class Location:
         Retrieve all location instances.
     get_total_locations() -> int
         Retrieve the total number of location instances.
+    get_version() -> int
+        Retrieve the version of the location registry (e.g., to invalidate cached map layers).
     delete_all_by_type(location_type: str)
         Delete all location instances of a specific type.
     delete_all_customers()
@@ -745,6 +1004,7 @@ class Location:
 
     _instances: List['Location'] = []
     _total_instances: int = 0
+    _version: int = 0
 
     def __init__(self,
                  georeference: List[float],
@@ -783,12 +1043,15 @@ class Location:
         self.actions: List['Action'] = actions if actions is not None else []
         self.constraint: Optional['Constraint'] = constraint
         self.marker: Marker = marker
-        self.creation_date: datetime = datetime.now()
-        self.last_modified: datetime = datetime.now()
+        self.creation_date: datetime = clock.now()
+        self.last_modified: datetime = clock.now()
 
         # Register the new instance
         Location._instances.append(self)
         Location._total_instances += 1
+        Location._version += 1
+        if events.recorders:
+            events.record(self, events.CREATE, ())
 
     def __repr__(self) -> str:
         """
@@ -802,6 +1065,30 @@ class Location:
         return (f"Location(id='{self.id}', name='{self.name}', "
                 f"location_type='{self.location_type}', georeference={self.georeference})")
 
+    def update_instance_parameter(self, parameter: str, value: Any) -> None:
+        """
+        Update a specific parameter of the location to a new value.
+
+        Parameters:
+        ----------
+        parameter : str
+            The name of the parameter to update.
+        value : any
+            The new value to assign to the parameter.
+
+        Example:
+        -------
+        location.update_instance_parameter("actors", [actor])
+        """
+        previous = getattr(self, parameter, None) if events.subscribers else None
+        setattr(self, parameter, value)
+        self.last_modified = clock.now()
+        Location._version += 1  # Derived data (e.g., the static map, location indexes) is rebuilt
+        if events.subscribers:
+            events.publish(self, parameter, previous, value)
+        if events.recorders:
+            events.record(self, 'update_instance_parameter', (parameter, value))
+
     @classmethod
     def get_by_id(cls, id: str) -> Optional['Location']:
         """
@@ -895,6 +1182,21 @@ class Location:
         """
         return cls._total_instances
 
+    @classmethod
+    def get_version(cls) -> int:
+        """
+        Retrieve the version of the location registry.
+
+        The version is incremented whenever locations are added, changed or deleted, so derived data
+        (e.g., the static map layer) only has to be rebuilt when it changes.
+
+        Returns:
+        -------
+        int
+            The current version.
+        """
+        return cls._version
+
     @classmethod
     def delete_all_by_type(cls, location_type: str) -> None:
         """
@@ -907,6 +1209,9 @@ class Location:
         """
         cls._instances = [location for location in cls._instances if location.location_type != location_type]
         cls._total_instances = len(cls._instances)
+        cls._version += 1
+        if events.recorders:
+            events.record(cls, 'delete_all_by_type', (location_type,))
 
 class Route:
     """
@@ -997,11 +1302,13 @@ class Route:
         self.nodes: list = nodes
         self.polyline = polyline
         self.coordinates: list = coordinates
-        self.creation_date = datetime.now()
-        self.last_modified = datetime.now()
+        self.creation_date = clock.now()
+        self.last_modified = clock.now()
 
         Route._instances.append(self)  # Add the new instance to the list of instances
         Route._total_instances += 1      # Increment the total instances counter
+        if events.recorders:
+            events.record(self, events.CREATE, ())
 
     def __repr__(self) -> str:
         """
@@ -1064,14 +1371,446 @@ class Route:
         """
         cls._instances.clear()
         cls._total_instances = 0
+        if events.recorders:
+            events.record(cls, 'delete_all_instances')
 
 class Sensor:
-    '''
-    TODO: Implement Sensor class. See https://otm5.opentripmodel.org/ for details. 
+    """
+    A class to represent a real-world sensor on a vehicle (e.g., a GPS receiver or a battery monitor), following OTM5 (https://otm5.opentripmodel.org/).
+
+    In a Digital Shadow setting, the vehicle's state is taken from its sensors instead of the simulation:
+    the telemetry pipeline (see utils/telemetry.py) records every accepted sample on the sensor of its type
+    and copies the latest value to the vehicle (e.g., a 'gps' sample to Vehicle.position). While a sensor is
+    live, its measurement wins: the simulation does not move a vehicle with a live 'gps' sensor and does not
+    change the status of a vehicle with a live 'status' sensor (see utils/entities.py).
+
+    Attributes:
+    ----------
+    VALID_SENSOR_TYPES : list
+        The valid sensor types: 'gps', 'battery' and 'status'.
+    LIVE_PERIOD : float
+        The number of seconds (by the model's clock) a measured value stays live.
+    _instances : list
+        A class attribute that stores all instances of Sensor.
+    _total_instances : int
+        A class attribute that stores the total number of Sensor instances created.
+
+    Instance Attributes:
+    ----------
+    id : str
+        The unique identifier of the sensor.
+    name : str
+        The name of the sensor.
+    sensor_type : str
+        The quantity measured: 'gps' ([latitude, longitude]), 'battery' (%) or 'status' (a vehicle status).
+    vehicle : Vehicle, optional
+        The vehicle the sensor is mounted on.
+    value : any
+        The latest measured value.
+    timestamp : datetime, optional
+        The time the latest value was measured.
+    samples : int
+        The number of values recorded.
+    creation_date : datetime
+        The date and time when the sensor was created.
+    last_modified : datetime
+        The date and time when the sensor was last modified.
+
+    Methods:
+    -------
+    record(value: any, timestamp: datetime) -> bool
+        Records a measured value, unless it is older than the latest one.
+    is_live(max_age: Optional[float] = None) -> bool
+        Checks whether the latest value was measured at most max_age seconds ago.
+    update_instance_parameter(parameter: str, value: any) -> None:
+        Updates a specific parameter of the sensor to a new value.
+    get_by_id(id: str) -> Optional[Sensor]:
+        Returns the sensor matched by the given id.
+    get_by_vehicle(vehicle: Vehicle, sensor_type: str) -> Optional[Sensor]:
+        Returns the sensor of a type mounted on a vehicle.
+    get_all_sensors() -> List[Sensor]:
+        Returns a list of all sensors.
+    get_total_sensors() -> int:
+        Returns the total number of sensors created.
+    delete_all_instances() -> None
+        Deletes all sensors.
+
+    Example:
+    -------
+    sensor = Sensor(name="AV1 GPS", sensor_type="gps", vehicle=vehicle)
+    """
+
+    VALID_SENSOR_TYPES: List[str] = ['gps', 'battery', 'status']
+    LIVE_PERIOD: float = 60.0  # The default max_age of the telemetry pipeline
+    _instances: List['Sensor'] = []
+    _total_instances: int = 0
+
+    def __init__(self,
+                 name: str = "",
+                 sensor_type: str = "gps",
+                 vehicle: Optional['Vehicle'] = None) -> None:
+        """
+        Initialize a new Sensor instance and mount it on the vehicle (if any).
+
+        Parameters:
+        ----------
+        name : str, optional
+            The name of the sensor. Defaults to an empty string.
+        sensor_type : str, optional
+            The quantity measured: 'gps', 'battery' or 'status'. Defaults to 'gps'.
+        vehicle : Vehicle, optional
+            The vehicle the sensor is mounted on. Defaults to None.
+
+        Raises:
+        -------
+        ValueError:
+            If the sensor type is not valid.
+        """
+        if sensor_type not in Sensor.VALID_SENSOR_TYPES:
+            raise ValueError(f"Sensor type '{sensor_type}' is not valid. Valid values are: {', '.join(Sensor.VALID_SENSOR_TYPES)}")
+
+        self.id: str = str(uuid.uuid4())
+        self.name: str = name
+        self.sensor_type: str = sensor_type
+        self.vehicle: Optional['Vehicle'] = vehicle
+        self.value: Any = None
+        self.timestamp: Optional[datetime] = None
+        self.samples: int = 0
+        self.creation_date: datetime = clock.now()
+        self.last_modified: datetime = clock.now()
+
+        if vehicle is not None:
+            vehicle.sensors.append(self)
+
+        Sensor._instances.append(self)
+        Sensor._total_instances += 1
+        if events.recorders:
+            events.record(self, events.CREATE, ())
+
+    def __repr__(self) -> str:
+        """
+        Return an unambiguous string representation of the Sensor instance.
+        """
+        return f"Sensor(name={self.name}, sensor_type={self.sensor_type}, value={self.value}, timestamp={self.timestamp})"
+
+    def record(self, value: Any, timestamp: datetime) -> bool:
+        """
+        Record a measured value, unless it is older than the latest recorded value.
+
+        Parameters:
+        ----------
+        value : any
+            The measured value.
+        timestamp : datetime
+            The time the value was measured.
+
+        Returns:
+        -------
+        bool
+            True if the value was recorded, False if it was stale.
+        """
+        if self.timestamp is not None and timestamp < self.timestamp:
+            return False
+        previous = self.value
+        self.value = value
+        self.timestamp = timestamp
+        self.samples += 1
+        self.last_modified = clock.now()
+        if events.subscribers:
+            events.publish(self, 'value', previous, value)
+        if events.recorders:
+            events.record(self, 'record', (value, timestamp))
+        return True
+
+    def is_live(self, max_age: Optional[float] = None) -> bool:
+        """
+        Check whether the latest value was measured at most max_age seconds ago (by the model's clock).
+
+        Parameters:
+        ----------
+        max_age : float, optional
+            The maximum age in seconds. Defaults to Sensor.LIVE_PERIOD.
+
+        Returns:
+        -------
+        bool
+            True if the sensor has a value that is not older than max_age.
+        """
+        if self.timestamp is None:
+            return False
+        max_age = Sensor.LIVE_PERIOD if max_age is None else max_age
+        return (clock.now() - self.timestamp).total_seconds() <= max_age
+
+    def update_instance_parameter(self, parameter: str, value: Any) -> None:
+        """
+        Update a specific parameter of the sensor to a new value.
+
+        Parameters:
+        ----------
+        parameter : str
+            The name of the parameter to update.
+        value : any
+            The new value to assign to the parameter.
+        """
+        previous = getattr(self, parameter, None) if events.subscribers else None
+        setattr(self, parameter, value)
+        self.last_modified = clock.now()
+        if events.subscribers:
+            events.publish(self, parameter, previous, value)
+        if events.recorders:
+            events.record(self, 'update_instance_parameter', (parameter, value))
+
+    @classmethod
+    def get_by_id(cls, id: str) -> Optional['Sensor']:
+        """
+        Retrieve a sensor by its unique identifier.
+
+        Parameters:
+        ----------
+        id : str
+            The unique identifier (UUID) of the sensor.
+
+        Returns:
+        -------
+        Sensor
+            The sensor with the specified id, or None if not found.
+        """
+        return next((s for s in cls._instances if s.id == id), None)
+
+    @classmethod
+    def get_by_vehicle(cls, vehicle: 'Vehicle', sensor_type: str) -> Optional['Sensor']:
+        """
+        Retrieve the sensor of a type mounted on a vehicle.
+
+        Parameters:
+        ----------
+        vehicle : Vehicle
+            The vehicle.
+        sensor_type : str
+            The sensor type (e.g., 'gps').
+
+        Returns:
+        -------
+        Sensor
+            The first sensor of the type on the vehicle, or None if it has none.
+        """
+        return next((s for s in vehicle.sensors if s.sensor_type == sensor_type), None)
+
+    @classmethod
+    def get_all_sensors(cls) -> List['Sensor']:
+        """
+        Retrieve all sensors.
+
+        Returns:
+        -------
+        List[Sensor]
+            A list of all sensors.
+        """
+        return cls._instances.copy()
 
-    Can be useful to represent real-world sensors (either on-vehicle or on-site) in a Digital Shadow / Digital Twin setting.
-    '''
-    pass
+    @classmethod
+    def get_total_sensors(cls) -> int:
+        """
+        Retrieve the total number of sensors created.
+
+        Returns:
+        -------
+        int
+            The total number of sensors.
+        """
+        return cls._total_instances
+
+    @classmethod
+    def delete_all_instances(cls) -> None:
+        """
+        Delete all sensor instances.
+
+        This method clears the list of sensor instances and resets the total instances counter.
+        """
+        cls._instances.clear()
+        cls._total_instances = 0
+        if events.recorders:
+            events.record(cls, 'delete_all_instances')
+
+class TimingPlan:
+    """
+    A class to represent the timing plan of a trip executed by a vehicle.
+
+    The plan is computed once when a vehicle is assigned to a trip (see Vehicle.assign_to_trip) and
+    is only refreshed when the vehicle's speed or (un)load times change. Simulating a trip then only
+    requires lookups instead of recomputing durations from the routes on every tick.
+
+    Instance Attributes:
+    ----------
+    speed : float
+        The speed (m/s) used to compute the duration of 'move' actions.
+    load_time : float
+        The load time (in seconds) used for 'load' actions.
+    unload_time : float
+        The unload time (in seconds) used for 'unload' actions.
+    durations : list
+        The expected duration (in seconds) of each action of the trip.
+    offsets : list
+        The expected start of each action, in seconds since the start of the trip.
+    total_duration : float
+        The expected duration of the whole trip (in seconds).
+    distance_offsets : list
+        Prefix sums of the route lengths (in meters): distance_offsets[i] is the distance driven
+        before action i starts; distance_offsets[-1] is the total route length of the trip.
+    cumulative_distances : list
+        For each 'move' action, the cumulative distances along its route coordinates (see
+        get_cumulative_distances() in utils/osmnx.py). None for other action types.
+
+    Methods:
+    -------
+    is_stale(speed: float, load_time: float, unload_time: float) -> bool
+        Returns True if the plan was computed with different vehicle parameters.
+    get_trip_progress(elapsed_seconds: float) -> float
+        Returns the fraction [0-1] of the trip completed after 'elapsed_seconds'.
+    get_action_progress(sequence_nr: int, elapsed_seconds: float) -> float
+        Returns the fraction [0-1] of an action completed 'elapsed_seconds' after it started.
+    get_distance_travelled(sequence_nr: int, action_progress: float) -> float
+        Returns the distance driven (in meters) given the current action and its progress.
+
+    Example:
+    -------
+    plan = TimingPlan(trip, speed=vehicle.actual_speed, load_time=vehicle.load_time, unload_time=vehicle.unload_time)
+    """
+
+    def __init__(self, trip: 'Trip', speed: float, load_time: float = 0, unload_time: float = 0) -> None:
+        """
+        Initialize a new TimingPlan instance.
+
+        Parameters:
+        ----------
+        trip : Trip
+            The trip to compute the timing plan for.
+        speed : float
+            The speed of the vehicle in m/s.
+        load_time : float, optional
+            The load time (in seconds). Default is 0.
+        unload_time : float, optional
+            The unload time (in seconds). Default is 0.
+        """
+        self.speed: float = speed
+        self.load_time: float = load_time
+        self.unload_time: float = unload_time
+        self.durations: List[float] = []
+        self.offsets: List[float] = []
+        self.distance_offsets: List[float] = [0.0]
+        self.cumulative_distances: List[Optional[List[float]]] = []
+
+        elapsed = 0.0
+        for action in trip.actions:
+            length = 0.0
+            cumulative = None
+            if action.action_type == 'load':
+                duration = load_time
+            elif action.action_type == 'unload':
+                duration = unload_time
+            elif action.action_type == 'move':
+                # NOTE: Assumes action.route.length is in meters
+                length = action.route.length
+                duration = length / speed
+                if action.route.coordinates:
+                    cumulative = get_cumulative_distances(action.route.coordinates)
+            else:
+                duration = action.duration or 0
+            self.offsets.append(elapsed)
+            self.durations.append(duration)
+            self.distance_offsets.append(self.distance_offsets[-1] + length)
+            self.cumulative_distances.append(cumulative)
+            elapsed += duration
+        self.total_duration: float = elapsed
+
+    def __repr__(self) -> str:
+        """
+        Return an unambiguous string representation of the TimingPlan instance.
+
+        Returns:
+        -------
+        str
+            A string representation of the TimingPlan instance.
+        """
+        return f"TimingPlan(actions={len(self.durations)}, total_duration={self.total_duration:.1f})"
+
+    def is_stale(self, speed: float, load_time: float, unload_time: float) -> bool:
+        """
+        Check whether the plan was computed with different vehicle parameters.
+
+        Parameters:
+        ----------
+        speed : float
+            The current speed of the vehicle in m/s.
+        load_time : float
+            The current load time (in seconds).
+        unload_time : float
+            The current unload time (in seconds).
+
+        Returns:
+        -------
+        bool
+            True if the plan needs to be recomputed.
+        """
+        return (speed, load_time, unload_time) != (self.speed, self.load_time, self.unload_time)
+
+    def get_trip_progress(self, elapsed_seconds: float) -> float:
+        """
+        Retrieve the fraction of the trip completed after a given time.
+
+        Parameters:
+        ----------
+        elapsed_seconds : float
+            The time since the start of the trip (in seconds).
+
+        Returns:
+        -------
+        float
+            The progress of the trip between 0 and 1.
+        """
+        if self.total_duration <= 0:
+            return 1
+        return min(max(elapsed_seconds / self.total_duration, 0), 1)
+
+    def get_action_progress(self, sequence_nr: int, elapsed_seconds: float) -> float:
+        """
+        Retrieve the fraction of an action completed after a given time.
+
+        Parameters:
+        ----------
+        sequence_nr : int
+            The sequence number of the action within the trip.
+        elapsed_seconds : float
+            The time since the start of the action (in seconds).
+
+        Returns:
+        -------
+        float
+            The progress of the action between 0 and 1.
+        """
+        duration = self.durations[sequence_nr]
+        if duration <= 0:
+            return 1  # avoid division-by-zero error
+        return min(max(elapsed_seconds / duration, 0), 1)
+
+    def get_distance_travelled(self, sequence_nr: int, action_progress: float) -> float:
+        """
+        Retrieve the distance driven during the trip.
+
+        Parameters:
+        ----------
+        sequence_nr : int
+            The sequence number of the current action.
+        action_progress : float
+            The progress of the current action between 0 and 1.
+
+        Returns:
+        -------
+        float
+            The distance driven (in meters).
+        """
+        start = self.distance_offsets[sequence_nr]
+        return start + (self.distance_offsets[sequence_nr + 1] - start) * action_progress
 
 class Trip:
     """
@@ -1087,6 +1826,8 @@ class Trip:
         A class attribute that stores all instances of Trip.
     _total_instances : int
         A class attribute that stores the total number of Trip instances created.
+    _version : int
+        A class attribute that is incremented whenever a trip is created, modified or deleted.
 
     Instance Attributes:
     ----------
@@ -1110,6 +1851,10 @@ class Trip:
         The Folium.Marker object of the destination of this trip.
     progress : int
         An integer denoting how far the trip is completed [0-100%].
+    timing_plan : TimingPlan
+        The timing plan of the trip, computed when a vehicle is assigned to it.
+    external_id : str, optional
+        The id of the trip in the system it was imported from (e.g., the id of an OTM trip message).
     creation_date : datetime
         The date and time when the trip was created.
     last_modified : datetime
@@ -1127,6 +1872,8 @@ class Trip:
         Retrieve a list of all trip instances.
     get_total_trips() -> int
         Retrieve the total number of trips created.
+    get_version() -> int
+        Retrieve the version of the trip registry.
     delete_all_instances()
         Delete all trip instances.
 
@@ -1150,6 +1897,7 @@ class Trip:
     VALID_TRANSPORT_MODES: List[str] = ['maritime', 'road', 'rail', 'air', 'inlandWaterway']
     _instances: List['Trip'] = []
     _total_instances: int = 0
+    _version: int = 0
 
     def __init__(self,
                  name: str = "",
@@ -1160,7 +1908,8 @@ class Trip:
                  actors: Optional[List['Actor']] = None,
                  actions: Optional[List['Action']] = None,
                  constraint: Optional['Constraint'] = None,
-                 progress: int = 0) -> None:
+                 progress: int = 0,
+                 external_id: Optional[str] = None) -> None:
         """
         Initialize a new Trip instance.
 
@@ -1184,6 +1933,8 @@ class Trip:
             The constraint associated with this trip. Default is None.
         progress : int, optional
             An integer denoting how far the trip is completed [0-100%]. Default is 0.
+        external_id : str, optional
+            The id of the trip in the system it was imported from. Default is None.
 
         Raises:
         ------
@@ -1203,14 +1954,28 @@ class Trip:
         self.actors: List['Actor'] = actors if actors is not None else []
         self.actions: List['Action'] = actions if actions is not None else []
         self.constraint: Optional['Constraint'] = constraint
-        self.creation_date: datetime = datetime.now()
-        self.last_modified: datetime = datetime.now()
+        self.creation_date: datetime = clock.now()
+        self.last_modified: datetime = clock.now()
 
         self.marker: Optional[Marker] = marker
         self.progress: int = progress
+        self.timing_plan: Optional['TimingPlan'] = None
+        self.external_id: Optional[str] = external_id
 
         Trip._instances.append(self)  # Add the new instance to the list of instances
         Trip._total_instances += 1  # Increment the total instances counter
+        self._mark_modified()
+        if events.recorders:
+            events.record(self, events.CREATE, ())
+
+    def _mark_modified(self) -> None:
+        """
+        Increment the registry version and record it as the revision of this trip.
+
+        Views derived from the trips (e.g., the trip table) compare these to only recompute what changed.
+        """
+        Trip._version += 1
+        self._revision: int = Trip._version
 
     def get_actions(self) -> List['Action']:
         """
@@ -1238,7 +2003,10 @@ class Trip:
             True if the action was successfully added.
         """
         self.actions.append(action)
-        self.last_modified = datetime.now()
+        self.last_modified = clock.now()
+        self._mark_modified()
+        if events.recorders:
+            events.record(self, 'add_action', (action,))
         return True
 
     def get_total_route_length(self) -> int:
@@ -1254,9 +2022,9 @@ class Trip:
         """
         route_length = 0
         for ac in self.actions:
-            # Assumes each action has a 'route' attribute with a 'length'
-            # NOTE: Only 'move' actions have a route. If other action types are added, this method requires updating. 
-            route_length += ac.route.length
+            # NOTE: Only 'move' actions have a route ('load' and 'unload' actions take place at a location)
+            if ac.action_type == 'move':
+                route_length += ac.route.length
         return route_length
 
     def update_instance_parameter(self, parameter: str, value: Any) -> None:
@@ -1270,13 +2038,20 @@ class Trip:
         value : any
             The new value for the parameter.
         """
+        previous = getattr(self, parameter, None) if events.subscribers else None
         setattr(self, parameter, value)
-        self.last_modified = datetime.now()
+        self.last_modified = clock.now()
+        self._mark_modified()
 
         if parameter == 'status' and self.vehicle is not None:
             # Also update status in the vehicle's schedule if applicable
             self.vehicle.schedule.loc[self.vehicle.schedule['task_id'] == self.id, 'status'] = value
 
+        if events.subscribers:
+            events.publish(self, parameter, previous, value)
+        if events.recorders:
+            events.record(self, 'update_instance_parameter', (parameter, value))
+
     @classmethod
     def get_by_id(cls, id: str) -> Optional['Trip']:
         """
@@ -1352,6 +2127,21 @@ class Trip:
         """
         return cls._total_instances
 
+    @classmethod
+    def get_version(cls) -> int:
+        """
+        Retrieve the version of the trip registry.
+
+        The version changes whenever a trip is created, modified (through update_instance_parameter,
+        add_action or an assignment to a vehicle) or deleted.
+
+        Returns:
+        -------
+        int
+            The current version.
+        """
+        return cls._version
+
     @classmethod
     def delete_all_instances(cls) -> None:
         """
@@ -1361,6 +2151,9 @@ class Trip:
         """
         cls._instances.clear()
         cls._total_instances = 0
+        cls._version += 1
+        if events.recorders:
+            events.record(cls, 'delete_all_instances')
 
 class Vehicle:
     """
@@ -1368,6 +2161,9 @@ class Vehicle:
 
     Attributes:
     ----------
+    VALID_STATUS : list
+        A class attribute that stores all statuses of a vehicle: the action types, 'idle', 'wait', and 'charging'
+        and 'failed', for which the dispatcher and the replanner consider the vehicle unavailable.
     _instances : list
         A class attribute that stores all instances of Vehicle.
     _total_instances : int
@@ -1407,6 +2203,8 @@ class Vehicle:
         The actions associated with the vehicle.
     marker : Folium.Marker, optional
         The Folium.Marker object for visualization on a map.
+    position : list, optional
+        [latitude, longitude] of the current position of the vehicle.
     status : str
         The current status of the vehicle (e.g., 'idle', 'move', 'wait', 'load', 'unload', 'charging', 'failed').
     average_speed : float
@@ -1433,6 +2231,8 @@ class Vehicle:
         The land use metric (e.g., in m³/hour).
     battery_capacity : float
         The battery capacity of the vehicle.
+    battery_level : float
+        The state of charge of the battery (in %), e.g. measured by a 'battery' sensor.
     energy_consumption_moving : float
         The energy consumption while moving.
     energy_consumption_idling : float
@@ -1468,6 +2268,9 @@ class Vehicle:
     vehicle = Vehicle(name=f"{type} {Vehicle.get_total_vehicles()}", vehicle_type="terminal_tractor")
     """
 
+    VALID_STATUS: List[str] = ['idle', 'move', 'wait', 'load', 'unload', 'charging', 'failed']
+    TIMING_PARAMETERS: List[str] = ['actual_speed', 'load_time', 'unload_time']  # Parameters the timing plans depend on
+
     _instances: list = []
     _total_instances: int = 0
 
@@ -1487,6 +2290,7 @@ class Vehicle:
                  sensors: Optional[list['Sensor']] = None,
                  actions: Optional[list['Action']] = None,
                  marker: Optional['Marker'] = None,
+                 position: Optional[List[float]] = None,
                  status: str = 'idle',
                  load_time: float = 0,
                  unload_time: float = 0,
@@ -1535,6 +2339,8 @@ class Vehicle:
             The actions associated with the vehicle. Default is None.
         marker : Folium.CircleMarker, optional
             The Folium.CircleMarker object for visualization on a map. Default is None.
+        position : list, optional
+            [latitude, longitude] of the initial position of the vehicle. Default is None.
         status : str, optional
             The current status of the vehicle. Default is 'idle'.
         load_time : float, optional
@@ -1566,8 +2372,8 @@ class Vehicle:
         # Core attributes
         self.id: str = str(uuid.uuid4())
         self.name: str = name
-        self.creation_date: datetime = datetime.now()
-        self.last_modified: datetime = datetime.now()
+        self.creation_date: datetime = clock.now()
+        self.last_modified: datetime = clock.now()
         self.vehicle_type: str = vehicle_type
         self.fuel: Optional[str] = fuel
         self.average_fuel_consumption: Optional[float] = average_fuel_consumption
@@ -1586,6 +2392,7 @@ class Vehicle:
         self.average_speed: float = average_speed  # in m/s
         self.actual_speed: float = self.average_speed # initialize as average speed
         self.marker: Optional['Marker'] = marker
+        self.position: Optional[List[float]] = position
         self.status: str = status
         self.load_time: float = load_time
         self.unload_time: float = unload_time
@@ -1594,6 +2401,7 @@ class Vehicle:
         self.noise_pollution: float = noise_pollution
         self.land_use: float = land_use
         self.battery_capacity: float = battery_capacity
+        self.battery_level: float = 100
         self.energy_consumption_moving: float = energy_consumption_moving
         self.energy_consumption_idling: float = energy_consumption_idling
         self.battery_threshold: float = battery_threshold
@@ -1648,7 +2456,7 @@ class Vehicle:
         ])
         # Initialize cumulative statistics with starting values
         start_cum_stats = pd.DataFrame([{
-            'timestamp': datetime.now(),
+            'timestamp': clock.now(),
             'move': 0,
             'idle': 0,
             'load': 0,
@@ -1665,8 +2473,10 @@ class Vehicle:
         # Register the instance
         Vehicle._instances.append(self)
         Vehicle._total_instances += 1
+        if events.recorders:
+            events.record(self, events.CREATE, ())
 
-    def assign_to_trip(self, trip: 'Trip') -> bool:
+    def assign_to_trip(self, trip: 'Trip', start: Optional[datetime] = None) -> bool:
         """
         Assign the vehicle to a trip.
 
@@ -1674,6 +2484,9 @@ class Vehicle:
         ----------
         trip : Trip
             The trip to which the vehicle will be assigned.
+        start : datetime, optional
+            The planned start of the trip (e.g., from a planner). The trip never starts before the
+            vehicle has finished the trips already planned for it. Default is as soon as possible.
 
         Returns:
         -------
@@ -1690,36 +2503,27 @@ class Vehicle:
             raise ValueError("Invalid trip status: must be 'draft' or 'requested'")
         else:
             # Assign the vehicle to the trip
+            previous = trip.status
             trip.vehicle = self
             trip.status = 'requested'
+            trip._mark_modified()
+            if events.subscribers:
+                events.publish(trip, 'status', previous, trip.status)
 
-            # Calculate expected duration based on actions in the trip
-            expected_duration = 0
             for action in trip.actions:
                 if action.action_type == 'load':
                     action.update_instance_parameter('duration', self.load_time)
-                    expected_duration += action.duration
                 elif action.action_type == 'unload':
                     action.update_instance_parameter('duration', self.unload_time)
-                    expected_duration += action.duration
-                elif action.action_type == 'move':
-                    # NOTE: Assumes action.route.length is in meters
-                    expected_duration += action.route.length / self.average_speed
-
-            # Determine start and end times for the trip
-            if self.schedule.empty:
-                start = datetime.now()
-                end = start + timedelta(seconds=expected_duration)
-            elif self.current_trip is not None:
-                start = self.schedule.iloc[-1]['end']
-                end = start + timedelta(seconds=expected_duration)
-            elif self.status not in ['charging', 'failed']:
-                start = datetime.now()
-                end = start + timedelta(seconds=expected_duration)
-            else:
-                # Fallback to current time if none of the conditions match
-                start = datetime.now()
-                end = start + timedelta(seconds=expected_duration)
+
+            # Compute the timing plan once; it provides the expected duration of the trip
+            trip.timing_plan = self.get_timing_plan(trip)
+            expected_duration = trip.timing_plan.total_duration
+
+            # Determine start and end times for the trip: after the trips already planned for this vehicle
+            available = self.get_available_time()
+            start = max(start, available) if start is not None else available
+            end = start + timedelta(seconds=expected_duration)
 
             # Create a new task and add it to the schedule
             new_task = pd.DataFrame([{
@@ -1731,9 +2535,112 @@ class Vehicle:
                 'status': trip.status
             }])
             self.schedule = pd.concat([self.schedule, new_task], ignore_index=True)
-            self.last_modified = datetime.now()
+            self.last_modified = clock.now()
+            if events.recorders:
+                events.record(self, 'assign_to_trip', (trip, start))
             return True
 
+    def unassign_trip(self, trip: 'Trip') -> bool:
+        """
+        Remove a trip that has not started yet from the vehicle and its schedule.
+
+        The trip becomes a 'draft' trip again, so it can be re-planned (e.g., by a re-planner).
+
+        Parameters:
+        ----------
+        trip : Trip
+            The trip to remove.
+
+        Returns:
+        -------
+        bool
+            True if the trip was removed.
+
+        Raises:
+        ------
+        ValueError:
+            If the trip is not assigned to this vehicle or its status is not 'requested'.
+        """
+        if trip.vehicle is not self or trip.status != 'requested':
+            raise ValueError(f"Can only unassign trips with status 'requested' assigned to vehicle {self.name}")
+        self.schedule = self.schedule[self.schedule['task_id'] != trip.id].reset_index(drop=True)
+        trip.vehicle = None
+        trip.status = 'draft'
+        trip.timing_plan = None
+        trip._mark_modified()
+        if events.subscribers:
+            events.publish(trip, 'status', 'requested', trip.status)
+        self.last_modified = clock.now()
+        if events.recorders:
+            events.record(self, 'unassign_trip', (trip,))
+        return True
+
+    def update_planned_end(self, trip: 'Trip', end: datetime) -> None:
+        """
+        Update the planned end of a trip in the schedule of the vehicle (e.g., the expected end of a running trip).
+
+        Parameters:
+        ----------
+        trip : Trip
+            The trip in the schedule.
+        end : datetime
+            The new planned end.
+
+        Raises:
+        ------
+        ValueError:
+            If the trip is not in the schedule of the vehicle.
+        """
+        rows = self.schedule['task_id'] == trip.id
+        if not rows.any():
+            raise ValueError(f"Could not find trip_id {trip.id} in the schedule of vehicle {self.name}")
+        self.schedule.loc[rows, 'end'] = end
+        self.last_modified = clock.now()
+        if events.recorders:
+            events.record(self, 'update_planned_end', (trip, end))
+
+    def get_available_time(self, exclude: Optional[Collection[str]] = None) -> datetime:
+        """
+        Retrieve the time at which the vehicle has finished all trips planned for it.
+
+        Parameters:
+        ----------
+        exclude : collection of str, optional
+            The ids of planned trips to ignore (e.g., trips that are being re-planned). Defaults to None.
+
+        Returns:
+        -------
+        datetime
+            The planned end of the last trip in the schedule that is not completed or cancelled,
+            or the current time if that is later (or if there is no such trip).
+        """
+        now = clock.now()
+        if self.schedule.empty:
+            return now
+        pending = ~self.schedule['status'].isin(['completed', 'cancelled'])
+        if exclude:
+            pending &= ~self.schedule['task_id'].isin(list(exclude))
+        pending = self.schedule.loc[pending, 'end']
+        if pending.empty:
+            return now
+        return max(now, pd.Timestamp(pending.max()).to_pydatetime())
+
+    def get_timing_plan(self, trip: 'Trip') -> 'TimingPlan':
+        """
+        Compute the timing plan of a trip executed by this vehicle.
+
+        Parameters:
+        ----------
+        trip : Trip
+            The trip to compute the timing plan for.
+
+        Returns:
+        -------
+        TimingPlan
+            The timing plan based on the vehicle's actual speed and (un)load times.
+        """
+        return TimingPlan(trip, speed=self.actual_speed, load_time=self.load_time, unload_time=self.unload_time)
+
     def get_start_time_trip(self, trip_id: str) -> 'datetime':
         """
         Retrieve the start time for a given trip from the vehicle's schedule.
@@ -1770,8 +2677,21 @@ class Vehicle:
         value : any
             The new value for the parameter.
         """
+        previous = getattr(self, parameter, None) if events.subscribers else None
+        refresh_plans = parameter in Vehicle.TIMING_PARAMETERS and getattr(self, parameter, None) != value
         setattr(self, parameter, value)
-        self.last_modified = datetime.now()
+        self.last_modified = clock.now()
+
+        if refresh_plans:
+            # Refresh the timing plans of trips this vehicle has not yet completed
+            for trip in Trip._instances:
+                if trip.vehicle is self and trip.status in ['requested', 'in_transit']:
+                    trip.timing_plan = self.get_timing_plan(trip)
+
+        if events.subscribers:
+            events.publish(self, parameter, previous, value)
+        if events.recorders:
+            events.record(self, 'update_instance_parameter', (parameter, value))
 
     @classmethod
     def get_by_id(cls, id: str) -> Optional['Vehicle']:
@@ -1836,6 +2756,8 @@ class Vehicle:
         """
         if len(cls._instances) >= number:
             cls._instances = cls._instances[:-number]
+            if events.recorders:
+                events.record(cls, 'delete_last_x', (number,))
             return True
         else:
             return False
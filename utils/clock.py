@@ -0,0 +1,190 @@
+"""
+Module providing the simulation clock that the whole model reads the current time through.
+
+All entities (Action, Trip, Vehicle, ...) and the simulation functions in utils.entities
+and utils.stats call now() instead of datetime.now(). The active clock is process-wide
+(like the instance registries of the classes in utils.classes) and can be swapped:
+
+- WallClock: real time (default).
+- ScaledClock: real time running 'factor' times faster, e.g. 10x or 100x for what-if runs.
+- SteppedClock: advances a fixed step on every tick(), independent of real time.
+- VirtualClock: only moves when set() or advance() is called, e.g. for deterministic tests.
+"""
+
+import time
+
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import Optional, Union
+
+
+class Clock(ABC):
+    """
+    Abstract base class of all clocks.
+
+    Methods:
+    -------
+    now() -> datetime
+        Return the current (simulation) time.
+    tick() -> None
+        Called once per simulation step. No-op unless the clock is step-driven.
+    """
+
+    @abstractmethod
+    def now(self) -> datetime:
+        pass
+
+    def tick(self) -> None:
+        pass
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(now={self.now()})"
+
+
+class WallClock(Clock):
+    """
+    A clock returning the real (wall) time.
+    """
+
+    def now(self) -> datetime:
+        return datetime.now()
+
+
+class ScaledClock(Clock):
+    """
+    A clock running 'factor' times as fast as real time.
+
+    Parameters:
+    ----------
+    factor : float, optional
+        The real-time factor, e.g. 10 runs the model ten times faster. Default is 1.
+    start : datetime, optional
+        The simulation time at creation. Default is the current wall time.
+    """
+
+    def __init__(self, factor: float = 1, start: Optional[datetime] = None) -> None:
+        if factor <= 0:
+            raise ValueError(f"Real-time factor must be positive, got {factor}")
+        self.factor: float = factor
+        self._wall_anchor: float = time.monotonic()
+        self._sim_anchor: datetime = start if start is not None else datetime.now()
+
+    def now(self) -> datetime:
+        return self._sim_anchor + timedelta(seconds=(time.monotonic() - self._wall_anchor) * self.factor)
+
+    def set_factor(self, factor: float) -> None:
+        """
+        Change the real-time factor without a jump in simulation time.
+
+        Parameters:
+        ----------
+        factor : float
+            The new real-time factor.
+        """
+        if factor <= 0:
+            raise ValueError(f"Real-time factor must be positive, got {factor}")
+        self._sim_anchor = self.now()
+        self._wall_anchor = time.monotonic()
+        self.factor = factor
+
+    def set(self, value: datetime) -> None:
+        """
+        Set the simulation time; it keeps running at the same factor from there.
+        """
+        self._sim_anchor = value
+        self._wall_anchor = time.monotonic()
+
+
+class SteppedClock(Clock):
+    """
+    A clock advancing a fixed amount of simulation time on every tick().
+
+    Parameters:
+    ----------
+    step : float or timedelta, optional
+        The simulation time added per tick (seconds if a number). Default is 1 second.
+    start : datetime, optional
+        The simulation time at creation. Default is the current wall time.
+    """
+
+    def __init__(self, step: Union[float, timedelta] = 1, start: Optional[datetime] = None) -> None:
+        self.step: timedelta = step if isinstance(step, timedelta) else timedelta(seconds=step)
+        self._now: datetime = start if start is not None else datetime.now()
+
+    def now(self) -> datetime:
+        return self._now
+
+    def tick(self) -> None:
+        self._now += self.step
+
+    def set(self, value: datetime) -> None:
+        """
+        Set the simulation time.
+        """
+        self._now = value
+
+
+class VirtualClock(Clock):
+    """
+    A clock that only moves when told to.
+
+    Parameters:
+    ----------
+    start : datetime, optional
+        The simulation time at creation. Default is the current wall time.
+    """
+
+    def __init__(self, start: Optional[datetime] = None) -> None:
+        self._now: datetime = start if start is not None else datetime.now()
+
+    def now(self) -> datetime:
+        return self._now
+
+    def set(self, value: datetime) -> None:
+        """
+        Set the simulation time.
+        """
+        self._now = value
+
+    def advance(self, seconds: Union[float, timedelta]) -> None:
+        """
+        Move the simulation time forward.
+        """
+        self._now += seconds if isinstance(seconds, timedelta) else timedelta(seconds=seconds)
+
+
+_clock: Clock = WallClock()
+
+
+def get_clock() -> Clock:
+    """
+    Return the active clock.
+    """
+    return _clock
+
+
+def set_clock(clock: Clock) -> Clock:
+    """
+    Replace the active clock and return the previous one.
+
+    Parameters:
+    ----------
+    clock : Clock
+        The clock the model should read the time from.
+
+    Returns:
+    -------
+    Clock
+        The previously active clock.
+    """
+    global _clock
+    previous = _clock
+    _clock = clock
+    return previous
+
+
+def now() -> datetime:
+    """
+    Return the current time of the active clock. Use this instead of datetime.now() in the model.
+    """
+    return _clock.now()
@@ -0,0 +1,277 @@
+"""
+Module for checking whether vehicles can execute a trip under its constraints.
+
+The constraints of a trip are its own constraint (applying to the whole trip), the constraints
+of its actions (applying to that action) and the constraints of the locations it visits (applying
+when the vehicle departs from or arrives at the location, or for the whole (un)load action at it).
+
+check_feasibility() tests one trip against all vehicles in a single vectorized pass: the
+offsets of all actions for all vehicles form an (actions x vehicles) matrix, the vehicles'
+available times are read from one concatenation of their schedules, and the vehicle type,
+capacity and time window checks are array operations. Dispatch and insertion heuristics use it
+to screen candidate vehicles before evaluating them in detail.
+"""
+
+import math
+import numpy as np
+import pandas as pd
+
+from datetime import datetime
+from typing import List, Optional, Sequence, Tuple
+
+from utils import clock
+from utils.classes import Constraint, Trip, Vehicle
+
+
+def get_capacity(vehicle: Vehicle) -> float:
+    """
+    Get the load capacity of a vehicle as a number.
+
+    Parameters
+    ----------
+    vehicle : Vehicle
+        The vehicle.
+
+    Returns
+    -------
+    float
+        The load capacity; the largest capacity if 'load_capacities' is a dict, infinity if unknown.
+    """
+    capacities = vehicle.load_capacities
+    if isinstance(capacities, dict):
+        values = [value for value in capacities.values() if isinstance(value, (int, float))]
+        return float(max(values)) if values else math.inf
+    return float(capacities) if capacities is not None else math.inf
+
+
+def get_constraints(trip: Trip, include_preference: bool = False) -> List[Tuple[Constraint, Optional[int], str]]:
+    """
+    Collect the constraints that apply to a trip.
+
+    Parameters
+    ----------
+    trip : Trip
+        The trip.
+    include_preference : bool, optional
+        Also return 'preference' constraints. Default is False (only 'enforced' constraints).
+
+    Returns
+    -------
+    list
+        (constraint, action index, point) tuples. The action index is None for the constraint of the
+        trip itself; point tells whether a time window applies to the whole action ('action'), its
+        start ('start') or its end ('end').
+    """
+    constraints = []
+    if trip.constraint is not None:
+        constraints.append((trip.constraint, None, 'action'))
+    for a, action in enumerate(trip.actions):
+        if action.constraint is not None:
+            constraints.append((action.constraint, a, 'action'))
+        if action.location is not None and action.location.constraint is not None:
+            constraints.append((action.location.constraint, a, 'action'))
+        if action._from is not None and action._from.constraint is not None:
+            constraints.append((action._from.constraint, a, 'start'))
+        if action._to is not None and action._to.constraint is not None:
+            constraints.append((action._to.constraint, a, 'end'))
+    return [c for c in constraints if include_preference or getattr(c[0], 'enforceability', 'enforced') == 'enforced']
+
+
+def get_available_times(vehicles: Sequence[Vehicle], now: Optional[datetime] = None) -> np.ndarray:
+    """
+    Get the time at which each vehicle has finished its planned trips, from one pass over all schedules.
+
+    Parameters
+    ----------
+    vehicles : list of Vehicle
+        The vehicles.
+    now : datetime, optional
+        The current time. Default is clock.now().
+
+    Returns
+    -------
+    numpy.ndarray
+        Seconds from now until each vehicle is available (0 if it is available now).
+    """
+    now = now if now is not None else clock.now()
+    available = np.zeros(len(vehicles))
+    schedules = [vehicle.schedule for vehicle in vehicles]
+    if not any(len(schedule) for schedule in schedules):
+        return available
+    schedules = pd.concat(schedules, keys=range(len(vehicles)), names=['index', None])
+    pending = schedules.loc[~schedules['status'].isin(['completed', 'cancelled']), 'end']
+    if not pending.empty:
+        ends = pd.to_datetime(pending).groupby(level='index').max()
+        available[ends.index.to_numpy()] = np.maximum((ends - pd.Timestamp(now)).dt.total_seconds().to_numpy(), 0.0)
+    return available
+
+
+def get_compatible_vehicles(trip: Trip,
+                            vehicles: Sequence[Vehicle],
+                            include_preference: bool = False,
+                            constraints: Optional[List[Tuple[Constraint, Optional[int], str]]] = None) -> np.ndarray:
+    """
+    Check for all vehicles at once whether their type and capacity meet the constraints of a trip.
+
+    Parameters
+    ----------
+    trip : Trip
+        The trip to check.
+    vehicles : list of Vehicle
+        The candidate vehicles.
+    include_preference : bool, optional
+        Also treat 'preference' constraints as hard constraints. Default is False.
+    constraints : list, optional
+        The constraints of the trip, see get_constraints(). Default is collected from the trip.
+
+    Returns
+    -------
+    numpy.ndarray
+        A boolean mask over the vehicles.
+    """
+    constraints = constraints if constraints is not None else get_constraints(trip, include_preference)
+    compatible = np.ones(len(vehicles), dtype=bool)
+    capacities = None
+    for constraint, _, _ in constraints:
+        vehicle_types = getattr(constraint, 'vehicle_types', None)
+        if vehicle_types is not None:
+            compatible &= np.array([vehicle.vehicle_type in vehicle_types for vehicle in vehicles], dtype=bool)
+        capacity = getattr(constraint, 'capacity', None)
+        if capacity is not None:
+            if capacities is None:
+                capacities = np.array([get_capacity(vehicle) for vehicle in vehicles], dtype=float)
+            compatible &= capacities >= capacity
+    return compatible
+
+
+def get_action_offsets(trip: Trip, vehicles: Sequence[Vehicle]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Compute when every action of a trip starts and ends, from the start of the trip, for all vehicles at once.
+
+    Parameters
+    ----------
+    trip : Trip
+        The trip.
+    vehicles : list of Vehicle
+        The vehicles.
+
+    Returns
+    -------
+    tuple of numpy.ndarray
+        (offsets, ends, total): the (actions x vehicles) start and end offsets of the actions in seconds
+        (see TimingPlan), and the duration of the trip per vehicle.
+    """
+    # Vehicle parameters as arrays
+    speed = np.array([vehicle.actual_speed or 0.0 for vehicle in vehicles], dtype=float)
+    load_time = np.array([vehicle.load_time or 0.0 for vehicle in vehicles], dtype=float)
+    unload_time = np.array([vehicle.unload_time or 0.0 for vehicle in vehicles], dtype=float)
+
+    # Action parameters as arrays: route length, (un)load indicator and other fixed duration
+    length = np.array([action.route.length if action.action_type == 'move' else 0.0 for action in trip.actions], dtype=float)
+    is_load = np.array([action.action_type == 'load' for action in trip.actions], dtype=float)
+    is_unload = np.array([action.action_type == 'unload' for action in trip.actions], dtype=float)
+    other = np.array([(action.duration or 0.0) if action.action_type not in ['move', 'load', 'unload'] else 0.0
+                      for action in trip.actions], dtype=float)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        driving = np.where(length[:, None] > 0, length[:, None] / speed[None, :], 0.0)
+    durations = driving + is_load[:, None] * load_time[None, :] + is_unload[:, None] * unload_time[None, :] + other[:, None]
+    ends = np.cumsum(durations, axis=0)
+    offsets = ends - durations
+    total = ends[-1] if len(trip.actions) else np.zeros(len(vehicles))
+    return offsets, ends, total
+
+
+def get_start_window(trip: Trip,
+                     vehicles: Sequence[Vehicle],
+                     constraints: List[Tuple[Constraint, Optional[int], str]],
+                     now: Optional[datetime] = None,
+                     action_offsets: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Translate the time windows of constraints into the window in which each vehicle must start the trip.
+
+    Parameters
+    ----------
+    trip : Trip
+        The trip.
+    vehicles : list of Vehicle
+        The vehicles.
+    constraints : list
+        The constraints to meet, see get_constraints().
+    now : datetime, optional
+        The current time. Default is clock.now().
+    action_offsets : tuple, optional
+        The result of get_action_offsets(). Default is computed from the trip.
+
+    Returns
+    -------
+    tuple of numpy.ndarray
+        (earliest, latest): per vehicle, the earliest start (seconds from now, -inf without start times)
+        such that no window is entered before it opens, and the latest start (inf without end times)
+        such that every window is left before it closes.
+    """
+    now = now if now is not None else clock.now()
+    offsets, ends, total = action_offsets if action_offsets is not None else get_action_offsets(trip, vehicles)
+    earliest = np.full(len(vehicles), -math.inf)
+    latest = np.full(len(vehicles), math.inf)
+    for constraint, a, point in constraints:
+        start_time, end_time = getattr(constraint, 'start_time', None), getattr(constraint, 'end_time', None)
+        if start_time is None and end_time is None:
+            continue
+        # Offsets (from the start of the trip) at which the window is entered and left
+        if a is None:
+            enter, leave = np.zeros(len(vehicles)), total
+        else:
+            enter = ends[a] if point == 'end' else offsets[a]
+            leave = offsets[a] if point == 'start' else ends[a]
+        if start_time is not None:
+            earliest = np.maximum(earliest, (start_time - now).total_seconds() - enter)
+        if end_time is not None:
+            latest = np.minimum(latest, (end_time - now).total_seconds() - leave)
+    return earliest, latest
+
+
+def check_feasibility(trip: Trip,
+                      vehicles: Optional[Sequence[Vehicle]] = None,
+                      available: Optional[np.ndarray] = None,
+                      include_preference: bool = False) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Check for all vehicles at once whether they can execute a trip after their planned trips.
+
+    A vehicle is feasible if its type and capacity meet the constraints and it can start the trip
+    (after it is available, waiting if a time window has not opened yet) such that every action
+    meets its time windows. The trip is executed as planned by Vehicle.assign_to_trip, i.e., without
+    waiting once started.
+
+    Parameters
+    ----------
+    trip : Trip
+        The trip to check.
+    vehicles : list of Vehicle, optional
+        The candidate vehicles. Default is all vehicles.
+    available : numpy.ndarray, optional
+        Seconds from now until each vehicle is available. Default is read from the vehicles' schedules.
+    include_preference : bool, optional
+        Also treat 'preference' constraints as hard constraints. Default is False.
+
+    Returns
+    -------
+    tuple of numpy.ndarray
+        (feasible, start, end): a boolean mask over the vehicles and the earliest start and
+        corresponding end (datetime64) of the trip per vehicle.
+    """
+    now = clock.now()
+    vehicles = list(vehicles) if vehicles is not None else Vehicle.get_all_vehicles()
+    available = np.asarray(available, dtype=float) if available is not None else get_available_times(vehicles, now)
+
+    action_offsets = get_action_offsets(trip, vehicles)
+    total = action_offsets[2]
+    constraints = get_constraints(trip, include_preference)
+    feasible = np.isfinite(total) & get_compatible_vehicles(trip, vehicles, include_preference, constraints)
+    window_start, window_end = get_start_window(trip, vehicles, constraints, now, action_offsets)
+    earliest = np.maximum(available, window_start)
+    feasible &= earliest <= window_end
+
+    start = np.datetime64(now, 'us') + np.round(np.where(np.isfinite(earliest), earliest, 0.0) * 1e6).astype('timedelta64[us]')
+    end = start + np.round(np.where(np.isfinite(total), total, 0.0) * 1e6).astype('timedelta64[us]')
+    return feasible, start, end
@@ -0,0 +1,198 @@
+"""
+Module for dispatching draft trips to vehicles automatically.
+
+Draft trips are popped from a priority queue and each is assigned to the vehicle that
+becomes available earliest, taken from a min-heap of vehicle free times. Every decision
+costs O(log V) for V vehicles; the assignment itself is written through
+Vehicle.assign_to_trip, so schedules, timing plans and statistics work as for trips
+planned by hand. Trips with enforced constraints (time windows, vehicle types, capacities)
+are screened against all vehicles in one vectorized feasibility check instead, and go to the
+feasible vehicle that can start them earliest; trips no vehicle can execute remain drafts.
+
+Requested trips passed explicitly are re-dispatched: they are planned as drafts (their own slot
+does not delay their vehicle) and only leave their vehicle once a new one is found, see reassign().
+"""
+
+import heapq
+import itertools
+import pandas as pd
+
+from datetime import datetime, timedelta
+from typing import Any, Callable, List, Optional, Tuple
+
+from utils import clock
+from utils.classes import Trip, Vehicle
+from utils.constraints import check_feasibility, get_constraints
+
+UNAVAILABLE_STATUS: List[str] = ['charging', 'failed']  # Vehicle.VALID_STATUS that take a vehicle out of service
+
+
+def reassign(trip: Trip, vehicle: Vehicle, start: Optional[datetime] = None) -> None:
+    """
+    Assign a draft trip to a vehicle, or move a requested trip to a (new) vehicle.
+
+    A requested trip is unassigned from its vehicle just before the new assignment. If that raises,
+    the previous assignment is restored (at its previous start, or after the trips planned for the
+    vehicle since) and the error is raised again.
+
+    Parameters:
+    ----------
+    trip : Trip
+        The trip, with status 'draft' or 'requested'.
+    vehicle : Vehicle
+        The vehicle that executes the trip.
+    start : datetime, optional
+        The planned start of the trip. Default is as soon as possible.
+    """
+    previous = trip.vehicle if trip.status == 'requested' else None
+    if previous is None:
+        vehicle.assign_to_trip(trip, start=start)
+        return
+    previous_start = pd.Timestamp(previous.get_start_time_trip(trip.id)).to_pydatetime()
+    previous.unassign_trip(trip)
+    try:
+        vehicle.assign_to_trip(trip, start=start)
+    except Exception:
+        if trip.vehicle is not None and trip.status == 'requested':
+            trip.vehicle.unassign_trip(trip)  # Undo a partial assignment
+        previous.assign_to_trip(trip, start=previous_start)
+        raise
+
+
+def get_default_priority(trip: Trip) -> Tuple[Any, ...]:
+    """
+    Order trips first-come, first-served (by creation date).
+    """
+    return (trip.creation_date,)
+
+
+class Dispatcher:
+    """
+    Assigns draft trips to the earliest available vehicles.
+
+    Instance Attributes:
+    ----------
+    priority : callable
+        Maps a trip to a sortable key; trips with the lowest key are dispatched first.
+    vehicle_type : str, optional
+        Only dispatch to vehicles of this type (default is all vehicles).
+
+    Methods:
+    -------
+    plan(trips=None, vehicles=None) -> list
+        Decide the (trip, vehicle, start) assignments without changing the model.
+    dispatch(trips=None, vehicles=None) -> list
+        Decide the assignments and write them through Vehicle.assign_to_trip.
+    """
+
+    def __init__(self, priority: Optional[Callable[[Trip], Any]] = None, vehicle_type: Optional[str] = None) -> None:
+        """
+        Initialize a new Dispatcher.
+
+        Parameters:
+        ----------
+        priority : callable, optional
+            Maps a trip to a sortable key; trips with the lowest key are dispatched first.
+            Default is get_default_priority (first-come, first-served).
+        vehicle_type : str, optional
+            Only dispatch to vehicles of this type. Default is None (all vehicles).
+        """
+        self.priority: Callable[[Trip], Any] = priority if priority is not None else get_default_priority
+        self.vehicle_type: Optional[str] = vehicle_type
+
+    def _get_vehicles(self, vehicles: Optional[List[Vehicle]]) -> List[Vehicle]:
+        """
+        Return the vehicles that can be dispatched to.
+        """
+        if vehicles is None:
+            vehicles = Vehicle.get_by_type(self.vehicle_type) if self.vehicle_type is not None else Vehicle.get_all_vehicles()
+        return [vehicle for vehicle in vehicles if vehicle.status not in UNAVAILABLE_STATUS]
+
+    def _decide(self, trips: Optional[List[Trip]], vehicles: Optional[List[Vehicle]], assign: bool) -> List[Tuple[Trip, Vehicle, datetime]]:
+        """
+        Pop the trips in priority order and give each to the vehicle at the top of the free-time heap.
+        """
+        if trips is None:
+            trips = Trip.get_by_status('draft')
+        vehicles = self._get_vehicles(vehicles)
+        if not trips or not vehicles:
+            return []
+
+        # Trip queue ordered by (priority, registry order); the counter keeps equal priorities stable
+        order = itertools.count()
+        trip_heap = [(self.priority(trip), next(order), trip) for trip in trips if trip.status in ['draft', 'requested'] and trip.actions]
+        heapq.heapify(trip_heap)
+
+        # Vehicle heap ordered by (free time, index); built once in O(V). Entries whose free time
+        # differs from free_at[i] are outdated (the vehicle got a constrained trip) and skipped.
+        # Requested trips that are re-dispatched do not delay their current vehicle.
+        redispatched = {trip.id for _, _, trip in trip_heap if trip.status == 'requested'}
+        free_at = [vehicle.get_available_time(exclude=redispatched) for vehicle in vehicles]
+        vehicle_heap = [(free_at[i], i, vehicle) for i, vehicle in enumerate(vehicles)]
+        heapq.heapify(vehicle_heap)
+
+        decisions = []
+        while trip_heap:
+            _, _, trip = heapq.heappop(trip_heap)
+            while vehicle_heap[0][0] != free_at[vehicle_heap[0][1]]:
+                heapq.heappop(vehicle_heap)
+            if get_constraints(trip):
+                # Screen all vehicles at once; take the feasible vehicle that can start earliest
+                now = clock.now()
+                feasible, starts, _ = check_feasibility(trip, vehicles, available=[max((t - now).total_seconds(), 0.0) for t in free_at])
+                if not feasible.any():
+                    continue
+                i = min(feasible.nonzero()[0], key=lambda i: (starts[i], i))
+                start, vehicle = pd.Timestamp(starts[i]).to_pydatetime(), vehicles[i]
+            else:
+                start, i, vehicle = vehicle_heap[0]
+            if assign:
+                reassign(trip, vehicle, start=start)
+                end = trip.timing_plan.total_duration
+            else:
+                end = vehicle.get_timing_plan(trip).total_duration
+            decisions.append((trip, vehicle, start))
+            free_at[i] = start + timedelta(seconds=end)
+            if vehicle_heap[0][1] == i:
+                heapq.heapreplace(vehicle_heap, (free_at[i], i, vehicle))
+            else:
+                heapq.heappush(vehicle_heap, (free_at[i], i, vehicle))
+        return decisions
+
+    def plan(self, trips: Optional[List[Trip]] = None, vehicles: Optional[List[Vehicle]] = None) -> List[Tuple[Trip, Vehicle, datetime]]:
+        """
+        Decide which vehicle executes each draft trip, without changing the model.
+
+        Parameters:
+        ----------
+        trips : list, optional
+            The trips to dispatch. Default is all trips with status 'draft'; requested trips in the list
+            are re-dispatched.
+        vehicles : list, optional
+            The candidate vehicles. Default is all vehicles (of 'vehicle_type') that are not charging or failed.
+
+        Returns:
+        -------
+        list
+            The (trip, vehicle, planned start) decisions, in dispatch order.
+        """
+        return self._decide(trips, vehicles, assign=False)
+
+    def dispatch(self, trips: Optional[List[Trip]] = None, vehicles: Optional[List[Vehicle]] = None) -> List[Tuple[Trip, Vehicle, datetime]]:
+        """
+        Assign each draft trip to the vehicle that becomes available earliest.
+
+        Parameters:
+        ----------
+        trips : list, optional
+            The trips to dispatch. Default is all trips with status 'draft'; requested trips in the list
+            are re-dispatched, and keep their vehicle if no vehicle can execute them.
+        vehicles : list, optional
+            The candidate vehicles. Default is all vehicles (of 'vehicle_type') that are not charging or failed.
+
+        Returns:
+        -------
+        list
+            The (trip, vehicle, planned start) assignments, in dispatch order.
+        """
+        return self._decide(trips, vehicles, assign=True)
@@ -1,7 +1,9 @@
 from utils.classes import Location, Trip, Actor, Route, Action, Vehicle
 from utils.osmnx import get_shortest_path, get_route_length, get_coordinates, get_interpolated_position
 from utils.osm import create_custom_icon
-from folium import Marker, PolyLine, CircleMarker, CustomIcon
+from utils.excel import read_excel
+from utils import clock
+from folium import Marker, PolyLine, CircleMarker
 import pandas as pd
 import random
 from datetime import datetime
@@ -30,10 +32,10 @@ def create_actor(location,name=f"Actor {Actor.get_total_actors()}"):
     actor = Actor(location,name=name)
 
     # Link Actor to Location
-    location.actors = [actor]
+    location.update_instance_parameter('actors', [actor])
 
     # Link Location to Actor (NOTE: Currently one Location per Actor)
-    actor.locations = [location]
+    actor.update_instance_parameter('locations', [location])
 
     return [actor]
 
@@ -48,22 +50,17 @@ def create_route(actors,graph,origin,destination):
     # Get coordinates of nodes in route
     coordinates = get_coordinates(graph,nodes)
 
-    # Create Polyline between origin and destination
-    line = PolyLine(
-            locations=coordinates,
-            color="#DC143C",
-            weight=5,
-            tooltip=f"{origin.name} to {destination.name}") 
-    
     # Create instance of Route Class
     route = Route(name=f"{origin.name} to {destination.name}",
                   georeference=coordinates,
                   actors=actors,
                   length=length_in_meters,
                   nodes=nodes,
-                  polyline=line,
                   coordinates=coordinates)
-    
+
+    # Create Polyline between origin and destination
+    get_route_polyline(route)
+
     return route
 
 def create_action(origin=None,destination=None,duration=None,location=None,sequence_nr=None,route=None,trip=None,constraint=None, action_type='move'):
@@ -130,24 +127,13 @@ def create_vehicles(num_vehicles, type, average_speed=(15.0/3.6), load_time=0, u
                 # Get all Tractor Parkings
                 tractor_parkings = Location.get_by_type('tractor_parking')
 
-                # Create a custom icon
-                icon_path = 'images/terminal_tractor.png'
-                icon_width = 50
-                custom_icon = CustomIcon(icon_image=icon_path, icon_size=(icon_width, icon_width/2.3))
-                
-                # Create Marker using the next available tractor parking
+                # Create instance of Vehicle class at the next available tractor parking
                 # Updated index: num_terminal_tractors + i ensures that if there are zero tractors,
                 # the first element (index 0) is used.
-                vehicle_marker = Marker(
-                    icon=custom_icon,
-                    location=tractor_parkings[num_terminal_tractors + i].georeference,
-                    popup=f"{type} {Vehicle.get_total_vehicles()}",
-                )               
-
-                # Create instance of Vehicle class
+                # NOTE: Vehicles are drawn by the vehicle layer (see create_vehicle_layer() in utils/osm.py)
                 Vehicle(name=f"{type} {Vehicle.get_total_vehicles()}",
                         vehicle_type=type,
-                        marker=vehicle_marker,
+                        position=list(tractor_parkings[num_terminal_tractors + i].georeference),
                         average_speed=average_speed)
         elif num_terminal_tractors > num_vehicles:
             response = Vehicle.delete_last_x(num_terminal_tractors - num_vehicles)
@@ -161,38 +147,111 @@ def create_vehicles(num_vehicles, type, average_speed=(15.0/3.6), load_time=0, u
 
         return Vehicle.get_all_vehicles()
     
-def get_trips(filter=None):
-    #TODO: implement filter (e.g., based on status of trip)
-    trip_list = []
-    for trip in Trip.get_all_trips():
-        if trip.vehicle is not None:
-            vehicle = trip.vehicle.name
-        else:
-            vehicle = trip.vehicle
+class TripTable:
+    """
+    A table view of all trips, kept up to date incrementally.
 
+    Rows are cached per trip and only rebuilt for trips whose revision changed since the
+    last refresh (see Trip._mark_modified), and only the columns with changed values are
+    rebuilt; nothing is recomputed while the trip registry version is unchanged. Display
+    objects (polylines, markers) are not part of the table, use the Trip instance
+    (Trip.get_by_id) for those.
+    """
+
+    COLUMNS = ["name", "creation_date", "status", "from", "to", "vehicle", "length", "progress", "id"]
+
+    def __init__(self):
+        self._version = None
+        self._ids = []
+        self._rows = []
+        self._frame = pd.DataFrame(columns=TripTable.COLUMNS)
+
+    @staticmethod
+    def get_row(trip):
+        """
+        Build the table row of a single trip.
+        """
         # Get length of all 'move' actions
         length = 0
         for action in trip.actions:
             if action.action_type == 'move':
                 length += action.route.length
 
-        trip_dict = {
-            "name": trip.name,
-            "creation_date": trip.creation_date,
-            "status": trip.status,
-            "from": [trip.actions[0]._from.name],
-            "to": [trip.actions[0]._to.name],
-            "vehicle": vehicle,
-            "length": length,
-            "progress": trip.progress,
-            "id": trip.id,
-            "polyline": trip.actions[0].route.polyline, #Hardcode
-            "marker" : trip.marker,
-        }
-        # Add dictionary to list
-        trip_list.append(trip_dict)
+        return (
+            trip.name,
+            trip.creation_date,
+            trip.status,
+            [trip.actions[0]._from.name],
+            [trip.actions[0]._to.name],
+            trip.vehicle.name if trip.vehicle is not None else None,
+            length,
+            trip.progress,
+            trip.id,
+        )
+
+    def refresh(self):
+        """
+        Bring the table up to date with the trip registry and return it.
+
+        Returns:
+        - pd.DataFrame: One row per trip, in order of creation.
+        """
+        version = Trip.get_version()
+        if version == self._version:
+            return self._frame
+
+        trips = Trip.get_all_trips()
+        num_known = len(self._ids)
+        # Trips are only appended to the registry, unless they were deleted
+        appended_only = (
+            self._version is not None and len(trips) >= num_known and
+            all(trip.id == id for trip, id in zip(trips, self._ids))
+        )
+
+        if appended_only:
+            changed_columns = set()
+            for i in range(num_known):
+                if trips[i]._revision > self._version:
+                    row = TripTable.get_row(trips[i])
+                    changed_columns.update(j for j, (old, new) in enumerate(zip(self._rows[i], row)) if old != new)
+                    self._rows[i] = row
+            new_rows = [TripTable.get_row(trip) for trip in trips[num_known:]]
+            if new_rows:
+                self._rows.extend(new_rows)
+                self._ids.extend(trip.id for trip in trips[num_known:])
+                changed_columns = range(len(TripTable.COLUMNS))
+        else:
+            self._rows = [TripTable.get_row(trip) for trip in trips]
+            self._ids = [trip.id for trip in trips]
+            changed_columns = range(len(TripTable.COLUMNS))
+
+        if changed_columns:
+            # Replace only the changed columns; a shallow copy keeps frames handed out earlier unchanged
+            frame = self._frame.copy(deep=False) if len(self._frame) == len(self._rows) else pd.DataFrame(index=pd.RangeIndex(len(self._rows)))
+            for j in changed_columns:
+                column = TripTable.COLUMNS[j]
+                frame[column] = pd.Series([row[j] for row in self._rows], dtype=object if column in ('from', 'to') else None)
+            self._frame = frame[TripTable.COLUMNS]
+        self._version = version
+        return self._frame
+
+_trip_table = TripTable()
 
-    return pd.DataFrame(trip_list)
+def get_trips(filter=None):
+    """
+    Get a table of all trips.
+
+    Parameters:
+    - filter (str or list[str]): Only include trips with this status (or one of these statuses). Default is None (all trips).
+
+    Returns:
+    - pd.DataFrame: One row per trip with columns TripTable.COLUMNS.
+    """
+    trips = _trip_table.refresh()
+    if filter is None:
+        return trips.copy()
+    statuses = [filter] if isinstance(filter, str) else list(filter)
+    return trips[trips['status'].isin(statuses)].reset_index(drop=True)
 
 def get_vehicles(filter=None):
     #TODO: implement filter (e.g., based on status of vehicle)
@@ -234,15 +293,43 @@ def get_actions_of_trip(trip,filter=None):
     return pd.DataFrame(action_list)
 
 
+def is_measured(vehicle, sensor_type):
+    """
+    Check whether a vehicle has a live sensor of a type, whose measurements win over the simulation.
+
+    Parameters:
+    - vehicle (Vehicle): The vehicle.
+    - sensor_type (str): The sensor type ('gps' for the position, 'status' for the status).
+
+    Returns:
+    - bool: True if the vehicle has a sensor of the type with a recent value.
+    """
+    return any(sensor.sensor_type == sensor_type and sensor.is_live() for sensor in vehicle.sensors)
+
+def update_status(vehicle, status):
+    """
+    Set the status of a vehicle, unless its status is measured by a live 'status' sensor.
+
+    Parameters:
+    - vehicle (Vehicle): The vehicle.
+    - status (str): The simulated status.
+    """
+    if not is_measured(vehicle, 'status'):
+        vehicle.update_instance_parameter('status', status)
+
 def start_trips(trips_with_status_requested):
     if trips_with_status_requested is not None:
-        for trip in trips_with_status_requested:
+        # Get start time of trips in schedule of vehicle (only trips with a vehicle assigned)
+        start_times = {trip.id: pd.to_datetime(trip.vehicle.get_start_time_trip(trip.id))
+                       for trip in trips_with_status_requested if trip.vehicle is not None}
+
+        # Earliest planned start first, so a vehicle executes its trips in schedule order (also after re-planning)
+        for trip in sorted(trips_with_status_requested, key=lambda trip: start_times.get(trip.id, pd.Timestamp.max)):
                 # Check of a vehicle is assigned to trip
                 if trip.vehicle is not None:
-                    # Get start time of trip in schedule of vehicle
-                    start_time = trip.vehicle.get_start_time_trip(trip.id)
+                    start_time = start_times[trip.id]
 
-                    if datetime.now() > pd.to_datetime(start_time) and trip.vehicle.current_trip is None:
+                    if clock.now() > start_time and trip.vehicle.current_trip is None:
                         # Start trip
                         trip.update_instance_parameter('status','in_transit')
 
@@ -253,39 +340,26 @@ def start_trips(trips_with_status_requested):
                         trip.vehicle.update_instance_parameter('current_action',0)
 
                         # Update first Action 
-                        trip.actions[0].update_instance_parameter('start_time',datetime.now())
+                        trip.actions[0].update_instance_parameter('start_time',clock.now())
                         trip.actions[0].update_instance_parameter('lifecycle','actual')
 
-                        # Update status of vehicle
-                        trip.vehicle.update_instance_parameter('status',trip.actions[0].action_type)
+                        # Update status of vehicle (unless measured)
+                        update_status(trip.vehicle,trip.actions[0].action_type)
                         trip.vehicle.update_instance_parameter('entries',trip.vehicle.entries + 1) #TODO: change to actual number of cargo going into vehicle  (and only if succesfull)
 
-def update_vehicle_positions(trips_with_status_in_transit,vehicle_markers,destination_markers):
+def update_vehicle_positions(trips_with_status_in_transit,destination_markers):
     if trips_with_status_in_transit is not None:
         for trip in trips_with_status_in_transit:
             if trip.actions[trip.vehicle.current_action].progress < 100:
-                # Calculate the elapsed time
-                elapsed_time = datetime.now() - trip.actions[0].start_time
-
-                # Convert elapsed time to seconds
-                elapsed_seconds = elapsed_time.total_seconds()
-
-                # Calculate the expected duration of the trip in seconds
-                expected_duration = 0
-                for action in trip.actions:
-                    if action.action_type == 'load':
-                        expected_duration += action.duration
-                    elif action.action_type == 'unload':
-                        expected_duration += action.duration
-                    elif action.action_type == 'move':
-                        expected_duration += action.route.length/trip.vehicle.actual_speed
-
+                # Get the timing plan computed at assignment (only recomputed if missing)
+                plan = trip.timing_plan
+                if plan is None:
+                    plan = trip.vehicle.get_timing_plan(trip)
+                    trip.update_instance_parameter('timing_plan', plan)
 
                 # Calculate progress as a fraction of the TOTAL TRIP (between 0 and 1)
-                #progress_fraction = (elapsed_seconds * trip.vehicle.actual_speed) / trip.get_total_route_length()
-                progress_fraction = (elapsed_seconds / expected_duration)
-                # Ensure the progress is between 0 and 1
-                progress_fraction = min(max(progress_fraction, 0), 1)
+                elapsed_seconds = (clock.now() - trip.actions[0].start_time).total_seconds()
+                progress_fraction = plan.get_trip_progress(elapsed_seconds)
 
                 # Scale progress to be between 0 and 100 and convert to an integer
                 progress_trip = int(progress_fraction * 100)
@@ -293,61 +367,27 @@ def update_vehicle_positions(trips_with_status_in_transit,vehicle_markers,destin
                 # Update progress of trip
                 trip.update_instance_parameter('progress',progress_trip)
 
-
-                # Calculate progress of the CURRENT ACTION as a fraction
-
-                # Calculate the elapsed time since start of current action
-                elapsed_time = datetime.now() - trip.actions[trip.vehicle.current_action].start_time
-
-                # Convert elapsed time to seconds
-                elapsed_seconds = elapsed_time.total_seconds()
-
-                if trip.actions[trip.vehicle.current_action].duration == 0:
-                    progress_fraction = 1 #avoid division-by-zero error
-                elif trip.actions[trip.vehicle.current_action].action_type == 'load':
-                    progress_fraction = (elapsed_seconds / trip.actions[trip.vehicle.current_action].duration)
-                elif trip.actions[trip.vehicle.current_action].action_type == 'unload':
-                    progress_fraction = (elapsed_seconds / trip.actions[trip.vehicle.current_action].duration)
-                elif trip.actions[trip.vehicle.current_action].action_type == 'move':
-                    # Calculate progress as a fraction of the action (between 0 and 1)
-                    progress_fraction = (elapsed_seconds * trip.vehicle.actual_speed) / trip.actions[trip.vehicle.current_action].route.length
-
-                # Ensure the progress is between 0 and 1
-                progress_fraction = min(max(progress_fraction, 0), 1)
+                # Calculate progress of the CURRENT ACTION as a fraction (between 0 and 1)
+                elapsed_seconds = (clock.now() - trip.actions[trip.vehicle.current_action].start_time).total_seconds()
+                progress_fraction = plan.get_action_progress(trip.vehicle.current_action, elapsed_seconds)
 
                 # Scale progress to be between 0 and 100 and convert to an integer
                 progress_action = int(progress_fraction * 100)
 
                 trip.actions[trip.vehicle.current_action].update_instance_parameter('progress',progress_action)
                 
-                # Calculate new position based on progress
-                if trip.actions[trip.vehicle.current_action].action_type == 'move':
-                    position = get_interpolated_position(trip.actions[trip.vehicle.current_action].route.coordinates, progress_action)
-
-                    # Remove old vehicle marker
-                    if trip.vehicle.marker in vehicle_markers:
-                        vehicle_markers.remove(trip.vehicle.marker)
-
-                    # Create new vehicle marker with updated position
-                    # Create a custom icon
-                        icon_path = 'images/terminal_tractor.png'
-                        icon_width = 50
-                        custom_icon = CustomIcon(icon_image=icon_path, icon_size=(icon_width, icon_width/2.3))
-                        # Create Marker
-                        vehicle_marker = Marker(
-                            icon=custom_icon,
-                            location=position,
-                            popup=f"{trip.vehicle.name} - {progress_trip}",
-                        )        
-                    # Append new vehicle marker to session state
-                    vehicle_markers.append(vehicle_marker)
-
-                    # Update marker in vehicle instance
-                    trip.vehicle.update_instance_parameter('marker',vehicle_marker)
+                # Calculate new position based on progress (a live GPS sensor gives the actual position instead)
+                if trip.actions[trip.vehicle.current_action].action_type == 'move' and not is_measured(trip.vehicle,'gps'):
+                    position = get_interpolated_position(trip.actions[trip.vehicle.current_action].route.coordinates,
+                                                         progress_action,
+                                                         cumulative=plan.cumulative_distances[trip.vehicle.current_action])
+
+                    # Only the coordinates change; the vehicle layer is rebuilt from the positions
+                    trip.vehicle.update_instance_parameter('position',list(position))
             else:
                 # Action is completed
                 trip.actions[trip.vehicle.current_action].update_instance_parameter('lifecycle','completed')
-                trip.actions[trip.vehicle.current_action].update_instance_parameter('end_time',datetime.now())
+                trip.actions[trip.vehicle.current_action].update_instance_parameter('end_time',clock.now())
 
                 # Update number of exits for 'unload' action:
                 if trip.actions[trip.vehicle.current_action].action_type == 'unload':
@@ -357,10 +397,10 @@ def update_vehicle_positions(trips_with_status_in_transit,vehicle_markers,destin
                 if trip.vehicle.current_action < len(trip.actions)-1:
                     trip.vehicle.update_instance_parameter('current_action',trip.vehicle.current_action + 1)
                     trip.actions[trip.vehicle.current_action].update_instance_parameter('lifecycle','actual')
-                    trip.actions[trip.vehicle.current_action].update_instance_parameter('start_time',datetime.now())
+                    trip.actions[trip.vehicle.current_action].update_instance_parameter('start_time',clock.now())
                     
-                    # Update status of vehicle to action_type of current action
-                    trip.vehicle.update_instance_parameter('status',trip.actions[trip.vehicle.current_action].action_type)
+                    # Update status of vehicle to action_type of current action (unless measured)
+                    update_status(trip.vehicle,trip.actions[trip.vehicle.current_action].action_type)
                     
                 else:
                     # Trip is completed
@@ -370,14 +410,14 @@ def update_vehicle_positions(trips_with_status_in_transit,vehicle_markers,destin
                     trip.vehicle.update_instance_parameter('current_trip',None)
                     trip.vehicle.update_instance_parameter('current_action',None)
 
-                    # Update status of vehicle
-                    trip.vehicle.update_instance_parameter('status','idle')
+                    # Update status of vehicle (unless measured)
+                    update_status(trip.vehicle,'idle')
 
                     # Remove marker after trip is completed
                     if trip.marker in destination_markers:
                         destination_markers.remove(trip.marker)
                         
-    return vehicle_markers,destination_markers
+    return destination_markers
 
 def get_location_type(location_name):
     if 'Entrance' in location_name:
@@ -395,57 +435,105 @@ def get_location_type(location_name):
     elif 'Docking Gate' in location_name:
         return 'dock'
 
-def create_locations(file_name,filter=None):
-    all_locations = []
-    with open(file_name, "r") as jsonfile:
-        locations = json.load(jsonfile) # Reading the file
-        for key in locations.keys():
-            # Create locations
-            for location in locations[key]:
-                name = location['Sub-Location']
-                identifier = location['Identifier ']
-                lat = location['Latitude ']
-                lng = location['Longitude ']
-
-                # Get type of location based on name
-                type = get_location_type(name)
-                
-                # Create instance of Location Class
-                loc = Location(
-                    georeference=[lat,lng],
-                    location_type=type,
-                    name=identifier,
-                    actors=None,
-                    actions=None,
-                    constraint=None)
-                
-                
-                if type == 'entrance':
-                    custom_icon = create_custom_icon(icon='door-open',color='orange')
-                elif type == 'tractor_parking':
-                    custom_icon = create_custom_icon(icon='square-parking',color='lightred')
-                elif type == 'semi_trailer_parking':
-                    custom_icon = create_custom_icon(icon='trailer',color='purple')
-                elif type == 'loading_lane':
-                    custom_icon = create_custom_icon(icon='grip-lines-vertical',color='green')
-                elif type == 'exit':
-                    custom_icon = create_custom_icon(icon='door-closed',color='gray')
-                elif type == 'temporary_parking':
-                    custom_icon = create_custom_icon(icon='home',color='beige')
-                elif type == 'dock':
-                    custom_icon = create_custom_icon(icon='truck-ramp-box',color='cadetblue')
-                else:
-                    custom_icon = create_custom_icon()
+# (icon, color) of the map marker per location type
+LOCATION_ICONS = {
+    'entrance': ('door-open', 'orange'),
+    'tractor_parking': ('square-parking', 'lightred'),
+    'semi_trailer_parking': ('trailer', 'purple'),
+    'loading_lane': ('grip-lines-vertical', 'green'),
+    'exit': ('door-closed', 'gray'),
+    'temporary_parking': ('home', 'beige'),
+    'dock': ('truck-ramp-box', 'cadetblue'),
+}
+
+def create_location_marker(location, name=None):
+    """
+    Create the map marker of a static location, with the icon of its type, and link it to the location.
 
-                location_marker = Marker(
-                    location=loc.georeference,
-                    popup = f"<b>Name:</b> {name}<br><b>ID:</b> {loc.name}<br><b>Georeference:</b> [{lat:.6f}, {lng:.6f}]",
-                    icon=custom_icon
-                    )
-                
-                # Link Location to Folium Marker
-                loc.marker = location_marker  
+    Parameters:
+    - location (Location): The location.
+    - name (str): The name shown in the popup (e.g., the sub-location in locations.json). Default is None (the location's name).
+
+    Returns:
+    - folium.Marker: The marker.
+    """
+    lat, lng = location.georeference
+    if location.location_type in LOCATION_ICONS:
+        icon, color = LOCATION_ICONS[location.location_type]
+        custom_icon = create_custom_icon(icon=icon, color=color)
+    else:
+        custom_icon = create_custom_icon()
+
+    location_marker = Marker(
+        location=location.georeference,
+        popup = f"<b>Name:</b> {name if name is not None else location.name}<br><b>ID:</b> {location.name}<br><b>Georeference:</b> [{lat:.6f}, {lng:.6f}]",
+        icon=custom_icon
+        )
+
+    # Link Location to Folium Marker
+    location.marker = location_marker
+    return location_marker
+
+def get_route_polyline(route):
+    """
+    Get the map polyline of a route, creating it if the route has none (e.g., after restoring a snapshot).
+
+    Parameters:
+    - route (Route): The route, with its coordinates.
+
+    Returns:
+    - folium.PolyLine: The polyline (also linked to the route).
+    """
+    if route.polyline is None:
+        route.polyline = PolyLine(
+                locations=route.coordinates,
+                color="#DC143C",
+                weight=5,
+                tooltip=route.name)
+    return route.polyline
+
+def read_locations(file_name):
+    """
+    Read the static locations per company from a JSON file (locations.json) or an Excel workbook
+    with one sheet per company (static/SAVED Static Locations GPS data (Filled).xlsx).
 
-                all_locations.append(tuple([loc,location_marker]))
-        jsonfile.close()
+    Parameters:
+    - file_name (str): The path to the JSON file or workbook.
+
+    Returns:
+    - dict: The locations (dicts with 'Sub-Location', 'Identifier ', 'Latitude ' and 'Longitude ') per company.
+    """
+    if file_name.endswith(('.xlsx', '.xls')):
+        # Columnar cache, parses the workbook only when it changed
+        return {company: sheet.to_dict('records') for company, sheet in read_excel(file_name, sheet_name=None).items()}
+    with open(file_name, "r") as jsonfile:
+        return json.load(jsonfile)
+
+def create_locations(file_name,filter=None):
+    all_locations = []
+    locations = read_locations(file_name) # Reading the file
+    for key in locations.keys():
+        # Create locations
+        for location in locations[key]:
+            name = location['Sub-Location']
+            identifier = location['Identifier ']
+            lat = location['Latitude ']
+            lng = location['Longitude ']
+
+            # Get type of location based on name
+            type = get_location_type(name)
+            
+            # Create instance of Location Class
+            loc = Location(
+                georeference=[lat,lng],
+                location_type=type,
+                name=identifier,
+                actors=None,
+                actions=None,
+                constraint=None)
+            
+            
+            location_marker = create_location_marker(loc, name=name)
+
+            all_locations.append(tuple([loc,location_marker]))
     return all_locations
\ No newline at end of file
@@ -0,0 +1,325 @@
+"""
+Module for streaming the lifecycle changes of trips, actions and vehicles to other systems.
+
+An EventStream subscribes to the model's changes (see utils.events) and keeps the changes of the
+'status' of trips and vehicles and the 'lifecycle' of actions in a bounded queue. Enqueueing is a
+single deque append of a tuple in the thread that changed the model, with the time of the change and
+the ids and name the event refers to (read then, as the entity may change before the event is
+written); converting the change to an OTM-style event and encoding it happens in the EventWriter's
+thread, which drains the queue in batches and appends them as NDJSON (one event per line) to a file
+or sends them to a local socket.
+
+When the queue is full (the writer cannot keep up), the oldest events are dropped and counted.
+Every event has a sequence number, so consumers can detect such gaps.
+"""
+
+import socket
+import threading
+import uuid
+
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple, Union
+
+from utils import clock, events
+from utils.otm import OTM_TRIP_STATUS, dumps, format_datetime
+
+# The parameters streamed per entity type
+STREAMED_PARAMETERS: Dict[str, Tuple[str, ...]] = {
+    'Trip': ('status',),
+    'Action': ('lifecycle',),
+    'Vehicle': ('status',),
+}
+
+
+class EventStream:
+    """
+    A bounded queue of the lifecycle changes of trips, actions and vehicles.
+
+    Instance Attributes:
+    ----------
+    id : str
+        The unique identifier of the stream; event ids are '<stream id>-<sequence number>'.
+    maxsize : int
+        The maximum number of queued events; when full, the oldest events are dropped.
+    parameters : dict
+        The streamed parameters per entity type (class name).
+    sequence_nr : int
+        The sequence number of the last event.
+    dropped : int
+        The number of events dropped because the queue was full.
+
+    Methods:
+    -------
+    open() -> None
+        Subscribe to the changes of the model.
+    close() -> None
+        Unsubscribe from the changes of the model.
+    drain(max_events: int) -> list
+        Remove and return the oldest queued events as OTM-style dicts.
+    """
+
+    def __init__(self, maxsize: int = 100000, parameters: Optional[Dict[str, Iterable[str]]] = None) -> None:
+        """
+        Initialize a new EventStream and subscribe it to the changes of the model.
+
+        Parameters:
+        ----------
+        maxsize : int, optional
+            The maximum number of queued events. Default is 100000.
+        parameters : dict, optional
+            The streamed parameters per entity type. Default is STREAMED_PARAMETERS.
+        """
+        self.id: str = str(uuid.uuid4())
+        self.maxsize: int = maxsize
+        self.parameters: Dict[str, Tuple[str, ...]] = {key: tuple(value) for key, value in (parameters or STREAMED_PARAMETERS).items()}
+        self.sequence_nr: int = 0
+        self.dropped: int = 0
+        self._queue: Deque[Tuple[Any, ...]] = deque(maxlen=maxsize)
+        self.open()
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def __call__(self, entity: Any, parameter: str, previous: Any, value: Any) -> None:
+        """
+        Enqueue a change of the model if it is a streamed lifecycle change (called by utils.events).
+        """
+        if previous == value or parameter not in self.parameters.get(type(entity).__name__, ()):
+            return
+        if len(self._queue) == self.maxsize:
+            self.dropped += 1
+        self.sequence_nr += 1
+        entity_type = type(entity).__name__
+        link = None  # The id of the trip of an action, or of the vehicle of a trip
+        if entity_type == 'Action':
+            link = entity.trip.id if entity.trip is not None else None
+        elif entity_type == 'Trip':
+            link = entity.vehicle.id if entity.vehicle is not None else None
+        self._queue.append((self.sequence_nr, clock.now(), entity_type, entity.id, entity.name, link, parameter, previous, value))
+
+    def open(self) -> None:
+        """
+        Subscribe to the changes of the model.
+        """
+        events.subscribe(self)
+
+    def close(self) -> None:
+        """
+        Unsubscribe from the changes of the model; queued events can still be drained.
+        """
+        events.unsubscribe(self)
+
+    def to_event(self, sequence_nr: int, time: Any, entity_type: str, entity_id: str, name: str, link: Optional[str],
+                 parameter: str, previous: Any, value: Any) -> Dict[str, Any]:
+        """
+        Convert a queued change to an OTM-style update event.
+        """
+        entity_type = entity_type.lower()
+        if entity_type == 'trip':
+            previous, value = OTM_TRIP_STATUS.get(previous, previous), OTM_TRIP_STATUS.get(value, value)
+        event = {
+            "id": f"{self.id}-{sequence_nr}",
+            "sequenceNr": sequence_nr,
+            "time": format_datetime(time),
+            "entityType": entity_type,
+            "entity": {"id": entity_id, "name": name},
+            "attribute": parameter,
+            "previousValue": previous,
+            "value": value,
+        }
+        if entity_type == 'action' and link is not None:
+            event["entity"]["trip"] = {"id": link}
+        elif entity_type == 'trip' and link is not None:
+            event["entity"]["vehicle"] = {"id": link}
+        return event
+
+    def drain(self, max_events: int = 1000) -> List[Dict[str, Any]]:
+        """
+        Remove and return the oldest queued events.
+
+        Parameters:
+        ----------
+        max_events : int, optional
+            The maximum number of events to return. Default is 1000.
+
+        Returns:
+        -------
+        list
+            The events as OTM-style dicts, in order of occurrence.
+        """
+        drained = []
+        for _ in range(min(max_events, len(self._queue))):
+            try:
+                drained.append(self.to_event(*self._queue.popleft()))
+            except IndexError:  # Dropped by a concurrent append
+                break
+        return drained
+
+
+class EventWriter:
+    """
+    A background thread appending the events of an EventStream as NDJSON to a file or a local socket.
+
+    Instance Attributes:
+    ----------
+    stream : EventStream
+        The stream to drain.
+    path : str, optional
+        The NDJSON file the events are appended to.
+    address : str or tuple, optional
+        The socket the events are sent to: a path (Unix domain socket) or a (host, port) tuple (TCP).
+    batch_size : int
+        The maximum number of events written at once.
+    interval : float
+        The time in seconds between two drains of the queue.
+    written : int
+        The number of events written so far.
+    failed : int
+        The number of events lost because the file could not be written or the socket could not be reached.
+    failed_flushes : int
+        The number of drains of the background thread that raised an exception.
+    last_error : str, optional
+        A description of the last error.
+
+    Methods:
+    -------
+    start() -> None
+        Start the background thread (no-op if already running).
+    stop() -> None
+        Stop the background thread after writing the queued events.
+    flush() -> int
+        Write all queued events now.
+    """
+
+    def __init__(self,
+                 stream: EventStream,
+                 path: Optional[str] = None,
+                 address: Union[str, Tuple[str, int], None] = None,
+                 batch_size: int = 1000,
+                 interval: float = 0.5) -> None:
+        """
+        Initialize a new EventWriter.
+
+        Parameters:
+        ----------
+        stream : EventStream
+            The stream to drain.
+        path : str, optional
+            The NDJSON file the events are appended to.
+        address : str or tuple, optional
+            The socket the events are sent to: a path (Unix domain socket) or a (host, port) tuple (TCP).
+        batch_size : int, optional
+            The maximum number of events written at once. Default is 1000.
+        interval : float, optional
+            The time in seconds between two drains of the queue. Default is 0.5.
+
+        Raises:
+        ------
+        ValueError:
+            If not exactly one of 'path' and 'address' is given.
+        """
+        if (path is None) == (address is None):
+            raise ValueError("Specify either a path or a socket address")
+        self.stream: EventStream = stream
+        self.path: Optional[str] = path
+        self.address = address
+        self.batch_size: int = batch_size
+        self.interval: float = interval
+        self.written: int = 0
+        self.failed: int = 0
+        self.failed_flushes: int = 0
+        self.last_error: Optional[str] = None
+        self._socket: Optional[socket.socket] = None
+        self._write_lock: threading.Lock = threading.Lock()
+        self._stop_event: threading.Event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """
+        Start the background thread (no-op if already running).
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="EventWriter", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop the background thread after writing the queued events.
+        """
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+    def is_running(self) -> bool:
+        """
+        Return True if the background thread is running.
+        """
+        return self._thread is not None and self._thread.is_alive()
+
+    def _send(self, data: bytes) -> None:
+        """
+        Send data to the socket, connecting first if needed.
+        """
+        if self._socket is None:
+            family = socket.AF_UNIX if isinstance(self.address, str) else socket.AF_INET
+            self._socket = socket.socket(family, socket.SOCK_STREAM)
+            try:
+                self._socket.connect(self.address)
+            except OSError:
+                self._socket.close()
+                self._socket = None
+                raise
+        try:
+            self._socket.sendall(data)
+        except OSError:
+            self._socket.close()
+            self._socket = None
+            raise
+
+    def flush(self) -> int:
+        """
+        Write all queued events now.
+
+        Returns:
+        -------
+        int
+            The number of events written.
+        """
+        written = 0
+        with self._write_lock:
+            while True:
+                batch = self.stream.drain(self.batch_size)
+                if not batch:
+                    return written
+                data = b''.join(dumps(event) + b'\n' for event in batch)
+                try:
+                    if self.path is not None:
+                        with open(self.path, 'ab') as f:
+                            f.write(data)
+                    else:
+                        self._send(data)
+                except OSError as e:
+                    self.failed += len(batch)
+                    self.last_error = f"{len(batch)} event(s) not written: {e!r}"
+                    continue
+                written += len(batch)
+                self.written += len(batch)
+
+    def _run(self) -> None:
+        """
+        Drain the queue every 'interval' seconds until stopped.
+        """
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.flush()
+            except Exception as e:
+                # Keep draining; the events of the failed batch are lost
+                self.failed_flushes += 1
+                self.last_error = f"Writing events failed: {e!r}"
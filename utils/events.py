@@ -0,0 +1,122 @@
+"""
+Module for observing changes to the model.
+
+update_instance_parameter() of the entities (Action, Actor, Constraint, Goods, Location, Sensor, Trip
+and Vehicle), Sensor.record() (as a change of 'value') and the direct status changes of
+Vehicle.assign_to_trip and Vehicle.unassign_trip call publish() for every change, with the entity,
+the parameter and its previous and new value. Subscribers (e.g., utils.event_stream.EventStream) are
+called synchronously in the thread that changed the model, while it holds the model lock, so they
+must be cheap: typically they only enqueue the change and process it elsewhere.
+
+Without subscribers, the model only tests whether the 'subscribers' list is empty (tens of nanoseconds).
+
+Recorders (e.g., utils.journal.Journal) are called through record() for every operation that changes
+the model, in a form that can be replayed: the target (an entity, or an entity class for class methods),
+the name of the method and its arguments. The recorded operations are the creation of entities
+(CREATE), update_instance_parameter() of the entities, Sensor.record(), Trip.add_action(),
+Vehicle.assign_to_trip(), Vehicle.unassign_trip(), Vehicle.update_planned_end() and the delete_* class methods. An operation is
+recorded after it succeeded; operations it performs itself (e.g., the duration updates of an assignment)
+are recorded before it, and have the same effect when they are replayed again as part of it.
+"""
+
+from typing import Any, Callable, List, Tuple
+
+# Called as callback(entity, parameter, previous, value) after every change
+Subscriber = Callable[[Any, str, Any, Any], None]
+
+# Called as recorder(target, operation, args) after every operation that changes the model
+Recorder = Callable[[Any, str, Tuple[Any, ...]], None]
+
+# The operation recorded when an entity is created (its target is the new entity)
+CREATE = '__init__'
+
+subscribers: List[Subscriber] = []
+recorders: List[Recorder] = []
+
+
+def subscribe(callback: Subscriber) -> None:
+    """
+    Call a function for every change to the model.
+
+    Parameters
+    ----------
+    callback : callable
+        Called as callback(entity, parameter, previous, value) after the change.
+    """
+    if callback not in subscribers:
+        subscribers.append(callback)
+
+
+def unsubscribe(callback: Subscriber) -> None:
+    """
+    Stop calling a function for changes to the model (no-op if it is not subscribed).
+
+    Parameters
+    ----------
+    callback : callable
+        The subscribed function.
+    """
+    if callback in subscribers:
+        subscribers.remove(callback)
+
+
+def publish(entity: Any, parameter: str, previous: Any, value: Any) -> None:
+    """
+    Notify all subscribers of a change to the model.
+
+    Parameters
+    ----------
+    entity : Any
+        The changed instance (e.g., a Trip).
+    parameter : str
+        The name of the changed parameter.
+    previous : Any
+        The value before the change.
+    value : Any
+        The value after the change.
+    """
+    for callback in subscribers:
+        callback(entity, parameter, previous, value)
+
+
+def add_recorder(recorder: Recorder) -> None:
+    """
+    Call a function for every operation that changes the model.
+
+    Parameters
+    ----------
+    recorder : callable
+        Called as recorder(target, operation, args) after the operation.
+    """
+    if recorder not in recorders:
+        recorders.append(recorder)
+
+
+def remove_recorder(recorder: Recorder) -> None:
+    """
+    Stop calling a function for operations on the model (no-op if it is not added).
+
+    Parameters
+    ----------
+    recorder : callable
+        The added function.
+    """
+    if recorder in recorders:
+        recorders.remove(recorder)
+
+
+def record(target: Any, operation: str, args: Tuple[Any, ...] = ()) -> None:
+    """
+    Notify all recorders of an operation that changed the model.
+
+    Parameters
+    ----------
+    target : Any
+        The instance the method was called on (e.g., a Vehicle), or its class for class methods.
+    operation : str
+        The name of the method, or CREATE for a new instance.
+    args : tuple, optional
+        The arguments of the method. Default is ().
+    """
+    for recorder in recorders:
+        recorder(target, operation, args)
@@ -0,0 +1,193 @@
+"""
+Module for reading Excel inputs through a columnar cache.
+
+Parsing a workbook with openpyxl is slow, and the same workbooks (static/trip_raw_data.xlsx and
+static/SAVED Static Locations GPS data (Filled).xlsx) are read every time a generator or the location
+setup runs. read_excel() stores every sheet it parses as a Feather file, keyed by the absolute path of
+the workbook, the sheet name and the workbook's modification time and size, and reads the Feather file
+instead of the workbook until the workbook changes. Sheets missing from the cache are parsed with one
+pass over the workbook; cache files of older versions of the workbook are removed when it is parsed again.
+
+Feather files are written with pyarrow. Without pyarrow, or for a sheet that cannot be stored in Arrow
+(e.g., a column mixing numbers and text), the sheet is read from Excel every time.
+"""
+
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+from typing import Dict, List, Optional, Union
+
+try:
+    import pyarrow.feather as feather
+except ImportError:  # pyarrow is optional; without it sheets are read from Excel every time
+    feather = None
+
+CACHE_DIR_NAME = '.excel_cache'
+
+
+def get_cache_dir(path: str) -> str:
+    """
+    Get the default cache directory of a workbook: '.excel_cache' next to it.
+
+    Directories of this name are ignored by git (see .gitignore), so the cache of the workbooks in
+    static/ does not show up as untracked files.
+
+    Parameters
+    ----------
+    path : str
+        The path to the workbook.
+
+    Returns
+    -------
+    str
+        The cache directory.
+    """
+    return os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIR_NAME)
+
+
+def _get_key(path: str, sheet_name: Optional[str] = None) -> str:
+    """
+    Return the cache key of a workbook (or one of its sheets), independent of its version.
+    """
+    return hashlib.sha1(f"{os.path.abspath(path)}\0{sheet_name or ''}".encode('utf-8')).hexdigest()[:16]
+
+
+def _get_version(path: str) -> str:
+    """
+    Return the version of a workbook: its modification time (in ns) and size.
+    """
+    stat = os.stat(path)
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+
+def _remove_stale(cache_dir: str, key: str, current: str) -> None:
+    """
+    Remove the cache files of a key other than the current one.
+    """
+    for file_name in os.listdir(cache_dir):
+        if file_name.startswith(f"{key}-") and file_name != current:
+            try:
+                os.remove(os.path.join(cache_dir, file_name))
+            except OSError:
+                pass
+
+
+def _write_atomic(file_path: str, write) -> None:
+    """
+    Write a cache file through a temporary file, so readers never see a partial file.
+    """
+    temporary = f"{file_path}.{os.getpid()}.tmp"
+    try:
+        write(temporary)
+        os.replace(temporary, file_path)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+
+def _write_json(file_path: str, data: list) -> None:
+    """
+    Write a list as a JSON file.
+    """
+    with open(file_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+
+
+def get_sheet_names(path: str, cache_dir: Optional[str] = None) -> List[str]:
+    """
+    Get the names of the sheets of a workbook, from the cache if the workbook did not change.
+
+    Parameters
+    ----------
+    path : str
+        The path to the workbook.
+    cache_dir : str, optional
+        The cache directory. Default is '.excel_cache' next to the workbook.
+
+    Returns
+    -------
+    list
+        The sheet names, in workbook order.
+    """
+    cache_dir = cache_dir or get_cache_dir(path)
+    key = _get_key(path)
+    file_name = f"{key}-{_get_version(path)}.json"
+    file_path = os.path.join(cache_dir, file_name)
+    if os.path.exists(file_path):
+        with open(file_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    with pd.ExcelFile(path) as workbook:
+        sheet_names = [str(sheet_name) for sheet_name in workbook.sheet_names]
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        _write_atomic(file_path, lambda temporary: _write_json(temporary, sheet_names))
+        _remove_stale(cache_dir, key, file_name)
+    except OSError:
+        pass  # A read-only location; the names are read from the workbook next time
+    return sheet_names
+
+
+def read_excel(path: str,
+               sheet_name: Union[str, List[str], None] = 0,
+               cache_dir: Optional[str] = None,
+               use_cache: bool = True) -> Union[pd.DataFrame, Dict[str, pd.DataFrame]]:
+    """
+    Read sheets of a workbook like pandas.read_excel, through the columnar cache.
+
+    Parameters
+    ----------
+    path : str
+        The path to the workbook.
+    sheet_name : str, int, list or None, optional
+        A sheet name or position, a list of them, or None for all sheets. Default is 0 (the first sheet).
+    cache_dir : str, optional
+        The cache directory. Default is '.excel_cache' next to the workbook.
+    use_cache : bool, optional
+        Read and write the cache. Default is True; False always parses the workbook.
+
+    Returns
+    -------
+    pandas.DataFrame or dict
+        The sheet, or a dict of DataFrames by sheet name if 'sheet_name' is a list or None.
+    """
+    if not use_cache or feather is None:
+        return pd.read_excel(path, sheet_name=sheet_name)
+
+    cache_dir = cache_dir or get_cache_dir(path)
+    requested = sheet_name if isinstance(sheet_name, list) else [sheet_name]
+    if sheet_name is None or any(isinstance(name, int) for name in requested):
+        sheet_names = get_sheet_names(path, cache_dir)
+        names = sheet_names if sheet_name is None else [sheet_names[name] if isinstance(name, int) else name for name in requested]
+    else:
+        names = requested
+
+    version = _get_version(path)
+    sheets: Dict[str, pd.DataFrame] = {}
+    missing = []
+    for name in names:
+        file_path = os.path.join(cache_dir, f"{_get_key(path, name)}-{version}.feather")
+        if os.path.exists(file_path):
+            sheets[name] = feather.read_feather(file_path)
+        else:
+            missing.append(name)
+
+    if missing:
+        parsed = pd.read_excel(path, sheet_name=missing)  # One pass over the workbook for all missing sheets
+        for name in missing:
+            sheets[name] = parsed[name]
+            key = _get_key(path, name)
+            file_name = f"{key}-{version}.feather"
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+                _remove_stale(cache_dir, key, file_name)
+                _write_atomic(os.path.join(cache_dir, file_name), lambda temporary: feather.write_feather(parsed[name], temporary))
+            except (OSError, ValueError, TypeError):
+                pass  # Not storable in Arrow (pyarrow raises subclasses of these) or not writable; not cached
+
+    if isinstance(sheet_name, list) or sheet_name is None:
+        return {name: sheets[name] for name in names}
+    return sheets[names[0]]
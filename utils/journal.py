@@ -0,0 +1,550 @@
+"""
+Module for journaling every change to the model, for audit, crash recovery and deterministic debugging.
+
+A Journal records the operations that change the model (see utils.events: the creation of entities,
+update_instance_parameter() of the entities, sensor readings, assignments of trips, ...) with a
+sequence number and the model time. Recording only appends a tuple to a queue in the thread that
+changed the model, while it holds the model lock. A background thread commits the queued records in
+groups: every 'interval' seconds, all records since the last commit are pickled into one frame, which
+is appended to the journal file and fsync'ed at once, so the cost of the fsync is shared by all of
+them. A crash loses at most the records of the last interval.
+
+File layout:
+    MAGIC (8 bytes) | format version (uint32) | frame | frame | ...
+    frame: length (uint32) | CRC-32 (uint32) | pickled list of records
+A record is a tuple (sequence number, model time, target, operation, arguments). Entities in a record
+are pickled as references (class name and id); a created entity is recorded as its class and its
+attributes at creation. A frame that was not completely written (a crash during a commit) fails its
+length or checksum test and is ignored; opening the journal again truncates it.
+
+Replaying a journal (replay_journal(), recover()) applies the records after a snapshot's journal position
+(see utils.snapshot) in order: the clock is set to the time of each record and the recorded method is
+called again, so the model goes through the same states as when it was recorded. Only the methods in
+REPLAYED_OPERATIONS can be called, and records are unpickled with the allow-list of utils.snapshot.
+Changes made outside these methods (e.g., the vehicle statistics) are not journaled; they are restored
+from the snapshot.
+"""
+
+import io
+import os
+import pickle
+import struct
+import threading
+import zlib
+
+import pandas as pd
+
+from collections import deque
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+from utils import clock, events
+from utils.classes import Location, Sensor, TimingPlan, Trip
+from utils.entities import create_location_marker
+from utils.snapshot import DISPLAY_ATTRIBUTES, ENTITY_CLASSES, SafeUnpickler, read_snapshot_header, restore_snapshot
+
+MAGIC = b'SAVEDJNL'
+FORMAT_VERSION = 1
+
+# The methods called when a journal is replayed (besides creating entities)
+REPLAYED_OPERATIONS = frozenset({
+    'update_instance_parameter', 'record', 'add_action', 'assign_to_trip', 'unassign_trip', 'update_planned_end',
+    'delete_all_instances', 'delete_all_by_type', 'delete_last_x',
+})
+
+# (sequence number, model time, target, operation, arguments)
+Record = Tuple[int, Any, Any, str, Tuple[Any, ...]]
+
+_CLASSES = {cls.__name__: cls for cls in ENTITY_CLASSES}
+_ENTITY_NAMES = {cls: name for name, cls in _CLASSES.items()}
+_HEADER = struct.Struct('<8sI')
+_FRAME = struct.Struct('<II')
+
+
+class Reference:
+    """
+    An entity in a record read from a journal, resolved to the entity when the record is replayed.
+
+    Instance Attributes:
+    ----------
+    name : str
+        The class name of the entity.
+    id : str
+        The id of the entity.
+    """
+
+    __slots__ = ('name', 'id')
+
+    def __init__(self, name: str, id: str) -> None:
+        self.name: str = name
+        self.id: str = id
+
+    def __repr__(self) -> str:
+        return f"{self.name}({self.id})"
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, Reference) and (self.name, self.id) == (other.name, other.id)
+
+    def __hash__(self) -> int:
+        return hash((self.name, self.id))
+
+
+class _RecordPickler(pickle.Pickler):
+    """
+    A pickler storing entities as references, entity classes as their names and timing plans as their attributes.
+    """
+
+    def persistent_id(self, obj: Any) -> Optional[Tuple[str, Any]]:
+        kind = type(obj)
+        if kind in _ENTITY_NAMES:
+            return _ENTITY_NAMES[kind], obj.id
+        if kind is TimingPlan:
+            return 'TimingPlan', obj.__dict__
+        if kind is type and obj in _ENTITY_NAMES:
+            return 'class', _ENTITY_NAMES[obj]
+        return None
+
+
+class _RecordUnpickler(SafeUnpickler):
+    """
+    An unpickler of records, see _RecordPickler; entities become References.
+    """
+
+    def persistent_load(self, pid: Tuple[str, Any]) -> Any:
+        kind, value = pid
+        if kind in _CLASSES:
+            return Reference(kind, value)
+        if kind == 'class' and value in _CLASSES:
+            return _CLASSES[value]
+        if kind == 'TimingPlan':
+            plan = TimingPlan.__new__(TimingPlan)
+            plan.__dict__ = value
+            return plan
+        raise pickle.UnpicklingError(f"Journals cannot contain {kind}")
+
+
+def _copy_attributes(entity: Any) -> Dict[str, Any]:
+    """
+    Copy the attributes of a new entity (with its lists and frames, which are changed in place later on) without display objects.
+    """
+    values = entity.__dict__.copy()
+    for key, value in values.items():
+        if key in DISPLAY_ATTRIBUTES:
+            values[key] = None
+        elif type(value) is list:
+            values[key] = value.copy()
+        elif type(value) is pd.DataFrame:
+            values[key] = value.copy()
+    return values
+
+
+def _pickle_records(records: List[Record]) -> Tuple[bytes, List[str]]:
+    """
+    Pickle records into the payload of a frame; records that cannot be pickled are left out.
+
+    Returns
+    -------
+    tuple of (bytes, list)
+        The payload and a description of the error for every record left out.
+    """
+    output = io.BytesIO()
+    try:
+        _RecordPickler(output, protocol=pickle.HIGHEST_PROTOCOL).dump(records)
+        return output.getvalue(), []
+    except Exception:
+        pass
+    picklable, errors = [], []
+    for record in records:
+        try:
+            _RecordPickler(io.BytesIO(), protocol=pickle.HIGHEST_PROTOCOL).dump(record)
+            picklable.append(record)
+        except Exception as e:
+            errors.append(f"Record {record[0]} ({record[3]}) cannot be stored: {e!r}")
+    output = io.BytesIO()
+    _RecordPickler(output, protocol=pickle.HIGHEST_PROTOCOL).dump(picklable)
+    return output.getvalue(), errors
+
+
+def _read_frames(f: Any, path: str) -> Iterator[Tuple[int, bytes]]:
+    """
+    Read the frames of a journal file after checking its header; stops at the first incomplete or corrupt frame.
+
+    Yields
+    ------
+    tuple of (int, bytes)
+        The offset of the end of the frame and its payload.
+    """
+    prefix = f.read(_HEADER.size)
+    if len(prefix) < _HEADER.size or _HEADER.unpack(prefix)[0] != MAGIC:
+        raise ValueError(f"{path} is not a journal")
+    version = _HEADER.unpack(prefix)[1]
+    if version != FORMAT_VERSION:
+        raise ValueError(f"{path} has journal format version {version}, expected {FORMAT_VERSION}")
+    offset = _HEADER.size
+    while True:
+        frame = f.read(_FRAME.size)
+        if len(frame) < _FRAME.size:
+            return
+        length, checksum = _FRAME.unpack(frame)
+        payload = f.read(length)
+        if len(payload) < length or zlib.crc32(payload) != checksum:
+            return
+        offset += _FRAME.size + length
+        yield offset, payload
+
+
+def read_journal(path: str, after: int = 0) -> List[Record]:
+    """
+    Read the records of a journal file, e.g. to audit the changes to the model.
+
+    Parameters
+    ----------
+    path : str
+        The path of the journal file.
+    after : int, optional
+        Only return the records with a higher sequence number. Default is 0 (all records).
+
+    Returns
+    -------
+    list of tuple
+        The records (sequence number, model time, target, operation, arguments), in order. Entities are
+        References; the target of a created entity is its class and its arguments are its attributes.
+
+    Raises
+    ------
+    ValueError
+        If the file is not a journal or has another format version.
+    """
+    records = []
+    with open(path, 'rb') as f:
+        for _, payload in _read_frames(f, path):
+            frame = _RecordUnpickler(io.BytesIO(payload)).load()
+            if frame and frame[-1][0] > after:
+                records.extend(record for record in frame if record[0] > after)
+    return records
+
+
+def _resolve(value: Any, entities: Dict[Tuple[str, str], Any]) -> Any:
+    """
+    Replace the References in a value (or in its lists, tuples and dicts) by the entities.
+    """
+    kind = type(value)
+    if kind is Reference:
+        try:
+            return entities[value.name, value.id]
+        except KeyError:
+            raise ValueError(f"Journal refers to unknown entity {value!r}") from None
+    if kind is list:
+        return [_resolve(item, entities) for item in value]
+    if kind is tuple:
+        return tuple(_resolve(item, entities) for item in value)
+    if kind is dict:
+        return {key: _resolve(item, entities) for key, item in value.items()}
+    return value
+
+
+def _apply(record: Record, entities: Dict[Tuple[str, str], Any]) -> None:
+    """
+    Apply a record to the model; 'entities' maps (class name, id) to the entities and is kept up to date.
+    """
+    _, _, target, operation, args = record
+    if operation == events.CREATE:
+        cls = target
+        entity = cls.__new__(cls)
+        entity.__dict__ = _resolve(args[0], entities)
+        cls._instances.append(entity)
+        cls._total_instances += 1
+        if cls is Trip:
+            entity._mark_modified()
+        elif cls is Location:
+            Location._version += 1
+            create_location_marker(entity)
+        elif cls is Sensor and entity.vehicle is not None:
+            entity.vehicle.sensors.append(entity)  # Mounted on its vehicle, as in Sensor.__init__
+        entities[cls.__name__, entity.id] = entity
+        return
+    if operation not in REPLAYED_OPERATIONS:
+        raise ValueError(f"Journal operation {operation!r} cannot be replayed")
+    getattr(_resolve(target, entities), operation)(*_resolve(args, entities))
+    if operation.startswith('delete_'):
+        entities.clear()
+        entities.update(((cls.__name__, entity.id), entity) for cls in ENTITY_CLASSES for entity in cls._instances)
+
+
+def _apply_records(records: List[Record], set_time: bool) -> None:
+    """
+    Apply records to the model in order, without recording them again. Hold the model lock while calling this.
+    """
+    entities = {(cls.__name__, entity.id): entity for cls in ENTITY_CLASSES for entity in cls._instances}
+    active_clock = clock.get_clock()
+    set_time = set_time and hasattr(active_clock, 'set')
+    recorders = events.recorders.copy()
+    events.recorders.clear()
+    try:
+        for record in records:
+            if set_time and record[1] is not None:
+                active_clock.set(record[1])
+            _apply(record, entities)
+    finally:
+        events.recorders.extend(recorders)
+
+
+def replay_journal(path: str, lock: Any = None, after: int = 0, set_time: bool = True) -> int:
+    """
+    Apply the records of a journal file to the model, e.g. after restoring the snapshot they follow.
+
+    Operations are not recorded again while the journal is replayed (they already are in the journal).
+
+    Parameters
+    ----------
+    path : str
+        The path of the journal file.
+    lock : threading.RLock, optional
+        The model lock (e.g., SimulationTicker.lock), held while the records are applied. Default is None.
+    after : int, optional
+        Only apply the records with a higher sequence number, e.g. the 'journal_sequence_nr' of a snapshot. Default is 0.
+    set_time : bool, optional
+        Set the active clock to the time of each record, if the clock can be set (not the WallClock). Default is True.
+
+    Returns
+    -------
+    int
+        The sequence number of the last record applied (or 'after' if there were none).
+
+    Raises
+    ------
+    ValueError
+        If the file is not a journal, has another format version or refers to an unknown entity or operation.
+    """
+    records = read_journal(path, after)
+    if lock is not None:
+        with lock:
+            _apply_records(records, set_time)
+    else:
+        _apply_records(records, set_time)
+    return records[-1][0] if records else after
+
+
+def recover(snapshot_path: Optional[str], journal_path: str, lock: Any = None, set_time: bool = True) -> Dict[str, Any]:
+    """
+    Restore the model from a snapshot and the records of the journal after it, e.g. after a crash.
+
+    Parameters
+    ----------
+    snapshot_path : str, optional
+        The snapshot file, saved with the journal (see utils.snapshot.save_snapshot()). If None, the
+        whole journal is replayed onto the current (empty) model.
+    journal_path : str
+        The journal file.
+    lock : threading.RLock, optional
+        The model lock (e.g., SimulationTicker.lock). Default is None.
+    set_time : bool, optional
+        Set the active clock to the time of the snapshot and the records, if the clock can be set. Default is True.
+
+    Returns
+    -------
+    dict
+        The 'snapshot' header (or None) and the number of records 'replayed' up to 'sequence_nr'.
+
+    Raises
+    ------
+    ValueError
+        If the snapshot was saved without a journal, or a file is not a snapshot or journal.
+    """
+    header, after = None, 0
+    if snapshot_path is not None:
+        after = read_snapshot_header(snapshot_path).get('journal_sequence_nr')
+        if after is None:
+            raise ValueError(f"{snapshot_path} was saved without a journal")
+        header = restore_snapshot(snapshot_path, lock, set_time)
+    start = after
+    sequence_nr = replay_journal(journal_path, lock, after, set_time)
+    return {'snapshot': header, 'replayed': sequence_nr - start, 'sequence_nr': sequence_nr}
+
+
+class Journal:
+    """
+    An append-only journal of the operations that change the model, committed to a file in groups.
+
+    Instance Attributes:
+    ----------
+    path : str
+        The journal file; records are appended to it.
+    interval : float
+        The time in seconds between two group commits.
+    sequence_nr : int
+        The sequence number of the last record (continued from the records in the file).
+    committed_sequence_nr : int
+        The sequence number of the last committed (fsync'ed) record.
+    commits : int
+        The number of group commits so far.
+    committed : int
+        The number of records committed so far.
+    failed : int
+        The number of records that could not be stored (e.g., attributes that cannot be pickled, or
+        the records of a commit that failed to write the file).
+    failed_commits : int
+        The number of commits of the background thread that failed (e.g., the disk is full).
+    last_error : str or None
+        A description of the last record that could not be stored or commit that failed.
+
+    Methods:
+    -------
+    open() -> None
+        Start recording the operations on the model.
+    close() -> None
+        Stop recording the operations on the model.
+    start() -> None
+        Start the background thread committing the records (no-op if already running).
+    stop() -> None
+        Stop the background thread after committing the queued records.
+    commit() -> int
+        Commit the queued records now.
+    """
+
+    def __init__(self, path: str = 'journal.bin', interval: float = 0.1) -> None:
+        """
+        Initialize a new Journal, continuing the journal file if it exists, and start recording.
+
+        An incomplete frame at the end of the file (a commit interrupted by a crash) is truncated.
+
+        Parameters:
+        ----------
+        path : str, optional
+            The journal file. Default is 'journal.bin'.
+        interval : float, optional
+            The time in seconds between two group commits. Default is 0.1.
+
+        Raises:
+        ------
+        ValueError:
+            If 'interval' is not positive, or the file is not a journal or has another format version.
+        """
+        if interval <= 0:
+            raise ValueError(f"Commit interval must be positive, got {interval}")
+        self.path: str = path
+        self.interval: float = interval
+        self.sequence_nr: int = 0
+        self.commits: int = 0
+        self.committed: int = 0
+        self.failed: int = 0
+        self.failed_commits: int = 0
+        self.last_error: Optional[str] = None
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, 'r+b') as f:
+                end, payload = _HEADER.size, None
+                for end, payload in _read_frames(f, path):
+                    pass
+                if payload is not None:
+                    frame = _RecordUnpickler(io.BytesIO(payload)).load()
+                    self.sequence_nr = frame[-1][0] if frame else 0
+                f.truncate(end)
+        else:
+            with open(path, 'wb') as f:
+                f.write(_HEADER.pack(MAGIC, FORMAT_VERSION))
+        self.committed_sequence_nr: int = self.sequence_nr
+        self._queue: Deque[Record] = deque()
+        self._commit_lock: threading.Lock = threading.Lock()
+        self._stop_event: threading.Event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.open()
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def __call__(self, target: Any, operation: str, args: Tuple[Any, ...]) -> None:
+        """
+        Queue an operation on the model (called by utils.events).
+        """
+        time = getattr(target, 'last_modified', None)
+        if operation == events.CREATE:
+            args = (_copy_attributes(target),)
+            target = type(target)
+        self.sequence_nr += 1
+        self._queue.append((self.sequence_nr, time if time is not None else clock.now(), target, operation, args))
+
+    def open(self) -> None:
+        """
+        Start recording the operations on the model.
+        """
+        events.add_recorder(self)
+
+    def close(self) -> None:
+        """
+        Stop recording the operations on the model; queued records can still be committed.
+        """
+        events.remove_recorder(self)
+
+    def start(self) -> None:
+        """
+        Start the background thread (no-op if already running).
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="Journal", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop the background thread after committing the queued records.
+        """
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.commit()
+
+    def is_running(self) -> bool:
+        """
+        Return True if the background thread is running.
+        """
+        return self._thread is not None and self._thread.is_alive()
+
+    def commit(self) -> int:
+        """
+        Commit the queued records now: append them as one frame to the journal file and fsync it.
+
+        Returns:
+        -------
+        int
+            The number of records committed.
+
+        Raises:
+        ------
+        OSError:
+            If the frame cannot be written; its records are lost and counted in 'failed'.
+        """
+        with self._commit_lock:
+            records = []
+            for _ in range(len(self._queue)):
+                records.append(self._queue.popleft())
+            if not records:
+                return 0
+            payload, errors = _pickle_records(records)
+            if errors:
+                self.failed += len(errors)
+                self.last_error = errors[-1]
+            try:
+                with open(self.path, 'ab') as f:
+                    f.write(_FRAME.pack(len(payload), zlib.crc32(payload)) + payload)
+                    f.flush()
+                    os.fsync(f.fileno())
+            except OSError:
+                self.failed += len(records) - len(errors)
+                raise
+            self.commits += 1
+            self.committed += len(records) - len(errors)
+            self.committed_sequence_nr = records[-1][0]
+            return len(records) - len(errors)
+
+    def _run(self) -> None:
+        """
+        Commit the queued records every 'interval' seconds until stopped.
+        """
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.commit()
+            except Exception as e:
+                # Keep committing; the records of a failed commit are lost, later ones are still stored
+                self.failed_commits += 1
+                self.last_error = f"Commit failed: {e!r}"
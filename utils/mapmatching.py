@@ -0,0 +1,483 @@
+"""
+Module for map-matching GPS samples onto the edges of a StreetNetwork with a hidden Markov model.
+
+A noisy GPS position is snapped to the edge the vehicle most likely drives on, given the positions
+before it (Newson & Krumm, 2009): the candidates of a sample are the edges within 'radius' meters,
+with an emission probability that decreases with the distance to the edge (GPS noise 'sigma'), and a
+transition probability that decreases with the difference between the driven (shortest path) distance
+and the straight-line distance between two consecutive samples ('beta'). The Viterbi algorithm finds
+the most likely sequence of edges.
+
+- EdgeIndex splits the edges into short segments indexed by a KD-tree, and generates the candidates of
+  many samples at once with array operations.
+- OnlineMapMatcher matches a live stream of samples: every update returns the current best estimate,
+  and a sample is finalized (smoothed by the samples after it) once it leaves a sliding window, so the
+  work and memory per sample are bounded.
+- match_trace() matches a recorded trace at once (e.g., to backfill history).
+- get_route_distance() converts a match to the distance driven along a Route's nodes, from which the
+  progress of a 'move' action and the travel distance follow.
+"""
+
+import math
+
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from scipy.sparse.csgraph import dijkstra
+from scipy.spatial import cKDTree
+
+from utils.osmnx import StreetNetwork
+
+
+class Match:
+    """
+    The position of a GPS sample on the street network.
+
+    Instance Attributes:
+    ----------
+    edge : tuple
+        The (u, v) node IDs of the matched edge.
+    offset : float
+        The distance (in meters) along the edge from u to the matched position.
+    distance : float
+        The distance (in meters) between the GPS sample and the matched position.
+    position : list
+        [latitude, longitude] of the matched position.
+    """
+
+    def __init__(self, edge: Tuple[int, int], offset: float, distance: float, position: List[float]) -> None:
+        self.edge: Tuple[int, int] = edge
+        self.offset: float = offset
+        self.distance: float = distance
+        self.position: List[float] = position
+
+    def __repr__(self) -> str:
+        return f"Match(edge={self.edge}, offset={self.offset:.1f}, distance={self.distance:.1f}, position={self.position})"
+
+
+class Candidates:
+    """
+    The candidate edges of one GPS sample (parallel arrays, nearest first).
+
+    Instance Attributes:
+    ----------
+    edges : numpy.ndarray
+        The edge indices (see EdgeIndex).
+    offsets : numpy.ndarray
+        The distance (in meters) along each edge to the position nearest to the sample.
+    distances : numpy.ndarray
+        The distance (in meters) between the sample and each edge.
+    positions : numpy.ndarray
+        The (latitude, longitude) of the position on each edge nearest to the sample.
+    point : numpy.ndarray
+        The projected (x, y) of the sample in meters.
+    """
+
+    def __init__(self, edges: np.ndarray, offsets: np.ndarray, distances: np.ndarray, positions: np.ndarray, point: np.ndarray) -> None:
+        self.edges = edges
+        self.offsets = offsets
+        self.distances = distances
+        self.positions = positions
+        self.point = point
+
+    def __len__(self) -> int:
+        return len(self.edges)
+
+
+class EdgeIndex:
+    """
+    A spatial index over the edges of a StreetNetwork for map-matching.
+
+    Parallel edges are collapsed to the shortest one, as in StreetNetwork.get_csr(). Edges are split
+    into segments of at most 'max_segment_length' meters (following their geometry, if any) and the
+    segment midpoints are indexed with a KD-tree; a query radius padded with half the longest segment
+    then finds every segment within the radius.
+
+    Instance Attributes:
+    ----------
+    network : StreetNetwork
+        The street network.
+    edge_nodes : numpy.ndarray
+        The (u, v) node indices (positions in network.node_ids) per edge.
+    edge_lengths : numpy.ndarray
+        The length (in meters) per edge.
+    segment_edges : numpy.ndarray
+        The edge index per segment.
+    segment_tree : scipy.spatial.cKDTree
+        The spatial index over the projected segment midpoints.
+
+    Methods:
+    -------
+    get_candidates(points: Sequence, radius: float, max_candidates: int) -> List[Candidates]
+        Find the candidate edges of many GPS samples at once.
+    get_distances(sources: numpy.ndarray) -> numpy.ndarray
+        Shortest path distances (in meters) from nodes to all nodes, cached per source node.
+    get_match(candidates: Candidates, i: int) -> Match
+        Convert a candidate to a Match.
+    """
+
+    def __init__(self,
+                 network: StreetNetwork,
+                 max_segment_length: float = 50.0,
+                 max_route_distance: float = 2000.0,
+                 cache_size: int = 512) -> None:
+        """
+        Initialize a new EdgeIndex.
+
+        Parameters:
+        ----------
+        network : StreetNetwork
+            The street network.
+        max_segment_length : float, optional
+            The maximum length of an indexed segment in meters. Default is 50.
+        max_route_distance : float, optional
+            Shortest paths are only searched up to this distance in meters. Default is 2000.
+        cache_size : int, optional
+            The number of source nodes whose shortest path distances are cached. Default is 512.
+        """
+        self.network = network
+        self.max_route_distance: float = max_route_distance
+        self.cache_size: int = cache_size
+        self._distances: 'OrderedDict[int, np.ndarray]' = OrderedDict()
+
+        best: Dict[Tuple[int, int], Tuple[float, Any]] = {}
+        for u, v, data in network.graph.edges(data=True):
+            length = float(data.get('length', 0.0))
+            if (u, v) not in best or length < best[(u, v)][0]:
+                best[(u, v)] = (length, data.get('geometry'))
+
+        edge_nodes, edge_lengths = [], []
+        starts, ends, start_coordinates, end_coordinates, edges, offsets, scales = [], [], [], [], [], [], []
+        for edge, ((u, v), (length, geometry)) in enumerate(best.items()):
+            if geometry is not None:
+                coordinates = np.array([(lat, lon) for lon, lat in geometry.coords], dtype=float)
+            else:
+                coordinates = network.node_coordinates[[network.get_node_index(u), network.get_node_index(v)]]
+            projected = network.project(coordinates)
+            piece_lengths = np.hypot(*np.diff(projected, axis=0).T)
+            total = float(piece_lengths.sum())
+            length = length if length > 0 else total
+            scale = length / total if total > 0 else 0.0
+
+            # Split the pieces of the geometry into segments of at most max_segment_length
+            cumulative = 0.0
+            for i, piece_length in enumerate(piece_lengths):
+                splits = max(1, math.ceil(piece_length / max_segment_length))
+                fractions = np.linspace(0, 1, splits + 1)
+                points = projected[i] + fractions[:, None] * (projected[i + 1] - projected[i])
+                latlons = coordinates[i] + fractions[:, None] * (coordinates[i + 1] - coordinates[i])
+                starts.append(points[:-1])
+                ends.append(points[1:])
+                start_coordinates.append(latlons[:-1])
+                end_coordinates.append(latlons[1:])
+                edges.append(np.full(splits, edge))
+                scales.append(np.full(splits, scale))
+                offsets.append((cumulative + fractions[:-1] * piece_length) * scale)
+                cumulative += piece_length
+            edge_nodes.append((network.get_node_index(u), network.get_node_index(v)))
+            edge_lengths.append(length)
+
+        self.edge_nodes: np.ndarray = np.array(edge_nodes, dtype=np.int64).reshape(-1, 2)
+        self.edge_lengths: np.ndarray = np.array(edge_lengths, dtype=float)
+        self.segment_edges: np.ndarray = np.concatenate(edges) if edges else np.empty(0, dtype=np.int64)
+        self._segment_starts = np.concatenate(starts) if starts else np.empty((0, 2))
+        self._segment_vectors = (np.concatenate(ends) - self._segment_starts) if ends else np.empty((0, 2))
+        self._segment_lengths2 = np.maximum((self._segment_vectors ** 2).sum(axis=1), 1e-12)
+        self._segment_scales = np.concatenate(scales) if scales else np.empty(0)  # Edge length / geometry length
+        self._segment_offsets = np.concatenate(offsets) if offsets else np.empty(0)
+        self._start_coordinates = np.concatenate(start_coordinates) if start_coordinates else np.empty((0, 2))
+        self._coordinate_vectors = (np.concatenate(end_coordinates) - self._start_coordinates) if end_coordinates else np.empty((0, 2))
+        self._padding = float(np.sqrt(self._segment_lengths2.max()) / 2) if len(self.segment_edges) else 0.0
+        self.segment_tree = cKDTree(self._segment_starts + self._segment_vectors / 2)
+
+    def get_candidates(self, points: Sequence[Sequence[float]], radius: float = 50.0, max_candidates: int = 8) -> List[Candidates]:
+        """
+        Find the candidate edges of many GPS samples at once.
+
+        Parameters:
+        ----------
+        points : sequence
+            The (latitude, longitude) of the samples.
+        radius : float, optional
+            The maximum distance (in meters) between a sample and a candidate edge. Default is 50.
+        max_candidates : int, optional
+            The maximum number of candidate edges per sample (the nearest). Default is 8.
+
+        Returns:
+        -------
+        list
+            The Candidates per sample (empty if no edge is within the radius).
+        """
+        projected = self.network.project(points)
+        neighbors = self.segment_tree.query_ball_point(projected, r=radius + self._padding)
+        counts = np.fromiter((len(n) for n in neighbors), dtype=np.int64, count=len(projected))
+        segments = np.fromiter((s for n in neighbors for s in n), dtype=np.int64, count=int(counts.sum()))
+        samples = np.repeat(np.arange(len(projected)), counts)
+
+        # Nearest position on each segment
+        t = np.clip(((projected[samples] - self._segment_starts[segments]) * self._segment_vectors[segments]).sum(axis=1)
+                    / self._segment_lengths2[segments], 0.0, 1.0)
+        nearest = self._segment_starts[segments] + t[:, None] * self._segment_vectors[segments]
+        distances = np.hypot(*(projected[samples] - nearest).T)
+        within = distances <= radius
+        samples, segments, t, distances = samples[within], segments[within], t[within], distances[within]
+        edges = self.segment_edges[segments]
+
+        # Keep the nearest segment per (sample, edge), then the nearest edges per sample
+        order = np.lexsort((distances, edges, samples))
+        samples, segments, t, distances, edges = samples[order], segments[order], t[order], distances[order], edges[order]
+        first = np.ones(len(samples), dtype=bool)
+        first[1:] = (samples[1:] != samples[:-1]) | (edges[1:] != edges[:-1])
+        samples, segments, t, distances, edges = samples[first], segments[first], t[first], distances[first], edges[first]
+        order = np.lexsort((distances, samples))
+        samples, segments, t, distances, edges = samples[order], segments[order], t[order], distances[order], edges[order]
+        group_starts = np.searchsorted(samples, samples, side='left')
+        keep = (np.arange(len(samples)) - group_starts) < max_candidates
+        samples, segments, t, distances, edges = samples[keep], segments[keep], t[keep], distances[keep], edges[keep]
+
+        offsets = self._segment_offsets[segments] + t * np.sqrt(self._segment_lengths2[segments]) * self._segment_scales[segments]
+        positions = self._start_coordinates[segments] + t[:, None] * self._coordinate_vectors[segments]
+        bounds = np.searchsorted(samples, np.arange(len(projected) + 1))
+        return [Candidates(edges[a:b], offsets[a:b], distances[a:b], positions[a:b], projected[i])
+                for i, (a, b) in enumerate(zip(bounds[:-1], bounds[1:]))]
+
+    def get_distances(self, sources: np.ndarray) -> np.ndarray:
+        """
+        Get the shortest path distances (in meters) from nodes to all nodes, up to max_route_distance.
+
+        Parameters:
+        ----------
+        sources : numpy.ndarray
+            The source node indices.
+
+        Returns:
+        -------
+        numpy.ndarray
+            A (len(sources) x number of nodes) array; unreachable nodes are inf.
+        """
+        missing = [int(source) for source in dict.fromkeys(sources.tolist()) if source not in self._distances]
+        if missing:
+            rows = dijkstra(self.network.get_csr('length'), indices=missing, limit=self.max_route_distance)
+            for source, row in zip(missing, np.atleast_2d(rows)):
+                self._distances[source] = row.astype(np.float32)
+        for source in sources.tolist():
+            self._distances.move_to_end(source)
+        while len(self._distances) > self.cache_size:
+            self._distances.popitem(last=False)
+        return np.stack([self._distances[source] for source in sources.tolist()])
+
+    def get_match(self, candidates: Candidates, i: int) -> Match:
+        """
+        Convert the i-th candidate of a sample to a Match.
+        """
+        u, v = self.edge_nodes[candidates.edges[i]]
+        return Match(edge=(int(self.network.node_ids[u]), int(self.network.node_ids[v])),
+                     offset=float(candidates.offsets[i]),
+                     distance=float(candidates.distances[i]),
+                     position=[float(candidates.positions[i][0]), float(candidates.positions[i][1])])
+
+
+class OnlineMapMatcher:
+    """
+    Matches a live stream of GPS samples of one vehicle with a sliding-window Viterbi.
+
+    Every update costs one candidate query, one (max_candidates x max_candidates) transition matrix
+    and at most 'window' backtracking steps, independent of the length of the stream. A sample is
+    finalized when it leaves the window, or when the chain breaks (no candidate edge within the radius,
+    or no route between the candidates of consecutive samples).
+
+    Instance Attributes:
+    ----------
+    index : EdgeIndex
+        The edges to match on.
+    sigma : float
+        The standard deviation of the GPS noise in meters.
+    beta : float
+        The expected difference (in meters) between the driven and the straight-line distance.
+    radius : float
+        The maximum distance (in meters) between a sample and a candidate edge.
+    max_candidates : int
+        The maximum number of candidate edges per sample.
+    window : int
+        The number of samples kept for smoothing before they are finalized.
+    finalized : collections.deque
+        The finalized matches (None for samples without a candidate), in sample order; consumers pop them.
+
+    Methods:
+    -------
+    update(latitude: float, longitude: float) -> Optional[Match]
+        Add a sample; returns the current best match of it.
+    flush() -> None
+        Finalize all samples in the window.
+    """
+
+    def __init__(self,
+                 index: EdgeIndex,
+                 sigma: float = 10.0,
+                 beta: float = 10.0,
+                 radius: float = 50.0,
+                 max_candidates: int = 8,
+                 window: int = 10) -> None:
+        """
+        Initialize a new OnlineMapMatcher.
+
+        Parameters:
+        ----------
+        index : EdgeIndex
+            The edges to match on.
+        sigma : float, optional
+            The standard deviation of the GPS noise in meters. Default is 10.
+        beta : float, optional
+            The scale (in meters) of the transition probability. Default is 10.
+        radius : float, optional
+            The maximum distance (in meters) between a sample and a candidate edge. Default is 50.
+        max_candidates : int, optional
+            The maximum number of candidate edges per sample. Default is 8.
+        window : int, optional
+            The number of samples kept for smoothing. Default is 10.
+        """
+        self.index: EdgeIndex = index
+        self.sigma: float = sigma
+        self.beta: float = beta
+        self.radius: float = radius
+        self.max_candidates: int = max_candidates
+        self.window: int = window
+        self.finalized: Deque[Optional[Match]] = deque()
+        self._steps: Deque[Tuple[Candidates, np.ndarray]] = deque()  # (candidates, back pointers) per sample
+        self._scores: Optional[np.ndarray] = None
+
+    def update(self, latitude: float, longitude: float) -> Optional[Match]:
+        """
+        Add a GPS sample.
+
+        Parameters:
+        ----------
+        latitude : float
+            The latitude of the sample.
+        longitude : float
+            The longitude of the sample.
+
+        Returns:
+        -------
+        Match
+            The current best match of the sample, or None if no edge is within the radius.
+        """
+        return self.update_candidates(self.index.get_candidates([(latitude, longitude)], self.radius, self.max_candidates)[0])
+
+    def update_candidates(self, candidates: Candidates) -> Optional[Match]:
+        """
+        Add a GPS sample by its candidates (see EdgeIndex.get_candidates()).
+        """
+        if len(candidates) == 0:
+            self.flush()
+            self.finalized.append(None)
+            return None
+
+        emission = -0.5 * (candidates.distances / self.sigma) ** 2
+        pointers = np.full(len(candidates), -1, dtype=np.int64)
+        if self._steps:
+            transition = self._get_transition(self._steps[-1][0], candidates)
+            total = self._scores[:, None] + transition
+            pointers = total.argmax(axis=0)
+            scores = total[pointers, np.arange(len(candidates))] + emission
+            if not np.isfinite(scores).any():
+                self.flush()  # No route from the previous sample: start a new chain
+                pointers = np.full(len(candidates), -1, dtype=np.int64)
+                scores = emission
+        else:
+            scores = emission
+
+        self._steps.append((candidates, pointers))
+        self._scores = scores - scores.max()  # Normalized, so scores stay bounded on long streams
+        if len(self._steps) > self.window:
+            self._finalize(1)
+        return self.index.get_match(candidates, int(self._scores.argmax()))
+
+    def _get_transition(self, previous: Candidates, current: Candidates) -> np.ndarray:
+        """
+        The log transition probabilities between the candidates of two consecutive samples.
+        """
+        index = self.index
+        straight = float(np.hypot(*(current.point - previous.point)))
+        previous_nodes, current_nodes = index.edge_nodes[previous.edges], index.edge_nodes[current.edges]
+        distances = index.get_distances(previous_nodes[:, 1])[:, current_nodes[:, 0]]
+        driven = (index.edge_lengths[previous.edges] - previous.offsets)[:, None] + distances + current.offsets[None, :]
+
+        # Along the same edge; backward moves within the noise of two samples (2 sigma) are not U-turns
+        same = previous.edges[:, None] == current.edges[None, :]
+        along = current.offsets[None, :] - previous.offsets[:, None]
+        driven = np.where(same & (along >= -2 * self.sigma), np.abs(along), driven)
+        return np.where(np.isfinite(driven), -np.abs(driven - straight) / self.beta, -np.inf)
+
+    def _finalize(self, count: int) -> None:
+        """
+        Finalize the oldest 'count' samples of the window by backtracking from the current best candidate.
+        """
+        best = int(self._scores.argmax())
+        path = []
+        for candidates, pointers in reversed(self._steps):
+            path.append((candidates, best))
+            best = int(pointers[best])
+        path.reverse()
+        for candidates, best in path[:count]:
+            self.finalized.append(self.index.get_match(candidates, best))
+            self._steps.popleft()
+
+    def flush(self) -> None:
+        """
+        Finalize all samples in the window.
+        """
+        if self._steps:
+            self._finalize(len(self._steps))
+        self._scores = None
+
+
+def match_trace(index: EdgeIndex, points: Sequence[Sequence[float]], **parameters: Any) -> List[Optional[Match]]:
+    """
+    Match a recorded GPS trace at once, with the candidates of all samples generated in one batch.
+
+    Parameters
+    ----------
+    index : EdgeIndex
+        The edges to match on.
+    points : sequence
+        The (latitude, longitude) of the samples, in time order.
+    **parameters
+        The sigma, beta, radius and max_candidates of the HMM (see OnlineMapMatcher).
+
+    Returns
+    -------
+    list
+        The Match per sample, or None for samples without a candidate edge.
+    """
+    matcher = OnlineMapMatcher(index, window=max(1, len(points)), **parameters)
+    for candidates in index.get_candidates(points, matcher.radius, matcher.max_candidates):
+        matcher.update_candidates(candidates)
+    matcher.flush()
+    return list(matcher.finalized)
+
+
+def get_route_distance(network: StreetNetwork, nodes: List[int], match: Match) -> Optional[float]:
+    """
+    Get the distance driven along a route (e.g., Route.nodes) up to a matched position.
+
+    Parameters
+    ----------
+    network : StreetNetwork
+        The street network of the route.
+    nodes : list of int
+        The node IDs of the route.
+    match : Match
+        The matched position.
+
+    Returns
+    -------
+    float or None
+        The distance in meters from the start of the route, or None if the matched edge is not on the route.
+    """
+    for i, edge in enumerate(zip(nodes[:-1], nodes[1:])):
+        if edge == match.edge:
+            return network.get_route_length(nodes[:i + 1]) + match.offset
+    return None
@@ -1,5 +1,13 @@
-from folium import Icon
-from typing import Any
+import copy
+
+from folium import CustomIcon, FeatureGroup, GeoJson, GeoJsonPopup, GeoJsonTooltip, Icon, Map, Marker
+from folium.plugins import Fullscreen
+from folium.utilities import image_to_url
+from functools import lru_cache
+from typing import Any, Dict, List
+
+VEHICLE_ICON_PATH = 'images/terminal_tractor.png'
+VEHICLE_ICON_WIDTH = 50
 
 def create_custom_icon(
     icon: str = 'info-sign',
@@ -28,4 +36,125 @@ def create_custom_icon(
 
 
     """
-    return Icon(icon=icon, color=color, icon_color=icon_color, prefix=prefix)
\ No newline at end of file
+    return Icon(icon=icon, color=color, icon_color=icon_color, prefix=prefix)
+
+@lru_cache(maxsize=None)
+def get_icon_url(icon_path: str) -> str:
+    """
+    Encode an image file as a data URL, once per process.
+
+    Parameters
+    ----------
+    icon_path : str
+        The path to the image file.
+
+    Returns
+    -------
+    str
+        The data URL of the image.
+    """
+    return image_to_url(icon_path)
+
+def get_vehicle_features(vehicles: List[Any]) -> Dict[str, Any]:
+    """
+    Describe the current vehicle positions as a GeoJSON FeatureCollection.
+
+    Only the coordinates (and a few short properties) change between ticks, so this is
+    all that needs to be recomputed and sent to the browser on a refresh.
+
+    Parameters
+    ----------
+    vehicles : list of Vehicle
+        The vehicles to include. Vehicles without a position are skipped.
+
+    Returns
+    -------
+    dict
+        A GeoJSON FeatureCollection with one Point feature per vehicle.
+    """
+    features = []
+    for vehicle in vehicles:
+        if vehicle.position is None:
+            continue
+        lat, lng = vehicle.position
+        features.append({
+            'type': 'Feature',
+            'id': vehicle.id,
+            'geometry': {'type': 'Point', 'coordinates': [lng, lat]},  # GeoJSON uses [lng, lat]
+            'properties': {
+                'name': vehicle.name,
+                'status': vehicle.status,
+                'trip': vehicle.current_trip.name if vehicle.current_trip is not None else '',
+                'progress': vehicle.current_trip.progress if vehicle.current_trip is not None else 0,
+            },
+        })
+    return {'type': 'FeatureCollection', 'features': features}
+
+def create_vehicle_layer(features: Dict[str, Any], name: str = "Vehicles") -> GeoJson:
+    """
+    Create the map layer showing all vehicles.
+
+    All vehicles share one marker template, so the vehicle icon is included once per layer
+    instead of once per vehicle, and its image is read and encoded only once per process.
+
+    Parameters
+    ----------
+    features : dict
+        The vehicle positions, see get_vehicle_features().
+    name : str, optional
+        The name of the layer (default is 'Vehicles').
+
+    Returns
+    -------
+    folium.GeoJson
+        The GeoJson layer with one marker per vehicle.
+    """
+    icon = CustomIcon(
+        icon_image=get_icon_url(VEHICLE_ICON_PATH),
+        icon_size=(VEHICLE_ICON_WIDTH, VEHICLE_ICON_WIDTH / 2.3)
+    )
+    # folium validates the tooltip/popup fields against the data, which fails without features
+    has_features = bool(features['features'])
+    return GeoJson(
+        features,
+        name=name,
+        marker=Marker(icon=icon),
+        tooltip=GeoJsonTooltip(fields=['name', 'status'], labels=False) if has_features else None,
+        popup=GeoJsonPopup(fields=['name', 'trip', 'progress']) if has_features else None,
+    )
+
+def create_static_map(center: List[float], zoom: int, static_markers: List[Marker], width: int = 1600) -> Map:
+    """
+    Create the base map with all layers that do not change between ticks.
+
+    The map, the Fullscreen plugin and the static location markers (with their popups) are
+    built once; callers should cache the result and pass a copy of it (copy.deepcopy) to
+    st_folium on every refresh, together with the dynamic layers (vehicles, destinations,
+    routes). Rendering adds elements to the markers and st_folium adds the dynamic layers to
+    the map it gets, so the cached map itself is never rendered.
+
+    Parameters
+    ----------
+    center : list of float
+        The [latitude, longitude] of the initial map center.
+    zoom : int
+        The initial zoom level.
+    static_markers : list of folium.Marker
+        The markers of the static locations (e.g., docks, parkings, entrances). The map holds
+        copies, so the markers of the locations are not changed.
+    width : int, optional
+        The width of the map in pixels (default is 1600).
+
+    Returns
+    -------
+    folium.Map
+        The (not yet rendered) base map.
+    """
+    m = Map(location=center, zoom_start=zoom, width=width)
+    Fullscreen().add_to(m)
+
+    fg_locations = FeatureGroup(name="Microhubs")
+    for marker in static_markers:
+        fg_locations.add_child(copy.deepcopy(marker))
+    fg_locations.add_to(m)
+    return m
@@ -4,9 +4,15 @@ and for calculating routes, distances, and (interpolated) vehicle positions.
 """
 
 import osmnx as ox
+import bisect
 import math
+import networkx as nx
+import numpy as np
 import pandas as pd
-from typing import List, Tuple, Any
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+from scipy.spatial import cKDTree
+from typing import Dict, List, Optional, Tuple, Any
 
 def get_graph_from_place(query: str, network_type: str = "drive") -> Any:
     """
@@ -31,14 +37,199 @@ def get_graph_from_place(query: str, network_type: str = "drive") -> Any:
     G = ox.routing.add_edge_travel_times(G)
     return G
 
+class StreetNetwork:
+    """
+    A read-only street network with the derived data needed for routing, shared by all sessions.
+
+    The graph is frozen, so it can safely be referenced from every Streamlit session (and
+    thread) at the same time. On top of it, a node index (KD-tree) answers nearest-node
+    queries without rebuilding a spatial index per query, and the edges are stored as CSR
+    arrays per weight so shortest paths run on scipy instead of on the networkx dicts.
+
+    Parameters
+    ----------
+    G : networkx.MultiDiGraph
+        The street network graph (e.g., from get_graph_from_place()).
+
+    Attributes
+    ----------
+    graph : networkx.MultiDiGraph
+        The frozen street network graph.
+    node_ids : numpy.ndarray
+        The OSM node IDs, the position in this array is the node's index in the CSR arrays.
+    node_coordinates : numpy.ndarray
+        The (latitude, longitude) per node index.
+    node_index : scipy.spatial.cKDTree
+        The spatial index over the (locally projected) node coordinates.
+    """
+
+    def __init__(self, G: Any) -> None:
+        self.graph = nx.freeze(G)
+        self.node_ids = np.fromiter(G.nodes, dtype=np.int64, count=G.number_of_nodes())
+        self.node_coordinates = np.array([(G.nodes[node]['y'], G.nodes[node]['x']) for node in self.node_ids], dtype=float).reshape(-1, 2)
+        self._positions: Dict[int, int] = {int(node): i for i, node in enumerate(self.node_ids)}
+
+        # Equirectangular projection around the network's center; accurate enough for nearest-node lookups
+        self._reference_latitude = math.radians(float(self.node_coordinates[:, 0].mean())) if len(self.node_ids) else 0.0
+        self.node_index = cKDTree(self.project(self.node_coordinates))
+        self._csr: Dict[str, csr_matrix] = {}
+
+    def project(self, coordinates: np.ndarray) -> np.ndarray:
+        """
+        Project (latitude, longitude) pairs to meters on a local plane around the network's center.
+
+        Parameters
+        ----------
+        coordinates : array-like
+            One (latitude, longitude) pair or an (n, 2) array of them.
+
+        Returns
+        -------
+        numpy.ndarray
+            The (n, 2) array of (x, y) positions in meters, the plane of node_index.
+        """
+        R = 6371000  # Earth's radius in meters
+        coordinates = np.radians(np.asarray(coordinates, dtype=float).reshape(-1, 2))
+        return np.column_stack((coordinates[:, 1] * math.cos(self._reference_latitude) * R, coordinates[:, 0] * R))
+
+    def get_node_index(self, node: int) -> int:
+        """
+        Get the index of a node, its position in node_ids, node_coordinates and the CSR arrays.
+
+        Parameters
+        ----------
+        node : int
+            The OSM node ID.
+
+        Returns
+        -------
+        int
+            The node index.
+        """
+        return self._positions[int(node)]
+
+    def get_csr(self, weight: str = "travel_time") -> csr_matrix:
+        """
+        Get the adjacency matrix of the network in CSR form for an edge weight, built once per weight.
+
+        Parallel edges are collapsed to the one with the lowest weight, as in ox.shortest_path.
+        Edges without the weight attribute fall back to their length.
+
+        Parameters
+        ----------
+        weight : str, optional
+            The edge attribute to use as weight (default is "travel_time").
+
+        Returns
+        -------
+        scipy.sparse.csr_matrix
+            The (num_nodes x num_nodes) weighted adjacency matrix.
+        """
+        if weight not in self._csr:
+            best: Dict[Tuple[int, int], float] = {}
+            for u, v, data in self.graph.edges(data=True):
+                key = (self._positions[u], self._positions[v])
+                value = float(data.get(weight, data.get('length', 1.0)))
+                if key not in best or value < best[key]:
+                    best[key] = value
+            n = len(self.node_ids)
+            if best:
+                keys = np.array(list(best.keys()), dtype=np.int64)
+                rows, cols = keys[:, 0], keys[:, 1]
+                values = np.fromiter(best.values(), dtype=float, count=len(best))
+            else:
+                rows = cols = np.empty(0, dtype=np.int64)
+                values = np.empty(0, dtype=float)
+            order = np.lexsort((cols, rows))
+            indptr = np.zeros(n + 1, dtype=np.int64)
+            np.cumsum(np.bincount(rows, minlength=n), out=indptr[1:])
+            # Build from (data, indices, indptr) so zero-weight edges stay explicit edges
+            self._csr[weight] = csr_matrix((values[order], cols[order], indptr), shape=(n, n))
+        return self._csr[weight]
+
+    def get_nearest_node(self, latitude: float, longitude: float) -> int:
+        """
+        Get the ID of the node nearest to a coordinate.
+
+        Parameters
+        ----------
+        latitude : float
+            The latitude of the coordinate.
+        longitude : float
+            The longitude of the coordinate.
+
+        Returns
+        -------
+        int
+            The nearest node ID.
+        """
+        _, i = self.node_index.query(self.project([latitude, longitude])[0])
+        return int(self.node_ids[i])
+
+    def get_shortest_path(self, orig: Tuple[float, float], dest: Tuple[float, float], weight: str = "travel_time") -> Optional[List[int]]:
+        """
+        Calculate the shortest path between two locations by minimizing the specified weight.
+
+        Parameters
+        ----------
+        orig : tuple of float
+            The (latitude, longitude) for the origin.
+        dest : tuple of float
+            The (latitude, longitude) for the destination.
+        weight : str, optional
+            The edge attribute to minimize (default is "travel_time").
+
+        Returns
+        -------
+        list of int or None
+            A list of node IDs representing the shortest path, or None if the destination is unreachable.
+        """
+        source = self._positions[self.get_nearest_node(*orig)]
+        target = self._positions[self.get_nearest_node(*dest)]
+        _, predecessors = dijkstra(self.get_csr(weight), indices=source, return_predecessors=True)
+        if source != target and predecessors[target] < 0:
+            return None
+        path = [target]
+        while path[-1] != source:
+            path.append(predecessors[path[-1]])
+        return [int(self.node_ids[i]) for i in reversed(path)]
+
+    def get_route_length(self, route: List[int]) -> int:
+        """
+        Calculate the total length of a route in meters from the CSR arrays of the 'length' weight.
+
+        Parallel edges count with their shortest length, as in ox.routing.route_to_gdf.
+
+        Parameters
+        ----------
+        route : list of int
+            A list of node IDs representing the route.
+
+        Returns
+        -------
+        int
+            The total route length (rounded to the nearest meter).
+        """
+        if len(route) < 2:
+            return 0
+        indices = np.array([self._positions[node] for node in route], dtype=np.int64)
+        lengths = self.get_csr('length')[indices[:-1], indices[1:]]
+        return round(float(np.asarray(lengths).sum()))
+
+def get_network_graph(G: Any) -> Any:
+    """
+    Return the networkx graph of a StreetNetwork, or G itself if it already is a graph.
+    """
+    return G.graph if isinstance(G, StreetNetwork) else G
+
 def get_nearest_nodes(G: Any, origin: Tuple[float, float], destination: Tuple[float, float]) -> List[int]:
     """
     Get the nearest network nodes to the specified origin and destination coordinates.
 
     Parameters
     ----------
-    G : networkx.MultiDiGraph
-        The street network graph.
+    G : networkx.MultiDiGraph or StreetNetwork
+        The street network graph. A StreetNetwork uses its prebuilt node index.
     origin : tuple of float
         The (latitude, longitude) for the origin.
     destination : tuple of float
@@ -49,6 +240,8 @@ def get_nearest_nodes(G: Any, origin: Tuple[float, float], destination: Tuple[fl
     list of int
         The nearest node IDs for origin and destination.
     """
+    if isinstance(G, StreetNetwork):
+        return [G.get_nearest_node(*origin), G.get_nearest_node(*destination)]
     orig = ox.distance.nearest_nodes(G, Y=origin[0], X=origin[1])
     dest = ox.distance.nearest_nodes(G, Y=destination[0], X=destination[1])
     return [orig, dest]
@@ -68,8 +261,8 @@ def get_shortest_path(G: Any, orig: Tuple[float, float], dest: Tuple[float, floa
 
     Parameters
     ----------
-    G : networkx.MultiDiGraph
-        The street network graph.
+    G : networkx.MultiDiGraph or StreetNetwork
+        The street network graph. A StreetNetwork uses its node index and CSR arrays.
     orig : tuple of float
         The (latitude, longitude) for the origin.
     dest : tuple of float
@@ -82,6 +275,8 @@ def get_shortest_path(G: Any, orig: Tuple[float, float], dest: Tuple[float, floa
     list of int
         A list of node IDs representing the shortest path.
     """
+    if isinstance(G, StreetNetwork):
+        return G.get_shortest_path(orig, dest, weight=weight)
     nodes = get_nearest_nodes(G, orig, dest)
     route = ox.shortest_path(G, nodes[0], nodes[1], weight=weight)
     return route
@@ -92,8 +287,8 @@ def get_route_length(G: Any, route: List[int]) -> int:
 
     Parameters
     ----------
-    G : networkx.MultiDiGraph
-        The street network graph.
+    G : networkx.MultiDiGraph or StreetNetwork
+        The street network graph. A StreetNetwork uses its CSR arrays.
     route : list of int
         A list of node IDs representing the route.
 
@@ -102,7 +297,9 @@ def get_route_length(G: Any, route: List[int]) -> int:
     int
         The total route length (rounded to the nearest meter).
     """
-    edge_lengths = ox.routing.route_to_gdf(G, route)["length"]
+    if isinstance(G, StreetNetwork):
+        return G.get_route_length(route)
+    edge_lengths = ox.routing.route_to_gdf(get_network_graph(G), route)["length"]
     return round(sum(edge_lengths))
 
 def get_coordinates(G: Any, nodes: List[int]) -> List[Tuple[float, float]]:
@@ -111,7 +308,7 @@ def get_coordinates(G: Any, nodes: List[int]) -> List[Tuple[float, float]]:
 
     Parameters
     ----------
-    G : networkx.MultiDiGraph
+    G : networkx.MultiDiGraph or StreetNetwork
         The street network graph.
     nodes : list of int
         A list of node IDs.
@@ -121,6 +318,7 @@ def get_coordinates(G: Any, nodes: List[int]) -> List[Tuple[float, float]]:
     list of tuple of float
         A list of (latitude, longitude) tuples.
     """
+    G = get_network_graph(G)
     return [(G.nodes[node]['y'], G.nodes[node]['x']) for node in nodes]
 
 def haversine(coord1: Tuple[float, float], coord2: Tuple[float, float]) -> float:
@@ -150,7 +348,26 @@ def haversine(coord1: Tuple[float, float], coord2: Tuple[float, float]) -> float
     c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
     return R * c
 
-def get_interpolated_position(polyline: List[Tuple[float, float]], progress: float) -> Tuple[float, float]:
+def get_cumulative_distances(polyline: List[Tuple[float, float]]) -> List[float]:
+    """
+    Compute the cumulative distance along a polyline at each of its points.
+
+    Parameters
+    ----------
+    polyline : list of tuple of float
+        A list of (latitude, longitude) tuples describing the polyline.
+
+    Returns
+    -------
+    list of float
+        The distance in meters from the first point to each point (the first value is 0).
+    """
+    cumulative = [0.0]
+    for i in range(len(polyline) - 1):
+        cumulative.append(cumulative[-1] + haversine(polyline[i], polyline[i + 1]))
+    return cumulative
+
+def get_interpolated_position(polyline: List[Tuple[float, float]], progress: float, cumulative: Optional[List[float]] = None) -> Tuple[float, float]:
     """
     Compute the interpolated position along a polyline based on a progress percentage.
 
@@ -160,6 +377,9 @@ def get_interpolated_position(polyline: List[Tuple[float, float]], progress: flo
         A list of (latitude, longitude) tuples describing the polyline.
     progress : float
         The progress percentage (0 to 100) along the polyline.
+    cumulative : list of float, optional
+        The cumulative distances of the polyline, see get_cumulative_distances().
+        Pass these when interpolating the same polyline repeatedly to avoid recomputing them.
 
     Returns
     -------
@@ -168,18 +388,19 @@ def get_interpolated_position(polyline: List[Tuple[float, float]], progress: flo
     """
     if progress >= 100:
         return polyline[-1]
+    if cumulative is None:
+        cumulative = get_cumulative_distances(polyline)
 
-    total_length = sum(haversine(polyline[i], polyline[i + 1]) for i in range(len(polyline) - 1))
-    target_distance = total_length * (progress / 100)
-    distance_covered = 0.0
+    target_distance = cumulative[-1] * (progress / 100)
 
-    for i in range(len(polyline) - 1):
-        segment_length = haversine(polyline[i], polyline[i + 1])
-        if distance_covered + segment_length >= target_distance:
-            segment_progress = (target_distance - distance_covered) / segment_length
-            lat = polyline[i][0] + segment_progress * (polyline[i + 1][0] - polyline[i][0])
-            lon = polyline[i][1] + segment_progress * (polyline[i + 1][1] - polyline[i][1])
-            return (lat, lon)
-        distance_covered += segment_length
-
-    return polyline[-1]
+    # Find the segment containing the target distance
+    i = max(bisect.bisect_left(cumulative, target_distance) - 1, 0)
+    if i >= len(polyline) - 1:
+        return polyline[-1]
+    segment_length = cumulative[i + 1] - cumulative[i]
+    if segment_length == 0:
+        return polyline[i]
+    segment_progress = (target_distance - cumulative[i]) / segment_length
+    lat = polyline[i][0] + segment_progress * (polyline[i + 1][0] - polyline[i][0])
+    lon = polyline[i][1] + segment_progress * (polyline[i + 1][1] - polyline[i][1])
+    return (lat, lon)
@@ -0,0 +1,848 @@
+"""
+Module for exchanging OTM5 trip messages (https://otm5.opentripmodel.org/) with the model in bulk.
+
+Import
+
+Messages are streamed from a directory of JSON files (such as example_otm_messages/generated_trips),
+a JSON file, an NDJSON feed (one message per line) or an uploaded file, and are imported in batches:
+
+1. Parse: the 'move' actions of each message become legs between locations. Locations are resolved
+   by their OTM id through a LocationIndex (a dict lookup instead of a scan of all locations).
+2. Route: the distinct legs that are not in the route cache yet are routed once, in-process or over
+   a ProcessPoolExecutor that receives the street network once through its initializer.
+3. Register: the Trip, Action, Route, Location and Constraint objects of the whole batch are created
+   while holding the model lock once, so the ticker and the page never see a half-imported trip.
+
+Other OTM action types (e.g., attachTransportEquipment, load) are not modelled yet and are skipped.
+
+Export
+The OTMExporter converts the live Trip, Action, Vehicle and Location objects to OTM entities. Entities
+are converted in batches while holding the model lock and written one by one (NDJSON or a JSON list),
+so the size of an export is not limited by memory. Locations, vehicles and constraints are converted
+once per export and shared by all trips. JSON is encoded with orjson if it is installed.
+"""
+
+import json
+import math
+import os
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from functools import lru_cache
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from folium import PolyLine
+
+from utils.classes import Action, Constraint, Location, Route, Trip, Vehicle
+from utils.entities import create_action, get_location_type
+from utils.osmnx import get_coordinates, get_route_length, get_shortest_path, haversine
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the json module is used without it
+    orjson = None
+
+# Read-only street network shared with the worker processes (set once by _init_worker)
+_NETWORK: Any = None
+
+# (nodes, length in meters, coordinates) of a routed leg
+RouteData = Tuple[Optional[List[int]], int, List[Tuple[float, float]]]
+
+
+def loads(data: Any) -> Any:
+    """
+    Decode JSON, with orjson if it is installed.
+
+    Parameters
+    ----------
+    data : bytes or str
+        The JSON document.
+
+    Returns
+    -------
+    Any
+        The decoded data.
+    """
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def _default(value: Any) -> Any:
+    """
+    Convert values that JSON cannot encode (numpy scalars, datetimes).
+    """
+    if hasattr(value, 'item'):
+        return value.item()
+    if isinstance(value, datetime):
+        return format_datetime(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(data: Any, indent: bool = False) -> bytes:
+    """
+    Encode data as UTF-8 JSON, with orjson if it is installed.
+
+    Parameters
+    ----------
+    data : Any
+        The data to encode.
+    indent : bool, optional
+        Indent the output (two spaces with orjson, four with json). Default is False (compact).
+
+    Returns
+    -------
+    bytes
+        The JSON document.
+    """
+    if orjson is not None:
+        option = orjson.OPT_PASSTHROUGH_DATETIME | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(data, default=_default, option=option)
+    if indent:
+        return json.dumps(data, default=_default, indent=4, ensure_ascii=False).encode('utf-8')
+    return json.dumps(data, default=_default, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def read_otm_messages(source: Any) -> Iterator[Dict[str, Any]]:
+    """
+    Stream OTM messages from a directory, a file or a file-like object.
+
+    Parameters
+    ----------
+    source : str or file-like
+        A directory (all *.json, *.ndjson and *.jsonl files, in name order), a path to a JSON file
+        (one message or a list of messages) or an NDJSON file (one message per line), or an open
+        file-like object with a 'name' (e.g., a Streamlit upload).
+
+    Yields
+    ------
+    dict
+        The OTM trip messages.
+    """
+    if isinstance(source, (str, os.PathLike)) and os.path.isdir(source):
+        for file_name in sorted(os.listdir(source)):
+            if file_name.endswith(('.json', '.ndjson', '.jsonl')):
+                yield from read_otm_messages(os.path.join(source, file_name))
+        return
+
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            yield from _read_file(f, str(source))
+    else:
+        yield from _read_file(source, getattr(source, 'name', ''))
+
+
+def _read_file(f: Any, name: str) -> Iterator[Dict[str, Any]]:
+    """
+    Yield the messages of an open JSON or NDJSON file.
+    """
+    if name.endswith('.json'):
+        data = loads(f.read())
+        yield from (data if isinstance(data, list) else [data])
+        return
+    for line in f:
+        line = line.strip()
+        if line:
+            yield loads(line)
+
+
+def parse_datetime(value: str) -> datetime:
+    """
+    Parse an OTM (ISO 8601) timestamp to a naive local datetime, like the model's clock.
+
+    Parameters
+    ----------
+    value : str
+        The timestamp, e.g. "2024-02-04T06:00:00Z".
+
+    Returns
+    -------
+    datetime
+        The timestamp in local time without timezone.
+    """
+    timestamp = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return timestamp.astimezone().replace(tzinfo=None) if timestamp.tzinfo is not None else timestamp
+
+
+@lru_cache(maxsize=65536)
+def format_datetime(value: datetime) -> str:
+    """
+    Format a naive local datetime of the model as an OTM (ISO 8601) timestamp with UTC offset.
+
+    Parameters
+    ----------
+    value : datetime
+        The timestamp in local time without timezone, like the model's clock.
+
+    Returns
+    -------
+    str
+        The timestamp, e.g. "2024-02-04T07:00:00+01:00". Cached: time windows share few distinct timestamps.
+    """
+    return value.astimezone().isoformat(timespec='seconds')
+
+
+def get_constraint_parameters(data: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Convert an OTM constraint to the parameters of a Constraint.
+
+    Parameters
+    ----------
+    data : dict, optional
+        The OTM constraint (with 'value' holding a timeWindowConstraint, a vehicleTypeConstraint or an
+        andConstraint of both, and the minimum capacity, if any, in 'externalAttributes').
+
+    Returns
+    -------
+    dict or None
+        The keyword arguments of Constraint, or None if there is no constraint or its type is not supported.
+
+    Raises
+    ------
+    ValueError
+        If the enforceability or a timestamp is not valid.
+    """
+    if not data:
+        return None
+    value = data.get('value') or {}
+    parameters = {'name': data.get('name', ''), 'enforceability': data.get('enforceability', 'enforced')}
+    if parameters['enforceability'] not in Constraint.VALID_ENFORCEABILITY:
+        raise ValueError(f"Enforceability '{parameters['enforceability']}' is not valid")
+    supported = False
+    for part in (value.get('and', []) if value.get('type') == 'andConstraint' else [value]):
+        if part.get('type') == 'timeWindowConstraint':
+            parameters['start_time'] = parse_datetime(part['startTime']) if part.get('startTime') else None
+            parameters['end_time'] = parse_datetime(part['endTime']) if part.get('endTime') else None
+            supported = True
+        elif part.get('type') == 'vehicleTypeConstraint':
+            parameters['vehicle_types'] = list(part.get('vehicleTypes', []))
+            supported = True
+    capacity = (data.get('externalAttributes') or {}).get('capacity')
+    if capacity is not None:
+        parameters['capacity'] = float(capacity)
+        supported = True
+    return parameters if supported else None
+
+
+def _get_entity(association: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Return the entity of an inline association, or {'id': ...} for an association by reference.
+    """
+    if not association:
+        return None
+    if association.get('entity'):
+        return association['entity']
+    reference = association.get('uuid') or association.get('id')
+    return {'id': reference} if reference else None
+
+
+class LocationIndex:
+    """
+    Resolves OTM location entities to Location instances by id (the Location's name) in O(1).
+
+    Locations that are not in the model yet are created from the entity's geoReference.
+
+    Instance Attributes:
+    ----------
+    by_name : dict
+        The locations by name (the OTM location id).
+    """
+
+    def __init__(self, locations: Optional[Iterable[Location]] = None) -> None:
+        """
+        Initialize a new LocationIndex.
+
+        Parameters:
+        ----------
+        locations : list, optional
+            The locations to index. Default is all locations.
+        """
+        locations = locations if locations is not None else Location.get_all_locations()
+        self.by_name: Dict[str, Location] = {location.name: location for location in locations}
+
+    def get_georeference(self, entity: Dict[str, Any]) -> Tuple[float, float]:
+        """
+        Return the (latitude, longitude) of a location entity, preferring the known location.
+
+        Raises:
+        ------
+        ValueError:
+            If the location is unknown and the entity has no geoReference.
+        """
+        location = self.by_name.get(entity.get('id'))
+        if location is not None:
+            return tuple(location.georeference)
+        georeference = entity.get('geoReference')
+        if not georeference:
+            raise ValueError(f"Unknown location '{entity.get('id')}' without geoReference")
+        return (float(georeference['lat']), float(georeference['lon']))
+
+    def resolve(self, entity: Dict[str, Any]) -> Location:
+        """
+        Return the Location of an entity, creating (and indexing) it if it does not exist yet.
+        """
+        location = self.by_name.get(entity.get('id'))
+        if location is None:
+            location = Location(georeference=list(self.get_georeference(entity)),
+                                name=entity['id'],
+                                location_type=get_location_type(entity.get('name', '')) or 'customer')
+            self.by_name[location.name] = location
+        return location
+
+
+class ImportReport:
+    """
+    The result of an OTM import.
+
+    Instance Attributes:
+    ----------
+    messages : int
+        The number of messages read.
+    trips : int
+        The number of trips created.
+    actions : int
+        The number of (move) actions created.
+    skipped_actions : int
+        The number of actions of a type that is not modelled (e.g., attachTransportEquipment).
+    duplicates : int
+        The number of messages skipped because a trip with the same OTM id was already imported.
+    routes_computed : int
+        The number of legs routed on the street network.
+    route_cache_hits : int
+        The number of legs taken from the route cache.
+    errors : list
+        (message id, error) of the messages that could not be imported.
+    trip_ids : dict
+        The ids of the created trips by OTM id.
+    seconds : float
+        The wall-clock duration of the import.
+    """
+
+    def __init__(self) -> None:
+        self.messages = 0
+        self.trips = 0
+        self.actions = 0
+        self.skipped_actions = 0
+        self.duplicates = 0
+        self.routes_computed = 0
+        self.route_cache_hits = 0
+        self.errors: List[Tuple[Any, str]] = []
+        self.trip_ids: Dict[Any, str] = {}
+        self.seconds = 0.0
+
+    @property
+    def messages_per_second(self) -> float:
+        """
+        The import throughput in messages per second.
+        """
+        return self.messages / self.seconds if self.seconds > 0 else 0.0
+
+    def __repr__(self) -> str:
+        return (f"ImportReport(messages={self.messages}, trips={self.trips}, actions={self.actions}, "
+                f"errors={len(self.errors)}, routes_computed={self.routes_computed}, "
+                f"route_cache_hits={self.route_cache_hits}, {self.messages_per_second:,.0f} messages/s)")
+
+
+def _init_worker(network: Any) -> None:
+    """
+    Store the read-only street network in the worker process.
+    """
+    global _NETWORK
+    _NETWORK = network
+
+
+def compute_route(network: Any, origin: Tuple[float, float], destination: Tuple[float, float]) -> Optional[RouteData]:
+    """
+    Route a leg on the street network, or as a straight line if there is no network.
+
+    Parameters
+    ----------
+    network : StreetNetwork or networkx.MultiDiGraph, optional
+        The street network.
+    origin : tuple of float
+        The (latitude, longitude) of the origin.
+    destination : tuple of float
+        The (latitude, longitude) of the destination.
+
+    Returns
+    -------
+    tuple or None
+        (nodes, length in meters, coordinates), or None if the destination cannot be reached.
+    """
+    if network is None:
+        return None, round(haversine(origin, destination)), [tuple(origin), tuple(destination)]
+    nodes = get_shortest_path(network, origin, destination)
+    if nodes is None:
+        return None
+    return nodes, get_route_length(network, nodes), get_coordinates(network, nodes)
+
+
+def _compute_routes(legs: List[Tuple[Tuple[float, float], Tuple[float, float]]]) -> List[Optional[RouteData]]:
+    """
+    Route a chunk of legs on the network of the worker process.
+    """
+    return [compute_route(_NETWORK, origin, destination) for origin, destination in legs]
+
+
+class OTMImporter:
+    """
+    Imports OTM trip messages into the model in batches.
+
+    Instance Attributes:
+    ----------
+    network : StreetNetwork, optional
+        The street network to route on; without a network, legs are straight lines.
+    locations : LocationIndex
+        The index used to resolve OTM location ids.
+    route_cache : dict
+        The routed legs by (origin id, destination id); pass the same dict to share it between imports.
+    batch_size : int
+        The number of messages registered at once.
+    max_workers : int
+        The number of processes routing legs; 1 routes in-process.
+    lock : threading.RLock, optional
+        The model lock held while a batch is registered (e.g., SimulationTicker.lock).
+    imported_ids : set
+        The OTM ids of the trips in the model (their external_id), read from the model at the start of
+        every import, so a message is imported once however many importers there are.
+    polylines : dict
+        The map polyline per leg; routes of the same leg share it (the page draws each polyline once).
+
+    Methods:
+    -------
+    import_messages(messages) -> ImportReport
+        Import an iterable of OTM messages.
+    import_source(source) -> ImportReport
+        Import the messages of a directory, file or file-like object (see read_otm_messages()).
+    """
+
+    def __init__(self,
+                 network: Any = None,
+                 locations: Optional[LocationIndex] = None,
+                 route_cache: Optional[Dict[Tuple[str, str], RouteData]] = None,
+                 batch_size: int = 500,
+                 max_workers: int = 1,
+                 lock: Any = None) -> None:
+        """
+        Initialize a new OTMImporter.
+
+        Parameters:
+        ----------
+        network : StreetNetwork, optional
+            The street network to route on. Default is None (straight-line legs).
+        locations : LocationIndex, optional
+            The index used to resolve OTM location ids. Default is an index of all locations.
+        route_cache : dict, optional
+            The routed legs by (origin id, destination id). Default is a new, empty cache.
+        batch_size : int, optional
+            The number of messages registered at once. Default is 500.
+        max_workers : int, optional
+            The number of processes routing legs. Default is 1 (in-process).
+        lock : threading.RLock, optional
+            The model lock held while a batch is registered. Default is None.
+        """
+        self.network = network
+        self.locations: LocationIndex = locations if locations is not None else LocationIndex()
+        self.route_cache: Dict[Tuple[str, str], RouteData] = route_cache if route_cache is not None else {}
+        self.batch_size: int = batch_size
+        self.max_workers: int = max_workers
+        self.lock = lock
+        self.imported_ids: set = set()
+        self.polylines: Dict[Tuple[str, str], PolyLine] = {}
+
+    def _get_imported_ids(self) -> set:
+        """
+        Read the OTM ids of the trips in the model.
+        """
+        with self.lock if self.lock is not None else nullcontext():
+            # Trips restored from snapshots of before 'external_id' do not have it
+            return {trip.external_id for trip in Trip._instances if getattr(trip, 'external_id', None) is not None}
+
+    def _parse(self, message: Dict[str, Any], report: ImportReport) -> Dict[str, Any]:
+        """
+        Extract the legs (move actions) of a message; missing endpoints are taken from the adjacent legs.
+        """
+        legs = []
+        for association in message.get('actions', []):
+            action = _get_entity(association) or {}
+            if action.get('actionType') != 'move':
+                report.skipped_actions += 1
+                continue
+            legs.append([_get_entity(action.get('from')), _get_entity(action.get('to')), get_constraint_parameters(action.get('constraint'))])
+        for previous, leg in zip(legs, legs[1:]):
+            previous[1] = previous[1] or leg[0]
+            leg[0] = leg[0] or previous[1]
+        if any(not origin or not destination for origin, destination, _ in legs):
+            raise ValueError("A move action has no origin or destination")
+        for entity in (entity for origin, destination, _ in legs for entity in (origin, destination)):
+            if not entity.get('id'):
+                raise ValueError("A location has no id")
+            self.locations.get_georeference(entity)  # Raises if the location cannot be placed
+        if not legs:
+            raise ValueError("Message has no move actions")
+        return {'id': message.get('id'), 'name': message.get('name') or message.get('id', ''), 'legs': legs,
+                'constraint': get_constraint_parameters(message.get('constraint'))}
+
+    def _route(self, parsed: List[Dict[str, Any]], executor: Optional[ProcessPoolExecutor], report: ImportReport) -> None:
+        """
+        Route the distinct legs of a batch that are not in the route cache yet.
+        """
+        missing: Dict[Tuple[str, str], Tuple[Tuple[float, float], Tuple[float, float]]] = {}
+        for trip in parsed:
+            for origin, destination, _ in trip['legs']:
+                key = (origin['id'], destination['id'])
+                if key in self.route_cache or key in missing:
+                    report.route_cache_hits += 1
+                else:
+                    missing[key] = (self.locations.get_georeference(origin), self.locations.get_georeference(destination))
+        if not missing:
+            return
+
+        legs = list(missing.values())
+        if executor is None:
+            routes = [compute_route(self.network, origin, destination) for origin, destination in legs]
+        else:
+            chunk_size = max(1, math.ceil(len(legs) / (self.max_workers * 4)))
+            routes = [route for chunk in executor.map(_compute_routes, [legs[i:i + chunk_size] for i in range(0, len(legs), chunk_size)]) for route in chunk]
+        for key, route in zip(missing, routes):
+            self.route_cache[key] = route
+        report.routes_computed += len(missing)
+
+    def _register(self, parsed: List[Dict[str, Any]], report: ImportReport) -> None:
+        """
+        Create the model objects of a batch of parsed messages while holding the model lock.
+        """
+        with self.lock if self.lock is not None else nullcontext():
+            # Another importer (e.g., of the API) may have imported the same messages while this batch was routed
+            self.imported_ids = self._get_imported_ids()
+            for message in parsed:
+                if message['id'] is not None and message['id'] in self.imported_ids:
+                    report.duplicates += 1
+                    continue
+                routes = [self.route_cache[(origin['id'], destination['id'])] for origin, destination, _ in message['legs']]
+                if any(route is None for route in routes):
+                    report.errors.append((message['id'], "No route between the locations of a move action"))
+                    continue
+                trip = Trip(name=message['name'], external_id=message['id'],
+                            constraint=Constraint(**message['constraint']) if message['constraint'] is not None else None)
+                for sequence_nr, ((origin, destination, constraint), (nodes, length, coordinates)) in enumerate(zip(message['legs'], routes)):
+                    key = (origin['id'], destination['id'])
+                    origin, destination = self.locations.resolve(origin), self.locations.resolve(destination)
+                    if key not in self.polylines:
+                        self.polylines[key] = PolyLine(locations=coordinates, color="#DC143C", weight=5, tooltip=f"{origin.name} to {destination.name}")
+                    route = Route(name=f"{origin.name} to {destination.name}",
+                                  georeference=coordinates,
+                                  length=length,
+                                  nodes=nodes,
+                                  polyline=self.polylines[key],
+                                  coordinates=coordinates)
+                    create_action(origin, destination, sequence_nr=sequence_nr, route=route, trip=trip,
+                                  constraint=Constraint(**constraint) if constraint is not None else None)
+                    report.actions += 1
+                self.imported_ids.add(message['id'])
+                report.trip_ids[message['id']] = trip.id
+                report.trips += 1
+
+    def import_messages(self, messages: Iterable[Dict[str, Any]]) -> ImportReport:
+        """
+        Import OTM trip messages as draft trips.
+
+        Parameters:
+        ----------
+        messages : iterable of dict
+            The OTM trip messages; consumed lazily, one batch at a time.
+
+        Returns:
+        -------
+        ImportReport
+            The number of messages, trips and actions imported, the errors and the throughput.
+        """
+        report = ImportReport()
+        start = time.perf_counter()
+        self.imported_ids = self._get_imported_ids()
+        executor = None
+        if self.max_workers > 1 and self.network is not None:
+            executor = ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker, initargs=(self.network,))
+        try:
+            batch: List[Dict[str, Any]] = []
+            batch_ids: set = set()
+            for message in messages:
+                report.messages += 1
+                message_id = message.get('id')
+                if message_id is not None and (message_id in self.imported_ids or message_id in batch_ids):
+                    report.duplicates += 1
+                    continue
+                try:
+                    batch.append(self._parse(message, report))
+                    batch_ids.add(message_id)
+                except (KeyError, TypeError, ValueError) as error:
+                    report.errors.append((message_id, str(error)))
+                if len(batch) >= self.batch_size:
+                    self._route(batch, executor, report)
+                    self._register(batch, report)
+                    batch, batch_ids = [], set()
+            if batch:
+                self._route(batch, executor, report)
+                self._register(batch, report)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        report.seconds = time.perf_counter() - start
+        return report
+
+    def import_source(self, source: Any) -> ImportReport:
+        """
+        Import the OTM trip messages of a directory, file or file-like object.
+
+        Parameters:
+        ----------
+        source : str or file-like
+            See read_otm_messages().
+
+        Returns:
+        -------
+        ImportReport
+            The number of messages, trips and actions imported, the errors and the throughput.
+        """
+        return self.import_messages(read_otm_messages(source))
+
+
+# OTM trip status per model status (the model uses snake case for 'inTransit')
+OTM_TRIP_STATUS: Dict[str, str] = {'in_transit': 'inTransit'}
+
+
+class OTMExporter:
+    """
+    Exports the live model as OTM entities.
+
+    Instance Attributes:
+    ----------
+    batch_size : int
+        The number of entities converted per acquisition of the model lock.
+    lock : threading.RLock, optional
+        The model lock held while a batch is converted (e.g., SimulationTicker.lock).
+    locations : dict
+        The converted locations by Location id.
+    vehicles : dict
+        The converted vehicles by Vehicle id.
+    constraints : dict
+        The converted constraints by Constraint id.
+
+    Locations, vehicles and constraints are converted once per exporter, so use a new exporter per export.
+
+    Methods:
+    -------
+    location(location: Location) -> dict
+        Return the OTM location entity of a Location.
+    vehicle(vehicle: Vehicle) -> dict
+        Return the OTM vehicle entity of a Vehicle.
+    constraint(constraint: Constraint) -> dict
+        Return the OTM constraint of a Constraint.
+    action(action: Action) -> dict
+        Return the OTM action entity of an Action.
+    trip(trip: Trip) -> dict
+        Return the OTM trip message of a Trip.
+    iter_trips(trips) -> Iterator[dict]
+        Yield the OTM trip messages of trips, converted in batches.
+    iter_vehicles(vehicles) -> Iterator[dict]
+        Yield the OTM vehicle entities of vehicles, converted in batches.
+    iter_locations(locations) -> Iterator[dict]
+        Yield the OTM location entities of locations, converted in batches.
+    write(destination, entities, ndjson) -> int
+        Write OTM entities to a file, one at a time.
+    """
+
+    def __init__(self, batch_size: int = 500, lock: Any = None) -> None:
+        """
+        Initialize a new OTMExporter.
+
+        Parameters:
+        ----------
+        batch_size : int, optional
+            The number of entities converted per acquisition of the model lock. Default is 500.
+        lock : threading.RLock, optional
+            The model lock held while a batch is converted. Default is None.
+        """
+        self.batch_size: int = batch_size
+        self.lock = lock
+        self.locations: Dict[str, Dict[str, Any]] = {}
+        self.vehicles: Dict[str, Dict[str, Any]] = {}
+        self.constraints: Dict[str, Dict[str, Any]] = {}
+
+    def location(self, location: Location) -> Dict[str, Any]:
+        """
+        Return the OTM location entity of a Location; its id is the Location's name (see LocationIndex).
+        """
+        entity = self.locations.get(location.id)
+        if entity is None:
+            entity = {
+                "id": location.name,
+                "name": location.name,
+                "geoReference": {"lat": location.georeference[0], "lon": location.georeference[1], "type": "latLonPointGeoReference"},
+                "externalAttributes": {"locationType": location.location_type},
+            }
+            if location.constraint is not None:
+                entity["constraint"] = self.constraint(location.constraint)
+            self.locations[location.id] = entity
+        return entity
+
+    def vehicle(self, vehicle: Vehicle) -> Dict[str, Any]:
+        """
+        Return the OTM vehicle entity of a Vehicle; quantities are in the units of the model.
+        """
+        entity = self.vehicles.get(vehicle.id)
+        if entity is None:
+            entity = {"id": vehicle.id, "name": vehicle.name, "entityType": "vehicle", "vehicleType": vehicle.vehicle_type}
+            for key, value in [("fuel", vehicle.fuel),
+                               ("averageFuelConsumption", vehicle.average_fuel_consumption),
+                               ("emissionStandard", vehicle.emission_standard),
+                               ("loadCapacities", vehicle.load_capacities),
+                               ("length", vehicle.length),
+                               ("height", vehicle.height),
+                               ("width", vehicle.width),
+                               ("licensePlate", vehicle.license_plate),
+                               ("emptyWeight", vehicle.empty_weight)]:
+                if value is not None:
+                    entity[key] = value
+            entity["externalAttributes"] = {"status": vehicle.status, "averageSpeed": vehicle.average_speed}
+            if vehicle.position is not None:
+                entity["externalAttributes"]["position"] = {"lat": vehicle.position[0], "lon": vehicle.position[1]}
+            self.vehicles[vehicle.id] = entity
+        return entity
+
+    def constraint(self, constraint: Constraint) -> Dict[str, Any]:
+        """
+        Return the OTM constraint of a Constraint (an andConstraint if it combines a time window and vehicle types).
+        """
+        data = self.constraints.get(constraint.id)
+        if data is None:
+            parts = []
+            if constraint.start_time is not None or constraint.end_time is not None:
+                window = {"type": "timeWindowConstraint"}
+                if constraint.start_time is not None:
+                    window["startTime"] = format_datetime(constraint.start_time)
+                if constraint.end_time is not None:
+                    window["endTime"] = format_datetime(constraint.end_time)
+                parts.append(window)
+            if constraint.vehicle_types is not None:
+                parts.append({"type": "vehicleTypeConstraint", "vehicleTypes": list(constraint.vehicle_types)})
+            data = {"id": constraint.id, "name": constraint.name, "enforceability": constraint.enforceability}
+            if len(parts) == 1:
+                data["value"] = parts[0]
+            elif parts:
+                data["value"] = {"type": "andConstraint", "and": parts}
+            if constraint.capacity is not None:
+                data["externalAttributes"] = {"capacity": constraint.capacity}  # OTM has no minimum capacity constraint
+            self.constraints[constraint.id] = data
+        return data
+
+    def action(self, action: Action) -> Dict[str, Any]:
+        """
+        Return the OTM action entity of an Action.
+        """
+        entity = {"id": action.id, "name": action.name, "lifecycle": action.lifecycle,
+                  "sequenceNr": action.sequence_nr, "actionType": action.action_type}
+        if action._from is not None:
+            entity["from"] = {"entity": self.location(action._from), "associationType": "inline"}
+        if action._to is not None:
+            entity["to"] = {"entity": self.location(action._to), "associationType": "inline"}
+        if action.location is not None:
+            entity["location"] = {"entity": self.location(action.location), "associationType": "inline"}
+        if action.start_time is not None:
+            entity["startTime"] = format_datetime(action.start_time)
+        if action.end_time is not None:
+            entity["endTime"] = format_datetime(action.end_time)
+        if action.constraint is not None:
+            entity["constraint"] = self.constraint(action.constraint)
+        if action.route is not None:
+            entity["externalAttributes"] = {"distance": action.route.length}
+        return entity
+
+    def trip(self, trip: Trip) -> Dict[str, Any]:
+        """
+        Return the OTM trip message of a Trip, with its vehicle, actions and locations inline.
+        """
+        message = {"id": trip.id, "name": trip.name, "status": OTM_TRIP_STATUS.get(trip.status, trip.status),
+                   "transportMode": trip.transport_mode}
+        if trip.vehicle is not None:
+            message["vehicle"] = {"entity": self.vehicle(trip.vehicle), "associationType": "inline"}
+        if trip.constraint is not None:
+            message["constraint"] = self.constraint(trip.constraint)
+        message["actions"] = [{"entity": self.action(action), "associationType": "inline"} for action in trip.actions]
+        return message
+
+    def _iter(self, convert: Any, entities: List[Any]) -> Iterator[Dict[str, Any]]:
+        """
+        Yield the converted entities; a batch is converted while holding the model lock, and yielded after releasing it.
+        """
+        for i in range(0, len(entities), self.batch_size):
+            with self.lock if self.lock is not None else nullcontext():
+                batch = [convert(entity) for entity in entities[i:i + self.batch_size]]
+            yield from batch
+
+    def iter_trips(self, trips: Optional[Iterable[Trip]] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Yield OTM trip messages.
+
+        Parameters:
+        ----------
+        trips : list, optional
+            The trips to export. Default is all trips.
+        """
+        yield from self._iter(self.trip, list(trips) if trips is not None else Trip.get_all_trips())
+
+    def iter_vehicles(self, vehicles: Optional[Iterable[Vehicle]] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Yield OTM vehicle entities.
+
+        Parameters:
+        ----------
+        vehicles : list, optional
+            The vehicles to export. Default is all vehicles.
+        """
+        yield from self._iter(self.vehicle, list(vehicles) if vehicles is not None else Vehicle.get_all_vehicles())
+
+    def iter_locations(self, locations: Optional[Iterable[Location]] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Yield OTM location entities.
+
+        Parameters:
+        ----------
+        locations : list, optional
+            The locations to export. Default is all locations.
+        """
+        yield from self._iter(self.location, list(locations) if locations is not None else Location.get_all_locations())
+
+    def write(self, destination: Any, entities: Iterable[Dict[str, Any]], ndjson: bool = True) -> int:
+        """
+        Write OTM entities to a file, encoding one entity at a time.
+
+        Parameters:
+        ----------
+        destination : str or file-like
+            A path, or a file-like object opened in binary mode.
+        entities : iterable of dict
+            The entities, e.g. from iter_trips().
+        ndjson : bool, optional
+            Write one entity per line (NDJSON). Default is True; False writes a JSON list.
+
+        Returns:
+        -------
+        int
+            The number of entities written.
+        """
+        if isinstance(destination, (str, os.PathLike)):
+            with open(destination, 'wb') as f:
+                return self.write(f, entities, ndjson)
+        count = 0
+        if not ndjson:
+            destination.write(b'[')
+        for entity in entities:
+            if ndjson:
+                destination.write(dumps(entity) + b'\n')
+            else:
+                destination.write((b',' if count else b'') + dumps(entity))
+            count += 1
+        if not ndjson:
+            destination.write(b']')
+        return count
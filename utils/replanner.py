@@ -0,0 +1,250 @@
+"""
+Module for re-planning trips that have not started yet while the model is running.
+
+Vehicle.assign_to_trip fixes the start and end of a trip once. When execution deviates from
+that schedule (a trip starts late because the previous one overran, or a vehicle fails) the
+remaining schedule is no longer realistic. The RollingHorizonPlanner re-optimizes the trips
+that are assigned but not started ('requested') and whose planned start falls within a
+sliding horizon, warm-started from the current plan so that the local search never returns
+a worse plan than the one in use. Trips beyond the horizon keep their vehicle and order and
+are appended after the re-planned ones. The next trip of an idle vehicle is committed: the
+vehicle is already on its way to (or waiting at) its origin, so it is never re-planned. Only
+the part of a vehicle's schedule from its first changed trip onward is rewritten; trips whose
+vehicle and predecessors did not change keep their assignment (no status changes, events or
+journal records). A replan takes at most the solver's time budget plus the (linear) cost of
+rewriting the changed schedules.
+
+Replans are triggered periodically (every 'interval' simulated seconds) or on a deviation
+event: a running trip that is expected to end more than 'threshold' seconds after its planned
+end, or a requested trip assigned to a vehicle that is charging or failed.
+"""
+
+import time
+import pandas as pd
+
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from utils import clock
+from utils.classes import Trip, Vehicle
+from utils.dispatcher import UNAVAILABLE_STATUS
+from utils.vrp import VRPSolution, VRPSolver
+
+
+class RollingHorizonPlanner:
+    """
+    Re-optimizes the not-yet-started trips within a sliding horizon.
+
+    Instance Attributes:
+    ----------
+    solver : VRPSolver
+        The solver used for re-planning; its time budget bounds the latency of a replan.
+    horizon : float
+        Trips planned to start within this many seconds from now are re-optimized.
+    interval : float
+        The (simulated) time in seconds between two periodic replans.
+    threshold : float
+        The deviation in seconds that triggers a replan before the next periodic one.
+    last_replan : datetime, optional
+        The (simulated) time of the last replan.
+    replans : int
+        The number of replans executed so far.
+    last_latency : float
+        The wall-clock duration of the last replan in seconds.
+    last_solution : VRPSolution, optional
+        The result of the last replan.
+    last_unplanned : list
+        The trips the last replan could not plan (e.g., because no vehicle was available or met their
+        enforced constraints); they kept their previous vehicle.
+    last_reassigned : int
+        The number of trips the last replan assigned again, because their vehicle or order changed.
+
+    Methods:
+    -------
+    get_deviation() -> float
+        Return the largest deviation between the schedule and its execution.
+    is_due() -> bool
+        Return True if a periodic replan is due or a deviation event occurred.
+    replan() -> VRPSolution
+        Re-optimize the not-yet-started trips within the horizon.
+    step() -> Optional[VRPSolution]
+        Replan if due.
+    """
+
+    def __init__(self, solver: VRPSolver, horizon: float = 3600, interval: float = 300, threshold: float = 60) -> None:
+        """
+        Initialize a new RollingHorizonPlanner.
+
+        Parameters:
+        ----------
+        solver : VRPSolver
+            The solver used for re-planning. Its time budget bounds the latency of a replan.
+        horizon : float, optional
+            Trips planned to start within this many seconds from now are re-optimized. Default is 3600.
+        interval : float, optional
+            The (simulated) time in seconds between two periodic replans. Default is 300.
+        threshold : float, optional
+            The deviation in seconds that triggers an early replan. Default is 60.
+        """
+        self.solver: VRPSolver = solver
+        self.horizon: float = horizon
+        self.interval: float = interval
+        self.threshold: float = threshold
+        self.last_replan: Optional[datetime] = None
+        self.replans: int = 0
+        self.last_latency: float = 0.0
+        self.last_solution: Optional[VRPSolution] = None
+        self.last_unplanned: List[Trip] = []
+        self.last_reassigned: int = 0
+
+    @staticmethod
+    def _get_scheduled_end(trip: Trip) -> Optional[datetime]:
+        """
+        Return the planned end of a trip in the schedule of its vehicle.
+        """
+        ends = trip.vehicle.schedule.loc[trip.vehicle.schedule['task_id'] == trip.id, 'end']
+        return pd.Timestamp(ends.iloc[0]).to_pydatetime() if not ends.empty else None
+
+    @staticmethod
+    def _get_expected_end(trip: Trip) -> datetime:
+        """
+        Return the end of a running trip expected from its actual start and timing plan.
+        """
+        plan = trip.timing_plan if trip.timing_plan is not None else trip.vehicle.get_timing_plan(trip)
+        return trip.actions[0].start_time + timedelta(seconds=plan.total_duration)
+
+    def get_deviation(self) -> float:
+        """
+        Return the largest deviation between the schedule and its execution.
+
+        Returns:
+        -------
+        float
+            The largest delay in seconds of a running trip with respect to its planned end,
+            or infinity if a requested trip is assigned to a vehicle that is charging or failed.
+        """
+        for trip in Trip.get_by_status('requested'):
+            if trip.vehicle is not None and trip.vehicle.status in UNAVAILABLE_STATUS:
+                return float('inf')
+        deviation = 0.0
+        for trip in Trip.get_by_status('in_transit'):
+            planned_end = self._get_scheduled_end(trip)
+            if planned_end is not None and trip.actions[0].start_time is not None:
+                deviation = max(deviation, (self._get_expected_end(trip) - planned_end).total_seconds())
+        return deviation
+
+    def is_due(self) -> bool:
+        """
+        Return True if a periodic replan is due or a deviation event occurred.
+        """
+        if self.last_replan is None or (clock.now() - self.last_replan).total_seconds() >= self.interval:
+            return True
+        return self.get_deviation() > self.threshold
+
+    def replan(self) -> VRPSolution:
+        """
+        Re-optimize the trips that have not started yet and are planned to start within the horizon.
+
+        Running trips get their expected end as planned end, so that the vehicles' available times
+        are realistic. The next trip of an idle (available) vehicle is committed and kept. The other
+        trips within the horizon are planned again with the solver, starting from their current
+        assignment and order. Trips beyond the horizon follow the re-planned ones on their vehicle in
+        their previous order. Trips the solver cannot plan (e.g., when no vehicle is available or meets
+        their enforced constraints) keep their previous vehicle, and are reported in 'last_unplanned'.
+        Each vehicle's schedule is only rewritten from its first changed trip onward.
+
+        Returns:
+        -------
+        VRPSolution
+            The plan of the trips within the horizon.
+        """
+        start_time = time.perf_counter()
+        now = clock.now()
+        end_of_horizon = now + timedelta(seconds=self.horizon)
+        vehicles = [vehicle for vehicle in Vehicle.get_all_vehicles() if vehicle.status not in UNAVAILABLE_STATUS]
+
+        # Running trips end as expected from their actual start
+        for trip in Trip.get_by_status('in_transit'):
+            if trip.vehicle is not None and trip.actions[0].start_time is not None:
+                trip.vehicle.update_planned_end(trip, self._get_expected_end(trip))
+
+        # The current plan: requested trips per vehicle, in order of planned start
+        current: Dict[Vehicle, List[Trip]] = {}
+        starts: Dict[str, datetime] = {}
+        for trip in Trip.get_by_status('requested'):
+            if trip.vehicle is not None:
+                starts[trip.id] = pd.Timestamp(trip.vehicle.get_start_time_trip(trip.id)).to_pydatetime()
+                current.setdefault(trip.vehicle, []).append(trip)
+
+        previous: Dict[Vehicle, List[Trip]] = {}
+        window: Dict[Vehicle, List[Trip]] = {}
+        beyond: Dict[Vehicle, List[Trip]] = {}
+        for vehicle, trips in current.items():
+            trips.sort(key=lambda trip: starts[trip.id])
+            if vehicle in vehicles and vehicle.current_trip is None:
+                trips = trips[1:]
+            previous[vehicle] = trips
+            for trip in trips:
+                if starts[trip.id] <= end_of_horizon or vehicle not in vehicles:
+                    window.setdefault(vehicle, []).append(trip)
+                else:
+                    beyond.setdefault(vehicle, []).append(trip)
+
+        # Warm start from the current plan; trips of unavailable vehicles are inserted elsewhere. The trips
+        # stay assigned meanwhile: the solver ignores them (and the trips beyond the horizon) in the vehicles'
+        # available times.
+        trips = [trip for trips in window.values() for trip in trips]
+        solution = self.solver.solve(trips, vehicles, initial={vehicle: window.get(vehicle, []) for vehicle in vehicles},
+                                     ignore=[trip for trips in beyond.values() for trip in trips])
+
+        # The new schedule per vehicle: its route (if it meets the enforced constraints), the trips the solver
+        # could not plan (they keep their vehicle) and the trips beyond the horizon, in their previous order
+        plan = {vehicle: list(trips) for vehicle, trips in solution.routes.items() if solution.is_feasible(vehicle)}
+        planned = {trip.id for trips in plan.values() for trip in trips}
+        unplanned = [(vehicle, trip) for vehicle, trips in window.items() for trip in trips if trip.id not in planned]
+        for vehicle, trip in unplanned:
+            plan.setdefault(vehicle, []).append(trip)
+        for vehicle, trips in beyond.items():
+            plan.setdefault(vehicle, []).extend(trips)
+
+        # Rewrite each schedule from its first change onward: trips leaving a vehicle are unassigned, and the
+        # trips that stay keep their assignment up to the first one whose order changed. All changed trips are
+        # unassigned before any is assigned again, as trips may move between vehicles.
+        changes: Dict[Vehicle, Tuple[List[Trip], List[Trip]]] = {}
+        for vehicle in list(previous) + [vehicle for vehicle in plan if vehicle not in previous]:
+            old, new = previous.get(vehicle, []), plan.get(vehicle, [])
+            staying = {trip.id for trip in new}
+            leaving = [trip for trip in old if trip.id not in staying]
+            kept = [trip for trip in old if trip.id in staying]
+            same = 0
+            while same < min(len(kept), len(new)) and kept[same] is new[same]:
+                same += 1
+            if leaving or same < len(new):
+                changes[vehicle] = (leaving + kept[same:], new[same:])
+        for vehicle, (old, _) in changes.items():
+            for trip in old:
+                vehicle.unassign_trip(trip)
+        for vehicle, (_, new) in changes.items():
+            for trip in new:
+                vehicle.assign_to_trip(trip, start=solution.starts[trip.id] if trip.id in planned else starts[trip.id])
+
+        self.last_replan = now
+        self.replans += 1
+        self.last_latency = time.perf_counter() - start_time
+        self.last_solution = solution
+        self.last_unplanned = [trip for _, trip in unplanned]
+        self.last_reassigned = sum(len(new) for _, new in changes.values())
+        return solution
+
+    def step(self) -> Optional[VRPSolution]:
+        """
+        Replan if a periodic replan is due or a deviation event occurred.
+
+        Returns:
+        -------
+        VRPSolution or None
+            The plan of the trips within the horizon, or None if no replan was needed.
+        """
+        if not self.is_due():
+            return None
+        return self.replan()
@@ -0,0 +1,387 @@
+"""
+Module for running seeded Monte Carlo replications of a planning scenario.
+
+A scenario describes a set of trips (sequences of location names) and a fleet
+with stochastic inputs (speeds, load and unload times, release times). Each
+replication builds the scenario as a model of its own (the locations, routes,
+vehicles and trips of utils.classes) and runs it headless: trips are created as
+drafts at their release times, and a SimulationTicker with a Dispatcher steps
+the model on a SteppedClock until all trips are completed. The KPIs therefore
+come from the same code as in the live model (utils.stats). Replications are
+fanned out over a ProcessPoolExecutor; the read-only graph and distance data are
+shipped to every worker once through the pool initializer instead of with every task.
+"""
+
+import math
+import os
+import numpy as np
+import pandas as pd
+
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from scipy.stats import t as student_t
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from utils import clock, events
+from utils.classes import Location, Route, Trip, Vehicle
+from utils.dispatcher import Dispatcher
+from utils.entities import create_action, create_trip
+from utils.osmnx import get_shortest_path, get_route_length
+from utils.snapshot import ENTITY_CLASSES
+from utils.ticker import SimulationTicker
+
+# Read-only data shared with the worker processes (set once by _init_worker)
+_GRAPH: Any = None
+_DISTANCES: Dict[Tuple[str, str], float] = {}
+_GEOREFERENCES: Dict[str, Tuple[float, float]] = {}
+_SCENARIO: Dict[str, Any] = {}
+
+# The simulation time at which every replication starts
+START: datetime = datetime(2024, 1, 1)
+
+KPI_COLUMNS: List[str] = [
+    'makespan',          # seconds until the last trip is completed
+    'utilization',       # load over capacity, averaged over time (utils.stats) and over vehicles
+    'empty_driving',     # seconds driving empty (summed over vehicles)
+    'full_driving',      # seconds driving loaded (summed over vehicles)
+    'travel_distance',   # meters driven (summed over vehicles)
+    'mean_waiting_time', # seconds between release and start of a trip
+]
+
+
+def get_distance_matrix(graph: Any, locations: Sequence[Any], pairs: Optional[Sequence[Tuple[str, str]]] = None) -> Dict[Tuple[str, str], float]:
+    """
+    Compute the route length between pairs of locations on the street network.
+
+    Parameters
+    ----------
+    graph : networkx.MultiDiGraph
+        The street network graph.
+    locations : list of Location
+        The locations involved in the scenario.
+    pairs : list of tuple of str, optional
+        The (origin name, destination name) pairs to compute. Default is all ordered pairs.
+
+    Returns
+    -------
+    dict
+        A mapping from (origin name, destination name) to the route length in meters.
+    """
+    by_name = {location.name: location for location in locations}
+    if pairs is None:
+        pairs = [(a, b) for a in by_name for b in by_name if a != b]
+
+    distances = {}
+    for origin, destination in pairs:
+        nodes = get_shortest_path(graph, by_name[origin].georeference, by_name[destination].georeference)
+        distances[(origin, destination)] = get_route_length(graph, nodes)
+    return distances
+
+
+def get_scenario_pairs(scenario: Dict[str, Any]) -> List[Tuple[str, str]]:
+    """
+    Collect the distinct (origin, destination) legs used by the trips of a scenario.
+
+    Parameters
+    ----------
+    scenario : dict
+        The scenario definition (see run_replications).
+
+    Returns
+    -------
+    list of tuple of str
+        The distinct legs in order of first appearance.
+    """
+    pairs = {}
+    for stops in scenario['trips']:
+        for origin, destination in zip(stops[:-1], stops[1:]):
+            pairs[(origin, destination)] = None
+    return list(pairs)
+
+
+def _init_worker(scenario: Dict[str, Any], graph: Any, distances: Dict[Tuple[str, str], float], georeferences: Dict[str, Tuple[float, float]]) -> None:
+    """
+    Store the scenario and the read-only graph and distance data in the worker process.
+    """
+    global _SCENARIO, _GRAPH, _DISTANCES, _GEOREFERENCES
+    _SCENARIO = scenario
+    _GRAPH = graph
+    _DISTANCES = dict(distances)
+    _GEOREFERENCES = dict(georeferences)
+
+
+def _get_distance(origin: str, destination: str) -> float:
+    """
+    Look up the length of a leg, routing on the shared graph if it was not precomputed.
+    """
+    if origin == destination:
+        return 0.0
+    distance = _DISTANCES.get((origin, destination))
+    if distance is None:
+        if _GRAPH is None:
+            raise ValueError(f"No distance available from {origin} to {destination} and no graph to route on")
+        nodes = get_shortest_path(_GRAPH, _GEOREFERENCES[origin], _GEOREFERENCES[destination])
+        distance = get_route_length(_GRAPH, nodes)
+        _DISTANCES[(origin, destination)] = distance
+    return distance
+
+
+def _sample(rng: np.random.Generator, mean: float, cv: float) -> float:
+    """
+    Draw a non-negative sample around 'mean' with coefficient of variation 'cv'.
+    """
+    if mean <= 0 or cv <= 0:
+        return max(mean, 0.0)
+    return max(rng.normal(mean, mean * cv), 0.0)
+
+
+@contextmanager
+def _isolated_model(model_clock: clock.Clock) -> Iterator[None]:
+    """
+    Run the body on empty instance registries and 'model_clock', without recorders or subscribers.
+
+    The registries, clock, recorders and subscribers are restored afterwards, so a replication can also
+    run in the process of the live model (max_workers=1), as long as its ticker is not running meanwhile.
+    """
+    saved = [(cls._instances, cls._total_instances) for cls in ENTITY_CLASSES]
+    recorders, subscribers = list(events.recorders), list(events.subscribers)
+    events.recorders.clear()
+    events.subscribers.clear()
+    for cls in ENTITY_CLASSES:
+        cls._instances = []
+        cls._total_instances = 0
+    previous = clock.set_clock(model_clock)
+    try:
+        yield
+    finally:
+        clock.set_clock(previous)
+        events.recorders[:], events.subscribers[:] = recorders, subscribers
+        for cls, (instances, total) in zip(ENTITY_CLASSES, saved):
+            cls._instances = instances
+            cls._total_instances = total
+
+
+def _create_scenario_trip(stops: Sequence[str], locations: Dict[str, Location], get_route: Callable[[str, str], Route]) -> Trip:
+    """
+    Create a draft trip driving along 'stops', with a 'load' and an 'unload' action.
+
+    As in utils.stats, the first 'move' action of a trip with several legs is driven empty to the
+    pick-up, where the cargo is loaded; a trip with a single leg is loaded at its origin. The cargo
+    is unloaded at the last stop.
+    """
+    trip = create_trip([])
+    legs = list(zip(stops[:-1], stops[1:]))
+    pick_up = 1 if len(legs) > 1 else 0
+    for leg, (origin, destination) in enumerate(legs):
+        if leg == pick_up:
+            create_action(locations[origin], locations[origin], location=locations[origin],
+                          sequence_nr=len(trip.actions), trip=trip, action_type='load')
+        create_action(locations[origin], locations[destination], sequence_nr=len(trip.actions),
+                      route=get_route(origin, destination), trip=trip)
+    last = locations[stops[-1]]
+    create_action(last, last, location=last, sequence_nr=len(trip.actions), trip=trip, action_type='unload')
+    return trip
+
+
+def simulate_replication(scenario: Dict[str, Any], seed: int) -> Dict[str, float]:
+    """
+    Simulate one replication of a scenario and return its KPIs.
+
+    The scenario is built as a model with a vehicle per 'num_vehicles' (with a sampled speed, load time
+    and unload time) and straight routes of the given lengths between the locations. Trips are created
+    as drafts at their release times and the model is stepped by a SimulationTicker with a Dispatcher
+    on a SteppedClock of 'step' seconds, which is the time resolution of the results. The model lives
+    only during the replication, see _isolated_model().
+
+    Parameters
+    ----------
+    scenario : dict
+        The scenario definition (see run_replications).
+    seed : int
+        The seed of the random number generator of this replication.
+
+    Returns
+    -------
+    dict
+        The KPIs of this replication, keyed by the names in KPI_COLUMNS.
+    """
+    rng = np.random.default_rng(seed)
+    num_vehicles = scenario.get('num_vehicles', 1)
+    average_speed = scenario.get('average_speed', 15 / 3.6)  # m/s
+    speed_cv = scenario.get('speed_cv', 0.0)
+    load_time = scenario.get('load_time', 0)
+    unload_time = scenario.get('unload_time', 0)
+    load_time_cv = scenario.get('load_time_cv', 0.0)
+    interarrival_time = scenario.get('interarrival_time', 0)
+    step = scenario.get('step', 10)
+    trips = scenario['trips']
+
+    # Speeds (at least 10% of the average) and (un)load times are drawn once per vehicle, as the model stores them on the vehicle
+    speeds = [max(_sample(rng, average_speed, speed_cv), 0.1 * average_speed) for _ in range(num_vehicles)]
+    load_times = [_sample(rng, load_time, load_time_cv) for _ in range(num_vehicles)]
+    unload_times = [_sample(rng, unload_time, load_time_cv) for _ in range(num_vehicles)]
+    releases = np.cumsum(rng.exponential(interarrival_time, len(trips))) if interarrival_time > 0 else np.zeros(len(trips))
+
+    with _isolated_model(clock.SteppedClock(step, START)):
+        locations = {}
+        for stops in trips:
+            for name in stops:
+                if name not in locations:
+                    locations[name] = Location(georeference=list(_GEOREFERENCES.get(name, (0.0, 0.0))), name=name)
+
+        routes = {}
+        def get_route(origin: str, destination: str) -> Route:
+            if (origin, destination) not in routes:
+                coordinates = [tuple(locations[origin].georeference), tuple(locations[destination].georeference)]
+                routes[(origin, destination)] = Route(georeference=coordinates, name=f"{origin} to {destination}",
+                                                      length=_get_distance(origin, destination), coordinates=coordinates)
+            return routes[(origin, destination)]
+
+        vehicles = [Vehicle(name=f"Vehicle {v}", vehicle_type='terminal_tractor', position=list(locations[trips[0][0]].georeference),
+                            average_speed=speeds[v], load_time=load_times[v], unload_time=unload_times[v])
+                    for v in range(num_vehicles)]
+        ticker = SimulationTicker()
+        ticker.dispatcher = Dispatcher()
+
+        created = []
+        while len(created) < len(trips) or len(Trip.get_by_status('completed')) < len(created):
+            elapsed = (clock.now() - START).total_seconds()
+            while len(created) < len(trips) and releases[len(created)] <= elapsed:
+                created.append(_create_scenario_trip(trips[len(created)], locations, get_route))
+            ticker.step()
+
+        statistics = [vehicle.cum_statistics.iloc[-1] for vehicle in vehicles]
+        makespan = max((trip.actions[-1].end_time - START).total_seconds() for trip in created) if created else 0.0
+        waiting = [(trip.actions[0].start_time - trip.creation_date).total_seconds() for trip in created]
+
+    return {
+        'seed': seed,
+        'makespan': makespan,
+        'utilization': float(np.mean([row['utilization'] for row in statistics])),
+        'empty_driving': float(sum(row['empty_driving'] for row in statistics)),
+        'full_driving': float(sum(row['full_driving'] for row in statistics)),
+        'travel_distance': float(sum(row['travel_distance'] for row in statistics)),
+        'mean_waiting_time': float(np.mean(waiting)) if waiting else 0.0,
+    }
+
+
+def _run_chunk(seeds: List[int]) -> List[Dict[str, float]]:
+    """
+    Run a chunk of replications of the shared scenario inside a worker process.
+    """
+    return [simulate_replication(_SCENARIO, seed) for seed in seeds]
+
+
+def summarize_replications(results: pd.DataFrame, confidence: float = 0.95) -> pd.DataFrame:
+    """
+    Aggregate replication results into means with confidence intervals.
+
+    The half-width of an interval is the Student t quantile (n - 1 degrees of freedom) times
+    the standard error, since the standard deviation is estimated from the replications.
+
+    Parameters
+    ----------
+    results : pd.DataFrame
+        One row per replication, with the columns in KPI_COLUMNS.
+    confidence : float, optional
+        The confidence level of the intervals (default is 0.95).
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per KPI with columns ['mean', 'std', 'ci_low', 'ci_high', 'n'].
+    """
+    n = len(results)
+    t = student_t.ppf(0.5 + confidence / 2, n - 1) if n > 1 else math.nan
+    rows = []
+    for kpi in KPI_COLUMNS:
+        values = results[kpi].to_numpy(dtype=float)
+        mean = float(values.mean()) if n else math.nan
+        std = float(values.std(ddof=1)) if n > 1 else 0.0
+        half_width = t * std / math.sqrt(n) if n > 1 else 0.0
+        rows.append({
+            'kpi': kpi,
+            'mean': mean,
+            'std': std,
+            'ci_low': mean - half_width,
+            'ci_high': mean + half_width,
+            'n': n,
+        })
+    return pd.DataFrame(rows).set_index('kpi')
+
+
+def run_replications(
+    scenario: Dict[str, Any],
+    num_replications: int,
+    distances: Dict[Tuple[str, str], float],
+    graph: Any = None,
+    georeferences: Optional[Dict[str, Tuple[float, float]]] = None,
+    base_seed: int = 0,
+    max_workers: Optional[int] = None,
+    confidence: float = 0.95,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Run seeded replications of a scenario over a process pool and aggregate the KPIs.
+
+    The scenario, graph and distance data are sent to each worker once (pool initializer).
+    Replications are submitted in chunks (a few per worker) so that inter-process
+    overhead stays small compared to the simulation work and throughput scales with
+    the number of cores.
+
+    Parameters
+    ----------
+    scenario : dict
+        The scenario definition with keys:
+        'trips' (list of list of location names, required), 'num_vehicles',
+        'average_speed' (m/s), 'speed_cv', 'load_time' (s), 'unload_time' (s),
+        'load_time_cv', 'interarrival_time' (s, mean of exponential release gaps) and
+        'step' (s, the step of the SteppedClock, default 10). Every trip needs at least two stops.
+    num_replications : int
+        The number of replications to run.
+    distances : dict
+        Precomputed leg lengths in meters, see get_distance_matrix().
+    graph : networkx.MultiDiGraph, optional
+        The street network, used to route legs missing from 'distances'. Default is None.
+    georeferences : dict, optional
+        Mapping from location name to (latitude, longitude), required together with 'graph'.
+        Also places the locations (and vehicles) of the model; other locations are placed at (0, 0).
+    base_seed : int, optional
+        The seed from which independent replication seeds are derived (default is 0).
+    max_workers : int, optional
+        The number of worker processes (default is the number of CPUs). Use 1 to run in-process
+        (not while the ticker of the live model is running, see _isolated_model()).
+    confidence : float, optional
+        The confidence level of the intervals (default is 0.95).
+
+    Returns
+    -------
+    tuple of pd.DataFrame
+        The per-replication results and the summary from summarize_replications().
+
+    Raises
+    ------
+    ValueError
+        If a trip of the scenario has fewer than two stops.
+    """
+    if any(len(stops) < 2 for stops in scenario['trips']):
+        raise ValueError("Every trip of the scenario needs at least two stops")
+    seeds = [int(s.generate_state(1)[0]) for s in np.random.SeedSequence(base_seed).spawn(num_replications)]
+    georeferences = georeferences or {}
+    max_workers = max_workers or os.cpu_count() or 1
+
+    if max_workers == 1:
+        _init_worker(scenario, graph, distances, georeferences)
+        rows = _run_chunk(seeds)
+    else:
+        chunk_size = max(1, math.ceil(num_replications / (max_workers * 4)))
+        chunks = [seeds[i:i + chunk_size] for i in range(0, num_replications, chunk_size)]
+        rows = []
+        with ProcessPoolExecutor(max_workers=max_workers,
+                                 initializer=_init_worker,
+                                 initargs=(scenario, graph, distances, georeferences)) as executor:
+            for chunk_rows in executor.map(_run_chunk, chunks):
+                rows.extend(chunk_rows)
+
+    results = pd.DataFrame(rows, columns=['seed'] + KPI_COLUMNS)
+    return results, summarize_replications(results, confidence)
@@ -0,0 +1,679 @@
+"""
+Module for saving the complete model state to a snapshot file and restoring it, e.g. after a restart.
+
+A snapshot holds every registry of utils.classes (locations, actors, constraints, goods, routes, trips,
+actions, vehicles and sensors) with their counters, the vehicles' schedules and statistics, the trips'
+timing plans, the route geometry and the model time. Restoring it needs no routing or recomputation:
+entities are recreated from their attributes without calling __init__ (so without clock reads, events
+or registry side effects) and the registries are replaced at once.
+
+File layout:
+    MAGIC (8 bytes) | format version (uint32) | header length (uint32) | header (JSON) | state
+The header describes the snapshot (creation time, model time, number of entities per class), so
+snapshots can be listed without reading their state. The state is a zlib-compressed pickle of plain
+data only: references between entities are stored as positions in their registries, the coordinates
+of all routes as one array, and timing plans as their attributes. It is unpickled with an allow-list
+of built-in, datetime, numpy and pandas types, so reading a snapshot cannot run code. Display objects
+(folium markers and polylines) are not stored; location markers are rebuilt and route polylines are
+created when they are first drawn.
+
+The format version is increased whenever the attributes of the entities change; snapshots of another
+version are rejected. A SnapshotScheduler writes snapshots periodically, holding the model lock only
+while the state is captured, and keeps the latest few.
+"""
+
+import gc
+import io
+import os
+import pickle
+import struct
+import threading
+import zlib
+
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from utils import clock
+from utils.classes import Action, Actor, Constraint, Goods, Location, Route, Sensor, TimingPlan, Trip, Vehicle
+from utils.entities import create_location_marker
+from utils.otm import dumps, format_datetime, loads
+
+MAGIC = b'SAVEDSNP'
+FORMAT_VERSION = 1
+FILE_EXTENSION = '.snapshot'
+
+# The registries in a snapshot, in order of restoring
+ENTITY_CLASSES: Tuple[type, ...] = (Location, Actor, Constraint, Goods, Route, Trip, Action, Vehicle, Sensor)
+
+# Attributes holding display objects, which are not stored
+DISPLAY_ATTRIBUTES: Tuple[str, ...] = ('marker', 'polyline')
+
+# The only globals the state may be unpickled into: (module, name) pairs of built-in and datetime types,
+# and the types and reconstructors numpy and pandas pickle their objects with (module names of numpy 1 and 2)
+SAFE_GLOBALS = frozenset({
+    ('builtins', 'list'), ('builtins', 'dict'), ('builtins', 'set'), ('builtins', 'frozenset'),
+    ('builtins', 'tuple'), ('builtins', 'bytearray'), ('builtins', 'complex'), ('builtins', 'slice'),
+    ('builtins', 'object'), ('copyreg', '_reconstructor'), ('collections', 'deque'), ('collections', 'OrderedDict'),
+    ('datetime', 'datetime'), ('datetime', 'date'), ('datetime', 'time'), ('datetime', 'timedelta'), ('datetime', 'timezone'),
+    ('numpy', 'dtype'), ('numpy', 'ndarray'),
+    ('numpy._core.multiarray', '_reconstruct'), ('numpy._core.multiarray', 'scalar'), ('numpy._core.numeric', '_frombuffer'),
+    ('numpy.core.multiarray', '_reconstruct'), ('numpy.core.multiarray', 'scalar'), ('numpy.core.numeric', '_frombuffer'),
+    ('pandas', 'DataFrame'), ('pandas', 'Series'), ('pandas', 'Index'), ('pandas', 'RangeIndex'), ('pandas', 'DatetimeIndex'),
+    ('pandas', 'Categorical'), ('pandas', 'CategoricalDtype'), ('pandas', 'StringDtype'), ('pandas', 'Timestamp'),
+    ('pandas', 'Timedelta'),
+    ('pandas.arrays', 'ArrowStringArray'), ('pandas.arrays', 'DatetimeArray'), ('pandas.arrays', 'TimedeltaArray'),
+    ('pandas._libs.arrays', '__pyx_unpickle_NDArrayBacked'), ('pandas._libs.internals', '_unpickle_block'),
+    ('pandas._libs.tslibs.nattype', '_nat_unpickle'), ('pandas._libs.tslibs.timedeltas', '_timedelta_unpickle'),
+    ('pandas._libs.tslibs.timestamps', '_unpickle_timestamp'),
+    ('pandas.core.indexes.base', '_new_Index'), ('pandas.core.indexes.datetimes', '_new_DatetimeIndex'),
+    ('pandas.core.internals.managers', 'BlockManager'), ('pandas.core.internals.managers', 'SingleBlockManager'),
+    ('pandas.core.internals.blocks', 'new_block'),
+    # String columns of pandas 3 are Arrow arrays
+    ('pyarrow.lib', '_restore_array'), ('pyarrow.lib', 'type_for_alias'), ('pyarrow.lib', 'py_buffer'), ('pyarrow.lib', 'chunked_array'),
+})
+
+# Types of attribute values stored as they are (besides numpy and pandas types); values of other types are not stored
+PLAIN_TYPES = frozenset({str, int, float, bool, type(None), bytes, list, tuple, dict, set, deque, datetime, timedelta})
+
+_HEADER = struct.Struct('<8sII')
+
+
+class SafeUnpickler(pickle.Unpickler):
+    """
+    An unpickler that only creates the built-in, datetime, numpy and pandas (and pyarrow) types of a snapshot's
+    state: every global must be one of the (module, name) pairs in SAFE_GLOBALS.
+    """
+
+    def find_class(self, module: str, name: str) -> Any:
+        # A dotted name is looked up attribute by attribute (e.g., 'builtins.eval' in an allowed module)
+        if '.' not in name and (module, name) in SAFE_GLOBALS:
+            return super().find_class(module, name)
+        raise pickle.UnpicklingError(f"Snapshots cannot contain {module}.{name}")
+
+
+@contextmanager
+def _pause_gc() -> Iterator[None]:
+    """
+    Pause the cyclic garbage collector while a state of many small objects is built; the state holds no
+    garbage, but the collections it triggers take about as long as building the state itself.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _encode_column(values: np.ndarray, indexes: Dict[type, Dict[Any, int]]) -> Tuple[str, Any]:
+    """
+    Encode an object column as a typed array if all its values have one type (datetimes, floats, ints or entities).
+    """
+    kinds = set(map(type, values))
+    kind = next(iter(kinds)) if len(kinds) == 1 else None
+    if kind is datetime and all(value.tzinfo is None for value in values):
+        return 'datetime', values.astype('datetime64[us]')
+    if kind is pd.Timestamp and all(value.tzinfo is None for value in values):
+        return 'timestamp', pd.DatetimeIndex(values).to_numpy()
+    if kind is float:
+        return 'float', values.astype(np.float64)
+    if kind is int:
+        try:
+            return 'int', values.astype(np.int64)
+        except OverflowError:
+            pass
+    entities = kinds - {type(None)}
+    if len(entities) == 1 and next(iter(entities)) in indexes:
+        entity = next(iter(entities))
+        index = indexes[entity]
+        positions = np.fromiter((index.get(value, -1) if value is not None else -1 for value in values), dtype=np.int64, count=len(values))
+        return entity.__name__, positions
+    # Copied, as frames can be changed in place (e.g., the status of a task in a schedule)
+    return 'object', values.copy()
+
+
+def _encode_frame(frame: pd.DataFrame, indexes: Dict[type, Dict[Any, int]]) -> Dict[str, Any]:
+    """
+    Encode a frame (e.g., Vehicle.statistics) as its index and columns; object columns are stored as typed arrays where possible.
+    """
+    columns = []
+    for column, dtype in frame.dtypes.items():
+        if dtype == object:
+            columns.append(_encode_column(frame[column].to_numpy(), indexes))
+        else:
+            columns.append(('series', frame[column].copy()))
+    return {'index': frame.index, 'names': list(frame.columns), 'columns': columns}
+
+
+def _decode_frame(encoded: Dict[str, Any], targets: Dict[str, np.ndarray]) -> pd.DataFrame:
+    """
+    Decode a frame encoded by _encode_frame(); 'targets' holds the entities per class name, followed by None.
+    """
+    names, columns = encoded['names'], encoded['columns']
+    data = np.empty((len(encoded['index']), len(names)), dtype=object)
+    for j, (kind, values) in enumerate(columns):
+        if kind in targets:
+            data[:, j] = targets[kind][values]
+        elif kind == 'timestamp':
+            data[:, j] = pd.DatetimeIndex(values).astype(object).to_numpy()
+        elif kind != 'series':
+            data[:, j] = values if kind == 'object' else values.astype(object)
+    # One block of object columns, like the frames built by concatenating rows
+    frame = pd.DataFrame(data, index=encoded['index'], columns=names, dtype=object, copy=False)
+    for name, (kind, values) in zip(names, columns):
+        if kind == 'series':
+            frame[name] = values
+    return frame
+
+
+@_pause_gc()
+def capture_state(journal: Any = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Capture the model state as plain data. Hold the model lock while calling this.
+
+    Parameters
+    ----------
+    journal : utils.journal.Journal, optional
+        The journal recording the changes to the model; the header then holds the sequence number of its
+        last record ('journal_sequence_nr'), from which the journal is replayed onto the snapshot. Default is None.
+
+    Returns
+    -------
+    tuple of (dict, dict)
+        The state and the header describing it.
+    """
+    indexes: Dict[type, Dict[Any, int]] = {cls: {obj: i for i, obj in enumerate(cls._instances)} for cls in ENTITY_CLASSES}
+    state: Dict[str, Any] = {'classes': {}}
+    dropped = set()
+    for cls in ENTITY_CLASSES:
+        states, references = [], {}
+        for obj in cls._instances:
+            values = obj.__dict__.copy()
+            for key, value in values.items():
+                kind = type(value)
+                if kind in PLAIN_TYPES:
+                    if kind is list and value and type(value[0]) in indexes:
+                        index = indexes[type(value[0])]
+                        values[key] = [i for i in map(index.get, value) if i is not None]
+                        references[key] = type(value[0]).__name__
+                elif kind in indexes:
+                    values[key] = indexes[kind].get(value)
+                    references[key] = kind.__name__
+                elif kind is TimingPlan:
+                    values[key] = value.__dict__.copy()
+                    references[key] = 'TimingPlan'
+                elif kind is pd.DataFrame:
+                    values[key] = _encode_frame(value, indexes)
+                    references[key] = 'DataFrame'
+                elif key in DISPLAY_ATTRIBUTES:
+                    values[key] = None
+                elif kind.__module__.partition('.')[0] not in ('numpy', 'pandas'):
+                    values[key] = None
+                    dropped.add(f"{cls.__name__}.{key}")
+            states.append(values)
+        entry = {'states': states, 'references': references, 'total': cls._total_instances}
+        if hasattr(cls, '_version'):
+            entry['version'] = cls._version
+        state['classes'][cls.__name__] = entry
+
+    # Route geometry as one array; the georeference usually is the coordinates list itself
+    routes = state['classes']['Route']['states']
+    coordinates = [values.pop('coordinates') or [] for values in routes]
+    for values, route_coordinates in zip(routes, coordinates):
+        if values['georeference'] is route_coordinates:
+            values['georeference'] = None
+    lengths = np.fromiter((len(c) for c in coordinates), dtype=np.int64, count=len(coordinates))
+    points = np.fromiter(chain.from_iterable(chain.from_iterable(coordinates)), dtype=np.float64, count=2 * int(lengths.sum())).reshape(-1, 2)
+    state['routes'] = {'lengths': lengths, 'coordinates': points,
+                       'missing': [i for i, route in enumerate(Route._instances) if route.coordinates is None]}
+
+    model_time = clock.now()
+    state['model_time'] = model_time
+    header = {
+        'format_version': FORMAT_VERSION,
+        'created': format_datetime(datetime.now()),
+        'model_time': format_datetime(model_time),
+        'entities': {cls.__name__: len(cls._instances) for cls in ENTITY_CLASSES},
+        'dropped': sorted(dropped),
+        'journal_sequence_nr': journal.sequence_nr if journal is not None else None,
+    }
+    return state, header
+
+
+def write_snapshot(path: str, state: Dict[str, Any], header: Dict[str, Any], compression: int = 1) -> int:
+    """
+    Write a captured state to a snapshot file, through a temporary file so readers never see a partial snapshot.
+
+    Parameters
+    ----------
+    path : str
+        The path of the snapshot file.
+    state : dict
+        The state, see capture_state().
+    header : dict
+        The header, see capture_state().
+    compression : int, optional
+        The zlib compression level (0-9). Default is 1 (fast).
+
+    Returns
+    -------
+    int
+        The size of the file in bytes.
+    """
+    encoded_header = dumps(header)
+    data = zlib.compress(pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL), compression)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temporary, 'wb') as f:
+            f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, len(encoded_header)))
+            f.write(encoded_header)
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, path)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+    return _HEADER.size + len(encoded_header) + len(data)
+
+
+def save_snapshot(path: str, lock: Any = None, compression: int = 1, journal: Any = None) -> Dict[str, Any]:
+    """
+    Save the complete model state to a snapshot file.
+
+    Parameters
+    ----------
+    path : str
+        The path of the snapshot file.
+    lock : threading.RLock, optional
+        The model lock (e.g., SimulationTicker.lock), held only while the state is captured. Default is None.
+    compression : int, optional
+        The zlib compression level (0-9). Default is 1 (fast).
+    journal : utils.journal.Journal, optional
+        The journal recording the changes to the model, see capture_state(). Default is None.
+
+    Returns
+    -------
+    dict
+        The header of the snapshot, with its 'size' in bytes.
+    """
+    if lock is not None:
+        with lock:
+            state, header = capture_state(journal)
+    else:
+        state, header = capture_state(journal)
+    header['size'] = write_snapshot(path, state, header, compression)
+    return header
+
+
+def _read_header(f: Any, path: str) -> Dict[str, Any]:
+    """
+    Read and check the header of a snapshot file.
+    """
+    prefix = f.read(_HEADER.size)
+    if len(prefix) < _HEADER.size:
+        raise ValueError(f"{path} is not a snapshot")
+    magic, version, length = _HEADER.unpack(prefix)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a snapshot")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"{path} has snapshot format version {version}, expected {FORMAT_VERSION}")
+    return loads(f.read(length))
+
+
+def read_snapshot_header(path: str) -> Dict[str, Any]:
+    """
+    Read the header of a snapshot file (without its state).
+
+    Parameters
+    ----------
+    path : str
+        The path of the snapshot file.
+
+    Returns
+    -------
+    dict
+        The 'format_version', 'created', 'model_time', number of 'entities' per class and 'journal_sequence_nr'.
+
+    Raises
+    ------
+    ValueError
+        If the file is not a snapshot or has another format version.
+    """
+    with open(path, 'rb') as f:
+        return _read_header(f, path)
+
+
+def read_snapshot(path: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Read the state and header of a snapshot file.
+
+    Parameters
+    ----------
+    path : str
+        The path of the snapshot file.
+
+    Returns
+    -------
+    tuple of (dict, dict)
+        The state and the header.
+
+    Raises
+    ------
+    ValueError
+        If the file is not a snapshot or has another format version.
+    """
+    with open(path, 'rb') as f:
+        header = _read_header(f, path)
+        data = f.read()
+    with _pause_gc():
+        return SafeUnpickler(io.BytesIO(zlib.decompress(data))).load(), header
+
+
+@_pause_gc()
+def install_state(state: Dict[str, Any], set_time: bool = True) -> Dict[str, List[Any]]:
+    """
+    Replace the model state by a captured state. Hold the model lock while calling this.
+
+    Parameters
+    ----------
+    state : dict
+        The state, see capture_state() and read_snapshot().
+    set_time : bool, optional
+        Set the active clock to the model time of the state, if the clock can be set (not the WallClock). Default is True.
+
+    Returns
+    -------
+    dict
+        The restored entities per class name.
+    """
+    classes = {cls.__name__: cls for cls in ENTITY_CLASSES}
+    entries = state['classes']
+    objects: Dict[str, List[Any]] = {}
+    for name, cls in classes.items():
+        objects[name] = objs = [cls.__new__(cls) for _ in entries[name]['states']]
+        for obj, values in zip(objs, entries[name]['states']):
+            obj.__dict__ = values
+
+    # Route geometry
+    routes = state['routes']
+    route_values = entries['Route']['states']
+    offsets = np.concatenate(([0], np.cumsum(routes['lengths']))).tolist()
+    latitudes, longitudes = routes['coordinates'][:, 0].tolist(), routes['coordinates'][:, 1].tolist()
+    for i, values in enumerate(route_values):
+        coordinates = list(zip(latitudes[offsets[i]:offsets[i + 1]], longitudes[offsets[i]:offsets[i + 1]]))
+        values['coordinates'] = coordinates
+        if values['georeference'] is None:
+            values['georeference'] = coordinates
+    for i in routes['missing']:
+        route_values[i]['coordinates'] = None
+
+    # References between entities
+    targets: Optional[Dict[str, np.ndarray]] = None
+    for name, entry in entries.items():
+        states = entry['states']
+        for key, target in entry['references'].items():
+            if target == 'TimingPlan':
+                for values in states:
+                    if values.get(key) is not None:
+                        plan = TimingPlan.__new__(TimingPlan)
+                        plan.__dict__ = values[key]
+                        values[key] = plan
+                continue
+            if target == 'DataFrame':
+                if targets is None:
+                    # Position -1 (an entity not in its registry or None) selects the None at the end
+                    targets = {name: np.array(objs + [None], dtype=object) for name, objs in objects.items()}
+                for values in states:
+                    if values.get(key) is not None:
+                        values[key] = _decode_frame(values[key], targets)
+                continue
+            referenced = objects[target]
+            for values in states:
+                value = values.get(key)
+                if type(value) is int:
+                    values[key] = referenced[value]
+                elif type(value) is list:
+                    values[key] = [referenced[i] for i in value]
+
+    for name, cls in classes.items():
+        cls._instances[:] = objects[name]
+        cls._total_instances = entries[name]['total']
+    # Views derived from the trips and locations (trip table, maps, location indexes) compare versions
+    Trip._version = max(Trip._version, entries['Trip'].get('version', 0)) + 1
+    for trip in Trip._instances:
+        trip._revision = Trip._version
+    Location._version = max(Location._version, entries['Location'].get('version', 0)) + 1
+
+    # Display objects; route polylines are created when first drawn (see get_route_polyline() in utils/entities.py)
+    for location in Location._instances:
+        create_location_marker(location)
+
+    if set_time and hasattr(clock.get_clock(), 'set'):
+        clock.get_clock().set(state['model_time'])
+    return objects
+
+
+def restore_snapshot(path: str, lock: Any = None, set_time: bool = True) -> Dict[str, Any]:
+    """
+    Replace the model state by the state of a snapshot file.
+
+    The file is read and decoded before the model lock is taken; components holding entities (e.g., lists
+    in the page's session state) must fetch them from the registries again afterwards.
+
+    Parameters
+    ----------
+    path : str
+        The path of the snapshot file.
+    lock : threading.RLock, optional
+        The model lock (e.g., SimulationTicker.lock), held while the registries are replaced. Default is None.
+    set_time : bool, optional
+        Set the active clock to the model time of the snapshot, if the clock can be set. Default is True.
+
+    Returns
+    -------
+    dict
+        The header of the snapshot.
+
+    Raises
+    ------
+    ValueError
+        If the file is not a snapshot or has another format version.
+    """
+    state, header = read_snapshot(path)
+    if lock is not None:
+        with lock:
+            install_state(state, set_time)
+    else:
+        install_state(state, set_time)
+    return header
+
+
+def list_snapshots(directory: str) -> List[str]:
+    """
+    List the snapshot files in a directory, oldest first.
+
+    Parameters
+    ----------
+    directory : str
+        The directory.
+
+    Returns
+    -------
+    list of str
+        The paths of the snapshot files.
+    """
+    if not os.path.isdir(directory):
+        return []
+    return sorted(os.path.join(directory, file_name) for file_name in os.listdir(directory) if file_name.endswith(FILE_EXTENSION))
+
+
+def get_latest_snapshot(directory: str) -> Optional[str]:
+    """
+    Get the latest snapshot file in a directory.
+
+    Parameters
+    ----------
+    directory : str
+        The directory.
+
+    Returns
+    -------
+    str, optional
+        The path of the latest snapshot, or None if there is none.
+    """
+    snapshots = list_snapshots(directory)
+    return snapshots[-1] if snapshots else None
+
+
+class SnapshotScheduler:
+    """
+    A background thread saving a snapshot of the model at a fixed interval.
+
+    Snapshots are named 'snapshot-<creation time>.snapshot' (so they sort by time); only the latest 'keep'
+    snapshots in the directory are kept.
+
+    Instance Attributes:
+    ----------
+    lock : threading.RLock, optional
+        The model lock, held while the state is captured.
+    directory : str
+        The directory the snapshots are written to.
+    interval : float
+        The time in seconds between two snapshots.
+    keep : int
+        The number of snapshots kept.
+    journal : utils.journal.Journal, optional
+        The journal whose position is stored in the snapshots.
+    saved : int
+        The number of snapshots saved so far.
+    last_snapshot : dict, optional
+        The header (with 'path' and 'size') of the last snapshot saved.
+    failed : int
+        The number of scheduled snapshots that failed.
+    last_error : str or None
+        The error of the last failed snapshot.
+
+    Methods:
+    -------
+    start() -> None
+        Start the background thread (no-op if already running).
+    stop(save: bool = True) -> None
+        Stop the background thread, saving a last snapshot.
+    save() -> dict
+        Save a snapshot now.
+    """
+
+    def __init__(self, lock: Any = None, directory: str = 'snapshots', interval: float = 300.0, keep: int = 5, journal: Any = None) -> None:
+        """
+        Initialize a new SnapshotScheduler.
+
+        Parameters:
+        ----------
+        lock : threading.RLock, optional
+            The model lock (e.g., SimulationTicker.lock). Default is None.
+        directory : str, optional
+            The directory the snapshots are written to. Default is 'snapshots'.
+        interval : float, optional
+            The time in seconds between two snapshots. Default is 300.
+        keep : int, optional
+            The number of snapshots kept. Default is 5.
+        journal : utils.journal.Journal, optional
+            The journal whose position is stored in the snapshots, so it can be replayed onto them. Default is None.
+
+        Raises:
+        ------
+        ValueError:
+            If 'interval' is not positive or 'keep' is less than 1.
+        """
+        if interval <= 0:
+            raise ValueError(f"Snapshot interval must be positive, got {interval}")
+        if keep < 1:
+            raise ValueError(f"At least one snapshot must be kept, got {keep}")
+        self.lock = lock
+        self.directory: str = directory
+        self.interval: float = interval
+        self.keep: int = keep
+        self.journal = journal
+        self.saved: int = 0
+        self.last_snapshot: Optional[Dict[str, Any]] = None
+        self.failed: int = 0
+        self.last_error: Optional[str] = None
+        self._save_lock: threading.Lock = threading.Lock()
+        self._stop_event: threading.Event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """
+        Start the background thread (no-op if already running).
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="SnapshotScheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, save: bool = True) -> None:
+        """
+        Stop the background thread.
+
+        Parameters:
+        ----------
+        save : bool, optional
+            Save a last snapshot after stopping. Default is True.
+        """
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+            if save:
+                self.save()
+
+    def is_running(self) -> bool:
+        """
+        Return True if the background thread is running.
+        """
+        return self._thread is not None and self._thread.is_alive()
+
+    def save(self) -> Dict[str, Any]:
+        """
+        Save a snapshot now and remove the snapshots beyond 'keep'.
+
+        Returns:
+        -------
+        dict
+            The header of the snapshot, with its 'path' and 'size'.
+        """
+        with self._save_lock:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f"snapshot-{datetime.now():%Y%m%dT%H%M%S%f}{FILE_EXTENSION}")
+            header = save_snapshot(path, self.lock, journal=self.journal)
+            header['path'] = path
+            self.saved += 1
+            self.last_snapshot = header
+            for old in list_snapshots(self.directory)[:-self.keep]:
+                try:
+                    os.remove(old)
+                except OSError:
+                    pass
+        return header
+
+    def _run(self) -> None:
+        """
+        Save a snapshot every 'interval' seconds until stopped.
+        """
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.save()
+            except Exception as e:
+                # Keep the schedule; a single failing snapshot (e.g., a full disk) should not stop it
+                self.failed += 1
+                self.last_error = f"Snapshot failed: {e!r}"
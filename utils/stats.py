@@ -6,9 +6,9 @@ instantaneous and cumulative statistics, and returns a combined DataFrame.
 """
 
 import pandas as pd
-from datetime import datetime, timedelta
 from typing import Optional
 from utils.classes import Vehicle, Trip
+from utils import clock
 
 
 def update_statistics() -> pd.DataFrame:
@@ -29,18 +29,18 @@ def update_statistics() -> pd.DataFrame:
 
     for vehicle in vehicles:
         # Cache the current time for consistency within this iteration
-        now = datetime.now()
+        now = clock.now()
 
         # Create new entry for instantaneous vehicle statistics
         new_row = pd.DataFrame([{
             'timestamp': now,
             'id': vehicle.id,
-            'lat': 0,  # Placeholder: update if vehicle has a location attribute
-            'lng': 0,  # Placeholder: update if vehicle has a location attribute
+            'lat': vehicle.position[0] if vehicle.position is not None else None,
+            'lng': vehicle.position[1] if vehicle.position is not None else None,
             'current_trip': vehicle.current_trip,
             'current_action': vehicle.current_action,
             'status': vehicle.status,
-            'battery_level': 100,  # Assumed default; update as needed
+            'battery_level': vehicle.battery_level,
             'co2_emission': 0,  # g/km
             'nox_emission': 0,  # g/km
             'noise_pollution': 0,  # dB
@@ -68,6 +68,10 @@ def update_statistics() -> pd.DataFrame:
 
         # Use Python 3.10 match-case for different statuses.
         match vehicle.status:
+            case _ if delta_seconds <= 0:
+                # No (simulation) time has passed, e.g., with a stepped or virtual clock.
+                pass
+
             case 'move':
                 move += delta_seconds
 
@@ -0,0 +1,717 @@
+"""
+Module for persisting the history of the model (trips, actions, schedules, vehicle statistics, ...) in SQLite.
+
+The entities of utils.classes only live in memory: Python lists (Trip._instances, ...) and, per vehicle,
+DataFrames of its schedule and statistics. An SQLiteStore writes them through to a local SQLite database,
+so historical queries (e.g., all trips of an actor last week) read from the database with an index
+instead of scanning everything in memory, and the history survives a restart.
+
+A store records the operations on the model (see utils.events) as a recorder: recording only marks the
+changed entities (e.g., a trip and its vehicle when the trip is assigned) as dirty, in the thread that
+changed the model. A background thread flushes them every 'interval' seconds: the rows of the dirty
+entities and the new statistics rows of the vehicles are read while holding the model lock, then
+written outside of it in one transaction of batched statements (executemany). The SQL of every
+statement is constant and all values are bound as parameters, so SQLite compiles each statement once
+and reuses it from the statement cache of the connection (a prepared statement).
+
+The database is opened in WAL mode (write-ahead logging) with synchronous=NORMAL: a transaction appends
+to the log without waiting for the database file, and the queries of this module use their own
+read-only connection, which reads the last committed state while a flush is writing.
+
+Deleting entities from the model (delete_all_instances(), ...) does not delete them from the store, so
+it keeps the history of the whole run. Constraints and sensors are stored as they are now (the latest
+reading of a sensor), like the other entities; only the vehicle statistics keep their history. Times are stored as ISO 8601 text ('YYYY-MM-DD HH:MM:SS.ffffff'),
+which sorts chronologically. The 'time' of a trip is its actual start (the start of its first action),
+else its planned start in the schedule of its vehicle, else its creation date.
+"""
+
+import os
+import sqlite3
+import threading
+
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from utils import events
+from utils.classes import Action, Actor, Constraint, Goods, Location, Sensor, Trip, Vehicle
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS actors (
+    id TEXT PRIMARY KEY, name TEXT, creation_date TEXT, last_modified TEXT
+);
+CREATE TABLE IF NOT EXISTS locations (
+    id TEXT PRIMARY KEY, name TEXT, location_type TEXT, lat REAL, lng REAL, creation_date TEXT, last_modified TEXT
+);
+CREATE TABLE IF NOT EXISTS trips (
+    id TEXT PRIMARY KEY, name TEXT, status TEXT, transport_mode TEXT, vehicle_id TEXT, origin_id TEXT,
+    destination_id TEXT, progress REAL, time TEXT, start_time TEXT, end_time TEXT, creation_date TEXT,
+    last_modified TEXT
+);
+CREATE TABLE IF NOT EXISTS trip_actors (
+    trip_id TEXT, actor_id TEXT, PRIMARY KEY (trip_id, actor_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS actions (
+    id TEXT PRIMARY KEY, trip_id TEXT, sequence_nr INTEGER, name TEXT, action_type TEXT, lifecycle TEXT,
+    from_id TEXT, to_id TEXT, location_id TEXT, length REAL, duration REAL, progress REAL, start_time TEXT,
+    end_time TEXT, creation_date TEXT, last_modified TEXT
+);
+CREATE TABLE IF NOT EXISTS vehicles (
+    id TEXT PRIMARY KEY, name TEXT, vehicle_type TEXT, status TEXT, lat REAL, lng REAL, current_trip_id TEXT,
+    current_action INTEGER, battery_level REAL, entries INTEGER, exits INTEGER, creation_date TEXT,
+    last_modified TEXT
+);
+CREATE TABLE IF NOT EXISTS schedules (
+    vehicle_id TEXT, trip_id TEXT, task_name TEXT, start_time TEXT, end_time TEXT, status TEXT,
+    PRIMARY KEY (vehicle_id, trip_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS vehicle_statistics (
+    vehicle_id TEXT, timestamp TEXT, lat REAL, lng REAL, trip_id TEXT, current_action INTEGER, status TEXT,
+    battery_level REAL, co2_emission REAL, nox_emission REAL, noise_pollution REAL, weight REAL,
+    PRIMARY KEY (vehicle_id, timestamp)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS goods (
+    id TEXT PRIMARY KEY, name TEXT, goods_type TEXT, equipment_type TEXT, quantity INTEGER, weight REAL,
+    gross_weight REAL, creation_date TEXT, last_modified TEXT
+);
+CREATE TABLE IF NOT EXISTS constraints (
+    id TEXT PRIMARY KEY, name TEXT, enforceability TEXT, start_time TEXT, end_time TEXT, vehicle_types TEXT,
+    capacity REAL, creation_date TEXT, last_modified TEXT
+);
+CREATE TABLE IF NOT EXISTS sensors (
+    id TEXT PRIMARY KEY, name TEXT, sensor_type TEXT, vehicle_id TEXT, value TEXT, timestamp TEXT, samples INTEGER,
+    creation_date TEXT, last_modified TEXT
+);
+CREATE INDEX IF NOT EXISTS trips_status ON trips (status, time);
+CREATE INDEX IF NOT EXISTS trips_vehicle ON trips (vehicle_id, time);
+CREATE INDEX IF NOT EXISTS trips_time ON trips (time);
+CREATE INDEX IF NOT EXISTS trips_origin ON trips (origin_id, time);
+CREATE INDEX IF NOT EXISTS trips_destination ON trips (destination_id, time);
+CREATE INDEX IF NOT EXISTS trip_actors_actor ON trip_actors (actor_id, trip_id);
+CREATE INDEX IF NOT EXISTS actions_trip ON actions (trip_id, sequence_nr);
+CREATE INDEX IF NOT EXISTS actions_from ON actions (from_id, start_time);
+CREATE INDEX IF NOT EXISTS actions_to ON actions (to_id, start_time);
+CREATE INDEX IF NOT EXISTS actions_start_time ON actions (start_time);
+CREATE INDEX IF NOT EXISTS vehicles_status ON vehicles (status);
+CREATE INDEX IF NOT EXISTS schedules_start_time ON schedules (start_time);
+CREATE INDEX IF NOT EXISTS vehicle_statistics_timestamp ON vehicle_statistics (timestamp);
+CREATE INDEX IF NOT EXISTS actors_name ON actors (name);
+CREATE INDEX IF NOT EXISTS locations_name ON locations (name);
+CREATE INDEX IF NOT EXISTS vehicles_name ON vehicles (name);
+"""
+
+# The columns of each table written by a flush, in the order of the rows
+COLUMNS = {
+    'actors': ('id', 'name', 'creation_date', 'last_modified'),
+    'locations': ('id', 'name', 'location_type', 'lat', 'lng', 'creation_date', 'last_modified'),
+    'trips': ('id', 'name', 'status', 'transport_mode', 'vehicle_id', 'origin_id', 'destination_id', 'progress',
+              'time', 'start_time', 'end_time', 'creation_date', 'last_modified'),
+    'trip_actors': ('trip_id', 'actor_id'),
+    'actions': ('id', 'trip_id', 'sequence_nr', 'name', 'action_type', 'lifecycle', 'from_id', 'to_id',
+                'location_id', 'length', 'duration', 'progress', 'start_time', 'end_time', 'creation_date',
+                'last_modified'),
+    'vehicles': ('id', 'name', 'vehicle_type', 'status', 'lat', 'lng', 'current_trip_id', 'current_action',
+                 'battery_level', 'entries', 'exits', 'creation_date', 'last_modified'),
+    'schedules': ('vehicle_id', 'trip_id', 'task_name', 'start_time', 'end_time', 'status'),
+    'vehicle_statistics': ('vehicle_id', 'timestamp', 'lat', 'lng', 'trip_id', 'current_action', 'status',
+                           'battery_level', 'co2_emission', 'nox_emission', 'noise_pollution', 'weight'),
+    'goods': ('id', 'name', 'goods_type', 'equipment_type', 'quantity', 'weight', 'gross_weight', 'creation_date',
+              'last_modified'),
+    'constraints': ('id', 'name', 'enforceability', 'start_time', 'end_time', 'vehicle_types', 'capacity',
+                    'creation_date', 'last_modified'),
+    'sensors': ('id', 'name', 'sensor_type', 'vehicle_id', 'value', 'timestamp', 'samples', 'creation_date',
+                'last_modified'),
+}
+
+# Columns holding times, converted to datetimes in the results of queries
+TIME_COLUMNS = frozenset({'time', 'start_time', 'end_time', 'creation_date', 'last_modified', 'timestamp'})
+
+# The columns of Vehicle.statistics, in the order of the vehicle_statistics table (after 'vehicle_id')
+STATISTICS_COLUMNS = ['timestamp', 'lat', 'lng', 'current_trip', 'current_action', 'status', 'battery_level',
+                      'co2_emission', 'nox_emission', 'noise_pollution', 'weight']
+
+# The tables of the entities that are tracked by a store, by class
+_TABLES = {Actor: 'actors', Location: 'locations', Trip: 'trips', Action: 'actions', Vehicle: 'vehicles', Goods: 'goods',
+           Constraint: 'constraints', Sensor: 'sensors'}
+
+# Changes to these attributes of an action also change the row of its trip
+_TRIP_ATTRIBUTES = frozenset({'start_time', 'end_time', 'lifecycle', 'sequence_nr'})
+
+
+def _upsert(table: str, key: Sequence[str]) -> str:
+    """
+    Build the statement inserting a row into a table, or updating the row with the same key.
+    """
+    columns = COLUMNS[table]
+    updates = ', '.join(f"{column} = excluded.{column}" for column in columns if column not in key)
+    return (f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+            f"ON CONFLICT ({', '.join(key)}) DO UPDATE SET {updates}")
+
+
+def _insert(table: str, conflict: str = 'IGNORE') -> str:
+    """
+    Build the statement inserting a row into a table; 'conflict' resolves rows with an existing key.
+    """
+    columns = COLUMNS[table]
+    return f"INSERT OR {conflict} INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+
+
+# The statements of a flush, in the order they are executed (the SQL text is constant, so they are prepared once)
+UPSERT_ACTORS = _upsert('actors', ['id'])
+UPSERT_LOCATIONS = _upsert('locations', ['id'])
+UPSERT_TRIPS = _upsert('trips', ['id'])
+DELETE_TRIP_ACTORS = "DELETE FROM trip_actors WHERE trip_id = ?"
+INSERT_TRIP_ACTORS = _insert('trip_actors')
+UPSERT_ACTIONS = _upsert('actions', ['id'])
+UPSERT_VEHICLES = _upsert('vehicles', ['id'])
+DELETE_SCHEDULE = "DELETE FROM schedules WHERE vehicle_id = ?"
+DELETE_SCHEDULED_TRIP = "DELETE FROM schedules WHERE vehicle_id = ? AND trip_id = ?"
+INSERT_SCHEDULES = _insert('schedules', 'REPLACE')
+INSERT_STATISTICS = _insert('vehicle_statistics')
+UPSERT_GOODS = _upsert('goods', ['id'])
+UPSERT_CONSTRAINTS = _upsert('constraints', ['id'])
+UPSERT_SENSORS = _upsert('sensors', ['id'])
+
+Rows = Dict[str, List[Tuple[Any, ...]]]
+
+
+def _time(value: Any) -> Optional[str]:
+    """
+    Convert a datetime (or pandas/numpy timestamp) to the text stored in the database; None if missing.
+
+    Text is returned as is (a time that was already converted).
+    """
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, np.datetime64):
+        value = pd.Timestamp(value)
+    if isinstance(value, datetime):
+        return None if value is pd.NaT else value.isoformat(sep=' ', timespec='microseconds')
+    return None
+
+
+def _value(value: Any) -> Any:
+    """
+    Convert a value of the model to a value SQLite can store: entities by their id, times as text.
+    """
+    if value is None or isinstance(value, (str, int, float)) and not isinstance(value, bool):
+        return None if isinstance(value, float) and value != value else value
+    if isinstance(value, (datetime, np.datetime64)):
+        return _time(value)
+    if isinstance(value, np.generic):
+        return _value(value.item())
+    if isinstance(value, bool):
+        return int(value)
+    if hasattr(value, 'id'):
+        return value.id
+    return str(value)
+
+
+def _id(entity: Any) -> Optional[str]:
+    return entity.id if entity is not None else None
+
+
+def _as_list(value: Any) -> list:
+    """
+    Return a list of entities of an attribute that holds a list or a single entity (e.g., Trip.actors).
+    """
+    if value is None:
+        return []
+    return list(value) if isinstance(value, (list, tuple)) else [value]
+
+
+def _coordinates(georeference: Any) -> Tuple[Optional[float], Optional[float]]:
+    if georeference is None or len(georeference) < 2:
+        return None, None
+    return _value(georeference[0]), _value(georeference[1])
+
+
+def _trip_row(trip: Trip, planned: Dict[str, Any]) -> Tuple[Any, ...]:
+    """
+    The row of a trip; 'planned' maps the ids of trips to their planned start in the schedule of their vehicle.
+    """
+    actions = trip.actions
+    first, last = (actions[0], actions[-1]) if actions else (None, None)
+    start_time = first.start_time if first is not None else None
+    time = start_time
+    if time is None and trip.vehicle is not None:
+        time = planned.get(trip.id)
+        if time is None:
+            try:
+                time = trip.vehicle.get_start_time_trip(trip.id)
+            except ValueError:
+                pass
+    if time is None:
+        time = trip.creation_date
+    return (
+        trip.id, trip.name, trip.status, trip.transport_mode, _id(trip.vehicle),
+        _id(first._from) if first is not None else None, _id(last._to) if last is not None else None,
+        _value(trip.progress), _time(time), _time(start_time), _time(last.end_time if last is not None else None),
+        _time(trip.creation_date), _time(trip.last_modified),
+    )
+
+
+def _action_row(action: Action) -> Tuple[Any, ...]:
+    return (
+        action.id, _id(action.trip), _value(action.sequence_nr), action.name, action.action_type, action.lifecycle,
+        _id(action._from), _id(action._to), _id(action.location),
+        _value(action.route.length) if action.route is not None else None, _value(action.duration),
+        _value(action.progress), _time(action.start_time), _time(action.end_time), _time(action.creation_date),
+        _time(action.last_modified),
+    )
+
+
+def _vehicle_row(vehicle: Vehicle) -> Tuple[Any, ...]:
+    return (
+        vehicle.id, vehicle.name, vehicle.vehicle_type, vehicle.status, *_coordinates(vehicle.position),
+        _id(vehicle.current_trip), _value(vehicle.current_action), _value(vehicle.battery_level),
+        _value(vehicle.entries), _value(vehicle.exits), _time(vehicle.creation_date), _time(vehicle.last_modified),
+    )
+
+
+def _schedule_rows(vehicle: Vehicle, trip_ids: Optional[Set[str]] = None) -> List[Tuple[Any, ...]]:
+    """
+    The rows of the schedule of a vehicle; only those of the trips in 'trip_ids' if given.
+    """
+    schedule = vehicle.schedule
+    if schedule.empty:
+        return []
+    return [(vehicle.id, _value(task_id), _value(task_name), _time(start), _time(end), _value(status))
+            for task_id, task_name, start, end, status in zip(
+                schedule['task_id'], schedule['task_name'], schedule['start'], schedule['end'], schedule['status'])
+            if trip_ids is None or task_id in trip_ids]
+
+
+def _statistics_rows(vehicle_id: str, frame: pd.DataFrame) -> List[Tuple[Any, ...]]:
+    columns = [frame[column].to_numpy(dtype=object) if column in frame.columns else [None] * len(frame)
+               for column in STATISTICS_COLUMNS]
+    return [(vehicle_id, _time(timestamp), *map(_value, values)) for timestamp, *values in zip(*columns)]
+
+
+def _to_frame(cursor: sqlite3.Cursor) -> pd.DataFrame:
+    """
+    Build a DataFrame of the result of a query, converting the time columns to datetimes.
+    """
+    columns = [description[0] for description in cursor.description]
+    frame = pd.DataFrame.from_records(cursor.fetchall(), columns=columns)
+    for column in columns:
+        if column in TIME_COLUMNS:
+            frame[column] = pd.to_datetime(frame[column], format='ISO8601')
+    return frame
+
+
+class SQLiteStore:
+    """
+    Writes the entities of the model and their history through to a local SQLite database, and queries it.
+
+    Instance Attributes:
+    ----------
+    path : str
+        The database file (created if it does not exist).
+    lock : threading.RLock or None
+        The model lock, held while the rows of the changed entities are read from the model.
+    interval : float
+        The time in seconds between two flushes of the background thread.
+    flushes : int
+        The number of flushes (transactions) so far.
+    written : int
+        The number of rows written so far.
+    failed_flushes : int
+        The number of flushes of the background thread that failed (e.g., the disk is full).
+    last_error : str or None
+        A description of the last flush that failed.
+
+    Methods:
+    -------
+    open() -> None
+        Start recording the changes to the model.
+    close() -> None
+        Stop recording the changes to the model.
+    start() -> None
+        Start the background thread flushing the changes (no-op if already running).
+    stop() -> None
+        Stop the background thread after flushing the pending changes.
+    sync_all() -> None
+        Mark all entities of the model as changed, so the next flush writes all of them.
+    flush() -> int
+        Write the changed entities and the new statistics rows to the database in one transaction.
+    get_trips(actor=None, status=None, vehicle=None, location=None, start=None, end=None, limit=None) -> pd.DataFrame
+        Query the trips, e.g. all trips of an actor in a period.
+    get_actions(trip) -> pd.DataFrame
+        Query the actions of a trip.
+    get_schedules(vehicle=None, start=None, end=None) -> pd.DataFrame
+        Query the scheduled trips of the vehicles.
+    get_statistics(vehicle=None, start=None, end=None) -> pd.DataFrame
+        Query the statistics of the vehicles.
+    query(sql, parameters=()) -> pd.DataFrame
+        Run a query on the database.
+    """
+
+    def __init__(self, path: str = 'model.db', lock: Any = None, interval: float = 1.0) -> None:
+        """
+        Initialize a new SQLiteStore, creating the database and its tables and indexes if they do not exist.
+
+        The store does not record changes until it is opened; call sync_all() to write the current model.
+
+        Parameters:
+        ----------
+        path : str, optional
+            The database file. Default is 'model.db'.
+        lock : threading.RLock, optional
+            The model lock (e.g., SimulationTicker.lock). Default is None.
+        interval : float, optional
+            The time in seconds between two flushes of the background thread. Default is 1.0.
+
+        Raises:
+        ------
+        ValueError:
+            If 'interval' is not positive.
+        """
+        if interval <= 0:
+            raise ValueError(f"Flush interval must be positive, got {interval}")
+        self.path: str = path
+        self.lock: Any = lock
+        self.interval: float = interval
+        self.flushes: int = 0
+        self.written: int = 0
+        self.failed_flushes: int = 0
+        self.last_error: Optional[str] = None
+        # The connection is used by the thread that flushes; flushes are serialized by the flush lock
+        self._connection: sqlite3.Connection = sqlite3.connect(path, check_same_thread=False, cached_statements=64)
+        self._connection.execute("PRAGMA journal_mode = WAL")
+        self._connection.execute("PRAGMA synchronous = NORMAL")
+        self._connection.executescript(SCHEMA)
+        self._dirty: Dict[str, Dict[int, Any]] = self._new_dirty()
+        self._statistics_rows: Dict[str, int] = {}  # Number of statistics rows of each vehicle already written
+        self._flush_lock: threading.Lock = threading.Lock()
+        self._stop_event: threading.Event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _new_dirty() -> Dict[str, Dict[Any, Any]]:
+        # The changed entities by table, keyed by id() of the entity; the vehicles of changed schedules with
+        # the ids of the changed trips (None: the whole schedule); and the (vehicle, trip) ids of unassigned trips
+        return {table: {} for table in (*_TABLES.values(), 'schedules', 'unassigned')}
+
+    def _mark_schedule(self, vehicle: Vehicle, trip_id: str) -> None:
+        vehicle, trip_ids = self._dirty['schedules'].setdefault(id(vehicle), (vehicle, set()))
+        if trip_ids is not None:
+            trip_ids.add(trip_id)
+
+    def __call__(self, target: Any, operation: str, args: Tuple[Any, ...]) -> None:
+        """
+        Mark the entities changed by an operation on the model (called by utils.events).
+        """
+        table = _TABLES.get(type(target))
+        if table is None:
+            return  # Class methods (deleting instances) and entities that are not stored
+        dirty = self._dirty
+        dirty[table][id(target)] = target
+        if table == 'actions':
+            trip = target.trip
+            if trip is not None and (operation != 'update_instance_parameter' or args[0] in _TRIP_ATTRIBUTES):
+                dirty['trips'][id(trip)] = trip
+        elif table == 'trips':
+            if operation == 'add_action':
+                dirty['actions'][id(args[0])] = args[0]
+            elif operation == 'update_instance_parameter' and args[0] == 'status' and target.vehicle is not None:
+                self._mark_schedule(target.vehicle, target.id)
+        elif table == 'vehicles' and operation == 'update_planned_end':
+            self._mark_schedule(target, args[0].id)
+        elif table == 'vehicles' and operation in ('assign_to_trip', 'unassign_trip'):
+            trip = args[0]
+            dirty['trips'][id(trip)] = trip
+            if operation == 'unassign_trip':
+                dirty['unassigned'][(target.id, trip.id)] = (target.id, trip.id)
+            self._mark_schedule(target, trip.id)
+
+    def open(self) -> None:
+        """
+        Start recording the changes to the model.
+        """
+        events.add_recorder(self)
+
+    def close(self) -> None:
+        """
+        Stop recording the changes to the model; pending changes can still be flushed.
+        """
+        events.remove_recorder(self)
+
+    def start(self) -> None:
+        """
+        Start the background thread (no-op if already running).
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="SQLiteStore", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop the background thread after flushing the pending changes.
+        """
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def is_running(self) -> bool:
+        """
+        Return True if the background thread is running.
+        """
+        return self._thread is not None and self._thread.is_alive()
+
+    def sync_all(self) -> None:
+        """
+        Mark all entities of the model as changed, so the next flush writes all of them (e.g., after opening
+        the store on a running model, or after restoring a snapshot).
+        """
+        if self.lock is not None:
+            with self.lock:
+                self._mark_all()
+        else:
+            self._mark_all()
+
+    def _mark_all(self) -> None:
+        dirty = self._dirty
+        for cls, table in _TABLES.items():
+            dirty[table].update((id(entity), entity) for entity in cls._instances)
+        dirty['schedules'].update((id(vehicle), (vehicle, None)) for vehicle in Vehicle._instances)
+
+    def _capture(self) -> Tuple[Rows, List[Tuple[str, pd.DataFrame]]]:
+        """
+        Take the changed entities and read their rows (while holding the model lock).
+
+        Returns the rows by table, and the new statistics rows of each vehicle as a slice of its statistics.
+        The statistics are appended by replacing the DataFrame of a vehicle (see utils.stats), so the slices
+        can be converted to rows after releasing the lock.
+        """
+        dirty, self._dirty = self._dirty, self._new_dirty()
+        rows: Rows = {}
+        rows['actors'] = [(actor.id, actor.name, _time(actor.creation_date), _time(actor.last_modified))
+                          for actor in dirty['actors'].values()]
+        rows['locations'] = [(location.id, location.name, location.location_type, *_coordinates(location.georeference),
+                              _time(location.creation_date), _time(location.last_modified))
+                             for location in dirty['locations'].values()]
+        rows['schedules'] = []
+        for vehicle, trip_ids in dirty['schedules'].values():
+            rows['schedules'].extend(_schedule_rows(vehicle, trip_ids))
+        planned = {row[1]: row[3] for row in rows['schedules']}
+        trips = dirty['trips'].values()
+        rows['trips'] = [_trip_row(trip, planned) for trip in trips]
+        rows['deleted_trip_actors'] = [(trip.id,) for trip in trips]
+        rows['trip_actors'] = [(trip.id, actor.id) for trip in trips for actor in _as_list(trip.actors)]
+        rows['actions'] = [_action_row(action) for action in dirty['actions'].values()]
+        rows['vehicles'] = [_vehicle_row(vehicle) for vehicle in dirty['vehicles'].values()]
+        rows['goods'] = [(goods.id, goods.name, goods.goods_type, goods.equipment_type, _value(goods.quantity),
+                          _value(goods.weight), _value(goods.gross_weight), _time(goods.creation_date),
+                          _time(goods.last_modified)) for goods in dirty['goods'].values()]
+        rows['constraints'] = [(constraint.id, constraint.name, constraint.enforceability, _time(constraint.start_time),
+                                _time(constraint.end_time),
+                                ','.join(constraint.vehicle_types) if constraint.vehicle_types is not None else None,
+                                _value(constraint.capacity), _time(constraint.creation_date), _time(constraint.last_modified))
+                               for constraint in dirty['constraints'].values()]
+        rows['sensors'] = [(sensor.id, sensor.name, sensor.sensor_type, _id(sensor.vehicle), _value(sensor.value),
+                            _time(sensor.timestamp), sensor.samples, _time(sensor.creation_date), _time(sensor.last_modified))
+                           for sensor in dirty['sensors'].values()]
+        rows['deleted_schedules'] = [(vehicle.id,) for vehicle, trip_ids in dirty['schedules'].values() if trip_ids is None]
+        rows['unassigned'] = list(dirty['unassigned'].values())
+
+        statistics = []
+        for vehicle in Vehicle._instances:
+            frame = vehicle.statistics
+            written = self._statistics_rows.get(vehicle.id, 0)
+            if len(frame) < written:
+                written = 0  # The statistics were replaced (e.g., restored); rows already stored are ignored
+            if len(frame) > written:
+                statistics.append((vehicle.id, frame.iloc[written:]))
+                self._statistics_rows[vehicle.id] = len(frame)
+        return rows, statistics
+
+    def flush(self) -> int:
+        """
+        Write the changed entities and the new statistics rows to the database in one transaction.
+
+        Returns:
+        -------
+        int
+            The number of rows written.
+        """
+        with self._flush_lock:
+            if self.lock is not None:
+                with self.lock:
+                    rows, statistics = self._capture()
+            else:
+                rows, statistics = self._capture()
+            rows['vehicle_statistics'] = [row for vehicle_id, frame in statistics
+                                          for row in _statistics_rows(vehicle_id, frame)]
+            statements = [
+                (UPSERT_ACTORS, rows['actors']), (UPSERT_LOCATIONS, rows['locations']),
+                (UPSERT_VEHICLES, rows['vehicles']), (UPSERT_TRIPS, rows['trips']),
+                (DELETE_TRIP_ACTORS, rows['deleted_trip_actors']), (INSERT_TRIP_ACTORS, rows['trip_actors']), (UPSERT_ACTIONS, rows['actions']),
+                (DELETE_SCHEDULE, rows['deleted_schedules']), (DELETE_SCHEDULED_TRIP, rows['unassigned']),
+                (INSERT_SCHEDULES, rows['schedules']),
+                (INSERT_STATISTICS, rows['vehicle_statistics']), (UPSERT_GOODS, rows['goods']),
+                (UPSERT_CONSTRAINTS, rows['constraints']), (UPSERT_SENSORS, rows['sensors']),
+            ]
+            if not any(parameters for statement, parameters in statements):
+                return 0
+            written = sum(len(parameters) for statement, parameters in statements if not statement.startswith('DELETE'))
+            with self._connection:  # One transaction, committed (or rolled back on an error) at the end
+                for statement, parameters in statements:
+                    if parameters:
+                        self._connection.executemany(statement, parameters)
+            self.flushes += 1
+            self.written += written
+            return written
+
+    def _run(self) -> None:
+        """
+        Flush the changes every 'interval' seconds until stopped.
+        """
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.flush()
+            except Exception as e:
+                # Keep flushing; the changes of a failed flush are written again when the entities change
+                self.failed_flushes += 1
+                self.last_error = f"Flush failed: {e!r}"
+
+    def query(self, sql: str, parameters: Union[Sequence[Any], Dict[str, Any]] = ()) -> pd.DataFrame:
+        """
+        Run a query on the database, with a read-only connection that does not wait for a flush.
+
+        Parameters:
+        ----------
+        sql : str
+            The query, with ? (or :name) placeholders for the parameters.
+        parameters : sequence or dict, optional
+            The values of the placeholders; datetimes are converted to the stored text. Default is ().
+
+        Returns:
+        -------
+        pd.DataFrame
+            The result, with the time columns (see TIME_COLUMNS) as datetimes.
+        """
+        if isinstance(parameters, dict):
+            parameters = {key: _value(value) for key, value in parameters.items()}
+        else:
+            parameters = [_value(value) for value in parameters]
+        connection = sqlite3.connect(f"file:{os.path.abspath(self.path)}?mode=ro", uri=True)
+        try:
+            return _to_frame(connection.execute(sql, parameters))
+        finally:
+            connection.close()
+
+    def get_trips(self, actor: Optional[str] = None, status: Union[str, Iterable[str], None] = None,
+                  vehicle: Optional[str] = None, location: Optional[str] = None, start: Optional[datetime] = None,
+                  end: Optional[datetime] = None, limit: Optional[int] = None) -> pd.DataFrame:
+        """
+        Query the trips, ordered by their time (see the module documentation), e.g. all trips of an actor last week.
+
+        Parameters:
+        ----------
+        actor : str, optional
+            The name or id of an actor of the trips.
+        status : str or iterable of str, optional
+            The status (or statuses) of the trips.
+        vehicle : str, optional
+            The name or id of the vehicle of the trips.
+        location : str, optional
+            The name or id of a location the trips start or end an action at.
+        start : datetime, optional
+            The earliest time of the trips.
+        end : datetime, optional
+            The time before which the trips start.
+        limit : int, optional
+            The maximum number of trips.
+
+        Returns:
+        -------
+        pd.DataFrame
+            The rows of the trips table, with the names of the vehicle, origin and destination.
+        """
+        conditions, parameters = [], []
+        if actor is not None:
+            conditions.append("t.id IN (SELECT ta.trip_id FROM trip_actors ta JOIN actors a ON a.id = ta.actor_id "
+                              "WHERE a.name = ? OR a.id = ?)")
+            parameters += [actor, actor]
+        if status is not None:
+            statuses = [status] if isinstance(status, str) else list(status)
+            conditions.append(f"t.status IN ({', '.join('?' * len(statuses))})")
+            parameters += statuses
+        if vehicle is not None:
+            conditions.append("t.vehicle_id IN (SELECT id FROM vehicles WHERE name = ? OR id = ?)")
+            parameters += [vehicle, vehicle]
+        if location is not None:
+            conditions.append("t.id IN (SELECT trip_id FROM actions WHERE from_id IN (SELECT id FROM locations "
+                              "WHERE name = ? OR id = ?) UNION SELECT trip_id FROM actions WHERE to_id IN "
+                              "(SELECT id FROM locations WHERE name = ? OR id = ?))")
+            parameters += [location, location, location, location]
+        if start is not None:
+            conditions.append("t.time >= ?")
+            parameters.append(start)
+        if end is not None:
+            conditions.append("t.time < ?")
+            parameters.append(end)
+        sql = ("SELECT t.*, v.name AS vehicle, o.name AS origin, d.name AS destination FROM trips t "
+               "LEFT JOIN vehicles v ON v.id = t.vehicle_id LEFT JOIN locations o ON o.id = t.origin_id "
+               "LEFT JOIN locations d ON d.id = t.destination_id")
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY t.time"
+        if limit is not None:
+            sql += " LIMIT ?"
+            parameters.append(limit)
+        return self.query(sql, parameters)
+
+    def get_actions(self, trip: str) -> pd.DataFrame:
+        """
+        Query the actions of a trip (by name or id), ordered by their sequence number.
+        """
+        return self.query(
+            "SELECT ac.*, f.name AS origin, d.name AS destination FROM actions ac "
+            "LEFT JOIN locations f ON f.id = ac.from_id LEFT JOIN locations d ON d.id = ac.to_id "
+            "WHERE ac.trip_id IN (SELECT id FROM trips WHERE id = ? OR name = ?) ORDER BY ac.sequence_nr",
+            [trip, trip])
+
+    def get_schedules(self, vehicle: Optional[str] = None, start: Optional[datetime] = None,
+                      end: Optional[datetime] = None) -> pd.DataFrame:
+        """
+        Query the scheduled trips of the vehicles (or of one vehicle, by name or id) starting in a period.
+        """
+        conditions, parameters = self._period('s.start_time', start, end)
+        if vehicle is not None:
+            conditions.append("s.vehicle_id IN (SELECT id FROM vehicles WHERE name = ? OR id = ?)")
+            parameters += [vehicle, vehicle]
+        return self.query(
+            "SELECT v.name AS vehicle, s.* FROM schedules s LEFT JOIN vehicles v ON v.id = s.vehicle_id"
+            + (" WHERE " + " AND ".join(conditions) if conditions else "") + " ORDER BY s.start_time", parameters)
+
+    def get_statistics(self, vehicle: Optional[str] = None, start: Optional[datetime] = None,
+                       end: Optional[datetime] = None) -> pd.DataFrame:
+        """
+        Query the statistics of the vehicles (or of one vehicle, by name or id) in a period.
+        """
+        conditions, parameters = self._period('vs.timestamp', start, end)
+        if vehicle is not None:
+            conditions.append("vs.vehicle_id IN (SELECT id FROM vehicles WHERE name = ? OR id = ?)")
+            parameters += [vehicle, vehicle]
+        return self.query(
+            "SELECT v.name AS vehicle, vs.* FROM vehicle_statistics vs LEFT JOIN vehicles v ON v.id = vs.vehicle_id"
+            + (" WHERE " + " AND ".join(conditions) if conditions else "") + " ORDER BY vs.timestamp", parameters)
+
+    @staticmethod
+    def _period(column: str, start: Optional[datetime], end: Optional[datetime]) -> Tuple[List[str], List[Any]]:
+        conditions, parameters = [], []
+        if start is not None:
+            conditions.append(f"{column} >= ?")
+            parameters.append(start)
+        if end is not None:
+            conditions.append(f"{column} < ?")
+            parameters.append(end)
+        return conditions, parameters
@@ -0,0 +1,703 @@
+"""
+Module for ingesting vehicle telemetry (GPS, battery and status) into the model, for a Digital Shadow.
+
+Samples are JSON objects, one per line (NDJSON), e.g.:
+    {"vehicle": "Terminal Tractor 1", "time": "2024-02-04T08:00:00Z", "lat": 52.32, "lon": 6.64, "battery": 87.5, "status": "move"}
+'vehicle' is the id or name of a Vehicle; 'time' is an ISO 8601 time or a Unix timestamp (default: the
+time of arrival). The measurements are optional; 'lng' is accepted for 'lon'.
+
+The TelemetryPipeline runs an asyncio event loop in a background thread, with three stages:
+1. Sources (TCP and UDP listeners, file replays) put chunks of lines into a bounded queue. When the queue
+   is full, TCP connections and replays stop reading until there is room again (backpressure; TCP flow
+   control then slows down the senders). UDP senders cannot be paused, so their datagrams are dropped
+   and counted.
+2. The parser decodes the samples and batches them per vehicle. Samples older than the latest sample of
+   the vehicle (out of order) or older than 'max_age' seconds (by the model's clock) are dropped as stale.
+3. 'update_rate' times per second, the batches are applied to the model at once, in a worker thread
+   holding the model lock: each sample is recorded on the vehicle's Sensor of its type, and the latest
+   values update Vehicle.position, Vehicle.battery_level and Vehicle.status. With a street network,
+   positions are first map-matched onto its edges (before the lock is taken).
+The measured values win over the simulation: while a vehicle's 'gps' sensor is live (Sensor.is_live()),
+the simulation no longer moves the vehicle, and while its 'status' sensor is live, the simulation no longer
+sets its status. A status must be one of Vehicle.VALID_STATUS ('charging' and 'failed' make the dispatcher
+and the replanner treat the vehicle as unavailable); samples with any other status are rejected as invalid.
+Parsing costs a few microseconds per sample and the model lock is taken once per update, not per sample.
+
+The latency of each stage is recorded in a LatencyHistogram per stage (TelemetryPipeline.latencies). A
+recorded trace can be replayed at N times real speed (replay(path, speed=N)); see
+benchmarks/telemetry_replay.py for a harness that reports throughput, queue depth and stage latencies.
+"""
+
+import asyncio
+import bisect
+import math
+import socket
+import threading
+import time
+
+from collections import deque
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+from utils import clock
+from utils.classes import Sensor, Vehicle
+from utils.mapmatching import EdgeIndex, OnlineMapMatcher
+from utils.osmnx import StreetNetwork
+from utils.otm import loads, parse_datetime
+
+# The statuses a vehicle can report
+VEHICLE_STATUSES: Tuple[str, ...] = tuple(Vehicle.VALID_STATUS)  # The statuses the dispatcher and replanner understand
+
+# (sensor type, vehicle parameter) of each measurement of a sample
+MEASUREMENTS: Tuple[Tuple[str, str], ...] = (('gps', 'position'), ('battery', 'battery_level'), ('status', 'status'))
+
+# A parsed sample: (time, position, battery level, status); missing measurements are None
+Sample = Tuple[datetime, Optional[List[float]], Optional[float], Optional[str]]
+
+# The stages whose latency is measured: the time a chunk of lines waits in the queue, the time to parse it,
+# the time the oldest sample of an update waits for the update, the duration of the update, and the time
+# from queueing the oldest sample of an update until it is applied
+STAGES: Tuple[str, ...] = ('queue', 'parse', 'batch', 'apply', 'end_to_end')
+
+READ_SIZE = 65536
+UDP_BUFFER_SIZE = 4 * 1024 * 1024
+
+# A paced replay releases the lines due within this many seconds (of wall time) at once
+PACE_INTERVAL = 0.005
+
+
+def parse_sample(line: bytes, arrival: datetime) -> Tuple[str, Sample]:
+    """
+    Parse a telemetry sample.
+
+    Parameters
+    ----------
+    line : bytes
+        The sample as a JSON object.
+    arrival : datetime
+        The time the sample arrived, used if it has no 'time'.
+
+    Returns
+    -------
+    tuple
+        The vehicle (id or name) and the sample (time, position, battery level, status).
+
+    Raises
+    ------
+    ValueError
+        If the sample is not valid.
+    """
+    data = loads(line)
+    if not isinstance(data, dict) or not isinstance(data.get('vehicle'), str):
+        raise ValueError("A sample must be a JSON object with a 'vehicle'")
+    time = data.get('time')
+    if time is None:
+        time = arrival
+    elif isinstance(time, (int, float)):
+        time = datetime.fromtimestamp(time)
+    else:
+        time = parse_datetime(time)
+    lat, lon = data.get('lat'), data.get('lon', data.get('lng'))
+    position = [float(lat), float(lon)] if lat is not None and lon is not None else None
+    battery = float(data['battery']) if data.get('battery') is not None else None
+    status = data.get('status')
+    if status is not None and status not in VEHICLE_STATUSES:
+        raise ValueError(f"Unknown vehicle status '{status}'")
+    return data['vehicle'], (time, position, battery, status)
+
+
+def get_sample_times(lines: List[bytes]) -> List[float]:
+    """
+    Return the time of each sample as a Unix timestamp, for pacing a replay.
+
+    Parameters
+    ----------
+    lines : list of bytes
+        The NDJSON lines of the samples.
+
+    Returns
+    -------
+    list of float
+        The times; lines without a (valid) time get the time of the previous line (or of the first timed line).
+    """
+    times: List[Optional[float]] = []
+    for line in lines:
+        try:
+            value = loads(line).get('time')
+            times.append(float(value) if isinstance(value, (int, float)) else
+                         parse_datetime(value).timestamp() if value is not None else None)
+        except (ValueError, TypeError, AttributeError):
+            times.append(None)
+    previous = next((t for t in times if t is not None), 0.0)
+    for i, t in enumerate(times):
+        if t is None:
+            times[i] = previous
+        previous = times[i]
+    return times
+
+
+async def pace(lines: List[bytes], times: List[float], speed: float,
+               max_lines: int = 1000) -> AsyncIterator[Tuple[float, List[bytes]]]:
+    """
+    Yield chunks of lines at the moment they are due, keeping the time between the samples scaled by 1 / speed.
+
+    The first line is due immediately; line i is due (times[i] - times[0]) / speed seconds later. The lines are
+    released in chunks of the lines due within the next PACE_INTERVAL seconds (at most 'max_lines'), so high
+    speeds do not cost a sleep per line. If the consumer falls behind, the lines are yielded as fast as it accepts them.
+
+    Parameters
+    ----------
+    lines : list of bytes
+        The lines, in order of their times.
+    times : list of float
+        The times of the lines in seconds (e.g., from get_sample_times), non-decreasing.
+    speed : float
+        The replay speed: 1 is real time, 10 is ten times as fast.
+    max_lines : int, optional
+        The maximum number of lines per chunk. Default is 1000.
+
+    Yields
+    ------
+    tuple of (float, list of bytes)
+        The lag (seconds the chunk's first line is behind its schedule) and the chunk of lines.
+    """
+    if speed <= 0:
+        raise ValueError(f"Speed must be positive, got {speed}")
+    if not lines:
+        return
+    loop = asyncio.get_running_loop()
+    start, first = loop.time(), times[0]
+    i = 0
+    while i < len(lines):
+        now = loop.time()
+        due = (times[i] - first) / speed - (now - start)
+        if due > 0:
+            await asyncio.sleep(due)
+            now = loop.time()
+        end = min(bisect.bisect_right(times, first + (now - start + PACE_INTERVAL) * speed, lo=i + 1), i + max_lines)
+        yield max(0.0, (now - start) - (times[i] - first) / speed), lines[i:end]
+        i = end
+
+
+class LatencyHistogram:
+    """
+    A histogram of latencies with logarithmic buckets (BUCKETS_PER_DOUBLING per doubling from 1 microsecond).
+
+    Recording costs a logarithm and a dictionary update, so it can be done per chunk or update in the pipeline.
+    Percentiles are estimated as the upper bound of the bucket they fall in (at most 19% too high).
+
+    Instance Attributes:
+    ----------
+    buckets : dict
+        The number of latencies per bucket index; bucket i holds latencies up to 1 µs * 2 ** (i / BUCKETS_PER_DOUBLING).
+    count : int
+        The number of latencies recorded.
+    total : float
+        The sum of the latencies in seconds.
+    max : float
+        The largest latency in seconds.
+
+    Methods:
+    -------
+    record(seconds: float, count: int = 1) -> None
+        Record a latency ('count' times).
+    percentile(p: float) -> float
+        Estimate the p-th percentile (0 to 100) in seconds.
+    mean() -> float
+        The mean latency in seconds.
+    get_buckets() -> list
+        The (upper bound in seconds, count) of the non-empty buckets.
+    """
+
+    BUCKETS_PER_DOUBLING = 4
+    MIN_LATENCY = 1e-6
+
+    def __init__(self) -> None:
+        self.buckets: Dict[int, int] = {}
+        self.count: int = 0
+        self.total: float = 0.0
+        self.max: float = 0.0
+
+    def record(self, seconds: float, count: int = 1) -> None:
+        index = max(0, math.ceil(math.log2(max(seconds, self.MIN_LATENCY) / self.MIN_LATENCY) * self.BUCKETS_PER_DOUBLING))
+        self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += count
+        self.total += seconds * count
+        if seconds > self.max:
+            self.max = seconds
+
+    def get_upper_bound(self, index: int) -> float:
+        return self.MIN_LATENCY * 2 ** (index / self.BUCKETS_PER_DOUBLING)
+
+    def percentile(self, p: float) -> float:
+        if not self.count:
+            return 0.0
+        rank, seen = p / 100 * self.count, 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return min(self.get_upper_bound(index), self.max)
+        return self.max
+
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def get_buckets(self) -> List[Tuple[float, int]]:
+        return [(self.get_upper_bound(index), self.buckets[index]) for index in sorted(self.buckets)]
+
+
+class TelemetryPipeline:
+    """
+    Ingests vehicle telemetry from sockets and files into the model in a background thread.
+
+    Instance Attributes:
+    ----------
+    lock : threading.RLock, optional
+        The model lock held while samples are applied (e.g., SimulationTicker.lock).
+    update_rate : float
+        The number of times per second the batched samples are applied to the model.
+    max_age : float, optional
+        Samples older than this many seconds (by the model's clock) are dropped; None keeps all.
+    queue_size : int
+        The maximum number of queued chunks of lines (a TCP read, a datagram or a replayed block).
+    max_samples : int
+        The maximum number of samples per vehicle and update; older samples are dropped.
+    edge_index : EdgeIndex, optional
+        The edges GPS positions are map-matched onto (see utils/mapmatching.py); None uses them as measured.
+    stats : dict
+        Counters of the samples: 'received', 'invalid', 'stale' (out of order, too old, or more than
+        'max_samples' per update), 'dropped' (UDP, queue full), 'unknown' (no such vehicle), 'applied',
+        and of the 'updates' applied.
+    latencies : dict
+        A LatencyHistogram per stage (see STAGES).
+
+    Methods:
+    -------
+    start() -> None
+        Start the event loop in a background thread (no-op if already running).
+    stop() -> None
+        Close the sources, apply the pending samples and stop the thread.
+    listen_tcp(host: str, port: int) -> int
+        Accept NDJSON samples on a TCP port; returns the port.
+    listen_udp(host: str, port: int) -> int
+        Accept NDJSON samples in UDP datagrams; returns the port.
+    replay(path: str, speed: float = None) -> concurrent.futures.Future
+        Feed the samples of an NDJSON file, optionally paced by their times; the future returns the number of lines.
+    flush() -> int
+        Apply the pending samples now; returns the number applied.
+
+    Example:
+    -------
+    pipeline = TelemetryPipeline(lock=ticker.lock, update_rate=2)
+    pipeline.start()
+    pipeline.listen_tcp('127.0.0.1', 8503)
+    """
+
+    def __init__(self,
+                 lock: Any = None,
+                 update_rate: float = 1.0,
+                 max_age: Optional[float] = 60.0,
+                 queue_size: int = 1000,
+                 max_samples: int = 100,
+                 network: Optional[StreetNetwork] = None) -> None:
+        """
+        Initialize a new TelemetryPipeline.
+
+        Parameters:
+        ----------
+        lock : threading.RLock, optional
+            The model lock held while samples are applied. Default is None.
+        update_rate : float, optional
+            The number of times per second samples are applied to the model. Default is 1.0.
+        max_age : float, optional
+            The maximum age of a sample in seconds; None keeps all samples. Default is 60.
+        queue_size : int, optional
+            The maximum number of queued chunks of lines. Default is 1000.
+        max_samples : int, optional
+            The maximum number of samples per vehicle and update. Default is 100.
+        network : StreetNetwork, optional
+            The street network GPS positions are map-matched onto. Default is None (positions are used as measured).
+
+        Raises:
+        ------
+        ValueError:
+            If 'update_rate' is not positive.
+        """
+        if update_rate <= 0:
+            raise ValueError(f"Update rate must be positive, got {update_rate}")
+        self.lock = lock
+        self.update_rate: float = update_rate
+        self.max_age: Optional[float] = max_age
+        self.queue_size: int = queue_size
+        self.max_samples: int = max_samples
+        self.edge_index: Optional[EdgeIndex] = EdgeIndex(network) if network is not None else None
+        self.stats: Dict[str, int] = dict.fromkeys(['received', 'invalid', 'stale', 'dropped', 'unknown', 'applied', 'updates'], 0)
+        self.latencies: Dict[str, LatencyHistogram] = {stage: LatencyHistogram() for stage in STAGES}
+        self._pending: Dict[str, Deque[Sample]] = {}
+        self._pending_since: Optional[float] = None
+        self._matchers: Dict[str, OnlineMapMatcher] = {}
+        self._last_time: Dict[str, datetime] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._thread: Optional[threading.Thread] = None
+        self._tasks: List[asyncio.Task] = []
+        self._servers: List[Any] = []
+        self._apply_lock: threading.Lock = threading.Lock()
+
+    @property
+    def queue_depth(self) -> int:
+        """
+        The number of chunks of lines waiting to be parsed.
+        """
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def start(self) -> None:
+        """
+        Start the event loop in a background thread (no-op if already running).
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._loop = asyncio.new_event_loop()
+        ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(ready,), name="TelemetryPipeline", daemon=True)
+        self._thread.start()
+        ready.wait()
+
+    def _run(self, ready: threading.Event) -> None:
+        """
+        Run the parser and the updater on the event loop until stopped.
+        """
+        asyncio.set_event_loop(self._loop)
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._tasks = [self._loop.create_task(self._parse_queue()), self._loop.create_task(self._update())]
+        self._loop.call_soon(ready.set)
+        self._loop.run_forever()
+        self._loop.run_until_complete(self._loop.shutdown_default_executor())
+        self._loop.close()
+
+    def stop(self) -> None:
+        """
+        Close the sources, parse the queued lines, apply the pending samples and stop the thread.
+        """
+        if self._thread is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._thread = None
+        self._queue = None
+
+    def is_running(self) -> bool:
+        """
+        Return True if the background thread is running.
+        """
+        return self._thread is not None and self._thread.is_alive()
+
+    async def _shutdown(self) -> None:
+        for server in self._servers:
+            server.close()
+        self._servers = []
+        while not self._queue.empty():
+            self._parse(*self._queue.get_nowait())
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._apply(*self._take_pending())
+
+    def _submit(self, coroutine: Any) -> Any:
+        """
+        Run a coroutine on the event loop and wait for its result.
+
+        Raises:
+        ------
+        RuntimeError:
+            If the pipeline is not running.
+        """
+        if not self.is_running():
+            coroutine.close()
+            raise RuntimeError("The telemetry pipeline is not running; call start() first")
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    # Sources
+
+    def listen_tcp(self, host: str = '127.0.0.1', port: int = 8503) -> int:
+        """
+        Accept NDJSON samples on a TCP port.
+
+        Parameters:
+        ----------
+        host : str, optional
+            The interface to listen on. Default is '127.0.0.1' (local connections only).
+        port : int, optional
+            The port to listen on; 0 picks a free port. Default is 8503.
+
+        Returns:
+        -------
+        int
+            The port listened on.
+        """
+        return self._submit(self._listen_tcp(host, port))
+
+    async def _listen_tcp(self, host: str, port: int) -> int:
+        server = await asyncio.start_server(self._read_stream, host, port)
+        self._servers.append(server)
+        return server.sockets[0].getsockname()[1]
+
+    async def _read_stream(self, reader: asyncio.StreamReader, writer: Optional[asyncio.StreamWriter] = None) -> int:
+        """
+        Queue the lines of a stream until it ends, waiting while the queue is full.
+        """
+        lines_read = 0
+        rest = b''
+        try:
+            while chunk := await reader.read(READ_SIZE):
+                lines = (rest + chunk).split(b'\n')
+                rest = lines.pop()
+                lines = [line for line in lines if line.strip()]
+                if lines:
+                    lines_read += len(lines)
+                    self.stats['received'] += len(lines)
+                    await self._queue.put((time.perf_counter(), lines))
+            if rest.strip():
+                lines_read += 1
+                self.stats['received'] += 1
+                await self._queue.put((time.perf_counter(), [rest]))
+        except ConnectionError:
+            pass
+        finally:
+            if writer is not None:
+                writer.close()
+        return lines_read
+
+    def listen_udp(self, host: str = '127.0.0.1', port: int = 8503) -> int:
+        """
+        Accept NDJSON samples in UDP datagrams (one or more lines per datagram).
+
+        Parameters:
+        ----------
+        host : str, optional
+            The interface to listen on. Default is '127.0.0.1' (local connections only).
+        port : int, optional
+            The port to listen on; 0 picks a free port. Default is 8503.
+
+        Returns:
+        -------
+        int
+            The port listened on.
+        """
+        return self._submit(self._listen_udp(host, port))
+
+    async def _listen_udp(self, host: str, port: int) -> int:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, UDP_BUFFER_SIZE)  # Absorbs bursts while the loop is busy
+        sock.bind((host, port))
+        transport, _ = await self._loop.create_datagram_endpoint(lambda: _DatagramProtocol(self), sock=sock)
+        self._servers.append(transport)
+        return transport.get_extra_info('sockname')[1]
+
+    def _receive_datagram(self, data: bytes) -> None:
+        """
+        Queue the lines of a datagram, or drop them if the queue is full.
+        """
+        lines = [line for line in data.split(b'\n') if line.strip()]
+        self.stats['received'] += len(lines)
+        try:
+            self._queue.put_nowait((time.perf_counter(), lines))
+        except asyncio.QueueFull:
+            self.stats['dropped'] += len(lines)
+
+    def replay(self, path: str, speed: Optional[float] = None) -> Any:
+        """
+        Feed the samples of an NDJSON file (a recorded trace), as fast as the pipeline accepts them or paced by
+        their times. Paced lines are queued in chunks like those of a live source, so they take the same path
+        through the pipeline. Recorded samples are older than 'max_age' unless it is None.
+
+        Parameters:
+        ----------
+        path : str
+            The path to the file.
+        speed : float, optional
+            Keep the time between the samples, scaled by 1 / speed (1 is real time, 10 is ten times as fast);
+            the samples must be in order of time. Default is None (as fast as possible).
+
+        Returns:
+        -------
+        concurrent.futures.Future
+            Completes with the number of lines read once the whole file is queued.
+
+        Raises:
+        ------
+        ValueError:
+            If 'speed' is not positive.
+        """
+        if not self.is_running():
+            raise RuntimeError("The telemetry pipeline is not running; call start() first")
+        if speed is not None and speed <= 0:
+            raise ValueError(f"Speed must be positive, got {speed}")
+        return asyncio.run_coroutine_threadsafe(self._replay(path, speed), self._loop)
+
+    async def _replay(self, path: str, speed: Optional[float] = None) -> int:
+        if speed is not None:
+            with open(path, 'rb') as f:
+                lines = [line for line in f.read().splitlines() if line.strip()]
+            async for _, chunk in pace(lines, get_sample_times(lines), speed):
+                self.stats['received'] += len(chunk)
+                await self._queue.put((time.perf_counter(), chunk))
+            return len(lines)
+        with open(path, 'rb') as f:
+            reader = asyncio.StreamReader(limit=READ_SIZE)
+            while chunk := f.read(READ_SIZE):
+                reader.feed_data(chunk)
+            reader.feed_eof()
+        return await self._read_stream(reader)
+
+    # Parsing and applying
+
+    async def _parse_queue(self) -> None:
+        while True:
+            enqueued, lines = await self._queue.get()
+            self._parse(enqueued, lines)
+
+    def _parse(self, enqueued: float, lines: List[bytes]) -> None:
+        """
+        Parse a chunk of lines (queued at perf_counter() 'enqueued') and batch the samples per vehicle,
+        dropping invalid and stale samples.
+        """
+        start = time.perf_counter()
+        self.latencies['queue'].record(start - enqueued)
+        if self._pending_since is None:
+            self._pending_since = enqueued
+        arrival = clock.now()
+        cutoff = arrival - timedelta(seconds=self.max_age) if self.max_age is not None else None
+        pending, last_time, stats = self._pending, self._last_time, self.stats
+        for line in lines:
+            try:
+                vehicle, sample = parse_sample(line, arrival)
+            except (ValueError, TypeError, KeyError):
+                stats['invalid'] += 1
+                continue
+            sample_time = sample[0]
+            last = last_time.get(vehicle)
+            if (last is not None and sample_time < last) or (cutoff is not None and sample_time < cutoff):
+                stats['stale'] += 1
+                continue
+            last_time[vehicle] = sample_time
+            samples = pending.get(vehicle)
+            if samples is None:
+                samples = pending[vehicle] = deque(maxlen=self.max_samples)
+            elif len(samples) == self.max_samples:
+                stats['stale'] += 1
+            samples.append(sample)
+        self.latencies['parse'].record(time.perf_counter() - start)
+
+    async def _update(self) -> None:
+        while True:
+            await asyncio.sleep(1 / self.update_rate)
+            pending, since = self._take_pending()
+            if pending:
+                await self._loop.run_in_executor(None, self._apply, pending, since)
+
+    def _take_pending(self) -> Tuple[Dict[str, Deque[Sample]], Optional[float]]:
+        """
+        Return the pending samples and the perf_counter() time their oldest chunk was queued.
+        """
+        pending, since = self._pending, self._pending_since
+        self._pending, self._pending_since = {}, None
+        return pending, since
+
+    def flush(self) -> int:
+        """
+        Parse the queued lines and apply the pending samples now.
+
+        Returns:
+        -------
+        int
+            The number of samples applied.
+        """
+        return self._submit(self._flush())
+
+    async def _flush(self) -> int:
+        while not self._queue.empty():
+            self._parse(*self._queue.get_nowait())
+        return await self._loop.run_in_executor(None, self._apply, *self._take_pending())
+
+    def _apply(self, pending: Dict[str, Deque[Sample]], since: Optional[float] = None) -> int:
+        """
+        Record the samples on the vehicles' sensors and update the vehicles, holding the model lock.
+        """
+        with self._apply_lock:
+            start = time.perf_counter()
+            snapped = self._match(pending) if self.edge_index is not None else {}
+            with self.lock if self.lock is not None else nullcontext():
+                applied = self._update_vehicles(pending, snapped)
+            end = time.perf_counter()
+        if pending:
+            self.latencies['apply'].record(end - start)
+        if since is not None:
+            self.latencies['batch'].record(start - since)
+            self.latencies['end_to_end'].record(end - since)
+        return applied
+
+    def _match(self, pending: Dict[str, Deque[Sample]]) -> Dict[str, List[float]]:
+        """
+        Map-match the GPS samples per vehicle (without holding the model lock) and return the latest matched positions.
+        """
+        snapped = {}
+        for key, samples in pending.items():
+            matcher = self._matchers.get(key)
+            if matcher is None:
+                matcher = self._matchers[key] = OnlineMapMatcher(self.edge_index)
+            for sample in samples:
+                if sample[1] is not None:
+                    match = matcher.update(*sample[1])
+                    if match is not None:
+                        snapped[key] = match.position
+                    else:
+                        snapped.pop(key, None)
+            matcher.finalized.clear()  # Only the current estimates are used
+        return snapped
+
+    def _update_vehicles(self, pending: Dict[str, Deque[Sample]], snapped: Dict[str, List[float]]) -> int:
+        """
+        Record the samples on the vehicles' sensors and update the vehicles (called holding the model lock).
+        """
+        applied = 0
+        vehicles = {vehicle.name: vehicle for vehicle in Vehicle._instances}
+        vehicles.update({vehicle.id: vehicle for vehicle in Vehicle._instances})
+        for key, samples in pending.items():
+            vehicle = vehicles.get(key)
+            if vehicle is None:
+                self.stats['unknown'] += len(samples)
+                continue
+            sensors = {sensor.sensor_type: sensor for sensor in vehicle.sensors}
+            for index, (sensor_type, parameter) in enumerate(MEASUREMENTS, start=1):
+                values = [(sample[0], sample[index]) for sample in samples if sample[index] is not None]
+                if not values:
+                    continue
+                sensor = sensors.get(sensor_type)
+                if sensor is None:
+                    sensor = Sensor(name=f"{vehicle.name} {sensor_type}", sensor_type=sensor_type, vehicle=vehicle)
+                for sample_time, value in values:
+                    sensor.record(value, sample_time)
+                # The sensor keeps the measured position; the vehicle is placed on the street network
+                value = snapped.get(key, sensor.value) if sensor_type == 'gps' else sensor.value
+                if getattr(vehicle, parameter) != value:
+                    vehicle.update_instance_parameter(parameter, value)
+            applied += len(samples)
+        self.stats['applied'] += applied
+        self.stats['updates'] += 1
+        return applied
+
+
+class _DatagramProtocol(asyncio.DatagramProtocol):
+    """
+    Passes received datagrams to a TelemetryPipeline.
+    """
+
+    def __init__(self, pipeline: TelemetryPipeline) -> None:
+        self.pipeline = pipeline
+
+    def datagram_received(self, data: bytes, addr: Any) -> None:
+        self.pipeline._receive_datagram(data)
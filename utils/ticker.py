@@ -0,0 +1,186 @@
+"""
+Module for advancing the simulation in a background thread, independent of Streamlit reruns.
+
+The SimulationTicker starts requested trips, moves vehicles and updates the statistics at a
+configurable interval. All model mutations happen while holding the ticker's lock; the page
+takes the same lock when it changes the model (e.g., creating or assigning trips) and only
+renders the latest snapshot published by the ticker.
+"""
+
+import threading
+import pandas as pd
+
+from typing import Any, Dict, List, Optional
+
+from utils import clock
+from utils.classes import Trip, Vehicle
+from utils.dispatcher import Dispatcher
+from utils.entities import start_trips, update_vehicle_positions
+from utils.osm import get_vehicle_features
+from utils.replanner import RollingHorizonPlanner
+from utils.stats import update_statistics
+
+
+class SimulationTicker:
+    """
+    A background thread advancing the model at a fixed rate.
+
+    Instance Attributes:
+    ----------
+    interval : float
+        The (wall-clock) time between two simulation steps in seconds.
+    lock : threading.RLock
+        The lock guarding all model mutations.
+    destination_markers : list
+        The destination markers of trips that are not yet completed.
+    ticks : int
+        The number of steps executed so far.
+    failed_steps : int
+        The number of steps of the background thread that raised an exception.
+    last_error : str, optional
+        A description of the exception of the last failed step.
+    dispatcher : Dispatcher, optional
+        If set, draft trips are assigned to vehicles automatically at every step.
+    replanner : RollingHorizonPlanner, optional
+        If set, trips that have not started yet are re-planned periodically or when execution deviates from the schedule.
+
+    Methods:
+    -------
+    start() -> None
+        Start the background thread (no-op if already running).
+    stop() -> None
+        Stop the background thread.
+    step() -> None
+        Execute one simulation step synchronously.
+    set_interval(interval: float) -> None
+        Change the time between two simulation steps.
+    snapshot() -> dict
+        Return the latest consistent state published by the ticker.
+    """
+
+    def __init__(self, interval: float = 1.0) -> None:
+        """
+        Initialize a new SimulationTicker.
+
+        Parameters:
+        ----------
+        interval : float, optional
+            The time between two simulation steps in seconds. Default is 1.0.
+        """
+        self.interval: float = interval
+        self.lock: threading.RLock = threading.RLock()
+        self.destination_markers: List[Any] = []
+        self.ticks: int = 0
+        self.failed_steps: int = 0
+        self.last_error: Optional[str] = None
+        self.dispatcher: Optional[Dispatcher] = None
+        self.replanner: Optional[RollingHorizonPlanner] = None
+        self._stop_event: threading.Event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._snapshot: Dict[str, Any] = {
+            'tick': 0,
+            'timestamp': clock.now(),
+            'vehicle_features': get_vehicle_features(Vehicle.get_all_vehicles()),
+            'destination_markers': [],
+            'statistics': pd.DataFrame(),
+        }
+
+    def start(self) -> None:
+        """
+        Start the background thread (no-op if already running).
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="SimulationTicker", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop the background thread and wait for the current step to finish.
+        """
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def is_running(self) -> bool:
+        """
+        Return True if the background thread is running.
+        """
+        return self._thread is not None and self._thread.is_alive()
+
+    def set_interval(self, interval: float) -> None:
+        """
+        Change the time between two simulation steps.
+
+        Parameters:
+        ----------
+        interval : float
+            The new interval in seconds.
+
+        Raises:
+        ------
+        ValueError:
+            If 'interval' is not positive.
+        """
+        if interval <= 0:
+            raise ValueError(f"Tick interval must be positive, got {interval}")
+        self.interval = interval
+
+    def step(self) -> None:
+        """
+        Execute one simulation step: dispatch draft trips and re-plan (if enabled), start requested
+        trips, update vehicle positions and statistics.
+        """
+        with self.lock:
+            clock.get_clock().tick()
+
+            if self.dispatcher is not None:
+                self.dispatcher.dispatch()
+
+            if self.replanner is not None:
+                self.replanner.step()
+
+            # Start trips with status "requested"
+            start_trips(Trip.get_by_status('requested'))
+
+            # Update vehicle positions
+            self.destination_markers = update_vehicle_positions(
+                Trip.get_by_status('in_transit'),
+                self.destination_markers
+            )
+
+            statistics = update_statistics() if Trip.get_total_trips() > 0 else pd.DataFrame()
+
+            self.ticks += 1
+            self._snapshot = {
+                'tick': self.ticks,
+                'timestamp': clock.now(),
+                'vehicle_features': get_vehicle_features(Vehicle.get_all_vehicles()),
+                'destination_markers': list(self.destination_markers),
+                'statistics': statistics,
+            }
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Return the latest consistent state published by the ticker.
+
+        Returns:
+        -------
+        dict
+            A dictionary with keys 'tick', 'timestamp', 'vehicle_features', 'destination_markers' and 'statistics'.
+        """
+        return self._snapshot
+
+    def _run(self) -> None:
+        """
+        Body of the background thread.
+        """
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.step()
+            except Exception as e:
+                # Keep ticking; a single failing step should not stop the simulation
+                self.failed_steps += 1
+                self.last_error = f"Simulation step {self.ticks + 1} failed: {e!r}"
@@ -0,0 +1,492 @@
+"""
+Module for planning a batch of trips over the fleet (a vehicle routing problem with time windows).
+
+Each trip is a job that starts at the origin of its first action and ends at the destination
+of its last action. A vehicle drives empty from the end of one job to the start of the next;
+these empty legs are read from a precomputed travel-time matrix between locations. Jobs have
+a time window per vehicle (earliest and latest start), translated from the time windows of the
+constraints of the trip, its actions and the locations it visits, as the dispatcher does (see
+utils/constraints.py). Starting after a 'preference' window is penalized as lateness; a plan that
+violates an 'enforced' window is never accepted by the local search. The same holds for a job on
+a vehicle whose type or capacity does not meet its enforced constraints. Jobs that no vehicle can
+execute within their enforced constraints are left out of the plan (VRPSolution.unplanned) and
+remain drafts, as with the dispatcher.
+
+The solver builds an initial plan by earliest-deadline insertion and improves it by local
+search (relocating and swapping jobs within and between vehicles) until its time budget is
+spent, or until a number of moves in a row did not improve the plan. The objective is a weighted sum of the makespan, the empty driving time and the total
+lateness.
+"""
+
+import math
+import random
+import time
+import numpy as np
+
+from datetime import datetime, timedelta
+from typing import Any, Collection, Dict, List, Optional, Sequence, Tuple
+
+from scipy.sparse.csgraph import dijkstra
+
+from utils import clock
+from utils.classes import Location, Trip, Vehicle
+from utils.constraints import get_action_offsets, get_compatible_vehicles, get_constraints, get_start_window
+from utils.osmnx import StreetNetwork, haversine
+
+WINDOW_TOLERANCE = 1e-3  # Seconds; planned starts are rounded to microseconds
+
+
+def get_travel_time_matrix(network: StreetNetwork, locations: Sequence[Location], speed: float) -> np.ndarray:
+    """
+    Compute the driving time between all pairs of locations on the street network.
+
+    All shortest paths are computed in one multi-source dijkstra over the network's CSR arrays.
+
+    Parameters
+    ----------
+    network : StreetNetwork
+        The shared street network.
+    locations : list of Location
+        The locations; row and column i of the matrix belong to locations[i].
+    speed : float
+        The driving speed in m/s.
+
+    Returns
+    -------
+    numpy.ndarray
+        A (len(locations) x len(locations)) matrix of travel times in seconds (inf if unreachable).
+    """
+    nodes = [network.get_node_index(network.get_nearest_node(*location.georeference)) for location in locations]
+    distances = dijkstra(network.get_csr('length'), indices=nodes)
+    return distances[:, nodes] / speed
+
+
+def get_time_windows(trip: Trip, vehicles: Sequence[Vehicle], now: Optional[datetime] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Get the window in which each vehicle should start a trip, from the constraints of the trip.
+
+    The constraints are those of utils.constraints.get_constraints(): of the trip, its actions and the
+    locations it visits; the windows are translated to the start of the trip per vehicle, as in
+    check_feasibility(). Constraints without time window attributes are ignored.
+
+    Parameters
+    ----------
+    trip : Trip
+        The trip.
+    vehicles : list of Vehicle
+        The vehicles.
+    now : datetime, optional
+        The current time. Default is clock.now().
+
+    Returns
+    -------
+    tuple of numpy.ndarray
+        Per vehicle, in seconds from now: the earliest start (-inf if none) of all constraints, the latest
+        start (inf if none) of all constraints, and the latest start of the 'enforced' constraints.
+    """
+    now = now if now is not None else clock.now()
+    constraints = get_constraints(trip, include_preference=True)
+    if not constraints:
+        return np.full(len(vehicles), -math.inf), np.full(len(vehicles), math.inf), np.full(len(vehicles), math.inf)
+    offsets = get_action_offsets(trip, vehicles)
+    earliest, latest = get_start_window(trip, vehicles, constraints, now, offsets)
+    enforced = [c for c in constraints if getattr(c[0], 'enforceability', 'enforced') == 'enforced']
+    _, latest_enforced = get_start_window(trip, vehicles, enforced, now, offsets)
+    return earliest, latest, latest_enforced
+
+
+class VRPSolution:
+    """
+    The result of a VRPSolver run.
+
+    Instance Attributes:
+    ----------
+    routes : dict
+        The ordered list of trips per vehicle.
+    starts : dict
+        The planned start time per trip id.
+    ends : dict
+        The planned end time per trip id.
+    makespan : float
+        Seconds from the planning time until the last trip ends.
+    empty_driving : float
+        Seconds driven empty between consecutive trips (summed over vehicles).
+    lateness : float
+        Seconds by which trips end after their time window (summed over trips).
+    objective : float
+        The weighted objective value.
+    iterations : int
+        The number of local search moves evaluated.
+    unplanned : list
+        The trips left out of the plan because no vehicle can execute them within their enforced constraints.
+
+    Methods:
+    -------
+    is_feasible(vehicle: Vehicle) -> bool
+        Check whether the route of a vehicle meets the enforced constraints of its trips.
+    apply() -> list
+        Assign the trips of the feasible routes; return the trips that were not assigned.
+    """
+
+    def __init__(self, routes: Dict[Vehicle, List[Trip]], starts: Dict[str, datetime], ends: Dict[str, datetime],
+                 makespan: float, empty_driving: float, lateness: float, objective: float, iterations: int,
+                 unplanned: Optional[List[Trip]] = None) -> None:
+        self.routes = routes
+        self.starts = starts
+        self.ends = ends
+        self.makespan = makespan
+        self.empty_driving = empty_driving
+        self.lateness = lateness
+        self.objective = objective
+        self.iterations = iterations
+        self.unplanned = unplanned if unplanned is not None else []
+
+    def __repr__(self) -> str:
+        return (f"VRPSolution(trips={len(self.starts)}, unplanned={len(self.unplanned)}, makespan={self.makespan:.0f}s, "
+                f"empty_driving={self.empty_driving:.0f}s, lateness={self.lateness:.0f}s, iterations={self.iterations})")
+
+    def is_feasible(self, vehicle: Vehicle) -> bool:
+        """
+        Check whether the route of a vehicle meets the enforced constraints of its trips at their planned starts.
+
+        Parameters:
+        ----------
+        vehicle : Vehicle
+            The vehicle.
+
+        Returns:
+        -------
+        bool
+            True if the vehicle's type and capacity meet the enforced constraints of every trip of its route,
+            and every trip starts within its enforced time windows.
+        """
+        now = clock.now()
+        for trip in self.routes.get(vehicle, []):
+            constraints = get_constraints(trip)
+            if not constraints:
+                continue
+            if not get_compatible_vehicles(trip, [vehicle], constraints=constraints)[0]:
+                return False
+            earliest, latest = get_start_window(trip, [vehicle], constraints, now)
+            start = (self.starts[trip.id] - now).total_seconds()
+            if not earliest[0] - WINDOW_TOLERANCE <= start <= latest[0] + WINDOW_TOLERANCE:
+                return False
+        return True
+
+    def apply(self) -> List[Trip]:
+        """
+        Write the plan to the model: assign every trip to its vehicle, in route order, at its planned start.
+
+        Routes that do not meet the enforced constraints of their trips (see is_feasible()) are skipped.
+
+        Returns:
+        -------
+        list
+            The trips that were not assigned: the unplanned trips and the trips of skipped routes.
+        """
+        skipped = list(self.unplanned)
+        for vehicle, trips in self.routes.items():
+            if not self.is_feasible(vehicle):
+                skipped.extend(trips)
+                continue
+            for trip in trips:
+                vehicle.assign_to_trip(trip, start=self.starts[trip.id])
+        return skipped
+
+
+class VRPSolver:
+    """
+    Assigns and sequences a batch of trips over the fleet, minimizing makespan and empty driving under time windows.
+
+    Instance Attributes:
+    ----------
+    travel_times : numpy.ndarray
+        The travel times (in seconds, at 'speed') between the locations.
+    locations : list
+        The locations belonging to the rows/columns of 'travel_times'.
+    speed : float
+        The speed (m/s) at which 'travel_times' were computed; scaled per vehicle by its actual speed.
+    time_budget : float
+        The maximum number of seconds spent in local search.
+    max_idle_moves : int or None
+        The number of evaluated moves in a row without improvement after which local search stops
+        (None: 5 per job and vehicle, at least 1000).
+    makespan_weight, empty_driving_weight, lateness_weight : float
+        The weights of the objective terms.
+    seed : int
+        The seed of the random move selection.
+    """
+
+    def __init__(self,
+                 travel_times: np.ndarray,
+                 locations: Sequence[Location],
+                 speed: float,
+                 time_budget: float = 1.0,
+                 max_idle_moves: Optional[int] = None,
+                 makespan_weight: float = 1.0,
+                 empty_driving_weight: float = 1.0,
+                 lateness_weight: float = 100.0,
+                 seed: int = 0) -> None:
+        """
+        Initialize a new VRPSolver.
+
+        Parameters:
+        ----------
+        travel_times : numpy.ndarray
+            The travel times (in seconds) between the locations, see get_travel_time_matrix().
+        locations : list
+            The locations belonging to the rows/columns of 'travel_times'.
+        speed : float
+            The speed (m/s) at which 'travel_times' were computed.
+        time_budget : float, optional
+            The maximum number of seconds spent in local search. Default is 1.0.
+        max_idle_moves : int, optional
+            Stop local search after this many evaluated moves in a row without improvement. Default is
+            None: 5 per job and vehicle (the size of the relocate neighbourhood), at least 1000.
+        makespan_weight : float, optional
+            The weight of the makespan (seconds). Default is 1.0.
+        empty_driving_weight : float, optional
+            The weight of the empty driving time (seconds). Default is 1.0.
+        lateness_weight : float, optional
+            The weight of the lateness (seconds). Default is 100.0.
+        seed : int, optional
+            The seed of the random move selection. Default is 0.
+        """
+        self.travel_times = np.asarray(travel_times, dtype=float)
+        self.locations = list(locations)
+        self.speed = speed
+        self.time_budget = time_budget
+        self.max_idle_moves = max_idle_moves
+        self.makespan_weight = makespan_weight
+        self.empty_driving_weight = empty_driving_weight
+        self.lateness_weight = lateness_weight
+        self.seed = seed
+        self._index = {location.id: i for i, location in enumerate(self.locations)}
+
+    def _get_location_index(self, location: Optional[Location]) -> int:
+        """
+        Return the matrix index of a location, or -1 if it is not part of the matrix.
+        """
+        return self._index.get(location.id, -1) if location is not None else -1
+
+    def _get_nearest_location_index(self, position: Optional[List[float]]) -> int:
+        """
+        Return the matrix index of the location nearest to a position, or -1 if there is no position.
+        """
+        if position is None or not self.locations:
+            return -1
+        return min(range(len(self.locations)), key=lambda i: haversine(position, self.locations[i].georeference))
+
+    def _get_vehicle_start(self, vehicle: Vehicle, exclude: Collection[str] = ()) -> int:
+        """
+        Return the location index where the vehicle is when it becomes available, ignoring the trips in 'exclude'.
+        """
+        pending = [trip for trip in Trip.get_all_trips() if trip.vehicle is vehicle and trip.status in ['requested', 'in_transit']
+                   and trip.actions and trip.id not in exclude]
+        if pending:
+            return self._get_location_index(pending[-1].actions[-1]._to)
+        return self._get_nearest_location_index(vehicle.position)
+
+    def solve(self, trips: Sequence[Trip], vehicles: Sequence[Vehicle],
+              time_windows: Optional[Dict[str, Tuple[Optional[datetime], Optional[datetime], bool]]] = None,
+              initial: Optional[Dict[Any, List[Trip]]] = None,
+              ignore: Optional[Sequence[Trip]] = None) -> VRPSolution:
+        """
+        Plan a batch of trips over the vehicles.
+
+        Parameters:
+        ----------
+        trips : list
+            The trips to plan (typically all trips with status 'draft').
+        vehicles : list
+            The vehicles to plan them on.
+        time_windows : dict, optional
+            (earliest start, latest end, enforced) per trip id, overriding get_time_windows().
+        initial : dict, optional
+            An initial plan (vehicle -> ordered trips, or vehicle id -> ordered trips) to start the
+            local search from instead of the construction step. Trips missing from it are inserted.
+        ignore : list, optional
+            Assigned trips that do not delay their vehicle (e.g., trips a re-planner appends after the plan).
+            Trips to plan that are already assigned are always ignored.
+
+        Returns:
+        -------
+        VRPSolution
+            The best plan found within the time budget. Trips that no vehicle can execute within their
+            enforced constraints (also when planned alone) are left out and listed in 'unplanned'.
+        """
+        start_time = time.perf_counter()
+        now = clock.now()
+        trips = [trip for trip in trips if trip.actions]
+        vehicles = list(vehicles)
+        time_windows = time_windows or {}
+        if not trips or not vehicles:
+            return VRPSolution({vehicle: [] for vehicle in vehicles}, {}, {}, 0.0, 0.0, 0.0, 0.0, 0, unplanned=trips)
+
+        # Job data, as plain lists for fast evaluation
+        job_start = [self._get_location_index(trip.actions[0]._from) for trip in trips]
+        job_end = [self._get_location_index(trip.actions[-1]._to) for trip in trips]
+        allowed = [get_compatible_vehicles(trip, vehicles).tolist() for trip in trips]  # allowed[j][v]
+
+        # Job durations per vehicle; vehicles with the same timing parameters share them
+        durations: Dict[Tuple[float, float, float], List[float]] = {}
+        vehicle_durations = []
+        for vehicle in vehicles:
+            key = (vehicle.actual_speed, vehicle.load_time, vehicle.unload_time)
+            if key not in durations:
+                durations[key] = [vehicle.get_timing_plan(trip).total_duration for trip in trips]
+            vehicle_durations.append(durations[key])
+
+        # Start windows per job and vehicle (seconds from now): earliest start, latest start without lateness,
+        # and latest start of the enforced windows
+        earliest, latest, hard_latest = [], [], []
+        for j, trip in enumerate(trips):
+            window = time_windows.get(trip.id)
+            if window is None:
+                windows = get_time_windows(trip, vehicles, now)
+            else:
+                end = (window[1] - now).total_seconds() if window[1] is not None else math.inf
+                latest_start = np.array([end - vehicle_durations[v][j] for v in range(len(vehicles))])
+                windows = (np.full(len(vehicles), (window[0] - now).total_seconds() if window[0] is not None else 0.0),
+                           latest_start, latest_start if window[2] else np.full(len(vehicles), math.inf))
+            earliest.append(np.maximum(windows[0], 0.0).tolist())
+            latest.append(windows[1].tolist())
+            hard_latest.append(windows[2].tolist())
+
+        # Where and when the vehicles become available, after their other trips
+        exclude = {trip.id for trip in trips} | {trip.id for trip in ignore or []}
+        ready = [max((vehicle.get_available_time(exclude) - now).total_seconds(), 0.0) for vehicle in vehicles]
+        origin = [self._get_vehicle_start(vehicle, exclude) for vehicle in vehicles]
+        scale = [self.speed / vehicle.actual_speed if vehicle.actual_speed else 1.0 for vehicle in vehicles]
+        T = self.travel_times.tolist()  # Nested lists index faster than numpy scalars in the loops below
+
+        def evaluate(v: int, route: List[int]) -> Tuple[float, float, float, bool]:
+            """Return (end, empty driving, lateness, feasible) of a route of vehicle v."""
+            t, loc, empty, late, feasible = ready[v], origin[v], 0.0, 0.0, True
+            duration = vehicle_durations[v]
+            for j in route:
+                travel = T[loc][job_start[j]] * scale[v] if loc >= 0 and job_start[j] >= 0 else 0.0
+                empty += travel
+                t = max(t + travel, earliest[j][v])
+                if t > latest[j][v]:
+                    late += t - latest[j][v]
+                    feasible = feasible and t <= hard_latest[j][v]
+                t += duration[j]
+                loc = job_end[j] if job_end[j] >= 0 else loc
+                feasible = feasible and allowed[j][v]
+            return t, empty, late, feasible
+
+        def objective(results: List[Tuple[float, float, float, bool]]) -> float:
+            return (self.makespan_weight * max(r[0] for r in results) +
+                    self.empty_driving_weight * sum(r[1] for r in results) +
+                    self.lateness_weight * sum(r[2] for r in results))
+
+        def prune(v: int, route: List[int]) -> List[int]:
+            """Return the jobs of a route of vehicle v that meet their enforced constraints, dropping the others."""
+            kept: List[int] = []
+            t, loc = ready[v], origin[v]
+            for j in route:
+                travel = T[loc][job_start[j]] * scale[v] if loc >= 0 and job_start[j] >= 0 else 0.0
+                start = max(t + travel, earliest[j][v])
+                if allowed[j][v] and start <= hard_latest[j][v]:
+                    kept.append(j)
+                    t = start + vehicle_durations[v][j]
+                    loc = job_end[j] if job_end[j] >= 0 else loc
+            return kept
+
+        # Construction: insert jobs by earliest deadline at the end of the vehicle where they finish earliest,
+        # among the vehicles that meet their enforced constraints. The routes stay feasible; jobs that fit
+        # no vehicle are left unplanned.
+        routes: List[List[int]] = [[] for _ in vehicles]
+        if initial:
+            position = {trip.id: j for j, trip in enumerate(trips)}
+            for v, vehicle in enumerate(vehicles):
+                planned = initial.get(vehicle, initial.get(vehicle.id, []))
+                routes[v] = prune(v, [position[trip.id] for trip in planned if trip.id in position])
+        results = [evaluate(v, routes[v]) for v in range(len(vehicles))]
+        planned = {j for route in routes for j in route}
+        deadline = [min(latest[j][v] + vehicle_durations[v][j] for v in range(len(vehicles))) for j in range(len(trips))]
+        unplanned: List[int] = []
+        for j in sorted((j for j in range(len(trips)) if j not in planned), key=lambda j: (deadline[j], min(earliest[j]))):
+            best = None
+            for v in range(len(vehicles)):
+                if not allowed[j][v]:
+                    continue
+                result = evaluate(v, routes[v] + [j])
+                if not result[3]:
+                    continue
+                cost = result[0] + self.empty_driving_weight * (result[1] - results[v][1]) + self.lateness_weight * (result[2] - results[v][2])
+                if best is None or cost < best[0]:
+                    best = (cost, v, result)
+            if best is None:
+                unplanned.append(j)
+                continue
+            _, v, result = best
+            routes[v].append(j)
+            results[v] = result
+
+        # Local search: random relocate and swap moves, first improvement, until the time budget is spent or
+        # no move improved the plan for a while. One job on one vehicle has no other plan.
+        rng = random.Random(self.seed)
+        current = objective(results)
+        feasible = all(r[3] for r in results)
+        iterations = idle = 0
+        num_vehicles = len(vehicles)
+        trivial = num_vehicles == 1 and len(trips) < 2
+        max_idle_moves = self.max_idle_moves if self.max_idle_moves is not None else max(1000, 5 * len(trips) * num_vehicles)
+        while not trivial and idle < max_idle_moves and time.perf_counter() - start_time < self.time_budget:
+            a = rng.randrange(num_vehicles)
+            if not routes[a]:
+                continue
+            b = rng.randrange(num_vehicles)
+            i = rng.randrange(len(routes[a]))
+            if rng.random() < 0.5:
+                # Relocate job i of route a to a random position of route b
+                new_a = routes[a][:i] + routes[a][i + 1:]
+                new_b = new_a if a == b else list(routes[b])
+                new_b.insert(rng.randrange(len(new_b) + 1), routes[a][i])
+            else:
+                # Swap job i of route a with a random job of route b
+                if not routes[b]:
+                    continue
+                k = rng.randrange(len(routes[b]))
+                new_a = list(routes[a])
+                new_b = new_a if a == b else list(routes[b])
+                new_a[i], new_b[k] = routes[b][k], routes[a][i]
+            iterations += 1
+            idle += 1
+            candidate = list(results)
+            candidate[a] = evaluate(a, new_a)
+            candidate[b] = evaluate(b, new_b) if a != b else candidate[a]
+            candidate_feasible = all(r[3] for r in candidate)
+            if candidate_feasible < feasible:
+                continue
+            value = objective(candidate)
+            if value < current - 1e-9 or candidate_feasible > feasible:
+                routes[a], routes[b] = new_a, new_b
+                results, current, feasible = candidate, value, candidate_feasible
+                idle = 0
+
+        # Planned start and end times of each trip
+        starts, ends = {}, {}
+        for v, route in enumerate(routes):
+            t, loc = ready[v], origin[v]
+            for j in route:
+                travel = T[loc][job_start[j]] * scale[v] if loc >= 0 and job_start[j] >= 0 else 0.0
+                t = max(t + travel, earliest[j][v])
+                starts[trips[j].id] = now + timedelta(seconds=t)
+                t += vehicle_durations[v][j]
+                ends[trips[j].id] = now + timedelta(seconds=t)
+                loc = job_end[j] if job_end[j] >= 0 else loc
+
+        return VRPSolution(
+            routes={vehicle: [trips[j] for j in routes[v]] for v, vehicle in enumerate(vehicles)},
+            starts=starts,
+            ends=ends,
+            makespan=max(r[0] for r in results),
+            empty_driving=sum(r[1] for r in results),
+            lateness=sum(r[2] for r in results),
+            objective=current,
+            iterations=iterations,
+            unplanned=[trips[j] for j in unplanned],
+        )